@@ -7,13 +7,15 @@ set -e
 
 # 检查参数
 BUMP_VERSION=""
-if [ "$1" = "--bump-patch" ]; then
-    BUMP_VERSION="patch"
-elif [ "$1" = "--bump-minor" ]; then
-    BUMP_VERSION="minor"
-elif [ "$1" = "--bump-major" ]; then
-    BUMP_VERSION="major"
-fi
+BUNDLE=false
+for arg in "$@"; do
+    case "$arg" in
+        --bump-patch) BUMP_VERSION="patch" ;;
+        --bump-minor) BUMP_VERSION="minor" ;;
+        --bump-major) BUMP_VERSION="major" ;;
+        --bundle) BUNDLE=true ;;
+    esac
+done
 
 echo "🔨 开始构建 EduBuddy..."
 
@@ -57,6 +59,12 @@ mypy src/
 echo "📦 构建包..."
 uv build
 
+# 构建单文件包（预编译字节码的zipapp），并与已安装命令对比启动时间
+if [ "$BUNDLE" = true ]; then
+    echo "📦 构建单文件包..."
+    python scripts/bundle.py --compare
+fi
+
 echo "✅ 构建完成！"
 echo ""
 echo "构建产物："
@@ -77,4 +85,7 @@ echo "  ./scripts/build.sh --bump-patch    # 构建时增加补丁版本"
 echo "  ./scripts/build.sh --bump-minor    # 构建时增加次版本"
 echo "  ./scripts/build.sh --bump-major    # 构建时增加主版本"
 echo ""
+echo "单文件包（启动更快）："
+echo "  ./scripts/build.sh --bundle        # 同时生成 dist/edubuddy-*.pyz"
+echo ""
 
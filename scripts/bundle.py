@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+单文件包构建脚本
+
+把 edubuddy 和纯 Python 依赖（click、loguru）打成一个 zipapp（dist/edubuddy-<版本>.pyz）:
+    - 每个模块旁边放预编译的 .pyc（不校验源码的哈希字节码），
+      冷启动时不编译、不比较源码时间戳
+    - 用 `python3 -IS` 启动，不处理 site，导入只在包内和标准库中查找
+    - numpy、scipy、sounddevice 等音频依赖不打包，用到时才从 site-packages
+      （或 EDUBUDDY_EXTRAS 指定的目录）加载，见 edubuddy.bootstrap
+
+.pyc 与构建所用的 Python 版本绑定，部署机器的 python3 版本不同时会退回源码
+（--strip-sources 时则无法运行），请用与部署机器相同版本的 Python 构建。
+"""
+
+import argparse
+import importlib.metadata
+import py_compile
+import shlex
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import zipapp
+from pathlib import Path
+from typing import List
+
+from version import get_current_version
+
+# 打进包内的纯 Python 依赖
+DEPENDENCIES = ("click", "loguru")
+
+# zipapp 的默认解释器行：-I 隔离环境变量和用户目录，-S 不导入 site
+DEFAULT_INTERPRETER = "/usr/bin/python3 -IS"
+
+MAIN_SOURCE = "from edubuddy.bootstrap import main\n\nmain()\n"
+
+
+def stage_package(source: Path, staging: Path) -> None:
+    """复制 edubuddy 源码"""
+    shutil.copytree(
+        source, staging / source.name, ignore=shutil.ignore_patterns("__pycache__")
+    )
+
+
+def stage_metadata(staging: Path, version: str) -> None:
+    """写入 edubuddy 的元数据，使 importlib.metadata 能取到版本号"""
+    dist_info = staging / f"edubuddy-{version}.dist-info"
+    dist_info.mkdir()
+    (dist_info / "METADATA").write_text(
+        f"Metadata-Version: 2.1\nName: edubuddy\nVersion: {version}\n"
+    )
+
+
+def stage_dependency(name: str, staging: Path) -> None:
+    """从当前环境中已安装的发行包复制依赖的文件"""
+    try:
+        dist = importlib.metadata.distribution(name)
+    except importlib.metadata.PackageNotFoundError:
+        sys.exit(f"错误: 依赖 {name} 未安装，请先运行 install.sh")
+    for file in dist.files or []:
+        parts = file.parts
+        if parts[0] == ".." or "__pycache__" in parts or file.suffix == ".pyc":
+            continue
+        if file.suffix in (".so", ".pyd"):
+            sys.exit(f"错误: 依赖 {name} 含有C扩展，不能打包进zipapp")
+        target = staging / file
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(dist.locate_file(file), target)
+
+
+def compile_tree(staging: Path, optimize: int, strip_sources: bool) -> int:
+    """
+    在每个 .py 旁边生成 .pyc（zipimport 只认这种位置，不读 __pycache__）
+
+    Returns:
+        编译的模块数
+    """
+    count = 0
+    for path in sorted(staging.rglob("*.py")):
+        py_compile.compile(
+            str(path),
+            cfile=str(path.with_suffix(".pyc")),
+            dfile=str(path.relative_to(staging)),
+            doraise=True,
+            optimize=optimize,
+            invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+        )
+        if strip_sources and path.name != "__main__.py":
+            path.unlink()
+        count += 1
+    return count
+
+
+def build(output: Path, interpreter: str, optimize: int, strip_sources: bool) -> Path:
+    """
+    构建单文件包
+
+    Args:
+        output: 输出目录
+        interpreter: zipapp 的解释器行
+        optimize: 字节码优化级别（0或1；2会去掉命令行帮助所用的文档字符串）
+        strip_sources: 是否只保留 .pyc（回溯中不再显示源码行）
+
+    Returns:
+        生成的 .pyz 路径
+    """
+    version = get_current_version()
+    target = output / f"edubuddy-{version}.pyz"
+    output.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        staging = Path(tmp)
+        stage_package(Path("src/edubuddy"), staging)
+        stage_metadata(staging, version)
+        for name in DEPENDENCIES:
+            stage_dependency(name, staging)
+        (staging / "__main__.py").write_text(MAIN_SOURCE)
+        count = compile_tree(staging, optimize, strip_sources)
+        zipapp.create_archive(staging, target, interpreter=interpreter)
+
+    size_kb = target.stat().st_size / 1024
+    print(f"📦 {target} ({size_kb:.0f} KB，预编译 {count} 个模块)")
+    return target
+
+
+def measure_startup(command: List[str], runs: int) -> List[float]:
+    """多次运行命令，返回每次的耗时（秒）"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def compare(
+    target: Path, interpreter: str, installed: str, runs: int, args: List[str]
+) -> None:
+    """对比已安装的命令与单文件包（按其解释器行启动）的启动时间"""
+    commands = {
+        "已安装 (venv)": [installed, *args],
+        "单文件包 (pyz)": [*shlex.split(interpreter), str(target), *args],
+    }
+    print(f"⏱️  启动时间对比: edubuddy {' '.join(args)}，运行 {runs} 次")
+    results = {}
+    for label, command in commands.items():
+        # 先运行一次预热文件系统缓存
+        measure_startup(command, 1)
+        timings = measure_startup(command, runs)
+        results[label] = statistics.median(timings)
+        print(
+            f"  {label:<16} 中位数 {results[label] * 1000:7.1f}ms"
+            f"  最小 {min(timings) * 1000:7.1f}ms"
+        )
+    baseline, bundled = results.values()
+    print(f"  单文件包快 {(1 - bundled / baseline) * 100:.0f}%")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="EduBuddy 单文件包构建工具")
+    parser.add_argument(
+        "--output", "-o", type=Path, default=Path("dist"), help="输出目录，默认 dist/"
+    )
+    parser.add_argument(
+        "--python",
+        default=DEFAULT_INTERPRETER,
+        help=f"zipapp 的解释器行，默认 '{DEFAULT_INTERPRETER}'",
+    )
+    parser.add_argument(
+        "--optimize", type=int, choices=[0, 1], default=0, help="字节码优化级别"
+    )
+    parser.add_argument(
+        "--strip-sources", action="store_true", help="只保留 .pyc，包更小"
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="COMMAND",
+        nargs="?",
+        const="edubuddy",
+        help="构建后对比已安装命令（默认 PATH 中的 edubuddy）与单文件包的启动时间",
+    )
+    parser.add_argument("--runs", type=int, default=20, help="对比时每种方式运行的次数")
+    options = parser.parse_args()
+
+    target = build(
+        options.output, options.python, options.optimize, options.strip_sources
+    )
+    if options.compare:
+        installed = shutil.which(options.compare)
+        if installed is None:
+            sys.exit(f"错误: 找不到已安装的命令 {options.compare}")
+        compare(target, options.python, installed, options.runs, ["--version"])
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,10 @@ set -e
 
 # 配置文件路径
 CONFIG_FILE="scripts/deploy.conf"
+# 已部署服务的运行时配置文件，服务会监视其变化并热加载
+INSTALLED_CONFIG_FILE="/opt/edubuddy/edubuddy.conf"
+# 可热加载的配置项
+LIVE_KEYS="LOG_INTERVAL LOG_FORMAT LOG_LEVEL"
 
 # 颜色输出
 RED='\033[0;31m'
@@ -157,6 +161,32 @@ EOF
         echo "${key}=${value}" >> "$CONFIG_FILE"
         log_success "配置项 $key 已添加: $value"
     fi
+
+    sync_installed_config "$key" "$value"
+}
+
+# 同步可热加载的配置项到已部署服务的配置文件
+# 通过临时文件加重命名原子替换，服务不会读到写了一半的文件
+sync_installed_config() {
+    local key="$1"
+    local value="$2"
+
+    if [ ! -f "$INSTALLED_CONFIG_FILE" ] || [[ " $LIVE_KEYS " != *" $key "* ]]; then
+        return
+    fi
+
+    local tmp_file
+    tmp_file=$(mktemp)
+    if grep -q "^${key}=" "$INSTALLED_CONFIG_FILE"; then
+        sed "s|^${key}=.*|${key}=${value}|" "$INSTALLED_CONFIG_FILE" > "$tmp_file"
+    else
+        cat "$INSTALLED_CONFIG_FILE" > "$tmp_file"
+        echo "${key}=${value}" >> "$tmp_file"
+    fi
+    sudo install -m 644 "$tmp_file" "${INSTALLED_CONFIG_FILE}.new"
+    sudo mv "${INSTALLED_CONFIG_FILE}.new" "$INSTALLED_CONFIG_FILE"
+    rm -f "$tmp_file"
+    log_success "已同步到运行中的服务，将自动热加载: $INSTALLED_CONFIG_FILE"
 }
 
 # 编辑配置文件
@@ -12,6 +12,7 @@ SERVICE_GROUP="mason"
 INSTALL_DIR="/opt/edubuddy"
 SERVICE_DIR="/etc/systemd/system"
 LOG_DIR="/var/log/edubuddy"
+CONTROL_SOCKET="/run/edubuddy/control.sock"
 
 # 从配置文件读取参数
 DEPLOY_CONFIG_FILE="scripts/deploy.conf"
@@ -167,6 +168,31 @@ install_package() {
     fi
 }
 
+# 安装单文件包
+# 不创建虚拟环境，/usr/local/bin/edubuddy 直接指向 zipapp（以 python3 -IS 启动）；
+# 音频依赖（numpy、scipy、sounddevice）用到时才从系统 python3 的 site-packages 加载
+install_bundle() {
+    log_info "安装EduBuddy单文件包..."
+
+    BUNDLE_FILE=$(find dist/ -name "*.pyz" -type f | sort -V | tail -n 1)
+
+    if [ -z "$BUNDLE_FILE" ]; then
+        log_error "未找到单文件包，请先运行 ./scripts/build.sh --bundle"
+        exit 1
+    fi
+
+    log_info "安装文件: $BUNDLE_FILE"
+    install -m 755 "$BUNDLE_FILE" "$INSTALL_DIR/edubuddy.pyz"
+    ln -sf "$INSTALL_DIR/edubuddy.pyz" "/usr/local/bin/edubuddy"
+
+    if /usr/local/bin/edubuddy --version; then
+        log_success "EduBuddy单文件包安装成功"
+    else
+        log_error "EduBuddy单文件包安装失败"
+        exit 1
+    fi
+}
+
 # 创建启动脚本
 create_launcher_script() {
     log_info "创建启动脚本..."
@@ -216,13 +242,15 @@ Type=simple
 User=$SERVICE_USER
 Group=$SERVICE_GROUP
 WorkingDirectory=$INSTALL_DIR
-ExecStart=/usr/local/bin/edubuddy start-logger --interval $LOG_INTERVAL
+ExecStart=/usr/local/bin/edubuddy start-logger --interval $LOG_INTERVAL --log-dir $LOG_DIR --control-socket $CONTROL_SOCKET --config $INSTALL_DIR/edubuddy.conf
 ExecReload=/bin/kill -HUP \$MAINPID
 Restart=always
 RestartSec=10
 StandardOutput=journal
 StandardError=journal
 SyslogIdentifier=edubuddy
+RuntimeDirectory=edubuddy
+RuntimeDirectoryMode=0750
 
 # 环境变量
 Environment=PYTHONPATH=$INSTALL_DIR/venv/lib/python*/site-packages
@@ -253,10 +281,10 @@ create_config() {
     cat > "$INSTALL_DIR/edubuddy.conf" << EOF
 # EduBuddy 配置文件
 
-# 日志设置
+# 日志设置（修改后自动热加载，无需重启服务）
 LOG_LEVEL=$LOG_LEVEL
 LOG_INTERVAL=$LOG_INTERVAL
-LOG_FORMAT=$LOG_FORMAT
+LOG_FORMAT="$LOG_FORMAT"
 
 # 服务设置
 AUTO_START=true
@@ -273,26 +301,14 @@ EOF
     log_success "配置文件已创建"
 }
 
-# 创建日志轮转配置
-create_logrotate() {
-    log_info "创建日志轮转配置..."
-    
-    cat > "/etc/logrotate.d/edubuddy" << EOF
-$LOG_DIR/*.log {
-    daily
-    missingok
-    rotate 7
-    compress
-    delaycompress
-    notifempty
-    create 644 $SERVICE_USER $SERVICE_GROUP
-    postrotate
-        systemctl reload $SERVICE_NAME > /dev/null 2>&1 || true
-    endscript
-}
-EOF
-
-    log_success "日志轮转配置已创建"
+# 清理旧的日志轮转配置
+# 日志由应用在进程内按大小和时长滚动并压缩，不再依赖外部logrotate
+remove_legacy_logrotate() {
+    if [ -f "/etc/logrotate.d/edubuddy" ]; then
+        log_info "删除旧的logrotate配置..."
+        rm -f "/etc/logrotate.d/edubuddy"
+        log_success "旧的logrotate配置已删除"
+    fi
 }
 
 # 启动服务
@@ -328,6 +344,8 @@ show_service_info() {
     echo ""
     echo "服务日志:"
     echo "  journalctl -u $SERVICE_NAME -f"
+    echo "  edubuddy logs --dir $LOG_DIR --since 1h --grep <正则>"
+    echo "  edubuddy ctl --socket $CONTROL_SOCKET metrics"
     echo ""
     echo "管理命令:"
     echo "  启动服务: sudo systemctl start $SERVICE_NAME"
@@ -366,7 +384,11 @@ main() {
     setup_directories
     
     # 安装包
-    install_package
+    if [ "$1" = "--bundle" ]; then
+        install_bundle
+    else
+        install_package
+    fi
     
     # 创建配置文件
     create_config
@@ -374,8 +396,8 @@ main() {
     # 创建systemd服务
     create_systemd_service
     
-    # 创建日志轮转
-    create_logrotate
+    # 清理旧的日志轮转配置
+    remove_legacy_logrotate
     
     # 启动服务
     start_service
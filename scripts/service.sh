@@ -7,6 +7,8 @@ set -e
 
 # 配置变量
 SERVICE_NAME="edubuddy"
+LOG_DIR="/var/log/edubuddy"
+CONTROL_SOCKET="/run/edubuddy/control.sock"
 
 # 颜色输出
 RED='\033[0;31m'
@@ -43,7 +45,7 @@ show_help() {
     echo "  stop      停止服务"
     echo "  restart   重启服务"
     echo "  status    查看服务状态"
-    echo "  logs      查看服务日志"
+    echo "  logs      查看服务日志（可附加 --since/--until/--grep）"
     echo "  follow    实时查看日志"
     echo "  enable    启用自启动"
     echo "  disable   禁用自启动"
@@ -54,6 +56,7 @@ show_help() {
     echo "  $0 start"
     echo "  $0 status"
     echo "  $0 logs"
+    echo "  $0 logs --since 1h --grep 错误"
     echo "  $0 follow"
 }
 
@@ -104,15 +107,28 @@ restart_service() {
 }
 
 # 查看服务状态
+# 除systemd状态外，通过控制套接字查询运行中进程的实时指标
 show_status() {
     log_info "查看 $SERVICE_NAME 服务状态..."
-    systemctl status "$SERVICE_NAME" --no-pager
+    systemctl status "$SERVICE_NAME" --no-pager || true
+    if command -v edubuddy &> /dev/null && [ -S "$CONTROL_SOCKET" ]; then
+        echo ""
+        log_info "运行时指标:"
+        edubuddy ctl --socket "$CONTROL_SOCKET" metrics \
+            || sudo "$(command -v edubuddy)" ctl --socket "$CONTROL_SOCKET" metrics \
+            || log_warning "无法查询控制套接字 $CONTROL_SOCKET"
+    fi
 }
 
 # 查看服务日志
+# 优先通过索引查询应用自己的滚动日志文件，否则回退到journalctl
 show_logs() {
     log_info "查看 $SERVICE_NAME 服务日志..."
-    sudo journalctl -u "$SERVICE_NAME" --no-pager
+    if command -v edubuddy &> /dev/null && [ -d "$LOG_DIR" ]; then
+        edubuddy logs --dir "$LOG_DIR" "$@"
+    else
+        sudo journalctl -u "$SERVICE_NAME" --no-pager
+    fi
 }
 
 # 实时查看日志
@@ -169,7 +185,8 @@ main() {
             show_status
             ;;
         logs)
-            show_logs
+            shift
+            show_logs "$@"
             ;;
         follow)
             follow_logs
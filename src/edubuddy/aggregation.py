@@ -0,0 +1,262 @@
+"""
+上行帧聚合模块
+
+每次 session.send_audio 都要做一次 base64 编码、JSON序列化和一个 WebSocket 帧，
+固定开销与音频长短无关。用户没有说话时把几块麦克风音频合并成一帧再发送，
+说话、打断或刚唤醒时立即回到最小帧长，不给语音增加延迟。
+
+策略:
+    - 一块音频的能量不低于 speech_energy，或带有 barge_in / wake 标记时视为活动，
+      活动及其后 hangover_s 秒内每块到达即发送（帧长为 min_ms 与块长中的较大者），
+      活动开始时先把积攒的静音一起发出
+    - 空闲时每发送一帧，目标帧长乘以 ramp，直到 max_ms
+    - 积攒的音频最早一块等待超过 max_ms 时，即使没有新块到达也应发送
+      （调用方按 deadline 等待）
+
+测量:
+    - 聚合增加的延迟: 每块从到达到实际发送的时间（均值、最大值）
+    - 节省的CPU: 对每次发送的CPU耗时按样本数做线性回归，截距即每次发送的固定开销，
+      节省量 = (块数 - 发送次数) × 固定开销
+"""
+
+import time
+from typing import TYPE_CHECKING, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from .audio import MODEL_SAMPLE_RATE, AudioArray
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
+    from .pipeline import Frame
+
+MIN_FRAME_MS = 20.0
+MAX_FRAME_MS = 200.0
+DEFAULT_SPEECH_ENERGY = 0.02
+DEFAULT_HANGOVER_S = 1.5
+DEFAULT_RAMP = 2.0
+
+
+def parse_frame_range(value: str) -> Tuple[float, float]:
+    """
+    解析帧长设置
+
+    Args:
+        value: "最小-最大" 毫秒，如 "20-200"；单个数字表示固定帧长
+
+    Returns:
+        (最小帧长, 最大帧长) 毫秒
+
+    Raises:
+        ValueError: 格式错误或超出 20~200ms
+    """
+    parts = [part.strip() for part in value.split("-")]
+    try:
+        numbers = [float(part) for part in parts]
+    except ValueError:
+        raise ValueError(f"无效的帧长设置: {value!r}") from None
+    if len(numbers) == 1:
+        numbers *= 2
+    if len(numbers) != 2:
+        raise ValueError(f"无效的帧长设置: {value!r}")
+    low, high = numbers
+    if not MIN_FRAME_MS <= low <= high <= MAX_FRAME_MS:
+        raise ValueError(
+            f"帧长必须在 {MIN_FRAME_MS:g}~{MAX_FRAME_MS:g}ms 之间且最小值不大于最大值"
+        )
+    return low, high
+
+
+class UplinkAggregator:
+    """自适应上行帧聚合"""
+
+    def __init__(
+        self,
+        min_ms: float = MIN_FRAME_MS,
+        max_ms: float = MAX_FRAME_MS,
+        sample_rate: int = MODEL_SAMPLE_RATE,
+        speech_energy: float = DEFAULT_SPEECH_ENERGY,
+        hangover_s: float = DEFAULT_HANGOVER_S,
+        ramp: float = DEFAULT_RAMP,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        初始化聚合器
+
+        Args:
+            min_ms: 活动时的帧长（毫秒）
+            max_ms: 空闲时的最大帧长（毫秒）
+            sample_rate: 音频采样率
+            speech_energy: 视为说话的最小RMS能量
+            hangover_s: 活动结束后保持最小帧长的时间（秒）
+            ramp: 空闲时每发送一帧目标帧长增长的倍数
+            clock: 单调时钟
+        """
+        if not MIN_FRAME_MS <= min_ms <= max_ms <= MAX_FRAME_MS:
+            raise ValueError(
+                f"帧长必须在 {MIN_FRAME_MS:g}~{MAX_FRAME_MS:g}ms 之间且最小值不大于最大值"
+            )
+        if ramp < 1:
+            raise ValueError("增长倍数不能小于1")
+        self.min_ms = min_ms
+        self.max_ms = max_ms
+        self.sample_rate = sample_rate
+        self.speech_energy = speech_energy
+        self.hangover_s = hangover_s
+        self.ramp = ramp
+        self.clock = clock
+
+        self.target_ms = min_ms
+        self._active_until = float("-inf")
+        self._pending: List[AudioArray] = []
+        self._arrived: List[float] = []
+        self._pending_samples = 0
+
+        # 统计
+        self.chunks = 0
+        self.sends = 0
+        self.latency_total_s = 0.0
+        self.latency_max_s = 0.0
+        # 发送CPU耗时对样本数的线性回归累计量
+        self._fit = np.zeros(5)  # n, Σx, Σy, Σx², Σxy
+
+    @property
+    def pending(self) -> int:
+        """积攒未发送的块数"""
+        return len(self._pending)
+
+    @property
+    def deadline(self) -> Optional[float]:
+        """积攒的音频最晚应发送的时刻，没有积攒时为None"""
+        if not self._arrived:
+            return None
+        return self._arrived[0] + self.max_ms / 1000.0
+
+    @property
+    def active(self) -> bool:
+        """是否处于活动（说话、打断、唤醒）期间"""
+        return self.clock() < self._active_until
+
+    def add(self, frame: "Frame") -> Optional[Tuple[AudioArray, int]]:
+        """
+        加入一块处理后的上行音频
+
+        Args:
+            frame: 上行流水线输出的块（meta 中的 energy/barge_in/wake 用于判断活动）
+
+        Returns:
+            需要立即发送的 (音频, 块数)，继续积攒时返回None
+        """
+        now = self.clock()
+        meta = frame.meta
+        if (
+            meta.get("energy", 0.0) >= self.speech_energy
+            or meta.get("barge_in")
+            or meta.get("wake")
+        ):
+            self._active_until = now + self.hangover_s
+            self.target_ms = self.min_ms
+
+        self._pending.append(frame.samples)
+        self._arrived.append(now)
+        self._pending_samples += len(frame.samples)
+        pending_ms = self._pending_samples * 1000.0 / self.sample_rate
+        if now < self._active_until or pending_ms >= self.target_ms:
+            return self._emit(now)
+        if now >= self._arrived[0] + self.max_ms / 1000.0:
+            return self._emit(now)
+        return None
+
+    def flush(self) -> Optional[Tuple[AudioArray, int]]:
+        """发送积攒的全部音频（到达 deadline 或停止时调用）"""
+        if not self._pending:
+            return None
+        return self._emit(self.clock())
+
+    def _emit(self, now: float) -> Tuple[AudioArray, int]:
+        count = len(self._pending)
+        if count == 1:
+            audio = self._pending[0]
+        else:
+            audio = np.concatenate(self._pending)
+        for arrived in self._arrived:
+            waited = now - arrived
+            self.latency_total_s += waited
+            if waited > self.latency_max_s:
+                self.latency_max_s = waited
+        self._pending = []
+        self._arrived = []
+        self._pending_samples = 0
+        self.chunks += count
+        self.sends += 1
+        if now >= self._active_until:
+            self.target_ms = min(self.max_ms, self.target_ms * self.ramp)
+        return audio, count
+
+    def record_send(self, samples: int, cpu_ns: int) -> None:
+        """
+        记录一次发送的CPU耗时，用于估计每次发送的固定开销
+
+        Args:
+            samples: 发送的样本数
+            cpu_ns: 发送消耗的CPU时间（纳秒）
+        """
+        x, y = float(samples), float(cpu_ns)
+        self._fit += (1.0, x, y, x * x, x * y)
+
+    @property
+    def fixed_cost_ns(self) -> float:
+        """每次发送的固定CPU开销估计（纳秒），样本数变化不足时为0"""
+        n, sx, sy, sxx, sxy = self._fit
+        denominator = n * sxx - sx * sx
+        if n < 2 or denominator <= 1e-9 * max(1.0, sxx * n):
+            return 0.0
+        slope = (n * sxy - sx * sy) / denominator
+        return max(0.0, (sy - slope * sx) / n)
+
+    @property
+    def cpu_saved_s(self) -> float:
+        """聚合省下的发送CPU时间估计（秒）"""
+        return (self.chunks - self.sends) * self.fixed_cost_ns / 1e9
+
+    @property
+    def latency_mean_s(self) -> float:
+        """每块平均增加的延迟（秒）"""
+        return self.latency_total_s / self.chunks if self.chunks else 0.0
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """向控制服务的指标注册表注册聚合指标"""
+        prefix = "uplink.aggregate"
+        registry.register(
+            f"{prefix}.chunks_total", lambda: self.chunks, "上行的音频块数", "counter"
+        )
+        registry.register(
+            f"{prefix}.sends_total",
+            lambda: self.sends,
+            "send_audio 调用次数",
+            "counter",
+        )
+        registry.register(
+            f"{prefix}.frame_ms", lambda: self.target_ms, "当前目标帧长（毫秒）"
+        )
+        registry.register(
+            f"{prefix}.latency_added_ms_mean",
+            lambda: self.latency_mean_s * 1000,
+            "每块平均增加的延迟（毫秒）",
+        )
+        registry.register(
+            f"{prefix}.latency_added_ms_max",
+            lambda: self.latency_max_s * 1000,
+            "单块最大增加的延迟（毫秒）",
+        )
+        registry.register(
+            f"{prefix}.send_fixed_cpu_us",
+            lambda: self.fixed_cost_ns / 1e3,
+            "每次发送的固定CPU开销估计（微秒）",
+        )
+        registry.register(
+            f"{prefix}.cpu_saved_seconds_total",
+            lambda: self.cpu_saved_s,
+            "聚合省下的发送CPU时间估计（秒）",
+            "counter",
+        )
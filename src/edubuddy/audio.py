@@ -0,0 +1,382 @@
+"""
+音频处理模块
+
+实时语音链路中与设备无关的音频处理：能量计算、重采样和回调式播放缓冲。
+"""
+
+import queue
+import threading
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+
+from .trace import (
+    EVENT_FADE_END,
+    EVENT_FADE_START,
+    EVENT_INTERRUPT,
+    EVENT_UNDERRUN,
+    recorder,
+)
+
+# Audio configuration
+CHUNK_LENGTH_S = 0.04  # 40ms aligns with realtime defaults
+# SAMPLE_RATE = 24000
+SAMPLE_RATE = 48000
+MODEL_SAMPLE_RATE = 24000  # realtime 模型使用 24kHz PCM16
+FORMAT = np.int16
+CHANNELS = 1
+# ENERGY_THRESHOLD = 0.015  # RMS threshold for barge‑in while assistant is speaking
+ENERGY_THRESHOLD = 0.12  # RMS threshold for barge‑in while assistant is speaking
+
+PREBUFFER_CHUNKS = 3  # initial jitter buffer (~120ms with 40ms chunks)
+FADE_OUT_MS = 12  # short fade to avoid clicks when interrupting
+
+AudioArray = np.ndarray[Any, np.dtype[Any]]
+
+# 播放进度回调: (item_id, content_index, 已播放的PCM字节)
+PlayedCallback = Callable[[str, int, bytes], None]
+
+
+def rms_energy(samples: AudioArray) -> float:
+    """计算int16音频的RMS能量，归一化到[0, 1]"""
+    if samples.size == 0:
+        return 0.0
+    # Normalize int16 to [-1, 1]
+    x = samples.astype(np.float32) / 32768.0
+    return float(np.sqrt(np.mean(x * x)))
+
+
+# scipy.signal 导入约需1秒，首次重采样时才导入，不拖慢命令行启动
+_resample_poly: Optional[Callable[..., AudioArray]] = None
+
+
+def _require_resampler() -> Callable[..., AudioArray]:
+    """获取重采样函数（首次调用时导入 scipy），scipy未安装时报错"""
+    global _resample_poly
+    if _resample_poly is None:
+        try:
+            from scipy.signal import resample_poly
+        except ImportError:
+            raise ImportError("重采样需要安装 scipy") from None
+        _resample_poly = resample_poly
+    return _resample_poly
+
+
+def downsample_48k_to_24k(samples_48k: AudioArray) -> AudioArray:
+    """将 48000Hz 音频下采样到 24000Hz 并转换为 int16"""
+    # 上下采样
+    samples_24k = _require_resampler()(samples_48k, up=1, down=2)
+
+    # 保证幅度不超范围并转换为 int16
+    return np.clip(samples_24k, -32768, 32767).astype(np.int16)
+
+
+def upsample_24k_to_48k(samples_24k: AudioArray) -> AudioArray:
+    """将 24000Hz 音频上采样到 48000Hz"""
+    # up=2, down=1 => 24k -> 48k
+    return _require_resampler()(samples_24k, up=2, down=1)
+
+
+class EchoGate:
+    """
+    按回环延迟对齐的回声门限
+
+    输出回调记录每块输出的时间和能量。麦克风块在时刻t读到时，其中的回声来自
+    约 t - latency 时写出的音频，据此判断助手声音是否还在被麦克风听到，
+    并把打断阈值提高到预期回声能量之上。未校准时延迟和回声增益为0，
+    行为与只看播放状态的固定阈值一致。
+    """
+
+    def __init__(
+        self,
+        latency_s: float = 0.0,
+        echo_gain: float = 0.0,
+        threshold: float = ENERGY_THRESHOLD,
+        block_s: float = CHUNK_LENGTH_S,
+        capacity: int = 256,
+    ):
+        """
+        初始化回声门限
+
+        Args:
+            latency_s: 输出到输入的回环延迟（秒），来自校准
+            echo_gain: 回声能量与输出能量之比，来自校准
+            threshold: 基础打断能量阈值
+            block_s: 音频块时长（秒），用于对齐窗口
+            capacity: 保留的输出块记录数
+        """
+        if latency_s < 0 or echo_gain < 0:
+            raise ValueError("延迟和回声增益不能为负数")
+        if capacity < 1:
+            raise ValueError("记录容量必须至少为1")
+
+        self.latency_s = latency_s
+        self.echo_gain = echo_gain
+        self.threshold = threshold
+        self.block_s = block_s
+
+        # 预分配环形记录，输出回调中不分配内存
+        self._times = np.full(capacity, -np.inf)
+        self._levels = np.zeros(capacity, dtype=np.float64)
+        self._index = 0
+
+    def record_output(self, timestamp: float, level: float) -> None:
+        """记录一块已写出的输出音频（在音频回调线程中调用）"""
+        i = self._index
+        self._times[i] = timestamp
+        self._levels[i] = level
+        self._index = (i + 1) % len(self._times)
+
+    def expected_echo(self, capture_time: float) -> float:
+        """
+        估计在capture_time读到的麦克风块中的回声来源能量
+
+        Args:
+            capture_time: 麦克风块读到的时刻（与record_output同一时钟）
+
+        Returns:
+            对齐窗口内输出块的最大能量，无输出时为0
+        """
+        center = capture_time - self.latency_s
+        mask = np.abs(self._times - center) <= self.block_s
+        if not mask.any():
+            return 0.0
+        return float(self._levels[mask].max())
+
+    def echo_expected(self, capture_time: float) -> bool:
+        """麦克风此刻是否可能听到助手的声音"""
+        return self.expected_echo(capture_time) > 0.0
+
+    def is_barge_in(self, energy: float, capture_time: float) -> bool:
+        """
+        判断麦克风能量是否超过回声，视为用户打断
+
+        Args:
+            energy: 麦克风块的RMS能量
+            capture_time: 麦克风块读到的时刻
+
+        Returns:
+            如果应视为用户语音则返回True
+        """
+        echo = self.echo_gain * self.expected_echo(capture_time)
+        return energy >= max(self.threshold, echo)
+
+
+class PlaybackBuffer:
+    """回调式播放缓冲 - 抖动缓冲、淡出中断，并上报播放进度"""
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        prebuffer_chunks: int = PREBUFFER_CHUNKS,
+        fade_out_ms: float = FADE_OUT_MS,
+        on_played: Optional[PlayedCallback] = None,
+    ):
+        """
+        初始化播放缓冲
+
+        Args:
+            sample_rate: 输出采样率
+            prebuffer_chunks: 开始播放前需要缓冲的音频块数
+            fade_out_ms: 中断时的淡出时长（毫秒）
+            on_played: 播放进度回调
+        """
+        self.on_played = on_played
+
+        # Store tuples: (samples_np, item_id, content_index)
+        # Use an unbounded queue to avoid drops that sound like skipped words.
+        self.output_queue: queue.Queue[Any] = queue.Queue(maxsize=0)
+        self.interrupt_event = threading.Event()
+        self.current_audio_chunk: Optional[Tuple[AudioArray, str, int]] = None
+        self.chunk_position = 0
+
+        # Jitter buffer and fade-out state
+        self.prebuffering = True
+        self.prebuffer_target_chunks = prebuffer_chunks
+        self.fading = False
+        self.fade_total_samples = 0
+        self.fade_done_samples = 0
+        self.fade_samples = int(sample_rate * (fade_out_ms / 1000.0))
+
+        # 只填充了部分输出块的次数（包括每段回复的最后一块）
+        self.partial_blocks = 0
+        # 回复播放中途数据耗尽、之后同一回复又有音频到达的次数（网络供给不足）
+        self.starvations = 0
+        self._dry_item: Optional[str] = None
+        self._dry_since = 0.0
+        self._last_item: Optional[str] = None
+
+    @property
+    def is_playing(self) -> bool:
+        """是否有助手音频正在播放或等待播放"""
+        return self.current_audio_chunk is not None or not self.output_queue.empty()
+
+    @property
+    def queue_depth(self) -> int:
+        """等待播放的音频块数"""
+        return self.output_queue.qsize()
+
+    def enqueue(self, samples: AudioArray, item_id: str, content_index: int) -> None:
+        """加入一块待播放的音频"""
+        # Non-blocking put; queue is unbounded, so drops won't occur.
+        self.output_queue.put_nowait((samples, item_id, content_index))
+        if self._dry_item is not None:
+            if self._dry_item == item_id:
+                self.starvations += 1
+                recorder.record(
+                    EVENT_UNDERRUN, self.starvations, recorder.clock() - self._dry_since
+                )
+            self._dry_item = None
+
+    def interrupt(self) -> None:
+        """中断播放：在回调中淡出并清空队列，随后重建抖动缓冲"""
+        recorder.record(EVENT_INTERRUPT, self.queue_depth, float(self.is_playing))
+        self.prebuffering = True
+        self._dry_item = None
+        self.interrupt_event.set()
+
+    def _report_played(
+        self, item_id: str, content_index: int, data: AudioArray
+    ) -> None:
+        """上报播放进度，回调异常不影响音频输出"""
+        if self.on_played is None:
+            return
+        try:
+            self.on_played(item_id, content_index, data.tobytes())
+        except Exception:
+            pass
+
+    def _flush_queue(self) -> None:
+        """清空待播放队列"""
+        while not self.output_queue.empty():
+            try:
+                self.output_queue.get_nowait()
+            except queue.Empty:
+                break
+
+    def fill(self, outdata: AudioArray) -> int:
+        """
+        填充一块输出缓冲（在音频回调线程中调用）
+
+        Args:
+            outdata: 形状为 (frames, channels) 的输出缓冲
+
+        Returns:
+            实际填充的音频样本数，其余部分为静音
+        """
+        # Handle interruption with a short fade-out to prevent clicks.
+        if self.interrupt_event.is_set():
+            outdata.fill(0)
+            if self.current_audio_chunk is None:
+                # Nothing to fade, just flush everything and reset.
+                self._flush_queue()
+                self.prebuffering = True
+                self.interrupt_event.clear()
+                return 0
+
+            # Prepare fade parameters
+            if not self.fading:
+                self.fading = True
+                self.fade_done_samples = 0
+                # Remaining samples in the current chunk
+                remaining_in_chunk = (
+                    len(self.current_audio_chunk[0]) - self.chunk_position
+                )
+                self.fade_total_samples = min(
+                    self.fade_samples, max(0, remaining_in_chunk)
+                )
+                recorder.record(EVENT_FADE_START, self.fade_total_samples)
+
+            samples, item_id, content_index = self.current_audio_chunk
+            samples_filled = 0
+            while (
+                samples_filled < len(outdata)
+                and self.fade_done_samples < self.fade_total_samples
+            ):
+                remaining_output = len(outdata) - samples_filled
+                remaining_fade = self.fade_total_samples - self.fade_done_samples
+                n = min(remaining_output, remaining_fade)
+
+                src = samples[self.chunk_position : self.chunk_position + n].astype(
+                    np.float32
+                )
+                # Linear ramp from current level down to 0 across remaining fade samples
+                idx = np.arange(
+                    self.fade_done_samples, self.fade_done_samples + n, dtype=np.float32
+                )
+                gain = 1.0 - (idx / float(self.fade_total_samples))
+                ramped = np.clip(src * gain, -32768.0, 32767.0).astype(np.int16)
+                outdata[samples_filled : samples_filled + n, 0] = ramped
+
+                # Optionally report played bytes (ramped) to playback tracker
+                self._report_played(item_id, content_index, ramped)
+
+                samples_filled += n
+                self.chunk_position += n
+                self.fade_done_samples += n
+
+            # If fade completed, flush the remaining audio and reset state
+            if self.fade_done_samples >= self.fade_total_samples:
+                recorder.record(EVENT_FADE_END, self.fade_done_samples)
+                self.current_audio_chunk = None
+                self.chunk_position = 0
+                self._flush_queue()
+                self.fading = False
+                self.prebuffering = True
+                self.interrupt_event.clear()
+            return samples_filled
+
+        # Fill output buffer from queue and current chunk
+        outdata.fill(0)  # Start with silence
+        samples_filled = 0
+
+        while samples_filled < len(outdata):
+            # If we don't have a current chunk, try to get one from queue
+            if self.current_audio_chunk is None:
+                try:
+                    # Respect a small jitter buffer before starting playback
+                    if (
+                        self.prebuffering
+                        and self.output_queue.qsize() < self.prebuffer_target_chunks
+                    ):
+                        break
+                    self.prebuffering = False
+                    self.current_audio_chunk = self.output_queue.get_nowait()
+                    self.chunk_position = 0
+                except queue.Empty:
+                    # No more audio data available - this causes choppiness
+                    # if more audio for the same item arrives later
+                    if self._dry_item is None and self._last_item is not None:
+                        self._dry_since = recorder.clock()
+                    self._dry_item = self._last_item
+                    break
+
+            # Copy data from current chunk to output buffer
+            remaining_output = len(outdata) - samples_filled
+            samples, item_id, content_index = self.current_audio_chunk
+            self._last_item = item_id
+            remaining_chunk = len(samples) - self.chunk_position
+            samples_to_copy = min(remaining_output, remaining_chunk)
+
+            if samples_to_copy > 0:
+                chunk_data = samples[
+                    self.chunk_position : self.chunk_position + samples_to_copy
+                ]
+                # More efficient: direct assignment for mono audio instead of reshape
+                outdata[samples_filled : samples_filled + samples_to_copy, 0] = (
+                    chunk_data
+                )
+                samples_filled += samples_to_copy
+                self.chunk_position += samples_to_copy
+
+                # Inform playback tracker about played bytes
+                self._report_played(item_id, content_index, chunk_data)
+
+            # If we've used up the entire chunk, reset for next iteration
+            if self.chunk_position >= len(samples):
+                self.current_audio_chunk = None
+                self.chunk_position = 0
+
+        if 0 < samples_filled < len(outdata):
+            self.partial_blocks += 1
+        return samples_filled
@@ -0,0 +1,362 @@
+"""
+共享内存音频总线模块
+
+把实时语音采集和播放的音频发布到 multiprocessing.shared_memory 环形缓冲区，
+供录音、实时字幕、电平表等其他进程旁路读取，而不必重复打开声卡。
+
+每个方向（capture 麦克风采集、playback 扬声器播放）一个共享内存段，
+名称为 "<总线名>.<方向>"。段内布局:
+    - 头部: 魔数、槽数、每槽最大样本数、采样率、最新序号
+    - 每个槽: 序号、时间戳（time.monotonic）、样本数和int16样本
+
+写入方只有一个线程（采集循环或音频回调），写入一块只是一次内存复制，不加锁、
+不等待读取方。序号从1开始递增；写槽时先把槽序号清零，写完数据再写入新序号，
+读取方在读数据前后各检查一次槽序号，不一致说明该槽已被覆盖。
+读取方直接拿到共享内存上的numpy视图（零拷贝），落后超过一圈时跳到最旧的
+可用块，并通过 Block.lost 和 RingReader.lost 报告丢失的块数。
+"""
+
+import time
+from dataclasses import dataclass
+from multiprocessing import resource_tracker, shared_memory
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+import numpy as np
+
+from .audio import SAMPLE_RATE, AudioArray
+from .logger import logger
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
+
+DEFAULT_BUS_NAME = "edubuddy"
+
+CHANNEL_CAPTURE = "capture"
+CHANNEL_PLAYBACK = "playback"
+BUS_CHANNELS = (CHANNEL_CAPTURE, CHANNEL_PLAYBACK)
+
+# 默认槽数和每槽样本数：256个40ms块约10秒
+DEFAULT_SLOTS = 256
+DEFAULT_SLOT_SAMPLES = 4096
+
+_MAGIC = 0x45424231  # "EBB1"
+_HEADER_WORDS = 8
+# 头部字段下标
+_H_MAGIC, _H_SLOTS, _H_SLOT_SAMPLES, _H_RATE, _H_SEQ = range(5)
+
+
+def segment_name(bus: str, channel: str) -> str:
+    """共享内存段名称"""
+    if channel not in BUS_CHANNELS:
+        raise ValueError(
+            f"未知的音频方向: {channel}（可用: {', '.join(BUS_CHANNELS)}）"
+        )
+    return f"{bus}.{channel}"
+
+
+def _layout(slots: int, slot_samples: int) -> Dict[str, int]:
+    """各区域在段内的偏移和总大小（都按8字节对齐）"""
+    header = _HEADER_WORDS * 8
+    seqs = header
+    times = seqs + slots * 8
+    lengths = times + slots * 8
+    data = lengths + slots * 8
+    size = data + slots * slot_samples * 2
+    return {
+        "seqs": seqs,
+        "times": times,
+        "lengths": lengths,
+        "data": data,
+        "size": size,
+    }
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """附加到已有的共享内存段，不让本进程退出时删除它"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # type: ignore[call-arg]
+    except TypeError:
+        pass
+    # Python < 3.13 没有 track 参数，附加时也会登记到 resource_tracker，
+    # 读取进程退出时段会被删除；附加期间跳过登记
+    register = resource_tracker.register
+    resource_tracker.register = lambda name, rtype: None
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+class _Ring:
+    """共享内存段上的环形缓冲区视图"""
+
+    def __init__(self, shm: shared_memory.SharedMemory):
+        self.shm = shm
+        self._header = np.ndarray(_HEADER_WORDS, dtype=np.uint64, buffer=shm.buf)
+        if int(self._header[_H_MAGIC]) != _MAGIC:
+            raise ValueError(f"共享内存段不是音频总线: {shm.name}")
+        self.slots = int(self._header[_H_SLOTS])
+        self.slot_samples = int(self._header[_H_SLOT_SAMPLES])
+        self.sample_rate = int(self._header[_H_RATE])
+        offsets = _layout(self.slots, self.slot_samples)
+        buf = shm.buf
+        self._seqs = np.ndarray(self.slots, np.uint64, buf, offsets["seqs"])
+        self._times = np.ndarray(self.slots, np.float64, buf, offsets["times"])
+        self._lengths = np.ndarray(self.slots, np.uint64, buf, offsets["lengths"])
+        self._data = np.ndarray(
+            (self.slots, self.slot_samples), np.int16, buf, offsets["data"]
+        )
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def last_seq(self) -> int:
+        """最新发布的块序号，0表示还没有数据"""
+        return int(self._header[_H_SEQ])
+
+    def _release(self) -> None:
+        """释放所有视图后关闭映射"""
+        del self._header, self._seqs, self._times, self._lengths, self._data
+        try:
+            self.shm.close()
+        except BufferError:
+            # 调用方仍持有零拷贝视图，映射随进程退出释放
+            pass
+
+
+class RingWriter(_Ring):
+    """环形缓冲区写入方（每个方向只能有一个）"""
+
+    def __init__(
+        self,
+        name: str,
+        sample_rate: int = SAMPLE_RATE,
+        slots: int = DEFAULT_SLOTS,
+        slot_samples: int = DEFAULT_SLOT_SAMPLES,
+    ):
+        """
+        创建共享内存段
+
+        Args:
+            name: 共享内存段名称
+            sample_rate: 采样率（写入头部供读取方使用）
+            slots: 槽数
+            slot_samples: 每槽最大样本数，更长的块拆成多个槽
+
+        Raises:
+            FileExistsError: 同名总线正被其他进程写入
+        """
+        if slots < 2 or slot_samples < 1:
+            raise ValueError("至少需要2个槽，每槽至少1个样本")
+        size = _layout(slots, slot_samples)["size"]
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            shm = self._replace_stale(name, size)
+
+        header = np.ndarray(_HEADER_WORDS, dtype=np.uint64, buffer=shm.buf)
+        header[:] = 0
+        header[_H_SLOTS] = slots
+        header[_H_SLOT_SAMPLES] = slot_samples
+        header[_H_RATE] = sample_rate
+        header[_H_MAGIC] = _MAGIC
+        del header
+        super().__init__(shm)
+        self._seqs[:] = 0
+        self.blocks = 0
+        self.samples = 0
+
+    @staticmethod
+    def _replace_stale(name: str, size: int) -> shared_memory.SharedMemory:
+        """上次异常退出留下的段：最新块超过5秒没有更新才删除重建"""
+        old = _attach(name)
+        try:
+            ring = _Ring(old)
+            last = ring.last_seq
+            stamp = float(ring._times[last % ring.slots]) if last else 0.0
+            alive = last and time.monotonic() - stamp < 5.0
+            ring._release()
+        except (ValueError, TypeError):
+            old.close()
+            alive = False
+        if alive:
+            raise FileExistsError(f"音频总线正被其他进程写入: {name}")
+        logger.warning("删除残留的音频总线共享内存: {}", name)
+        old.unlink()
+        return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    def publish(self, samples: AudioArray, timestamp: Optional[float] = None) -> None:
+        """
+        发布一块int16单声道音频（在音频线程中调用，不阻塞）
+
+        Args:
+            samples: 音频样本
+            timestamp: 块的时间（time.monotonic），默认为当前时间
+        """
+        samples = samples.reshape(-1)
+        stamp = time.monotonic() if timestamp is None else timestamp
+        seq = int(self._header[_H_SEQ])
+        for offset in range(0, samples.size, self.slot_samples):
+            part = samples[offset : offset + self.slot_samples]
+            seq += 1
+            slot = seq % self.slots
+            self._seqs[slot] = 0
+            self._data[slot, : part.size] = part
+            self._lengths[slot] = part.size
+            self._times[slot] = stamp + offset / self.sample_rate
+            self._seqs[slot] = seq
+            self._header[_H_SEQ] = seq
+            self.blocks += 1
+        self.samples += samples.size
+
+    def close(self) -> None:
+        """关闭并删除共享内存段"""
+        shm = self.shm
+        self._release()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class Block:
+    """读取到的一块音频"""
+
+    seq: int
+    timestamp: float
+    # 指向共享内存的零拷贝视图，写入方绕过一圈后内容会被覆盖
+    samples: AudioArray
+    # 读取这一块之前因落后而跳过的块数
+    lost: int = 0
+
+
+class RingReader(_Ring):
+    """环形缓冲区读取方，任意多个，互不影响，也不影响写入方"""
+
+    def __init__(self, name: str, from_start: bool = False):
+        """
+        附加到共享内存段
+
+        Args:
+            name: 共享内存段名称
+            from_start: 从缓冲区中最旧的块开始读，默认只读附加之后的新块
+
+        Raises:
+            FileNotFoundError: 总线不存在（实时语音未启用音频总线）
+        """
+        super().__init__(_attach(name))
+        self.lost = 0
+        self.position = self._oldest() if from_start else self.last_seq + 1
+
+    def _oldest(self) -> int:
+        # 写入方可能正在覆盖最旧的槽，因此留出一个槽的余量
+        return max(1, self.last_seq - self.slots + 2)
+
+    @property
+    def lag(self) -> int:
+        """尚未读取的块数"""
+        return max(0, self.last_seq + 1 - self.position)
+
+    def valid(self, block: Block) -> bool:
+        """零拷贝视图是否仍未被覆盖（处理完视图后调用以确认结果可信）"""
+        return int(self._seqs[block.seq % self.slots]) == block.seq
+
+    def read(self) -> Optional[Block]:
+        """
+        读取下一块
+
+        Returns:
+            下一块音频，没有新数据时返回None
+        """
+        lost = 0
+        while self.position <= self.last_seq:
+            oldest = self._oldest()
+            if self.position < oldest:
+                lost += oldest - self.position
+                self.position = oldest
+            seq = self.position
+            slot = seq % self.slots
+            if int(self._seqs[slot]) != seq:
+                # 读取途中被覆盖
+                lost += 1
+                self.position += 1
+                continue
+            length = int(self._lengths[slot])
+            timestamp = float(self._times[slot])
+            samples = self._data[slot, :length]
+            if int(self._seqs[slot]) != seq:
+                lost += 1
+                self.position += 1
+                continue
+            self.position += 1
+            self.lost += lost
+            return Block(seq, timestamp, samples, lost)
+        self.lost += lost
+        return None
+
+    def blocks(self, poll_interval: float = 0.005) -> Iterator[Block]:
+        """持续读取新块，没有数据时按间隔轮询"""
+        while True:
+            block = self.read()
+            if block is None:
+                time.sleep(poll_interval)
+                continue
+            yield block
+
+    def close(self) -> None:
+        """断开共享内存（不删除）"""
+        self._release()
+
+
+class AudioBus:
+    """实时语音的音频总线：采集和播放两个方向各一个环形缓冲区"""
+
+    def __init__(
+        self,
+        name: str = DEFAULT_BUS_NAME,
+        sample_rate: int = SAMPLE_RATE,
+        slots: int = DEFAULT_SLOTS,
+        slot_samples: int = DEFAULT_SLOT_SAMPLES,
+    ):
+        self.name = name
+        self.writers = {
+            channel: RingWriter(
+                segment_name(name, channel), sample_rate, slots, slot_samples
+            )
+            for channel in BUS_CHANNELS
+        }
+
+    def publish_capture(
+        self, samples: AudioArray, timestamp: Optional[float] = None
+    ) -> None:
+        """发布一块麦克风采集的音频"""
+        self.writers[CHANNEL_CAPTURE].publish(samples, timestamp)
+
+    def publish_playback(
+        self, samples: AudioArray, timestamp: Optional[float] = None
+    ) -> None:
+        """发布一块写入扬声器的音频"""
+        self.writers[CHANNEL_PLAYBACK].publish(samples, timestamp)
+
+    def close(self) -> None:
+        for writer in self.writers.values():
+            writer.close()
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """注册各方向发布的块数和样本数"""
+        for channel, writer in self.writers.items():
+            registry.register(
+                f"bus.{channel}.blocks_total",
+                lambda w=writer: w.blocks,
+                f"{channel} 方向发布的块数",
+                "counter",
+            )
+            registry.register(
+                f"bus.{channel}.samples_total",
+                lambda w=writer: w.samples,
+                f"{channel} 方向发布的样本数",
+                "counter",
+            )
@@ -0,0 +1,667 @@
+"""
+离线批处理模块
+
+把录好的学生提问（WAV文件）按实时语音相同的上行流水线（降噪、能量、下采样）
+送入会话，收集回复音频和各项耗时，用于大规模评估。多个文件并发处理，
+默认不按实时节奏等待，速度只受后端限制。
+
+会话通过工厂函数创建，可以是真实的实时会话，也可以是不联网的本地替身
+LocalSession（把收到的音频原样作为回复返回），便于测试和测量流水线本身的吞吐。
+"""
+
+import asyncio
+import json
+import os
+import statistics
+import wave
+from dataclasses import asdict, dataclass, field
+from math import gcd
+from types import SimpleNamespace
+from typing import (
+    Any,
+    AsyncContextManager,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from .audio import (
+    CHUNK_LENGTH_S,
+    MODEL_SAMPLE_RATE,
+    SAMPLE_RATE,
+    AudioArray,
+    _require_resampler,
+)
+from .clock import SYSTEM_CLOCK, Clock
+from .denoise import NoiseSuppressor
+from .logger import logger
+from .pipeline import (
+    DenoiseStage,
+    EnergyStage,
+    Frame,
+    Pipeline,
+    PipelineWorker,
+    ResampleStage,
+    Stage,
+)
+
+# 默认并发会话数
+DEFAULT_CONCURRENCY = 4
+
+# 单个文件等待回复结束的默认超时（秒）
+DEFAULT_TIMEOUT_S = 60.0
+
+# 提问结束后追加的静音（秒），让服务端语音活动检测判定一句话结束
+DEFAULT_TAIL_S = 1.0
+
+# 表示一轮回复结束的会话事件
+RESPONSE_DONE_EVENTS = ("agent_end",)
+
+# 等待流水线结果时检查丢块的间隔（秒）
+_DRAIN_POLL_S = 0.05
+
+RESULTS_FILE = "results.jsonl"
+SUMMARY_FILE = "summary.json"
+
+# 创建会话的工厂，返回异步上下文管理器，进入后得到会话对象
+SessionFactory = Callable[[], AsyncContextManager[Any]]
+
+
+def find_audio_files(directory: str) -> List[str]:
+    """
+    递归查找目录下的WAV文件
+
+    Args:
+        directory: 输入目录
+
+    Returns:
+        按路径排序的文件列表
+    """
+    found = []
+    for root, _dirs, files in os.walk(directory):
+        for name in files:
+            if name.lower().endswith(".wav"):
+                found.append(os.path.join(root, name))
+    return sorted(found)
+
+
+def read_wav(path: str) -> Tuple[AudioArray, int]:
+    """
+    读取16位PCM WAV文件，多声道取平均转为单声道
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        (int16样本, 采样率)
+
+    Raises:
+        ValueError: 不是16位PCM
+    """
+    with wave.open(path, "rb") as f:
+        if f.getsampwidth() != 2:
+            raise ValueError(f"只支持16位PCM WAV: {path}")
+        channels = f.getnchannels()
+        rate = f.getframerate()
+        data = f.readframes(f.getnframes())
+    samples = np.frombuffer(data, dtype="<i2")
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples.astype(np.int16), rate
+
+
+def write_wav(
+    path: str, samples: AudioArray, sample_rate: int = MODEL_SAMPLE_RATE
+) -> None:
+    """写出单声道16位PCM WAV文件"""
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(np.asarray(samples, dtype="<i2").tobytes())
+
+
+def to_pipeline_rate(samples: AudioArray, sample_rate: int) -> Tuple[AudioArray, int]:
+    """
+    把不能整数倍转换到采集采样率的音频（如44.1kHz）整体重采样到采集采样率
+
+    Args:
+        samples: int16样本
+        sample_rate: 采样率
+
+    Returns:
+        (int16样本, 采样率)，能整数倍转换时原样返回
+
+    Raises:
+        ImportError: 需要重采样但未安装 scipy
+    """
+    if SAMPLE_RATE % sample_rate == 0:
+        return samples, sample_rate
+    divisor = gcd(SAMPLE_RATE, sample_rate)
+    resampled = _require_resampler()(
+        samples.astype(np.float32),
+        up=SAMPLE_RATE // divisor,
+        down=sample_rate // divisor,
+    )
+    return np.clip(resampled, -32768, 32767).astype(np.int16), SAMPLE_RATE
+
+
+def uplink_stages(sample_rate: int, denoise: bool = False) -> List[Stage]:
+    """
+    与实时上行相同的处理阶段（没有播放，因此不含打断判断）
+
+    Args:
+        sample_rate: 输入采样率，需能整数倍转换到采集采样率（否则先用 to_pipeline_rate）
+        denoise: 是否降噪
+
+    Returns:
+        阶段列表，输出为模型采样率的int16音频
+    """
+    stages: List[Stage] = []
+    if sample_rate != SAMPLE_RATE:
+        if SAMPLE_RATE % sample_rate:
+            raise ValueError(
+                f"不支持的采样率 {sample_rate}Hz，需为 {SAMPLE_RATE}Hz 的整数分之一"
+            )
+        stages.append(
+            ResampleStage(up=SAMPLE_RATE // sample_rate, name="to_capture_rate")
+        )
+    if denoise:
+        stages.append(DenoiseStage(NoiseSuppressor(sample_rate=SAMPLE_RATE)))
+    stages.append(EnergyStage())
+    stages.append(
+        ResampleStage(down=SAMPLE_RATE // MODEL_SAMPLE_RATE, name="downsample")
+    )
+    return stages
+
+
+@dataclass
+class FileResult:
+    """单个文件的处理结果和耗时"""
+
+    file: str
+    ok: bool = False
+    error: str = ""
+    audio_s: float = 0.0
+    chunks: int = 0
+    connect_s: float = 0.0
+    send_s: float = 0.0
+    first_audio_s: Optional[float] = None
+    total_s: float = 0.0
+    lost_chunks: int = 0
+    response_audio_s: float = 0.0
+    output: str = ""
+    stages: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    events: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def realtime_factor(self) -> float:
+        """音频时长与处理耗时之比"""
+        return self.audio_s / self.total_s if self.total_s > 0 else 0.0
+
+
+@dataclass
+class BatchSummary:
+    """批处理汇总"""
+
+    files: int
+    succeeded: int
+    failed: int
+    audio_s: float
+    wall_s: float
+    concurrency: int
+    realtime_factor: float
+    first_audio_p50_s: Optional[float]
+    first_audio_p95_s: Optional[float]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _percentile(values: Sequence[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return round(ordered[index], 4)
+
+
+class LocalSession:
+    """
+    本地会话替身
+
+    不联网。进入时等待 connect_delay_s 模拟建立连接。检测到一句话结束（有过语音且之后静音达到 silence_s，或显式提交）后，
+    等待 response_delay_s，再把这段音频按40ms一块作为助手回复事件返回，
+    事件结构与实时会话的 audio / audio_end / agent_end 事件一致。
+    """
+
+    def __init__(
+        self,
+        response_delay_s: float = 0.0,
+        silence_s: float = 0.5,
+        threshold: float = 0.01,
+        sample_rate: int = MODEL_SAMPLE_RATE,
+        clock: Optional[Clock] = None,
+        connect_delay_s: float = 0.0,
+    ):
+        """
+        初始化本地会话
+
+        Args:
+            response_delay_s: 模拟的回复生成耗时（秒）
+            silence_s: 判定一句话结束的静音时长（秒）
+            threshold: 语音能量阈值（归一化RMS）
+            sample_rate: 收到和返回的音频采样率
+            clock: 模拟回复耗时所用的时钟，默认系统时钟
+            connect_delay_s: 模拟的建立连接耗时（秒）
+        """
+        self.clock = clock or SYSTEM_CLOCK
+        self.response_delay_s = response_delay_s
+        self.connect_delay_s = connect_delay_s
+        self.silence_samples = int(silence_s * sample_rate)
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.turns = 0
+
+        self._events: "asyncio.Queue[Any]" = asyncio.Queue()
+        self._buffer: List[AudioArray] = []
+        self._speech = False
+        self._silent_samples = 0
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    async def __aenter__(self) -> "LocalSession":
+        if self.connect_delay_s > 0:
+            await self.clock.asleep(self.connect_delay_s)
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        self._events.put_nowait(None)
+
+    async def send_audio(self, audio: Any, *, commit: bool = False) -> None:
+        """接收一块int16 PCM音频"""
+        samples = np.frombuffer(bytes(audio), dtype=np.int16).copy()
+        self._buffer.append(samples)
+
+        if samples.size:
+            level = float(np.sqrt(np.mean((samples / 32768.0) ** 2)))
+            if level >= self.threshold:
+                self._speech = True
+                self._silent_samples = 0
+            else:
+                self._silent_samples += samples.size
+        if commit or (self._speech and self._silent_samples >= self.silence_samples):
+            self._respond()
+
+    def _respond(self) -> None:
+        audio = np.concatenate(self._buffer) if self._buffer else np.zeros(0, np.int16)
+        self._buffer = []
+        self._speech = False
+        self._silent_samples = 0
+        self.turns += 1
+        self._tasks.append(
+            asyncio.create_task(self._emit(audio, f"local-{self.turns}"))
+        )
+
+    async def _emit(self, audio: AudioArray, item_id: str) -> None:
+        if self.response_delay_s > 0:
+            await self.clock.asleep(self.response_delay_s)
+        agent = SimpleNamespace(name="LocalSession")
+        self._events.put_nowait(SimpleNamespace(type="agent_start", agent=agent))
+        step = int(self.sample_rate * CHUNK_LENGTH_S)
+        for offset in range(0, audio.size, step):
+            data = audio[offset : offset + step].tobytes()
+            self._events.put_nowait(
+                SimpleNamespace(
+                    type="audio",
+                    audio=SimpleNamespace(data=data),
+                    item_id=item_id,
+                    content_index=0,
+                )
+            )
+        self._events.put_nowait(SimpleNamespace(type="audio_end", item_id=item_id))
+        self._events.put_nowait(SimpleNamespace(type="agent_end", agent=agent))
+
+    def __aiter__(self) -> "LocalSession":
+        return self
+
+    async def __anext__(self) -> Any:
+        event = await self._events.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+
+def local_session_factory(
+    response_delay_s: float = 0.0,
+    clock: Optional[Clock] = None,
+    connect_delay_s: float = 0.0,
+) -> SessionFactory:
+    """创建本地会话替身的工厂"""
+    return lambda: LocalSession(
+        response_delay_s=response_delay_s,
+        clock=clock,
+        connect_delay_s=connect_delay_s,
+    )
+
+
+def runner_session_factory(agent: Any, model_config: Dict[str, Any]) -> SessionFactory:
+    """
+    用 RealtimeRunner 创建实时会话的工厂，进入时建立连接并发送会话配置
+
+    Args:
+        agent: 实时语音代理
+        model_config: 会话的模型配置
+    """
+    from agents.realtime import RealtimeRunner
+
+    runner = RealtimeRunner(agent)
+
+    class _Session:
+        async def __aenter__(self) -> Any:
+            self._context = await runner.run(model_config=model_config)
+            return await self._context.__aenter__()
+
+        async def __aexit__(self, *exc_info: Any) -> Any:
+            return await self._context.__aexit__(*exc_info)
+
+    return _Session
+
+
+def realtime_session_factory() -> SessionFactory:
+    """
+    创建真实实时会话的工厂（需要 openai-agents 和 OPENAI_API_KEY）
+
+    使用服务端语音活动检测，每段提问结束后自动生成回复，不允许打断。
+    """
+    from .realtime_agent import agent
+
+    model_config = {
+        "initial_model_settings": {
+            "turn_detection": {
+                "type": "server_vad",
+                "interrupt_response": False,
+                "create_response": True,
+            },
+        },
+    }
+    return runner_session_factory(agent, model_config)
+
+
+class _ResponseCollector:
+    """收集一个会话的回复音频，记录首个回复音频的时间"""
+
+    def __init__(self, result: FileResult, start: float, clock: Clock):
+        self.result = result
+        self.start = start
+        self.clock = clock
+        self.chunks: List[AudioArray] = []
+        self.responses = 0
+        self.responding = False
+        self.sent = False
+        self.done = asyncio.Event()
+
+    def finish_sending(self) -> None:
+        """提问已全部发出；如果回复已经结束则立即完成"""
+        self.sent = True
+        if self.responses and not self.responding:
+            self.done.set()
+
+    async def run(self, session: Any) -> None:
+        try:
+            await self._receive(session)
+        finally:
+            self.done.set()
+
+    async def _receive(self, session: Any) -> None:
+        result = self.result
+        async for event in session:
+            result.events[event.type] = result.events.get(event.type, 0) + 1
+            if event.type == "agent_start":
+                self.responding = True
+            elif event.type == "audio":
+                if result.first_audio_s is None:
+                    result.first_audio_s = round(self.clock.monotonic() - self.start, 4)
+                self.chunks.append(np.frombuffer(event.audio.data, dtype=np.int16))
+            elif event.type == "error":
+                raise RuntimeError(str(getattr(event, "error", event)))
+            elif event.type in RESPONSE_DONE_EVENTS:
+                self.responding = False
+                self.responses += 1
+                if self.sent:
+                    self.done.set()
+
+    def audio(self) -> AudioArray:
+        return (
+            np.concatenate(self.chunks) if self.chunks else np.zeros(0, dtype=np.int16)
+        )
+
+
+async def _send_next(
+    worker: PipelineWorker, session: Any, result: FileResult, clock: Clock
+) -> None:
+    """
+    把下一块上行结果发给会话
+
+    流水线丢弃或处理出错的块不会交出结果，只计入 result.lost_chunks，
+    因此在途块数总能归零，不会一直等待。等待工作线程期间虚拟时钟不自动跳转。
+    """
+    with clock.hold():
+        while worker.lost == result.lost_chunks:
+            try:
+                frame = await asyncio.wait_for(worker.get(), _DRAIN_POLL_S)
+            except asyncio.TimeoutError:
+                continue
+            await session.send_audio(frame.samples.tobytes())
+            return
+        result.lost_chunks += 1
+
+
+async def process_file(
+    path: str,
+    session_factory: SessionFactory,
+    output_dir: str,
+    speed: float = 0.0,
+    timeout: float = DEFAULT_TIMEOUT_S,
+    tail_s: float = DEFAULT_TAIL_S,
+    denoise: bool = False,
+    name: Optional[str] = None,
+    clock: Optional[Clock] = None,
+) -> FileResult:
+    """
+    处理一个文件：经上行流水线送入新会话，保存回复音频
+
+    Args:
+        path: WAV文件
+        session_factory: 会话工厂
+        output_dir: 输出目录
+        speed: 相对实时的发送速度，0表示不等待
+        timeout: 等待回复结束的超时（秒）
+        tail_s: 提问后追加的静音（秒）
+        denoise: 是否降噪
+        name: 输出文件名（不含扩展名），默认取输入文件名
+        clock: 发送节奏和耗时计量所用的时钟，默认系统时钟
+
+    Returns:
+        处理结果，出错时 ok 为False并记录错误
+    """
+    clock = clock or SYSTEM_CLOCK
+    result = FileResult(file=path)
+    start = clock.monotonic()
+    worker: Optional[PipelineWorker] = None
+    try:
+        samples, rate = to_pipeline_rate(*read_wav(path))
+        step = int(rate * CHUNK_LENGTH_S)
+        # 尾部静音补齐到整块，流水线各阶段（下采样、降噪帧移）只接收完整的块
+        size = samples.size + int(rate * tail_s)
+        size = -(-size // step) * step
+        samples = np.concatenate(
+            [samples, np.zeros(size - samples.size, dtype=np.int16)]
+        )
+        result.audio_s = round(samples.size / rate, 4)
+
+        pipeline = Pipeline("batch", uplink_stages(rate, denoise))
+        worker = PipelineWorker(pipeline)
+        worker.start()
+
+        connect_start = clock.monotonic()
+        async with session_factory() as session:
+            result.connect_s = round(clock.monotonic() - connect_start, 4)
+            collector = _ResponseCollector(result, start, clock)
+            receiver = asyncio.create_task(collector.run(session))
+            pending = 0
+            for index, offset in enumerate(range(0, samples.size, step)):
+                if speed > 0:
+                    delay = start + index * CHUNK_LENGTH_S / speed - clock.monotonic()
+                    if delay > 0:
+                        await clock.asleep(delay)
+                worker.submit(Frame(samples[offset : offset + step], clock.monotonic()))
+                pending += 1
+                result.chunks += 1
+                # 按实时节奏发送时每块处理完立即发出；否则在途块数不超过
+                # 队列容量，流水线永远不会因溢出丢块
+                limit = 0 if speed > 0 else worker.maxsize - 1
+                while pending > limit:
+                    await _send_next(worker, session, result, clock)
+                    pending -= 1
+            while pending:
+                await _send_next(worker, session, result, clock)
+                pending -= 1
+            if worker.errors:
+                raise RuntimeError(f"上行流水线处理出错 {worker.errors} 块")
+            result.send_s = round(clock.monotonic() - start, 4)
+            collector.finish_sending()
+
+            try:
+                await asyncio.wait_for(collector.done.wait(), timeout)
+            finally:
+                receiver.cancel()
+            if receiver.done() and not receiver.cancelled() and receiver.exception():
+                raise receiver.exception()  # type: ignore[misc]
+            if not collector.responses:
+                raise RuntimeError("会话结束，没有收到回复")
+            response = collector.audio()
+
+        if response.size:
+            stem = name or os.path.splitext(os.path.basename(path))[0]
+            result.output = os.path.join(output_dir, f"{stem}.wav")
+            write_wav(result.output, response)
+        result.response_audio_s = round(response.size / MODEL_SAMPLE_RATE, 4)
+        result.stages = pipeline.stats()
+        result.ok = True
+    except asyncio.TimeoutError:
+        result.error = f"等待回复超时（{timeout}秒）"
+    except Exception as e:
+        result.error = f"{type(e).__name__}: {e}"
+    finally:
+        if worker:
+            worker.stop()
+        result.total_s = round(clock.monotonic() - start, 4)
+    return result
+
+
+async def run_batch(
+    paths: Sequence[str],
+    session_factory: SessionFactory,
+    output_dir: str,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    speed: float = 0.0,
+    timeout: float = DEFAULT_TIMEOUT_S,
+    tail_s: float = DEFAULT_TAIL_S,
+    denoise: bool = False,
+    base_dir: Optional[str] = None,
+    progress: Optional[Callable[[FileResult], Any]] = None,
+    clock: Optional[Clock] = None,
+) -> BatchSummary:
+    """
+    并发处理一组文件，结果逐行写入 results.jsonl，汇总写入 summary.json
+
+    Args:
+        paths: WAV文件列表
+        session_factory: 会话工厂
+        output_dir: 输出目录
+        concurrency: 同时进行的会话数上限
+        speed: 相对实时的发送速度，0表示不等待
+        timeout: 单个文件等待回复结束的超时（秒）
+        tail_s: 提问后追加的静音（秒）
+        denoise: 是否降噪
+        base_dir: 输入根目录，输出文件名按相对路径生成，避免同名文件覆盖
+        progress: 每个文件完成后的回调
+        clock: 发送节奏和耗时计量所用的时钟，默认系统时钟
+
+    Returns:
+        汇总结果
+    """
+    if concurrency < 1:
+        raise ValueError("并发数必须至少为1")
+    if speed < 0:
+        raise ValueError("发送速度不能为负数")
+    os.makedirs(output_dir, exist_ok=True)
+    clock = clock or SYSTEM_CLOCK
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[FileResult] = []
+    results_path = os.path.join(output_dir, RESULTS_FILE)
+    start = clock.monotonic()
+
+    with open(results_path, "w", encoding="utf-8") as out:
+
+        async def handle(path: str) -> None:
+            relative = (
+                os.path.relpath(path, base_dir) if base_dir else os.path.basename(path)
+            )
+            name = os.path.splitext(relative)[0].replace(os.sep, "__")
+            async with semaphore:
+                result = await process_file(
+                    path,
+                    session_factory,
+                    output_dir,
+                    speed,
+                    timeout,
+                    tail_s,
+                    denoise,
+                    name,
+                    clock,
+                )
+            results.append(result)
+            record = asdict(result)
+            record["realtime_factor"] = round(result.realtime_factor, 3)
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            if result.ok:
+                logger.debug("批处理完成: {} ({:.2f}秒)", path, result.total_s)
+            else:
+                logger.warning("批处理失败: {} - {}", path, result.error)
+            if progress is not None:
+                pending = progress(result)
+                if asyncio.iscoroutine(pending):
+                    await pending
+
+        await asyncio.gather(*(handle(path) for path in paths))
+
+    wall_s = clock.monotonic() - start
+    audio_s = sum(r.audio_s for r in results if r.ok)
+    latencies = [r.first_audio_s for r in results if r.first_audio_s is not None]
+    summary = BatchSummary(
+        files=len(results),
+        succeeded=sum(1 for r in results if r.ok),
+        failed=sum(1 for r in results if not r.ok),
+        audio_s=round(audio_s, 3),
+        wall_s=round(wall_s, 3),
+        concurrency=concurrency,
+        realtime_factor=round(audio_s / wall_s, 3) if wall_s > 0 else 0.0,
+        first_audio_p50_s=round(statistics.median(latencies), 4) if latencies else None,
+        first_audio_p95_s=_percentile(latencies, 0.95),
+    )
+    with open(os.path.join(output_dir, SUMMARY_FILE), "w", encoding="utf-8") as f:
+        json.dump(summary.to_dict(), f, ensure_ascii=False, indent=2)
+    return summary
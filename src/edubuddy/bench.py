@@ -0,0 +1,648 @@
+"""
+基准测试模块
+
+提供可复现的微基准和宏基准，覆盖重采样、RMS/打断判断、播放回调、
+事件分发、日志吞吐和TimeService触发抖动等路径，全部使用合成音频驱动。
+结果以JSON输出，并可与保存的基线按阈值比较以发现性能回退。
+"""
+
+import contextlib
+import fnmatch
+import gc
+import io
+import platform
+import statistics
+import sys
+import threading
+import time
+import timeit
+from dataclasses import dataclass, field
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .version import get_version
+
+# 固定随机种子，保证合成音频可复现
+SEED = 20240501
+
+# 默认回退阈值：主指标变差超过10%视为回退
+DEFAULT_THRESHOLD = 0.10
+
+BenchResult = Dict[str, float]
+
+
+class BenchmarkSkipped(Exception):
+    """基准测试因缺少依赖等原因被跳过"""
+
+
+@dataclass
+class Benchmark:
+    """基准测试定义"""
+
+    name: str
+    kind: str
+    primary: str
+    higher_is_better: bool
+    func: Callable[[bool], BenchResult]
+    description: str = ""
+
+
+@dataclass
+class Comparison:
+    """单项基准与基线的比较结果"""
+
+    name: str
+    metric: str
+    baseline: float
+    current: float
+    change: float
+    threshold: float
+    regressed: bool
+
+
+@dataclass
+class BenchReport:
+    """基准测试报告"""
+
+    results: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    skipped: Dict[str, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为可序列化的字典"""
+        return {
+            "version": get_version(),
+            "python": platform.python_version(),
+            "platform": sys.platform,
+            "machine": platform.machine(),
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "results": self.results,
+            "skipped": self.skipped,
+        }
+
+
+BENCHMARKS: Dict[str, Benchmark] = {}
+
+
+def benchmark(
+    name: str, kind: str, primary: str, higher_is_better: bool = False
+) -> Callable[[Callable[[bool], BenchResult]], Callable[[bool], BenchResult]]:
+    """
+    注册基准测试的装饰器
+
+    Args:
+        name: 基准名称
+        kind: 类型，micro或macro
+        primary: 用于基线比较的主指标
+        higher_is_better: 主指标是否越大越好
+    """
+
+    def decorator(func: Callable[[bool], BenchResult]) -> Callable[[bool], BenchResult]:
+        BENCHMARKS[name] = Benchmark(
+            name=name,
+            kind=kind,
+            primary=primary,
+            higher_is_better=higher_is_better,
+            func=func,
+            description=(func.__doc__ or "").strip(),
+        )
+        return func
+
+    return decorator
+
+
+def _numpy() -> Any:
+    """导入numpy，未安装时跳过基准"""
+    try:
+        import numpy as np
+    except ImportError:
+        raise BenchmarkSkipped("缺少依赖 numpy") from None
+    return np
+
+
+def _audio() -> Any:
+    """导入音频处理模块，缺少依赖时跳过基准"""
+    _numpy()
+    from . import audio
+
+    try:
+        audio._require_resampler()
+    except ImportError:
+        raise BenchmarkSkipped("缺少依赖 scipy") from None
+    return audio
+
+
+def _synthetic_speech(seconds: float, sample_rate: int) -> Any:
+    """生成可复现的合成语音：带谐波的浊音段、停顿和少量噪声"""
+    np = _numpy()
+    rng = np.random.default_rng(SEED)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140.0 + 30.0 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    envelope = (np.sin(2 * np.pi * 1.5 * t) > -0.3).astype(np.float64)
+    signal = 0.3 * voiced * envelope + 0.01 * rng.standard_normal(t.size)
+    return np.clip(signal * 32767, -32768, 32767).astype(np.int16)
+
+
+def _time_per_op(
+    func: Callable[[], Any], quick: bool, number: int, repeat: int = 5
+) -> BenchResult:
+    """多轮计时，返回每次调用的最小和中位耗时（纳秒）"""
+    if quick:
+        number = max(1, number // 10)
+        repeat = 3
+    timer = timeit.Timer(func)
+    runs = [t / number * 1e9 for t in timer.repeat(repeat=repeat, number=number)]
+    return {"ns_per_op": min(runs), "ns_per_op_median": statistics.median(runs)}
+
+
+@benchmark("resample.down_48k_24k", "micro", "ns_per_op")
+def bench_downsample(quick: bool) -> BenchResult:
+    """40ms麦克风块 48kHz -> 24kHz 下采样"""
+    audio = _audio()
+    chunk = _synthetic_speech(audio.CHUNK_LENGTH_S, audio.SAMPLE_RATE)
+    return _time_per_op(lambda: audio.downsample_48k_to_24k(chunk), quick, 2000)
+
+
+@benchmark("resample.up_24k_48k", "micro", "ns_per_op")
+def bench_upsample(quick: bool) -> BenchResult:
+    """40ms模型音频块 24kHz -> 48kHz 上采样"""
+    audio = _audio()
+    chunk = _synthetic_speech(audio.CHUNK_LENGTH_S, audio.MODEL_SAMPLE_RATE)
+    return _time_per_op(lambda: audio.upsample_24k_to_48k(chunk), quick, 2000)
+
+
+@benchmark("barge_in.rms", "micro", "ns_per_op")
+def bench_rms(quick: bool) -> BenchResult:
+    """40ms麦克风块RMS能量计算与打断判断"""
+    _numpy()
+    from . import audio
+
+    chunk = _synthetic_speech(audio.CHUNK_LENGTH_S, audio.SAMPLE_RATE)
+
+    def decide() -> bool:
+        return audio.rms_energy(chunk) >= audio.ENERGY_THRESHOLD
+
+    return _time_per_op(decide, quick, 20000)
+
+
+@benchmark("playback.output_callback", "micro", "ns_per_op")
+def bench_output_callback(quick: bool) -> BenchResult:
+    """播放回调填充一块40ms输出缓冲"""
+    np = _numpy()
+    from . import audio
+
+    frames = int(audio.SAMPLE_RATE * audio.CHUNK_LENGTH_S)
+    speech = _synthetic_speech(audio.CHUNK_LENGTH_S * 50, audio.SAMPLE_RATE)
+    chunks = [speech[i : i + frames] for i in range(0, speech.size, frames)]
+    outdata = np.zeros((frames, audio.CHANNELS), dtype=audio.FORMAT)
+    playback = audio.PlaybackBuffer(on_played=lambda *_: None)
+
+    def fill() -> None:
+        if playback.output_queue.qsize() < 4:
+            for i, chunk in enumerate(chunks):
+                playback.enqueue(chunk, "item", i)
+        playback.fill(outdata)
+
+    return _time_per_op(fill, quick, 20000)
+
+
+@benchmark("denoise.chunk", "micro", "ns_per_op")
+def bench_denoise(quick: bool) -> BenchResult:
+    """40ms麦克风块STFT维纳滤波降噪，同时报告占实时预算的比例"""
+    _numpy()
+    from . import audio, denoise
+
+    frames = int(audio.SAMPLE_RATE * audio.CHUNK_LENGTH_S)
+    speech = _synthetic_speech(audio.CHUNK_LENGTH_S * 50, audio.SAMPLE_RATE)
+    chunks = [speech[i : i + frames] for i in range(0, speech.size, frames)]
+    suppressor = denoise.NoiseSuppressor()
+    index = [0]
+
+    def process() -> None:
+        suppressor.process(chunks[index[0] % len(chunks)])
+        index[0] += 1
+
+    result = _time_per_op(process, quick, 500)
+    result["budget_fraction"] = result["ns_per_op"] / (denoise.CPU_BUDGET_S * 1e9)
+    return result
+
+
+@benchmark("wake.chunk", "micro", "ns_per_op")
+def bench_wake(quick: bool) -> BenchResult:
+    """40ms模型采样率块的唤醒词检测（MFCC + 3个模板的流式DTW），报告每帧耗时"""
+    _numpy()
+    from . import audio, wakeword
+
+    rate = audio.MODEL_SAMPLE_RATE
+    frames = int(rate * audio.CHUNK_LENGTH_S)
+    speech = _synthetic_speech(audio.CHUNK_LENGTH_S * 50, rate)
+    chunks = [speech[i : i + frames] for i in range(0, speech.size, frames)]
+    # 模板取自合成语音的不同片段，阈值设为0使检测器始终完整运行
+    features, _ = wakeword.MfccExtractor(rate).compute(speech)
+    templates = [features[i : i + 60] for i in (0, 70, 140)]
+    spotter = wakeword.KeywordSpotter(wakeword.WakeTemplates(templates, 0.0), rate)
+    index = [0]
+
+    def process() -> None:
+        spotter.process(chunks[index[0] % len(chunks)])
+        index[0] += 1
+
+    result = _time_per_op(process, quick, 500)
+    per_chunk = audio.CHUNK_LENGTH_S / spotter.hop_s
+    result["ns_per_frame"] = result["ns_per_op"] / per_chunk
+    result["budget_fraction"] = result["ns_per_op"] / (audio.CHUNK_LENGTH_S * 1e9)
+    return result
+
+
+@benchmark("trace.record", "micro", "ns_per_op")
+def bench_trace_record(quick: bool) -> BenchResult:
+    """向飞行记录器的追踪环写入一条事件"""
+    from . import trace
+
+    flight = trace.FlightRecorder(capacity=1024)
+    return _time_per_op(
+        lambda: flight.record(trace.EVENT_CHUNK_SENT, 1, 0.05), quick, 100000
+    )
+
+
+@benchmark("bus.publish", "micro", "ns_per_op")
+def bench_bus_publish(quick: bool) -> BenchResult:
+    """音频回调中向共享内存音频总线发布一块40ms音频"""
+    _numpy()
+    import os
+
+    from . import audio, audiobus
+
+    chunk = _synthetic_speech(audio.CHUNK_LENGTH_S, audio.SAMPLE_RATE)
+    writer = audiobus.RingWriter(f"edubuddy-bench-{os.getpid()}")
+    try:
+        return _time_per_op(lambda: writer.publish(chunk, 0.0), quick, 20000)
+    finally:
+        writer.close()
+
+
+@benchmark("replay.record", "micro", "ns_per_op")
+def bench_replay_record(quick: bool) -> BenchResult:
+    """一块40ms回复音频μ-law压缩后写入重播环（事件处理路径上的开销）"""
+    _numpy()
+    from . import audio, replay
+
+    chunk = _synthetic_speech(audio.CHUNK_LENGTH_S, audio.MODEL_SAMPLE_RATE)
+    ring = replay.ReplayRing(max_responses=2, max_bytes=chunk.size * 100)
+    index = [0]
+
+    def record() -> None:
+        # 每50块换一条回复，旧回复被淘汰，环的大小保持稳定
+        ring.add_audio(f"item-{index[0] // 50}", chunk)
+        index[0] += 1
+
+    return _time_per_op(record, quick, 20000)
+
+
+@benchmark("uplink.encode", "micro", "ns_per_op")
+def bench_uplink_encode(quick: bool) -> BenchResult:
+    """send_audio 的编码开销（base64 + JSON）：每秒音频按40ms帧与200ms聚合帧发送的CPU对比"""
+    _numpy()
+    try:
+        from agents.realtime.model_inputs import RealtimeModelSendAudio
+        from agents.realtime.openai_realtime import _ConversionHelper
+    except ImportError as e:
+        raise BenchmarkSkipped(f"缺少依赖 openai-agents: {e}") from None
+    from . import audio
+
+    rate = audio.MODEL_SAMPLE_RATE
+    speech = _synthetic_speech(0.2, rate)
+    convert = _ConversionHelper.convert_audio_to_input_audio_buffer_append
+
+    def encoder(samples: int) -> Callable[[], Any]:
+        data = speech[:samples].tobytes()
+        return lambda: convert(
+            RealtimeModelSendAudio(audio=data, commit=False)
+        ).model_dump_json()
+
+    small = _time_per_op(encoder(int(rate * 0.04)), quick, 5000)
+    large = _time_per_op(encoder(int(rate * 0.2)), quick, 2000)
+    # 每秒音频：25次40ms发送 vs 5次200ms发送
+    per_second_small = small["ns_per_op"] * 25
+    per_second_large = large["ns_per_op"] * 5
+    small["ns_per_op_200ms"] = large["ns_per_op"]
+    small["cpu_us_per_audio_s_40ms"] = per_second_small / 1e3
+    small["cpu_us_per_audio_s_200ms"] = per_second_large / 1e3
+    small["saved_fraction"] = 1 - per_second_large / per_second_small
+    return small
+
+
+@benchmark("logger.disabled_call", "micro", "ns_per_op")
+def bench_logger_disabled(quick: bool) -> BenchResult:
+    """未启用级别的日志调用（延迟参数）"""
+    from .logger import logger
+
+    previous = logger.level
+    logger.set_level("INFO")
+    try:
+        payload = SimpleNamespace(data="x" * 2000)
+        result = _time_per_op(lambda: logger.debug("事件: {}", payload), quick, 200000)
+        eager = _time_per_op(lambda: logger.debug(f"事件: {payload}"), quick, 200000)
+    finally:
+        logger.set_level(previous)
+    result["eager_ns_per_op"] = eager["ns_per_op"]
+    return result
+
+
+@benchmark("event.dispatch", "macro", "events_per_s", higher_is_better=True)
+def bench_event_dispatch(quick: bool) -> BenchResult:
+    """会话事件分发：模型音频事件解码，经下行流水线上采样后入队"""
+    _audio()
+    try:
+        from .realtime_agent import NoUIDemo
+    except (ImportError, OSError) as e:
+        raise BenchmarkSkipped(f"无法导入实时语音模块: {e}") from None
+
+    import asyncio
+
+    from . import audio
+
+    demo = NoUIDemo()
+    demo._build_pipelines()
+    pcm = _synthetic_speech(audio.CHUNK_LENGTH_S, audio.MODEL_SAMPLE_RATE).tobytes()
+    events = [
+        SimpleNamespace(
+            type="audio",
+            audio=SimpleNamespace(data=pcm),
+            item_id="item",
+            content_index=0,
+        )
+        for _ in range(200 if quick else 2000)
+    ]
+
+    async def dispatch() -> float:
+        start = time.perf_counter()
+        for event in events:
+            await demo._on_event(event)  # type: ignore[arg-type]
+        while demo.playback.queue_depth < len(events):
+            await asyncio.sleep(0.0005)
+        return time.perf_counter() - start
+
+    demo.downlink.start()
+    try:
+        elapsed = asyncio.run(dispatch())
+    finally:
+        demo.downlink.stop()
+    return {
+        "events_per_s": len(events) / elapsed,
+        "us_per_event": elapsed / len(events) * 1e6,
+    }
+
+
+@benchmark("uplink.capture_path", "macro", "realtime_factor", higher_is_better=True)
+def bench_capture_path(quick: bool) -> BenchResult:
+    """上行采集路径：分块、RMS、打断判断和下采样，统计实时倍率"""
+    audio = _audio()
+    seconds = 10.0 if quick else 60.0
+    speech = _synthetic_speech(seconds, audio.SAMPLE_RATE)
+    frames = int(audio.SAMPLE_RATE * audio.CHUNK_LENGTH_S)
+
+    start = time.perf_counter()
+    interrupts = 0
+    for offset in range(0, speech.size - frames + 1, frames):
+        samples = speech[offset : offset + frames]
+        if audio.rms_energy(samples) >= audio.ENERGY_THRESHOLD:
+            interrupts += 1
+        audio.downsample_48k_to_24k(samples)
+    elapsed = time.perf_counter() - start
+
+    chunks = speech.size // frames
+    return {
+        "realtime_factor": seconds / elapsed,
+        "us_per_chunk": elapsed / chunks * 1e6,
+        "barge_in_chunks": float(interrupts),
+    }
+
+
+@benchmark("pipeline.uplink", "macro", "realtime_factor", higher_is_better=True)
+def bench_uplink_pipeline(quick: bool) -> BenchResult:
+    """上行阶段流水线经工作线程处理，统计实时倍率和各阶段平均耗时"""
+    _numpy()
+    from . import audio, pipeline
+
+    seconds = 10.0 if quick else 60.0
+    speech = _synthetic_speech(seconds, audio.SAMPLE_RATE)
+    frames = int(audio.SAMPLE_RATE * audio.CHUNK_LENGTH_S)
+    stages = pipeline.Pipeline(
+        "uplink",
+        [
+            pipeline.EnergyStage(),
+            pipeline.BargeInStage(audio.PlaybackBuffer(), audio.EchoGate()),
+            pipeline.ResampleStage(down=2, name="downsample"),
+        ],
+    )
+    done = threading.Event()
+    chunks = speech.size // frames
+    received = []
+
+    def sink(frame: "pipeline.Frame") -> None:
+        received.append(frame)
+        if len(received) == chunks:
+            done.set()
+
+    worker = pipeline.PipelineWorker(
+        stages, maxsize=chunks, overflow="block", sink=sink
+    )
+    worker.start()
+    try:
+        start = time.perf_counter()
+        for offset in range(0, chunks * frames, frames):
+            worker.submit(pipeline.Frame(speech[offset : offset + frames]))
+        done.wait()
+        elapsed = time.perf_counter() - start
+    finally:
+        worker.stop()
+
+    result = {
+        "realtime_factor": seconds / elapsed,
+        "us_per_chunk": elapsed / chunks * 1e6,
+    }
+    for name, timing in stages.timings.items():
+        result[f"{name}_us"] = timing.mean_ns / 1000.0
+    return result
+
+
+@benchmark("logger.throughput", "macro", "messages_per_s", higher_is_better=True)
+def bench_logger_throughput(quick: bool) -> BenchResult:
+    """日志吞吐：格式化并经队列输出写出到内存缓冲"""
+    from .logger import logger
+
+    count = 5000 if quick else 50000
+    dropped_before = logger.dropped_messages
+    buffer = io.StringIO()
+    logger.flush()
+    with contextlib.redirect_stdout(buffer):
+        start = time.perf_counter()
+        for i in range(count):
+            logger.info("当前时间: {} 序号: {}", "2024-05-01 08:00:00", i)
+        logger.flush(timeout=None)
+        elapsed = time.perf_counter() - start
+
+    return {
+        "messages_per_s": count / elapsed,
+        "us_per_message": elapsed / count * 1e6,
+        "dropped": float(logger.dropped_messages - dropped_before),
+    }
+
+
+@benchmark("time_service.tick_jitter", "macro", "p99_ms")
+def bench_tick_jitter(quick: bool) -> BenchResult:
+    """TimeService触发抖动：相邻两次触发的间隔偏离设定间隔的程度"""
+    from .time_service import TimeService
+
+    interval = 0.01
+    ticks = 50 if quick else 300
+    stamps: List[float] = []
+    done = threading.Event()
+
+    class _JitterProbe(TimeService):
+        def _log_time(self) -> None:
+            stamps.append(time.perf_counter())
+            if len(stamps) >= ticks:
+                done.set()
+
+    service = _JitterProbe(interval=interval)
+    service.start_time_logging()
+    done.wait(timeout=ticks * interval * 10)
+    service.stop_time_logging()
+
+    lateness = sorted(
+        abs((b - a) - interval) * 1000 for a, b in zip(stamps, stamps[1:])
+    )
+    if not lateness:
+        raise BenchmarkSkipped("未采集到足够的触发")
+    return {
+        "p50_ms": lateness[len(lateness) // 2],
+        "p99_ms": lateness[min(len(lateness) - 1, int(len(lateness) * 0.99))],
+        "max_ms": lateness[-1],
+    }
+
+
+def run_benchmarks(
+    patterns: Optional[List[str]] = None,
+    quick: bool = False,
+    progress: Optional[Callable[[str], None]] = None,
+) -> BenchReport:
+    """
+    运行基准测试
+
+    Args:
+        patterns: 名称通配符列表，为空时运行全部
+        quick: 快速模式，减少迭代次数
+        progress: 进度回调，接收基准名称
+
+    Returns:
+        BenchReport实例
+    """
+    report = BenchReport()
+    for name, bench in BENCHMARKS.items():
+        if patterns and not any(fnmatch.fnmatch(name, p) for p in patterns):
+            continue
+        if progress is not None:
+            progress(name)
+
+        gc.collect()
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            metrics = bench.func(quick)
+        except BenchmarkSkipped as e:
+            report.skipped[name] = str(e)
+            continue
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        report.results[name] = {
+            "kind": bench.kind,
+            "primary": bench.primary,
+            "higher_is_better": bench.higher_is_better,
+            "metrics": {key: round(value, 3) for key, value in metrics.items()},
+        }
+    return report
+
+
+def compare_to_baseline(
+    current: Dict[str, Any],
+    baseline: Dict[str, Any],
+    thresholds: Optional[Dict[str, float]] = None,
+    default_threshold: float = DEFAULT_THRESHOLD,
+) -> List[Comparison]:
+    """
+    将本次结果与基线比较
+
+    Args:
+        current: 本次结果（BenchReport.to_dict()格式）
+        baseline: 基线结果（同上）
+        thresholds: 按基准名称（支持通配符）配置的回退阈值
+        default_threshold: 未单独配置时的回退阈值
+
+    Returns:
+        两边都存在的基准的比较结果列表
+    """
+    thresholds = thresholds or {}
+    comparisons = []
+
+    for name, result in current.get("results", {}).items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        metric = result["primary"]
+        if metric not in base.get("metrics", {}):
+            continue
+
+        base_value = float(base["metrics"][metric])
+        value = float(result["metrics"][metric])
+        if base_value == 0:
+            continue
+
+        change = (value - base_value) / base_value
+        # 统一为"正数表示变差"
+        worse = -change if result.get("higher_is_better") else change
+
+        threshold = default_threshold
+        for pattern, limit in thresholds.items():
+            if fnmatch.fnmatch(name, pattern):
+                threshold = limit
+
+        comparisons.append(
+            Comparison(
+                name=name,
+                metric=metric,
+                baseline=base_value,
+                current=value,
+                change=change,
+                threshold=threshold,
+                regressed=worse > threshold,
+            )
+        )
+    return comparisons
+
+
+def parse_thresholds(values: Tuple[str, ...]) -> Dict[str, float]:
+    """
+    解析 name=ratio 形式的阈值参数
+
+    Args:
+        values: 例如 ("resample.*=0.2", "logger.throughput=0.3")
+
+    Returns:
+        名称到阈值的映射
+    """
+    thresholds = {}
+    for value in values:
+        name, sep, ratio = value.partition("=")
+        if not sep:
+            raise ValueError(f"阈值格式应为 name=ratio: {value}")
+        try:
+            thresholds[name] = float(ratio)
+        except ValueError:
+            raise ValueError(f"无效的阈值: {value}") from None
+    return thresholds
@@ -0,0 +1,107 @@
+"""
+单文件包启动模块
+
+scripts/bundle.py 把 edubuddy 和纯 Python 依赖（click、loguru）连同预编译的字节码
+打成一个 zipapp，用 `python3 -IS` 启动：不处理 site，sys.path 只有包本身和标准库，
+导入不再逐个扫描 site-packages 和 .pth 文件。
+
+numpy、scipy、sounddevice 等带 C 扩展的音频依赖不能从 zip 中导入，按需加载：
+包内和标准库都找不到某个顶层模块时，才把附加目录加入 sys.path 再查找。
+附加目录依次取:
+    - 环境变量 EDUBUDDY_EXTRAS（os.pathsep 分隔的目录列表）
+    - 否则为解释器自身的 site-packages
+"""
+
+import importlib.machinery
+import os
+import site
+import sys
+from importlib.abc import MetaPathFinder
+from typing import Any, List, Optional, Sequence
+
+# 指定附加依赖目录的环境变量
+EXTRAS_ENV = "EDUBUDDY_EXTRAS"
+
+
+def extras_dirs() -> List[str]:
+    """
+    获取附加依赖目录
+
+    Returns:
+        目录列表（不检查是否存在）
+    """
+    value = os.environ.get(EXTRAS_ENV)
+    if value is not None:
+        return [path for path in value.split(os.pathsep) if path]
+    dirs = list(site.getsitepackages())
+    if not sys.flags.no_user_site:
+        dirs.append(site.getusersitepackages())
+    return dirs
+
+
+class ExtrasFinder(MetaPathFinder):
+    """
+    排在 sys.meta_path 最后的查找器
+
+    只在第一次有顶层模块找不到时生效：把附加目录加入 sys.path（处理其中的
+    .pth 文件）后重新查找，然后把自己移出 sys.meta_path，之后的导入由标准的
+    PathFinder 直接在附加目录中找到。
+    """
+
+    def __init__(self, dirs: Sequence[str]):
+        self.dirs = list(dirs)
+        self.activated = False
+
+    def find_spec(
+        self,
+        fullname: str,
+        path: Optional[Sequence[str]] = None,
+        target: Any = None,
+    ) -> Optional[importlib.machinery.ModuleSpec]:
+        if path is not None or self.activated:
+            # 子模块由所在包的路径查找，不需要附加目录
+            return None
+        self.activate()
+        return importlib.machinery.PathFinder.find_spec(fullname)
+
+    def activate(self) -> None:
+        """把附加目录加入 sys.path 并移出 sys.meta_path"""
+        self.activated = True
+        for path in self.dirs:
+            if os.path.isdir(path):
+                site.addsitedir(path)
+        self.uninstall()
+
+    def uninstall(self) -> None:
+        """移出 sys.meta_path"""
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+
+def install(dirs: Optional[Sequence[str]] = None) -> ExtrasFinder:
+    """
+    安装按需加载附加依赖的查找器
+
+    Args:
+        dirs: 附加依赖目录，默认取 extras_dirs()
+
+    Returns:
+        已安装的查找器
+    """
+    finder = ExtrasFinder(extras_dirs() if dirs is None else dirs)
+    sys.meta_path.append(finder)
+    return finder
+
+
+def main() -> None:
+    """单文件包入口：安装附加依赖查找器后运行命令行"""
+    install()
+    from .cli import main as cli_main
+
+    try:
+        cli_main(prog_name="edubuddy")
+    except ModuleNotFoundError as e:
+        sys.exit(
+            f"缺少依赖 {e.name}: 请安装到 python3 的 site-packages，"
+            f"或用环境变量 {EXTRAS_ENV} 指定其所在目录"
+        )
@@ -0,0 +1,372 @@
+"""
+回环延迟校准模块
+
+播放已知的扫频（chirp）或最大长度序列（MLS），同时录音，
+用FFT互相关找出录到的信号相对播放信号的延迟，即输出到输入的回环延迟。
+校准结果按设备保存，实时语音用它把麦克风块与当时正在播放的音频对齐，
+据此判断回声和打断。
+"""
+
+import json
+import os
+import tempfile
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio import SAMPLE_RATE, AudioArray
+
+SIGNAL_CHIRP = "chirp"
+SIGNAL_MLS = "mls"
+SIGNALS = (SIGNAL_CHIRP, SIGNAL_MLS)
+
+# 默认的校准结果文件
+DEFAULT_CALIBRATION_FILE = os.path.join(
+    os.path.expanduser("~"), ".config", "edubuddy", "latency.json"
+)
+
+# 低于该归一化相关峰值的测量视为没有录到回环信号
+MIN_CONFIDENCE = 0.2
+
+# 播放一段测试信号并返回同步录到的单声道float32信号
+PlayRecord = Callable[[AudioArray], AudioArray]
+
+# MLS反馈抽头（Fibonacci LFSR，本原多项式）
+_MLS_TAPS = {
+    10: (10, 7),
+    11: (11, 9),
+    12: (12, 11, 10, 4),
+    13: (13, 12, 11, 8),
+    14: (14, 13, 12, 2),
+    15: (15, 14),
+}
+
+
+def chirp(
+    sample_rate: int = SAMPLE_RATE,
+    duration: float = 0.5,
+    f_start: float = 300.0,
+    f_end: float = 6000.0,
+    amplitude: float = 0.5,
+) -> AudioArray:
+    """
+    生成指数扫频信号，两端加短淡入淡出避免爆音
+
+    Args:
+        sample_rate: 采样率
+        duration: 时长（秒）
+        f_start: 起始频率（Hz）
+        f_end: 终止频率（Hz）
+        amplitude: 幅度（满幅为1.0）
+
+    Returns:
+        float32信号
+    """
+    if duration <= 0:
+        raise ValueError("时长必须大于0")
+    if not 0 < f_start < f_end < sample_rate / 2:
+        raise ValueError("频率范围必须满足 0 < 起始 < 终止 < 采样率/2")
+
+    t = np.arange(int(sample_rate * duration), dtype=np.float64) / sample_rate
+    k = np.log(f_end / f_start)
+    phase = 2 * np.pi * f_start * duration / k * (np.exp(t * k / duration) - 1.0)
+    signal = amplitude * np.sin(phase)
+
+    ramp = min(len(signal) // 2, int(sample_rate * 0.005))
+    if ramp > 0:
+        window = 0.5 - 0.5 * np.cos(np.linspace(0.0, np.pi, ramp))
+        signal[:ramp] *= window
+        signal[-ramp:] *= window[::-1]
+    return signal.astype(np.float32)
+
+
+def mls(order: int = 13, amplitude: float = 0.5) -> AudioArray:
+    """
+    生成最大长度序列（长度 2^order - 1 的 ±amplitude 序列）
+
+    Args:
+        order: 阶数（10-15）
+        amplitude: 幅度
+
+    Returns:
+        float32信号
+    """
+    if order not in _MLS_TAPS:
+        raise ValueError(f"MLS阶数必须在 {min(_MLS_TAPS)}-{max(_MLS_TAPS)} 之间")
+
+    # 优先用 scipy（生成时才导入，避免拖慢启动），未安装时用numpy实现
+    try:
+        from scipy.signal import max_len_seq
+    except ImportError:
+        max_len_seq = None
+
+    if max_len_seq is not None:
+        bits = max_len_seq(order)[0]
+    else:
+        length = (1 << order) - 1
+        taps = _MLS_TAPS[order]
+        state = [1] * order
+        bits = np.empty(length, dtype=np.int8)
+        for i in range(length):
+            bits[i] = state[-1]
+            feedback = 0
+            for tap in taps:
+                feedback ^= state[tap - 1]
+            state = [feedback] + state[:-1]
+    return (amplitude * (2.0 * np.asarray(bits, dtype=np.float32) - 1.0)).astype(
+        np.float32
+    )
+
+
+def make_signal(kind: str, sample_rate: int = SAMPLE_RATE) -> AudioArray:
+    """
+    按名称生成测试信号
+
+    Args:
+        kind: "chirp" 或 "mls"
+        sample_rate: 采样率
+
+    Returns:
+        float32信号
+    """
+    if kind == SIGNAL_CHIRP:
+        return chirp(sample_rate)
+    if kind == SIGNAL_MLS:
+        # 约0.35秒，与扫频时长相当
+        return mls(14 if sample_rate >= 32000 else 13)
+    raise ValueError(f"未知的测试信号: {kind}")
+
+
+def estimate_delay(reference: AudioArray, captured: AudioArray) -> Tuple[int, float]:
+    """
+    用FFT互相关估计录音相对参考信号的延迟
+
+    Args:
+        reference: 播放的参考信号
+        captured: 录到的信号，应比参考信号长
+
+    Returns:
+        (延迟样本数, 归一化相关峰值 0-1)
+    """
+    ref = np.asarray(reference, dtype=np.float64).reshape(-1)
+    cap = np.asarray(captured, dtype=np.float64).reshape(-1)
+    if len(cap) < len(ref) or len(ref) == 0:
+        raise ValueError("录音长度必须不小于参考信号长度")
+
+    n = 1 << int(np.ceil(np.log2(len(cap) + len(ref))))
+    spectrum = np.fft.rfft(cap, n) * np.conj(np.fft.rfft(ref, n))
+    # 只保留参考信号完整落在录音内的非负延迟
+    max_lag = len(cap) - len(ref)
+    corr = np.fft.irfft(spectrum, n)[: max_lag + 1]
+
+    # 每个延迟处录音窗口的能量，用于归一化
+    energy = np.concatenate(([0.0], np.cumsum(cap * cap)))
+    window_energy = energy[len(ref) :] - energy[: max_lag + 1]
+    norm = np.sqrt(np.maximum(window_energy, 1e-12) * float(np.dot(ref, ref)))
+    normalized = corr / norm
+
+    lag = int(np.argmax(normalized))
+    return lag, float(max(0.0, normalized[lag]))
+
+
+@dataclass
+class LatencyCalibration:
+    """一组输入输出设备的校准结果"""
+
+    device: str
+    sample_rate: int
+    latency_ms: float
+    jitter_ms: float
+    echo_gain: float
+    confidence: float
+    signal: str
+    measured_at: str = field(
+        default_factory=lambda: datetime.now().isoformat(timespec="seconds")
+    )
+
+    @property
+    def latency_s(self) -> float:
+        """回环延迟（秒）"""
+        return self.latency_ms / 1000.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "LatencyCalibration":
+        return cls(
+            **{key: data[key] for key in cls.__dataclass_fields__ if key in data}
+        )
+
+
+def measure_latency(
+    play_record: PlayRecord,
+    device: str,
+    sample_rate: int = SAMPLE_RATE,
+    signal: str = SIGNAL_CHIRP,
+    repeats: int = 3,
+    tail_s: float = 1.0,
+) -> LatencyCalibration:
+    """
+    多次播放测试信号并测量回环延迟
+
+    Args:
+        play_record: 播放并同步录音的函数
+        device: 设备标识
+        sample_rate: 采样率
+        signal: 测试信号（chirp 或 mls）
+        repeats: 测量次数，结果取中位数
+        tail_s: 信号后追加的静音时长（秒），需大于预期的最大延迟
+
+    Returns:
+        校准结果
+
+    Raises:
+        ValueError: 所有测量都没有录到可信的回环信号
+    """
+    if repeats < 1:
+        raise ValueError("测量次数必须至少为1")
+
+    reference = make_signal(signal, sample_rate)
+    played = np.concatenate(
+        [reference, np.zeros(int(sample_rate * tail_s), np.float32)]
+    )
+
+    lags: List[int] = []
+    gains: List[float] = []
+    confidences: List[float] = []
+    for _ in range(repeats):
+        captured = np.asarray(play_record(played), dtype=np.float32).reshape(-1)
+        if len(captured) < len(played):
+            captured = np.pad(captured, (0, len(played) - len(captured)))
+        lag, confidence = estimate_delay(reference, captured)
+        if confidence < MIN_CONFIDENCE:
+            continue
+        segment = captured[lag : lag + len(reference)]
+        lags.append(lag)
+        confidences.append(confidence)
+        gains.append(float(np.std(segment) / max(np.std(reference), 1e-12)))
+
+    if not lags:
+        raise ValueError("未检测到回环信号，请调高音量或让麦克风靠近扬声器")
+
+    lags_ms = np.asarray(lags, dtype=np.float64) * 1000.0 / sample_rate
+    return LatencyCalibration(
+        device=device,
+        sample_rate=sample_rate,
+        latency_ms=round(float(np.median(lags_ms)), 2),
+        jitter_ms=round(float(np.max(lags_ms) - np.min(lags_ms)), 2),
+        echo_gain=round(float(np.median(gains)), 4),
+        confidence=round(float(np.median(confidences)), 3),
+        signal=signal,
+    )
+
+
+class CalibrationStore:
+    """按设备保存校准结果的JSON文件"""
+
+    def __init__(self, path: str = DEFAULT_CALIBRATION_FILE):
+        self.path = path
+
+    def load(self) -> Dict[str, LatencyCalibration]:
+        """读取全部校准结果，文件不存在或损坏时返回空"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {
+                device: LatencyCalibration.from_dict(item)
+                for device, item in data.get("devices", {}).items()
+            }
+        except (OSError, ValueError, TypeError, KeyError):
+            return {}
+
+    def get(self, device: str) -> Optional[LatencyCalibration]:
+        """获取指定设备的校准结果"""
+        return self.load().get(device)
+
+    def save(self, calibration: LatencyCalibration) -> None:
+        """保存一个设备的校准结果（原子替换文件）"""
+        calibrations = self.load()
+        calibrations[calibration.device] = calibration
+        data = {"devices": {d: c.to_dict() for d, c in sorted(calibrations.items())}}
+
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".latency-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+def device_key(
+    input_device: Optional[Any] = None, output_device: Optional[Any] = None
+) -> str:
+    """
+    生成输入输出设备组合的标识
+
+    Args:
+        input_device: sounddevice输入设备编号或名称，None表示默认设备
+        output_device: sounddevice输出设备编号或名称，None表示默认设备
+
+    Returns:
+        形如 "输入设备名 -> 输出设备名" 的标识
+    """
+    import sounddevice as sd
+
+    input_name = sd.query_devices(input_device, kind="input")["name"]
+    output_name = sd.query_devices(output_device, kind="output")["name"]
+    return f"{input_name} -> {output_name}"
+
+
+def sounddevice_play_record(
+    input_device: Optional[Any] = None,
+    output_device: Optional[Any] = None,
+    sample_rate: int = SAMPLE_RATE,
+) -> PlayRecord:
+    """
+    创建基于 sounddevice.playrec 的播放录音函数
+
+    Args:
+        input_device: 输入设备
+        output_device: 输出设备
+        sample_rate: 采样率
+
+    Returns:
+        播放并同步录音的函数
+    """
+    import sounddevice as sd
+
+    def play_record(signal: AudioArray) -> AudioArray:
+        recording = sd.playrec(
+            signal.reshape(-1, 1),
+            samplerate=sample_rate,
+            channels=1,
+            dtype="float32",
+            device=(input_device, output_device),
+            blocking=True,
+        )
+        return recording.reshape(-1)
+
+    return play_record
+
+
+def load_calibration(
+    device: str, path: str = DEFAULT_CALIBRATION_FILE
+) -> Optional[LatencyCalibration]:
+    """
+    读取指定设备的校准结果
+
+    Args:
+        device: 设备标识
+        path: 校准结果文件
+
+    Returns:
+        校准结果，未校准时返回None
+    """
+    return CalibrationStore(path).get(device)
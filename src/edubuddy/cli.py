@@ -4,17 +4,93 @@
 提供EduBuddy的命令行界面。
 """
 
+import asyncio
+import contextlib
+import json
+import os
+import re
 import signal
 import sys
 import time
-from typing import Optional
+import wave
+from datetime import datetime
+from typing import TYPE_CHECKING, Optional
 
 import click
 
+from .bench import (
+    BENCHMARKS,
+    DEFAULT_THRESHOLD,
+    compare_to_baseline,
+    parse_thresholds,
+    run_benchmarks,
+)
+from .clock import VirtualClock
+from .config import ConfigReloader
+from .control import DEFAULT_CONTROL_SOCKET, ControlServer, send_command
+from .governor import ResourceBudget, ResourceGovernor
+from .log_store import query_logs
 from .logger import logger
+from .session_pool import SessionPool
+from .sinks import OVERFLOW_DROP_OLDEST, OVERFLOW_POLICIES
 from .time_service import TimeService, create_time_service
+from .trace import (
+    DEFAULT_TRACE_DIR,
+    EVENT_NAMES,
+    read_trace,
+    recorder,
+    render_timeline,
+)
 from .version import VersionManager, get_version_info, print_version_info
 
+if TYPE_CHECKING:
+    from .batch import BatchSummary, FileResult
+
+# 服务部署时的默认日志目录
+DEFAULT_LOG_DIR = "/var/log/edubuddy"
+
+# 音频相关命令用到的模块（audiobus、batch、calibration、wakeword）依赖 numpy，
+# 在命令内导入，其余命令启动时不加载音频依赖。选项默认值与这些模块中的常量一致:
+#   audiobus.DEFAULT_BUS_NAME / BUS_CHANNELS / CHANNEL_CAPTURE
+#   batch.DEFAULT_CONCURRENCY / DEFAULT_TIMEOUT_S
+#   calibration.SIGNALS / SIGNAL_CHIRP / DEFAULT_CALIBRATION_FILE
+#   wakeword.DEFAULT_WAKE_FILE
+_CONFIG_DIR = os.path.join(os.path.expanduser("~"), ".config", "edubuddy")
+
+_RELATIVE_TIME_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def _parse_time_spec(value: str) -> float:
+    """
+    解析时间参数
+
+    支持相对时间（如 "30m"、"2h"、"1d"，表示多久之前）、
+    当天时刻（如 "08:00"、"08:00:30"）和完整日期时间（如 "2024-05-01 08:00"）。
+
+    Args:
+        value: 时间参数
+
+    Returns:
+        Unix时间戳
+    """
+    value = value.strip()
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd])", value)
+    if match:
+        amount, unit = match.groups()
+        return time.time() - float(amount) * _RELATIVE_TIME_UNITS[unit]
+
+    for fmt in ("%H:%M", "%H:%M:%S"):
+        try:
+            clock = datetime.strptime(value, fmt).time()
+        except ValueError:
+            continue
+        return datetime.combine(datetime.now().date(), clock).timestamp()
+
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise click.BadParameter(f"无法解析的时间: {value}") from None
+
 
 @click.group()
 @click.version_option(version=get_version_info()["version"], prog_name="EduBuddy")
@@ -35,11 +111,123 @@ def main() -> None:
     help="时间格式字符串，默认ISO格式",
 )
 @click.option("--duration", "-d", type=int, help="运行持续时间（秒），不指定则持续运行")
-def start_logger(interval: float, format: str, duration: Optional[int]) -> None:
+@click.option(
+    "--schedule",
+    "-s",
+    type=str,
+    help="cron风格计划表达式，例如 '*/5 8-14 * * mon-fri'，指定后忽略--interval",
+)
+@click.option(
+    "--log-overflow",
+    type=click.Choice(OVERFLOW_POLICIES),
+    default=OVERFLOW_DROP_OLDEST,
+    help="日志输出队列满时的策略，默认丢弃最旧的消息",
+)
+@click.option(
+    "--log-dir",
+    type=click.Path(file_okay=False),
+    envvar="EDUBUDDY_LOG_DIR",
+    help="滚动日志文件目录，不指定则只输出到控制台",
+)
+@click.option(
+    "--control-socket",
+    type=click.Path(dir_okay=False),
+    envvar="EDUBUDDY_CONTROL_SOCKET",
+    help="控制套接字路径，指定后可通过 edubuddy ctl 查看指标和修改设置",
+)
+@click.option(
+    "--config",
+    "config_file",
+    type=click.Path(dir_okay=False),
+    envvar="EDUBUDDY_CONFIG",
+    help="配置文件路径，文件变化或收到SIGHUP时热加载 LOG_INTERVAL/LOG_FORMAT/LOG_LEVEL",
+)
+@click.option(
+    "--no-governor",
+    is_flag=True,
+    help="不启用资源调控（默认在配置或环境变量设置了 MAX_MEMORY/MAX_CPU 时启用）",
+)
+@click.option(
+    "--trace-dir",
+    type=click.Path(file_okay=False),
+    envvar="EDUBUDDY_TRACE_DIR",
+    default=DEFAULT_TRACE_DIR,
+    show_default=True,
+    help="追踪转储目录，出错或收到SIGUSR1时写入最近的追踪事件",
+)
+@click.pass_context
+def start_logger(
+    ctx: click.Context,
+    interval: float,
+    format: str,
+    duration: Optional[int],
+    schedule: Optional[str],
+    log_overflow: str,
+    log_dir: Optional[str],
+    control_socket: Optional[str],
+    config_file: Optional[str],
+    no_governor: bool,
+    trace_dir: str,
+) -> None:
     """启动时间日志记录器"""
+    control: Optional[ControlServer] = None
+    reloader: Optional[ConfigReloader] = None
+    governor: Optional[ResourceGovernor] = None
     try:
+        logger.configure_console(overflow=log_overflow)
+        if log_dir:
+            logger.add_file_sink(log_dir)
+        recorder.configure(directory=trace_dir)
+        recorder.install_signal_handler()
+        recorder.install_excepthooks()
+
         # 创建时间服务
-        time_service = create_time_service(interval=interval, format_str=format)
+        time_service = create_time_service(
+            interval=interval, format_str=format, schedule=schedule
+        )
+
+        if not no_governor:
+            budget = ResourceBudget.load(config_file)
+            if budget.enabled:
+                governor = ResourceGovernor(budget)
+                governor.start()
+
+        if config_file:
+            # 降级期间日志级别由资源调控器接管，热加载的级别在恢复时生效
+            reloader = ConfigReloader(
+                config_file,
+                time_service,
+                level_guard=governor.hold_level if governor else None,
+                # 命令行中指定的选项优先于配置文件
+                pinned=[
+                    key
+                    for key, param in (
+                        ("LOG_INTERVAL", "interval"),
+                        ("LOG_FORMAT", "format"),
+                    )
+                    if ctx.get_parameter_source(param)
+                    is not click.core.ParameterSource.DEFAULT
+                ],
+            )
+            reloader.install_signal_handler()
+            reloader.start()
+
+        if control_socket:
+            control = ControlServer(control_socket)
+            time_service.register_metrics(control.registry)
+            if reloader is not None:
+                reloader.register_metrics(control.registry)
+                control.add_command("reload", lambda args: reloader.reload())
+            if governor is not None:
+                governor.register_metrics(control.registry)
+            control.add_setting(
+                "interval", lambda v: time_service.set_interval(float(v))
+            )
+            control.add_setting("format", time_service.set_format)
+            control.add_setting(
+                "schedule", lambda v: time_service.set_schedule(v or None)
+            )
+            control.start()
 
         # 设置信号处理器，用于优雅退出
         def signal_handler(signum: int, frame: object) -> None:
@@ -70,8 +258,655 @@ def start_logger(interval: float, format: str, duration: Optional[int]) -> None:
 
     except Exception as e:
         logger.error(f"启动时间日志记录器时发生错误: {e}")
+        recorder.dump_on_error(f"启动时间日志记录器时发生错误: {e}")
+        sys.exit(1)
+    finally:
+        if control is not None:
+            control.stop()
+        if reloader is not None:
+            reloader.stop()
+        if governor is not None:
+            governor.stop()
+
+
+@main.command()
+@click.option(
+    "--dir",
+    "log_dir",
+    type=click.Path(file_okay=False),
+    envvar="EDUBUDDY_LOG_DIR",
+    default=DEFAULT_LOG_DIR,
+    show_default=True,
+    help="日志目录",
+)
+@click.option(
+    "--since", "-S", type=str, help="起始时间，例如 30m、08:00、2024-05-01 08:00"
+)
+@click.option("--until", "-U", type=str, help="结束时间，格式同--since")
+@click.option("--grep", "-g", "pattern", type=str, help="只显示匹配该正则的日志")
+def logs(
+    log_dir: str, since: Optional[str], until: Optional[str], pattern: Optional[str]
+) -> None:
+    """按时间范围查询滚动日志文件"""
+    since_ts = _parse_time_spec(since) if since else None
+    until_ts = _parse_time_spec(until) if until else None
+
+    try:
+        for entry in query_logs(
+            log_dir, since=since_ts, until=until_ts, pattern=pattern
+        ):
+            click.echo(entry, nl=False)
+    except re.error as e:
+        raise click.BadParameter(f"无效的正则表达式: {e}") from None
+
+
+@main.command()
+@click.option(
+    "--filter",
+    "-k",
+    "patterns",
+    multiple=True,
+    help="只运行名称匹配的基准（支持通配符，可多次指定）",
+)
+@click.option("--quick", "-q", is_flag=True, help="快速模式，减少迭代次数")
+@click.option("--list", "list_only", is_flag=True, help="列出所有基准后退出")
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False),
+    help="结果JSON输出文件，默认输出到标准输出",
+)
+@click.option(
+    "--baseline",
+    "-b",
+    type=click.Path(exists=True, dir_okay=False),
+    help="用于比较的基线JSON文件",
+)
+@click.option(
+    "--save-baseline", type=click.Path(dir_okay=False), help="将本次结果保存为基线"
+)
+@click.option(
+    "--threshold",
+    "-t",
+    "thresholds",
+    multiple=True,
+    help="单项回退阈值，格式 name=ratio，例如 'resample.*=0.2'",
+)
+@click.option(
+    "--default-threshold",
+    type=float,
+    default=DEFAULT_THRESHOLD,
+    show_default=True,
+    help="默认回退阈值（相对变化比例）",
+)
+def bench(
+    patterns: tuple,
+    quick: bool,
+    list_only: bool,
+    output: Optional[str],
+    baseline: Optional[str],
+    save_baseline: Optional[str],
+    thresholds: tuple,
+    default_threshold: float,
+) -> None:
+    """运行性能基准测试并与基线比较"""
+    if list_only:
+        for name, item in BENCHMARKS.items():
+            click.echo(f"{name:<28} {item.kind:<6} {item.description}")
+        return
+
+    try:
+        threshold_map = parse_thresholds(thresholds)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from None
+
+    def progress(name: str) -> None:
+        click.echo(f"运行基准: {name}", err=True)
+
+    # 运行期间的日志输出重定向到标准错误，保证标准输出只有JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = run_benchmarks(list(patterns) or None, quick=quick, progress=progress)
+        logger.flush()
+    result = report.to_dict()
+
+    for name, reason in report.skipped.items():
+        click.echo(f"跳过 {name}: {reason}", err=True)
+
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        click.echo(text)
+
+    if save_baseline:
+        with open(save_baseline, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        click.echo(f"基线已保存: {save_baseline}", err=True)
+
+    if baseline:
+        with open(baseline, "r", encoding="utf-8") as f:
+            baseline_data = json.load(f)
+        comparisons = compare_to_baseline(
+            result, baseline_data, threshold_map, default_threshold
+        )
+        regressions = [c for c in comparisons if c.regressed]
+        for c in comparisons:
+            mark = "回退" if c.regressed else "正常"
+            click.echo(
+                f"[{mark}] {c.name} {c.metric}: {c.baseline:g} -> {c.current:g} "
+                f"({c.change:+.1%}，阈值 {c.threshold:.0%})",
+                err=True,
+            )
+        if regressions:
+            click.echo(f"发现 {len(regressions)} 项性能回退", err=True)
+            sys.exit(1)
+
+
+@main.group()
+@click.option(
+    "--socket",
+    "socket_path",
+    type=click.Path(dir_okay=False),
+    default=DEFAULT_CONTROL_SOCKET,
+    envvar="EDUBUDDY_CONTROL_SOCKET",
+    show_default=True,
+    help="控制套接字路径",
+)
+@click.pass_context
+def ctl(ctx: click.Context, socket_path: str) -> None:
+    """查询运行中的进程并下发运行时命令"""
+    ctx.obj = socket_path
+
+
+def _ctl_request(ctx: click.Context, command: str, *args: str) -> object:
+    """发送控制命令，失败时以非零状态退出"""
+    try:
+        return send_command(ctx.obj, command, *args)
+    except OSError as e:
+        click.echo(f"无法连接控制套接字 {ctx.obj}: {e}", err=True)
+        sys.exit(2)
+    except RuntimeError as e:
+        click.echo(f"命令执行失败: {e}", err=True)
+        sys.exit(1)
+
+
+@ctl.command()
+@click.option(
+    "--format",
+    "-f",
+    "output_format",
+    type=click.Choice(["text", "json", "prometheus"]),
+    default="text",
+    help="输出格式",
+)
+@click.pass_context
+def metrics(ctx: click.Context, output_format: str) -> None:
+    """显示实时指标快照"""
+    if output_format == "prometheus":
+        click.echo(_ctl_request(ctx, "prometheus"), nl=False)
+        return
+    snapshot = _ctl_request(ctx, "metrics")
+    if output_format == "json":
+        click.echo(json.dumps(snapshot, ensure_ascii=False, indent=2))
+        return
+    for name, value in sorted(snapshot.items()):
+        text = str(int(value)) if value.is_integer() else f"{value:.6f}"
+        click.echo(f"{name:<36} {text}")
+
+
+@ctl.command(name="set")
+@click.argument("name")
+@click.argument("value")
+@click.pass_context
+def ctl_set(ctx: click.Context, name: str, value: str) -> None:
+    """修改运行时设置，例如 interval 2.5 或 level DEBUG"""
+    click.echo(_ctl_request(ctx, "set", name, value))
+
+
+@ctl.command()
+@click.pass_context
+def reload(ctx: click.Context) -> None:
+    """让进程立即重新加载配置文件"""
+    if not _ctl_request(ctx, "reload"):
+        click.echo("配置无效，进程保持原配置（详见服务日志）", err=True)
+        sys.exit(1)
+    click.echo("配置已重新加载")
+
+
+@ctl.command()
+@click.argument("item_id", required=False)
+@click.option("--list", "list_only", is_flag=True, help="列出保留的回复，不重播")
+@click.pass_context
+def replay(ctx: click.Context, item_id: Optional[str], list_only: bool) -> None:
+    """在本地重播助手的回复（默认最近一条），不经过模型"""
+    if list_only:
+        for entry in _ctl_request(ctx, "replay", "list"):
+            flag = "（被打断）" if entry["interrupted"] else ""
+            click.echo(
+                f"{entry['item_id']:<28} {entry['duration_s']:>6.1f}s{flag} "
+                f"{entry['transcript'][:40]}"
+            )
+        return
+    args = [item_id] if item_id else []
+    result = _ctl_request(ctx, "replay", *args)
+    click.echo(f"正在重播 {result['item_id']}（{result['duration_s']:.1f}秒）")
+
+
+@ctl.command()
+@click.pass_context
+def ping(ctx: click.Context) -> None:
+    """检查进程是否在响应"""
+    click.echo(_ctl_request(ctx, "ping"))
+
+
+def _parse_device(value: Optional[str]) -> Optional[object]:
+    """设备参数：数字按编号处理，否则按名称处理"""
+    if value is None:
+        return None
+    return int(value) if value.isdigit() else value
+
+
+@main.command()
+@click.option(
+    "--signal",
+    type=click.Choice(["chirp", "mls"]),
+    default="chirp",
+    show_default=True,
+    help="测试信号",
+)
+@click.option(
+    "--repeats",
+    "-n",
+    type=click.IntRange(1, 20),
+    default=3,
+    show_default=True,
+    help="测量次数",
+)
+@click.option(
+    "--input-device",
+    type=str,
+    default="0",
+    show_default=True,
+    help="输入设备编号或名称",
+)
+@click.option(
+    "--output-device", type=str, help="输出设备编号或名称，默认使用系统默认设备"
+)
+@click.option(
+    "--file",
+    "calibration_file",
+    type=click.Path(dir_okay=False),
+    default=os.path.join(_CONFIG_DIR, "latency.json"),
+    envvar="EDUBUDDY_CALIBRATION_FILE",
+    show_default=True,
+    help="校准结果文件",
+)
+@click.option("--dry-run", is_flag=True, help="只测量，不保存结果")
+def calibrate(
+    signal: str,
+    repeats: int,
+    input_device: str,
+    output_device: Optional[str],
+    calibration_file: str,
+    dry_run: bool,
+) -> None:
+    """测量音频输出到输入的回环延迟并按设备保存"""
+    from .calibration import (
+        CalibrationStore,
+        device_key,
+        measure_latency,
+        sounddevice_play_record,
+    )
+
+    try:
+        devices = (_parse_device(input_device), _parse_device(output_device))
+        key = device_key(*devices)
+        play_record = sounddevice_play_record(*devices)
+    except Exception as e:
+        click.echo(f"无法打开音频设备: {e}", err=True)
+        sys.exit(2)
+
+    click.echo(f"设备: {key}")
+    click.echo(f"将播放{repeats}次测试信号（{signal}），请保持安静并打开扬声器...")
+    try:
+        result = measure_latency(play_record, key, signal=signal, repeats=repeats)
+    except ValueError as e:
+        click.echo(f"校准失败: {e}", err=True)
+        sys.exit(1)
+
+    click.echo(
+        f"回环延迟: {result.latency_ms:.1f} ms（抖动 {result.jitter_ms:.1f} ms）"
+    )
+    click.echo(f"回声增益: {result.echo_gain:.3f}，相关峰值: {result.confidence:.2f}")
+    if not dry_run:
+        CalibrationStore(calibration_file).save(result)
+        click.echo(f"校准结果已保存: {calibration_file}")
+
+
+@main.command("enroll")
+@click.argument(
+    "samples", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False)
+)
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False),
+    default=os.path.join(_CONFIG_DIR, "wake.npz"),
+    show_default=True,
+    help="唤醒词模板文件",
+)
+@click.option(
+    "--margin",
+    type=click.FloatRange(min=1.0),
+    default=1.3,
+    show_default=True,
+    help="阈值相对录音间最大匹配代价的倍数",
+)
+@click.option(
+    "--check",
+    "check_path",
+    type=click.Path(exists=True, dir_okay=False),
+    help="登记后在这段录音上试运行检测，报告触发时刻和每帧CPU耗时",
+)
+def enroll_wake(
+    samples: tuple, output: str, margin: float, check_path: Optional[str]
+) -> None:
+    """用几段唤醒词录音（16kHz及以上的WAV）登记本地唤醒词"""
+    from .batch import read_wav
+    from .wakeword import HOP_MS, KeywordSpotter, enroll
+
+    try:
+        recordings = [read_wav(path) for path in samples]
+        templates, scores = enroll(recordings, margin=margin)
+    except (OSError, wave.Error, ValueError) as e:
+        click.echo(f"登记失败: {e}", err=True)
+        sys.exit(1)
+
+    for path, template in zip(samples, templates.templates):
+        click.echo(f"{path}: 有声部分 {len(template) * HOP_MS:.0f}ms")
+    if scores:
+        click.echo(f"录音间匹配代价: {min(scores):.3f} ~ {max(scores):.3f}")
+    else:
+        click.echo("只有一段录音，使用默认阈值；建议录3~5段")
+    click.echo(f"阈值: {templates.threshold:.3f}")
+    templates.save(output)
+    click.echo(f"唤醒词模板已保存: {output}（设置 EDUBUDDY_WAKE_WORD={output} 启用）")
+
+    if check_path:
+        audio, rate = read_wav(check_path)
+        spotter = KeywordSpotter(templates, sample_rate=rate)
+        chunk = int(rate * 0.04)
+        for start in range(0, audio.size, chunk):
+            if spotter.process(audio[start : start + chunk]):
+                click.echo(
+                    f"触发: {(start + chunk) / rate:.2f}s（匹配代价 {spotter.score:.3f}）"
+                )
+        click.echo(
+            f"共触发 {spotter.detections} 次，每帧CPU {spotter.ns_per_frame / 1e3:.1f}us"
+            f"（实时的 {spotter.realtime_fraction:.2%}）"
+        )
+
+
+@main.command()
+@click.argument("input_dir", type=click.Path(exists=True, file_okay=False))
+@click.option(
+    "--output",
+    "-o",
+    "output_dir",
+    type=click.Path(file_okay=False),
+    required=True,
+    help="输出目录，写入回复音频、results.jsonl 和 summary.json",
+)
+@click.option(
+    "--concurrency",
+    "-j",
+    type=click.IntRange(min=1),
+    default=4,
+    show_default=True,
+    help="同时进行的会话数",
+)
+@click.option(
+    "--speed",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    show_default=True,
+    help="相对实时的发送速度，0表示不等待（尽快发送）",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    default=60.0,
+    show_default=True,
+    help="单个文件等待回复结束的超时（秒）",
+)
+@click.option("--denoise", is_flag=True, help="上行前降噪")
+@click.option(
+    "--backend",
+    type=click.Choice(["realtime", "local"]),
+    default="realtime",
+    show_default=True,
+    help="会话后端：realtime为真实实时会话，local为不联网的本地替身",
+)
+@click.option(
+    "--pool",
+    "pool_size",
+    type=click.IntRange(min=0),
+    default=0,
+    show_default=True,
+    help="预先建立的会话数，隐藏建立连接的耗时（0表示每个文件现建会话）",
+)
+def batch(
+    input_dir: str,
+    output_dir: str,
+    concurrency: int,
+    speed: float,
+    timeout: float,
+    denoise: bool,
+    backend: str,
+    pool_size: int,
+) -> None:
+    """
+    把目录中的WAV提问经上行流水线批量送入会话，保存回复和耗时
+
+    输入为16位PCM WAV，采样率不限：其他采样率（如44.1kHz）先重采样到48kHz（需要 scipy）。
+    """
+    from .batch import (
+        find_audio_files,
+        local_session_factory,
+        realtime_session_factory,
+        run_batch,
+    )
+
+    paths = find_audio_files(input_dir)
+    if not paths:
+        click.echo(f"目录中没有WAV文件: {input_dir}", err=True)
+        sys.exit(2)
+
+    if backend == "local":
+        factory = local_session_factory()
+    else:
+        try:
+            factory = realtime_session_factory()
+        except (ImportError, OSError) as e:
+            click.echo(f"无法创建实时会话: {e}", err=True)
+            sys.exit(2)
+
+    done = [0]
+
+    def progress(result: "FileResult") -> None:
+        done[0] += 1
+        status = "✓" if result.ok else f"✗ {result.error}"
+        click.echo(f"[{done[0]}/{len(paths)}] {result.file} {status}")
+
+    async def run() -> "BatchSummary":
+        pool = SessionPool(factory, size=pool_size)
+        if pool_size:
+            pool.start()
+        try:
+            return await run_batch(
+                paths,
+                pool.session_factory() if pool_size else factory,
+                output_dir,
+                concurrency=concurrency,
+                speed=speed,
+                timeout=timeout,
+                denoise=denoise,
+                base_dir=input_dir,
+                progress=progress,
+            )
+        finally:
+            await pool.close()
+            if pool_size:
+                click.echo(
+                    f"会话池: 命中率 {pool.hit_rate:.0%}，"
+                    f"建立会话平均 {pool.ready_mean_s:.2f}秒，"
+                    f"取会话平均等待 {pool.wait_mean_s:.2f}秒"
+                )
+
+    click.echo(f"处理 {len(paths)} 个文件，并发 {concurrency}，后端 {backend}")
+    summary = asyncio.run(run())
+    click.echo(
+        f"完成: 成功 {summary.succeeded}，失败 {summary.failed}，"
+        f"音频 {summary.audio_s:.1f}秒，耗时 {summary.wall_s:.1f}秒，"
+        f"实时倍率 {summary.realtime_factor:.1f}x"
+    )
+    if summary.failed:
+        sys.exit(1)
+
+
+@main.command()
+@click.option(
+    "--bus",
+    envvar="EDUBUDDY_AUDIO_BUS",
+    default="edubuddy",
+    show_default=True,
+    help="音频总线名称（环境变量 EDUBUDDY_AUDIO_BUS）",
+)
+@click.option(
+    "--channel",
+    "-c",
+    type=click.Choice(["capture", "playback"]),
+    default="capture",
+    show_default=True,
+    help="读取的方向：capture 麦克风，playback 扬声器",
+)
+@click.option(
+    "--wav", "wav_path", type=click.Path(dir_okay=False), help="录制到WAV文件"
+)
+@click.option("--duration", "-d", type=float, help="读取时长（秒），不指定则持续读取")
+def tap(
+    bus: str, channel: str, wav_path: Optional[str], duration: Optional[float]
+) -> None:
+    """旁路读取实时语音的音频总线：显示电平或录音"""
+    import numpy as np
+
+    from .audiobus import RingReader, segment_name
+
+    try:
+        reader = RingReader(segment_name(bus, channel))
+    except FileNotFoundError:
+        click.echo(
+            f"音频总线不存在: {bus}（实时语音需设置 EDUBUDDY_AUDIO_BUS）", err=True
+        )
+        sys.exit(2)
+
+    writer = None
+    if wav_path:
+        writer = wave.open(wav_path, "wb")
+        writer.setnchannels(1)
+        writer.setsampwidth(2)
+        writer.setframerate(reader.sample_rate)
+
+    deadline = time.monotonic() + duration if duration else None
+    peak = 0.0
+    next_report = time.monotonic() + 0.5
+    try:
+        while True:
+            block = reader.read()
+            if block is None:
+                time.sleep(0.005)
+            elif writer:
+                data = block.samples.tobytes()
+                if reader.valid(block):
+                    writer.writeframes(data)
+            elif block.samples.size:
+                level = float(np.sqrt(np.mean((block.samples / 32768.0) ** 2)))
+                peak = max(peak, level)
+            now = time.monotonic()
+            if now >= next_report:
+                next_report = now + 0.5
+                if not writer:
+                    db = 20 * np.log10(max(peak, 1e-5))
+                    bar = "█" * int(max(0.0, db + 60) / 2)
+                    click.echo(f"{channel} {db:6.1f} dBFS {bar:<30} 丢失 {reader.lost}")
+                    peak = 0.0
+            if deadline and now >= deadline:
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer:
+            writer.close()
+        reader.close()
+    if reader.lost:
+        click.echo(f"读取落后，共丢失 {reader.lost} 块", err=True)
+
+
+def _latest_trace(directory: str) -> Optional[str]:
+    """目录中最新的追踪转储文件"""
+    try:
+        names = [n for n in os.listdir(directory) if n.startswith("trace-")]
+    except OSError:
+        return None
+    if not names:
+        return None
+    return os.path.join(directory, max(names))
+
+
+@main.command()
+@click.argument("path", required=False, type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--dir",
+    "trace_dir",
+    type=click.Path(file_okay=False),
+    envvar="EDUBUDDY_TRACE_DIR",
+    default=DEFAULT_TRACE_DIR,
+    show_default=True,
+    help="未指定文件时读取该目录中最新的转储",
+)
+@click.option(
+    "--kind",
+    "-k",
+    "kinds",
+    multiple=True,
+    type=click.Choice(list(EVENT_NAMES)),
+    help="只显示这些事件，可重复",
+)
+@click.option("--last", "-n", type=click.IntRange(min=1), help="只显示最后几条")
+def trace(
+    path: Optional[str], trace_dir: str, kinds: tuple, last: Optional[int]
+) -> None:
+    """把飞行记录器的追踪转储还原成时间线"""
+    path = path or _latest_trace(trace_dir)
+    if path is None:
+        click.echo(f"没有找到追踪转储: {trace_dir}", err=True)
+        sys.exit(2)
+    try:
+        dump = read_trace(path)
+    except (OSError, ValueError) as e:
+        click.echo(f"无法读取追踪转储: {e}", err=True)
         sys.exit(1)
 
+    created = datetime.fromtimestamp(float(dump.header.get("created", 0.0)))
+    click.echo(f"文件: {path}")
+    click.echo(
+        f"原因: {dump.reason}，时间: {created:%Y-%m-%d %H:%M:%S}，"
+        f"进程: {dump.header.get('pid')}，事件: {len(dump.events)} 条"
+    )
+    for line in render_timeline(dump, list(kinds) or None, last):
+        click.echo(line)
+
 
 @main.command()
 def version() -> None:
@@ -104,14 +939,26 @@ def info(check_updates: bool) -> None:
 @click.option(
     "--test-duration", "-t", type=int, default=5, help="测试运行时间（秒），默认5秒"
 )
-def test(test_duration: int) -> None:
+@click.option(
+    "--virtual-time",
+    is_flag=True,
+    help="使用虚拟时钟，立即跑完测试时间而不实际等待",
+)
+def test(test_duration: int, virtual_time: bool) -> None:
     """测试时间日志记录功能"""
     logger.info(f"开始测试，将运行 {test_duration} 秒")
 
     try:
-        time_service = create_time_service(interval=0.5, format_str="%H:%M:%S")
+        clock = VirtualClock(start=time.time()) if virtual_time else None
+        time_service = create_time_service(
+            interval=0.5, format_str="%H:%M:%S", clock=clock
+        )
         time_service.start_time_logging()
-        time.sleep(test_duration)
+        if clock is not None:
+            clock.wait_for_waiters()
+            clock.advance(test_duration)
+        else:
+            time.sleep(test_duration)
         time_service.stop_time_logging()
         logger.info("测试完成")
     except Exception as e:
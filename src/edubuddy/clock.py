@@ -0,0 +1,279 @@
+"""
+时钟模块
+
+把"读当前时间"和"等待一段时间"抽象成可注入的时钟，供 TimeService、
+计划触发和批处理的发送节奏使用。
+
+- SystemClock: 真实时钟，直接调用 time / threading.Event.wait / asyncio.sleep
+- VirtualClock: 虚拟时钟，时间只在调用 advance() 时前进（或开启 autojump 后
+  在等待时直接跳到到期时刻），测试可以在毫秒内跑完数小时的触发和会话计时
+
+Clock.monotonic 是普通的无参方法，也可以直接传给 RateLimiter、AutoTuner
+等接受 clock 回调的组件。
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple
+
+
+class Clock:
+    """时钟接口"""
+
+    def time(self) -> float:
+        """当前Unix时间（秒）"""
+        raise NotImplementedError
+
+    def monotonic(self) -> float:
+        """单调时间（秒），用于计算间隔"""
+        raise NotImplementedError
+
+    def now(self) -> datetime:
+        """当前本地时间"""
+        return datetime.fromtimestamp(self.time())
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        """
+        等待事件被设置或超时（阻塞当前线程）
+
+        Args:
+            event: 要等待的事件
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            事件是否已被设置
+        """
+        raise NotImplementedError
+
+    def sleep(self, seconds: float) -> None:
+        """阻塞当前线程一段时间"""
+        self.wait(threading.Event(), seconds)
+
+    async def asleep(self, seconds: float) -> None:
+        """在事件循环中等待一段时间"""
+        raise NotImplementedError
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        """协程等待时钟之外的事件（如工作线程的结果）期间，时间不自动跳转"""
+        yield
+
+
+class SystemClock(Clock):
+    """真实时钟"""
+
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        return event.wait(timeout)
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    async def asleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+# 虚拟时钟等待线程时轮询事件的真实间隔（秒）
+_POLL_S = 0.005
+# advance() 等待被唤醒的线程再次进入等待的最长真实时间（秒）
+_SETTLE_S = 1.0
+# autojump 跳转前协程等待者集合需要保持不变的真实时间（秒）：其他协程可能
+# 正在等待工作线程，稍后才会再次等待；检查间隔用真实睡眠，不占住GIL
+_JUMP_IDLE_S = 0.005
+_JUMP_POLL_S = 0.001
+
+
+class VirtualClock(Clock):
+    """
+    虚拟时钟
+
+    线程中的 wait()/sleep() 会阻塞到 advance() 把时间推进到到期时刻；
+    advance() 按到期先后逐个唤醒等待的线程，并等它再次进入等待（或退出）后
+    才继续推进，因此周期性任务在虚拟时间里的触发次数是确定的。
+
+    协程中的 asleep() 在 autojump 模式下不需要 advance()：当它是最早到期的
+    等待者、且等待者集合短时间内没有变化时，时钟直接跳到到期时刻。
+    """
+
+    def __init__(
+        self,
+        start: float = 1_700_000_000.0,
+        monotonic_start: float = 1000.0,
+        autojump: bool = False,
+    ):
+        """
+        初始化虚拟时钟
+
+        Args:
+            start: 起始Unix时间
+            monotonic_start: 起始单调时间
+            autojump: 等待时直接跳到到期时刻，无需调用 advance()
+        """
+        self.autojump = autojump
+        self._epoch = start - monotonic_start
+        self._now = monotonic_start
+        self._cond = threading.Condition()
+        # 线程等待者: {线程: 到期的单调时间}
+        self._waiting: Dict[threading.Thread, float] = {}
+        # 协程等待者: (到期时间, 序号, future)
+        self._sleepers: List[Tuple[float, int, "asyncio.Future[None]"]] = []
+        self._counter = itertools.count()
+        self._changed = time.perf_counter()
+        # 正在等待时钟之外事件的协程数，不为0时 autojump 不跳转
+        self._holds = 0
+
+    def time(self) -> float:
+        return self._epoch + self._now
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def _set(self, moment: float) -> None:
+        with self._cond:
+            if moment > self._now:
+                self._now = moment
+            self._cond.notify_all()
+
+    def wait(self, event: threading.Event, timeout: float) -> bool:
+        deadline = self._now + max(0.0, timeout)
+        if self.autojump:
+            if not event.is_set():
+                self._set(deadline)
+            return event.is_set()
+
+        thread = threading.current_thread()
+        with self._cond:
+            self._waiting[thread] = deadline
+            self._cond.notify_all()
+            try:
+                while not event.is_set() and self._now < deadline:
+                    # 事件不会通知条件变量，短间隔轮询
+                    self._cond.wait(_POLL_S)
+            finally:
+                del self._waiting[thread]
+                self._cond.notify_all()
+        return event.is_set()
+
+    async def asleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            await asyncio.sleep(0)
+            return
+        deadline = self._now + seconds
+        loop = asyncio.get_running_loop()
+        entry = (deadline, next(self._counter), loop.create_future())
+        heapq.heappush(self._sleepers, entry)
+        self._changed = time.perf_counter()
+        try:
+            if not self.autojump:
+                await entry[2]
+                return
+            # 让出事件循环，直到自己是最早到期的等待者且其他协程都已安定
+            while (
+                self._holds
+                or self._sleepers[0] is not entry
+                or time.perf_counter() - self._changed < _JUMP_IDLE_S
+            ):
+                await asyncio.sleep(_JUMP_POLL_S)
+            self._set(deadline)
+        finally:
+            self._sleepers.remove(entry)
+            heapq.heapify(self._sleepers)
+            self._changed = time.perf_counter()
+
+    @contextmanager
+    def hold(self) -> Iterator[None]:
+        self._holds += 1
+        try:
+            yield
+        finally:
+            self._holds -= 1
+            self._changed = time.perf_counter()
+
+    def _wake_sleepers(self) -> None:
+        """唤醒已到期的协程等待者（在其事件循环线程中设置结果）"""
+        for deadline, _, future in list(self._sleepers):
+            if deadline <= self._now and not future.done():
+                future.get_loop().call_soon_threadsafe(_resolve, future)
+
+    def _settle(self, thread: threading.Thread, deadline: float) -> None:
+        """等被唤醒的线程处理完这次到期，再次进入等待或退出"""
+        limit = time.monotonic() + _SETTLE_S
+        while time.monotonic() < limit:
+            if not thread.is_alive():
+                return
+            current = self._waiting.get(thread)
+            if current is not None and current > deadline:
+                return
+            self._cond.wait(_POLL_S)
+
+    def advance(self, seconds: float) -> None:
+        """
+        把时间向前推进，途中按到期先后唤醒等待的线程和协程
+
+        Args:
+            seconds: 推进的秒数
+
+        Raises:
+            ValueError: 秒数为负
+        """
+        if seconds < 0:
+            raise ValueError("时间不能倒退")
+        target = self._now + seconds
+        with self._cond:
+            while True:
+                due = [
+                    (deadline, thread)
+                    for thread, deadline in self._waiting.items()
+                    if deadline <= target
+                ]
+                if not due:
+                    break
+                deadline, thread = min(due, key=lambda item: item[0])
+                self._now = max(self._now, deadline)
+                self._cond.notify_all()
+                self._settle(thread, deadline)
+            self._now = target
+            self._cond.notify_all()
+        self._wake_sleepers()
+
+    def wait_for_waiters(self, count: int = 1, timeout: float = _SETTLE_S) -> bool:
+        """
+        等待至少 count 个线程或协程进入等待（真实时间），
+        在刚启动的后台线程上调用 advance() 之前使用
+
+        Returns:
+            是否在超时前达到数量
+        """
+        limit = time.monotonic() + timeout
+        with self._cond:
+            while self.waiters < count:
+                remaining = limit - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(min(remaining, _POLL_S))
+        return True
+
+    @property
+    def waiters(self) -> int:
+        """正在等待的线程和协程数"""
+        return len(self._waiting) + len(self._sleepers)
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
@@ -0,0 +1,303 @@
+"""
+运行时配置模块
+
+读取部署配置文件（shell风格的 KEY=VALUE），并在不重启服务的情况下热加载：
+监视文件变化或收到SIGHUP时重新读取，校验通过后整体应用
+LOG_INTERVAL、LOG_FORMAT 和 LOG_LEVEL，应用失败时整体回滚。
+"""
+
+import os
+import re
+import shlex
+import signal
+import threading
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .logger import _LEVEL_NOS, logger
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
+    from .time_service import TimeService
+
+# 服务部署时的默认配置文件路径（由deploy.sh生成）
+DEFAULT_CONFIG_FILE = "/opt/edubuddy/edubuddy.conf"
+
+# 文件变化检查间隔（秒）
+DEFAULT_POLL_INTERVAL = 2.0
+
+# LOG_FORMAT 允许的strftime指令（各平台strftime对未知指令不报错，需要自行校验）
+_STRFTIME_DIRECTIVES = frozenset("aAbBcdefFGhHIjmMnpSTuUVwWxXyYzZ%")
+
+
+def parse_config(text: str) -> Dict[str, str]:
+    """
+    解析shell风格的配置文本
+
+    支持 `#` 注释、空行，以及带单引号或双引号的值。
+
+    Args:
+        text: 配置文本
+
+    Returns:
+        配置项字典
+
+    Raises:
+        ValueError: 存在无法解析的行
+    """
+    values = {}
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        key, sep, value = line.partition("=")
+        key = key.strip()
+        if not sep or not key.isidentifier():
+            raise ValueError(f"第{lineno}行格式无效: {raw}")
+        value = value.strip()
+        if value[:1] in ("'", '"'):
+            try:
+                parts = shlex.split(value)
+            except ValueError:
+                raise ValueError(f"第{lineno}行引号不匹配: {raw}") from None
+            value = parts[0] if len(parts) == 1 else value
+        values[key] = value
+    return values
+
+
+@dataclass(frozen=True)
+class RuntimeConfig:
+    """可热加载的运行时配置"""
+
+    interval: float
+    format_str: str
+    level: str
+
+    @classmethod
+    def from_values(
+        cls, values: Dict[str, str], defaults: "RuntimeConfig"
+    ) -> "RuntimeConfig":
+        """
+        由配置项构造并校验运行时配置
+
+        Args:
+            values: 配置项字典
+            defaults: 配置文件中缺失的项使用的值
+
+        Returns:
+            校验后的运行时配置
+
+        Raises:
+            ValueError: 任一配置项无效，错误信息包含所有问题
+        """
+        errors: List[str] = []
+
+        interval = defaults.interval
+        if "LOG_INTERVAL" in values:
+            try:
+                interval = float(values["LOG_INTERVAL"])
+            except ValueError:
+                errors.append(f"LOG_INTERVAL 不是数字: {values['LOG_INTERVAL']}")
+            else:
+                if interval <= 0:
+                    errors.append("LOG_INTERVAL 必须大于0")
+
+        format_str = values.get("LOG_FORMAT", defaults.format_str)
+        if not format_str:
+            errors.append("LOG_FORMAT 不能为空")
+        else:
+            unknown = [
+                d
+                for d in re.findall(r"%(.?)", format_str)
+                if d not in _STRFTIME_DIRECTIVES
+            ]
+            if unknown:
+                errors.append(
+                    f"LOG_FORMAT 含无效指令: {', '.join('%' + d for d in unknown)}"
+                )
+
+        level = values.get("LOG_LEVEL", defaults.level).upper()
+        if level not in _LEVEL_NOS:
+            errors.append(f"LOG_LEVEL 无效: {level}")
+
+        if errors:
+            raise ValueError("; ".join(errors))
+        return cls(interval=interval, format_str=format_str, level=level)
+
+
+class ConfigReloader:
+    """配置热加载器 - 监视配置文件并在变化或SIGHUP时重新加载"""
+
+    def __init__(
+        self,
+        path: str,
+        time_service: Optional["TimeService"] = None,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        level_guard: Optional[Callable[[str], bool]] = None,
+        pinned: Iterable[str] = (),
+    ):
+        """
+        初始化配置热加载器
+
+        Args:
+            path: 配置文件路径
+            time_service: 需要更新间隔和格式的时间服务，不指定则只更新日志级别
+            poll_interval: 检查文件变化的间隔（秒）
+            level_guard: 修改日志级别前调用，返回True时不修改
+                （如资源调控器降级期间接管日志级别，见 ResourceGovernor.hold_level）
+            pinned: 不从配置文件加载的配置项（如已在命令行中指定的 LOG_INTERVAL）
+        """
+        if poll_interval <= 0:
+            raise ValueError("检查间隔必须大于0")
+
+        self.path = path
+        self.time_service = time_service
+        self.poll_interval = poll_interval
+        self.level_guard = level_guard
+        self.pinned = frozenset(key.upper() for key in pinned)
+        self.reloads = 0
+        self.failures = 0
+
+        self._signature: Optional[Tuple[int, int, int]] = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def current(self) -> RuntimeConfig:
+        """当前生效的运行时配置"""
+        if self.time_service is not None:
+            return RuntimeConfig(
+                interval=self.time_service.interval,
+                format_str=self.time_service.format_str,
+                level=logger.level,
+            )
+        return RuntimeConfig(interval=1.0, format_str="%H:%M:%S", level=logger.level)
+
+    def _file_signature(self) -> Optional[Tuple[int, int, int]]:
+        """文件的 (inode, 大小, 修改时间)，用于检测变化"""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+    def _apply(self, config: RuntimeConfig) -> None:
+        """应用与当前不同的配置项"""
+        if config.level != logger.level and not (
+            self.level_guard is not None and self.level_guard(config.level)
+        ):
+            logger.set_level(config.level)
+        if self.time_service is not None:
+            if config.format_str != self.time_service.format_str:
+                self.time_service.set_format(config.format_str)
+            if config.interval != self.time_service.interval:
+                self.time_service.set_interval(config.interval)
+
+    def reload(self) -> bool:
+        """
+        重新读取配置文件并应用
+
+        校验失败时保持当前配置不变；应用过程中出错时回滚到应用前的配置。
+
+        Returns:
+            如果新配置已生效（或无变化）则返回True
+        """
+        with self._lock:
+            self._signature = self._file_signature()
+            previous = self.current()
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    values = parse_config(f.read())
+                skipped = sorted(self.pinned.intersection(values))
+                if skipped:
+                    logger.debug(
+                        f"已在命令行中指定，忽略配置文件中的: {', '.join(skipped)}"
+                    )
+                    values = {k: v for k, v in values.items() if k not in self.pinned}
+                config = RuntimeConfig.from_values(values, previous)
+            except (OSError, ValueError) as e:
+                self.failures += 1
+                logger.error(f"配置文件无效，保持当前配置: {e}")
+                return False
+
+            if self.time_service is None:
+                # 没有时间服务时只有日志级别生效
+                config = replace(
+                    config, interval=previous.interval, format_str=previous.format_str
+                )
+            if config == previous:
+                return True
+
+            try:
+                self._apply(config)
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"应用配置失败，已回滚: {e}")
+                self._apply(previous)
+                return False
+
+            self.reloads += 1
+            logger.info(f"配置已重新加载: {self.path}")
+            return True
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """
+        向控制服务的指标注册表注册热加载指标
+
+        Args:
+            registry: 指标注册表
+        """
+        registry.register(
+            "config.reloads_total",
+            lambda: self.reloads,
+            "配置热加载成功次数",
+            "counter",
+        )
+        registry.register(
+            "config.failures_total",
+            lambda: self.failures,
+            "配置热加载失败次数",
+            "counter",
+        )
+
+    def request_reload(self) -> None:
+        """请求后台线程尽快重新加载（可在信号处理器中调用）"""
+        self._wakeup.set()
+
+    def install_signal_handler(self) -> None:
+        """收到SIGHUP时重新加载配置（只能在主线程调用）"""
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.request_reload())
+
+    def _watch(self) -> None:
+        """后台监视线程"""
+        while not self._stop_event.is_set():
+            requested = self._wakeup.wait(self.poll_interval)
+            if self._stop_event.is_set():
+                break
+            self._wakeup.clear()
+            if requested:
+                logger.info("收到重新加载请求")
+                self.reload()
+            elif self._file_signature() != self._signature:
+                self.reload()
+
+    def start(self) -> None:
+        """加载一次配置并开始在后台监视文件变化"""
+        if self._thread is not None:
+            return
+        self.reload()
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._watch, name="edubuddy-config", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止监视"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
@@ -0,0 +1,373 @@
+"""
+控制套接字模块
+
+运行中的进程通过UNIX域套接字提供实时指标快照（JSON和Prometheus文本格式），
+并接受运行时命令（例如修改时间间隔或日志级别）。
+
+协议为按行的JSON：客户端每行发送 {"command": "...", "args": [...]}，
+服务端每行回复 {"ok": true, "result": ...} 或 {"ok": false, "error": "..."}。
+"""
+
+import json
+import os
+import re
+import socket
+import socketserver
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from .logger import logger
+
+# 服务部署时的默认控制套接字路径（systemd RuntimeDirectory）
+DEFAULT_CONTROL_SOCKET = "/run/edubuddy/control.sock"
+
+METRIC_GAUGE = "gauge"
+METRIC_COUNTER = "counter"
+
+# Prometheus指标名前缀
+PROMETHEUS_PREFIX = "edubuddy_"
+
+# 单个请求行的最大长度
+_MAX_REQUEST_BYTES = 64 * 1024
+
+CommandHandler = Callable[[List[str]], Any]
+SettingHandler = Callable[[str], None]
+
+
+@dataclass
+class Metric:
+    """单个指标定义"""
+
+    name: str
+    read: Callable[[], float]
+    help: str
+    kind: str
+
+
+class MetricsRegistry:
+    """指标注册表 - 指标在读取快照时才求值，不在热路径上产生开销"""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(
+        self,
+        name: str,
+        read: Callable[[], float],
+        help: str = "",
+        kind: str = METRIC_GAUGE,
+    ) -> None:
+        """
+        注册指标
+
+        Args:
+            name: 点分隔的指标名，例如 "logger.queue_depth"
+            read: 返回当前值的函数
+            help: 指标说明
+            kind: 指标类型（gauge 或 counter）
+
+        Raises:
+            ValueError: 指标名或类型无效
+        """
+        if not re.fullmatch(r"[a-z_][a-z0-9_]*(\.[a-z0-9_]+)*", name):
+            raise ValueError(f"无效的指标名: {name}")
+        if kind not in (METRIC_GAUGE, METRIC_COUNTER):
+            raise ValueError(f"无效的指标类型: {kind}")
+        with self._lock:
+            self._metrics[name] = Metric(name, read, help, kind)
+
+    def unregister(self, prefix: str) -> None:
+        """移除名称以指定前缀开头的所有指标"""
+        with self._lock:
+            for name in [n for n in self._metrics if n.startswith(prefix)]:
+                del self._metrics[name]
+
+    def snapshot(self) -> Dict[str, float]:
+        """
+        读取所有指标的当前值
+
+        Returns:
+            指标名到数值的映射，读取失败的指标被跳过
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        values = {}
+        for metric in metrics:
+            try:
+                values[metric.name] = float(metric.read())
+            except Exception:
+                continue
+        return values
+
+    def to_prometheus(self) -> str:
+        """
+        以Prometheus文本格式导出所有指标
+
+        Returns:
+            Prometheus exposition 格式文本
+        """
+        values = self.snapshot()
+        with self._lock:
+            metrics = [self._metrics[name] for name in values if name in self._metrics]
+
+        lines = []
+        for metric in metrics:
+            name = PROMETHEUS_PREFIX + metric.name.replace(".", "_")
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.append(f"{name} {values[metric.name]!r}")
+        return "\n".join(lines) + "\n"
+
+
+def read_rss_bytes() -> float:
+    """读取当前进程的常驻内存大小"""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return float(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        # 非Linux平台退回到峰值内存（macOS单位为字节，Linux为KB）
+        return float(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def register_process_metrics(registry: MetricsRegistry) -> None:
+    """注册进程级指标：运行时长、内存、CPU时间和线程数"""
+    started = time.monotonic()
+    registry.register(
+        "process.uptime_seconds",
+        lambda: time.monotonic() - started,
+        "进程运行时长（秒）",
+    )
+    registry.register("process.rss_bytes", read_rss_bytes, "常驻内存（字节）")
+    registry.register(
+        "process.cpu_seconds_total",
+        time.process_time,
+        "累计CPU时间（秒）",
+        METRIC_COUNTER,
+    )
+    registry.register("process.threads", threading.active_count, "活动线程数")
+
+
+def register_logger_metrics(registry: MetricsRegistry) -> None:
+    """注册日志相关指标"""
+    registry.register(
+        "logger.queue_depth", lambda: logger.queue_depth, "控制台日志队列中的消息数"
+    )
+    registry.register(
+        "logger.dropped_total",
+        lambda: logger.dropped_messages,
+        "控制台日志队列累计丢弃的消息数",
+        METRIC_COUNTER,
+    )
+    registry.register(
+        "logger.suppressed",
+        lambda: logger.suppressed_messages,
+        "当前被限流抑制的消息数",
+    )
+    registry.register("logger.level", lambda: logger.level_no, "当前日志级别数值")
+
+
+class _ControlHandler(socketserver.StreamRequestHandler):
+    """控制连接处理器 - 每行一个请求"""
+
+    server: "_ControlSocketServer"
+
+    def handle(self) -> None:
+        while True:
+            line = self.rfile.readline(_MAX_REQUEST_BYTES)
+            if not line:
+                break
+            response = self.server.control.handle_request(line)
+            self.wfile.write(json.dumps(response, ensure_ascii=False).encode() + b"\n")
+            self.wfile.flush()
+
+
+class _ControlSocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: str, control: "ControlServer"):
+        self.control = control
+        super().__init__(path, _ControlHandler)
+
+
+class ControlServer:
+    """控制套接字服务 - 在后台线程中提供指标和运行时命令"""
+
+    def __init__(self, path: str, registry: Optional[MetricsRegistry] = None):
+        """
+        初始化控制服务
+
+        默认注册进程和日志指标，以及 "level" 设置项。
+
+        Args:
+            path: UNIX域套接字路径
+            registry: 指标注册表，不指定则新建
+        """
+        self.path = path
+        self.registry = registry or MetricsRegistry()
+        self._commands: Dict[str, CommandHandler] = {}
+        self._settings: Dict[str, SettingHandler] = {}
+        self._server: Optional[_ControlSocketServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+        register_process_metrics(self.registry)
+        register_logger_metrics(self.registry)
+
+        self.add_command("ping", lambda args: "pong")
+        self.add_command("help", lambda args: self._help())
+        self.add_command("metrics", lambda args: self.registry.snapshot())
+        self.add_command("prometheus", lambda args: self.registry.to_prometheus())
+        self.add_command("set", self._set)
+        self.add_setting("level", logger.set_level)
+
+    def add_command(self, name: str, handler: CommandHandler) -> None:
+        """
+        注册命令
+
+        Args:
+            name: 命令名
+            handler: 处理函数，参数为字符串参数列表，返回值需可JSON序列化
+        """
+        self._commands[name] = handler
+
+    def add_setting(self, name: str, apply: SettingHandler) -> None:
+        """
+        注册可通过 "set <name> <value>" 修改的设置项
+
+        Args:
+            name: 设置项名称
+            apply: 应用新值的函数，值无效时应抛出ValueError
+        """
+        self._settings[name] = apply
+
+    def _help(self) -> Dict[str, List[str]]:
+        return {"commands": sorted(self._commands), "settings": sorted(self._settings)}
+
+    def _set(self, args: List[str]) -> str:
+        if len(args) != 2:
+            raise ValueError("用法: set <name> <value>")
+        name, value = args
+        apply = self._settings.get(name)
+        if apply is None:
+            raise ValueError(
+                f"未知的设置项: {name}（可用: {', '.join(sorted(self._settings))}）"
+            )
+        apply(value)
+        logger.info(f"控制命令已更新设置: {name}={value}")
+        return f"{name}={value}"
+
+    def handle_request(self, line: bytes) -> Dict[str, Any]:
+        """
+        处理一行请求
+
+        Args:
+            line: JSON编码的请求
+
+        Returns:
+            响应字典
+        """
+        try:
+            request = json.loads(line)
+            command = request["command"]
+            args = [str(arg) for arg in request.get("args", [])]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return {"ok": False, "error": "无效的请求"}
+
+        handler = self._commands.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"未知的命令: {command}"}
+        try:
+            return {"ok": True, "result": handler(args)}
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            logger.error(f"控制命令 {command} 执行错误: {e}")
+            return {"ok": False, "error": f"执行错误: {e}"}
+
+    def _remove_stale_socket(self) -> None:
+        """删除上次未正常退出遗留的套接字文件，若仍有进程在监听则报错"""
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.unlink(self.path)
+        else:
+            raise RuntimeError(f"控制套接字已被其他进程使用: {self.path}")
+        finally:
+            probe.close()
+
+    def start(self) -> None:
+        """
+        绑定套接字并在后台线程中开始服务
+
+        Raises:
+            RuntimeError: 套接字已被其他进程使用
+        """
+        if self._server is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._remove_stale_socket()
+
+        self._server = _ControlSocketServer(self.path, self)
+        os.chmod(self.path, 0o660)
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="edubuddy-control", daemon=True
+        )
+        self._thread.start()
+        logger.info(f"控制套接字已启动: {self.path}")
+
+    def stop(self) -> None:
+        """停止服务并删除套接字文件"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def send_command(path: str, command: str, *args: str, timeout: float = 2.0) -> Any:
+    """
+    向控制套接字发送一条命令
+
+    Args:
+        path: UNIX域套接字路径
+        command: 命令名
+        *args: 命令参数
+        timeout: 超时时间（秒）
+
+    Returns:
+        命令结果
+
+    Raises:
+        OSError: 无法连接控制套接字
+        RuntimeError: 命令执行失败
+    """
+    request = json.dumps({"command": command, "args": list(args)}).encode() + b"\n"
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(request)
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        raise RuntimeError("控制套接字未返回响应")
+    response = json.loads(line)
+    if not response.get("ok"):
+        raise RuntimeError(response.get("error", "未知错误"))
+    return response.get("result")
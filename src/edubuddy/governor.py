@@ -0,0 +1,455 @@
+"""
+资源调控模块
+
+部署配置中的 MAX_MEMORY / MAX_CPU 只会成为 systemd 的硬限制（MemoryMax /
+CPUQuota），超出时服务会在课堂中途被杀掉或被限流。资源调控器在进程内定期采样
+常驻内存和CPU占用，在接近预算时分级降级，资源回落后再逐级恢复:
+
+    第1级 收缩: 收缩缓冲和缓存
+    第2级 精简: 关闭可选的音频处理阶段
+    第3级 最低: 降低日志级别
+
+各组件通过 add_action() 注册自己在某一级要做的降级和恢复操作，
+每次升降级和每个操作都通过日志报告。
+"""
+
+import gc
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, List, Mapping, Optional, Tuple
+
+from .clock import SYSTEM_CLOCK, Clock
+from .config import parse_config
+from .control import read_rss_bytes
+from .logger import _LEVEL_NOS, logger
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
+
+STAGE_NORMAL = 0
+STAGE_SHRINK = 1
+STAGE_REDUCE = 2
+STAGE_MINIMAL = 3
+
+STAGE_NAMES = ("正常", "收缩缓冲和缓存", "关闭可选音频处理", "降低日志级别")
+
+# 进入第1/2/3级的预算占用比例
+DEFAULT_THRESHOLDS = (0.70, 0.80, 0.90)
+# 占用低于当前级别门限减去该值，并连续保持若干次采样后才降一级
+DEFAULT_HYSTERESIS = 0.10
+DEFAULT_RECOVER_SAMPLES = 3
+
+DEFAULT_INTERVAL = 2.0
+
+# 第3级使用的日志级别
+DEFAULT_QUIET_LEVEL = "WARNING"
+
+# CPU占用的指数平滑系数，避免对瞬时尖峰反应过度
+_CPU_SMOOTHING = 0.5
+
+_UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+_MEMORY_PATTERN = re.compile(r"^(\d+(?:\.\d+)?)([KMGT]?)B?$", re.IGNORECASE)
+_UNLIMITED = ("", "infinity")
+
+
+def parse_memory(value: str) -> Optional[int]:
+    """
+    解析 systemd 风格的内存限制
+
+    Args:
+        value: 例如 "256M"、"1.5G"、"80%"（物理内存的比例）、"infinity"
+
+    Returns:
+        字节数，不限制时返回None
+
+    Raises:
+        ValueError: 格式无效
+    """
+    text = value.strip()
+    if text.lower() in _UNLIMITED:
+        return None
+    if text.endswith("%"):
+        fraction = _parse_percent(text)
+        total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        return int(total * fraction)
+    match = _MEMORY_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"内存限制格式无效: {value}")
+    size = int(float(match.group(1)) * _UNITS[match.group(2).upper()])
+    if size <= 0:
+        raise ValueError(f"内存限制必须大于0: {value}")
+    return size
+
+
+def parse_cpu(value: str) -> Optional[float]:
+    """
+    解析 systemd 风格的CPU配额
+
+    Args:
+        value: 例如 "50%"（半个CPU）、"150%"、"infinity"
+
+    Returns:
+        可用的CPU数，不限制时返回None
+
+    Raises:
+        ValueError: 格式无效
+    """
+    text = value.strip()
+    if text.lower() in _UNLIMITED:
+        return None
+    if not text.endswith("%"):
+        raise ValueError(f"CPU配额必须是百分比: {value}")
+    return _parse_percent(text)
+
+
+def _parse_percent(text: str) -> float:
+    try:
+        fraction = float(text[:-1]) / 100.0
+    except ValueError:
+        raise ValueError(f"百分比格式无效: {text}") from None
+    if fraction <= 0:
+        raise ValueError(f"百分比必须大于0: {text}")
+    return fraction
+
+
+def _format_bytes(size: float) -> str:
+    return f"{size / (1 << 20):.1f}MB"
+
+
+@dataclass(frozen=True)
+class ResourceBudget:
+    """进程资源预算"""
+
+    # 常驻内存上限（字节）
+    max_memory: Optional[int] = None
+    # CPU上限（CPU数，1.0 即 100%）
+    max_cpu: Optional[float] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_memory is not None or self.max_cpu is not None
+
+    @classmethod
+    def from_values(cls, values: Mapping[str, str]) -> "ResourceBudget":
+        """
+        由 MAX_MEMORY / MAX_CPU 配置项构造预算
+
+        Raises:
+            ValueError: 任一配置项无效，错误信息包含所有问题
+        """
+        errors: List[str] = []
+        max_memory = max_cpu = None
+        try:
+            max_memory = parse_memory(values.get("MAX_MEMORY", ""))
+        except ValueError as e:
+            errors.append(f"MAX_MEMORY {e}")
+        try:
+            max_cpu = parse_cpu(values.get("MAX_CPU", ""))
+        except ValueError as e:
+            errors.append(f"MAX_CPU {e}")
+        if errors:
+            raise ValueError("; ".join(errors))
+        return cls(max_memory=max_memory, max_cpu=max_cpu)
+
+    @classmethod
+    def load(cls, config_file: Optional[str] = None) -> "ResourceBudget":
+        """
+        从配置文件读取预算，环境变量 MAX_MEMORY / MAX_CPU 优先
+
+        Raises:
+            OSError: 配置文件无法读取
+            ValueError: 配置无效
+        """
+        values: Dict[str, str] = {}
+        if config_file:
+            with open(config_file, "r", encoding="utf-8") as f:
+                values.update(parse_config(f.read()))
+        for key in ("MAX_MEMORY", "MAX_CPU"):
+            if os.getenv(key):
+                values[key] = os.environ[key]
+        return cls.from_values(values)
+
+    def describe(self) -> str:
+        memory = _format_bytes(self.max_memory) if self.max_memory else "不限"
+        cpu = f"{self.max_cpu:.0%}" if self.max_cpu else "不限"
+        return f"内存 {memory}，CPU {cpu}"
+
+
+@dataclass
+class DegradeAction:
+    """某一级降级时执行的操作"""
+
+    stage: int
+    name: str
+    apply: Callable[[], None]
+    restore: Optional[Callable[[], None]] = None
+
+
+class ResourceGovernor:
+    """资源调控器 - 按预算占用分级降级和恢复"""
+
+    def __init__(
+        self,
+        budget: ResourceBudget,
+        interval: float = DEFAULT_INTERVAL,
+        thresholds: Tuple[float, float, float] = DEFAULT_THRESHOLDS,
+        hysteresis: float = DEFAULT_HYSTERESIS,
+        recover_samples: int = DEFAULT_RECOVER_SAMPLES,
+        quiet_level: str = DEFAULT_QUIET_LEVEL,
+        rss: Callable[[], float] = read_rss_bytes,
+        cpu_time: Callable[[], float] = time.process_time,
+        clock: Optional[Clock] = None,
+    ):
+        """
+        初始化资源调控器
+
+        Args:
+            budget: 资源预算
+            interval: 采样间隔（秒）
+            thresholds: 进入第1/2/3级的预算占用比例，递增
+            hysteresis: 恢复时的回差
+            recover_samples: 降一级前需要连续满足恢复条件的采样次数
+            quiet_level: 第3级使用的日志级别
+            rss: 读取常驻内存（字节）的函数
+            cpu_time: 读取进程累计CPU时间（秒）的函数
+            clock: 时钟，默认系统时钟
+        """
+        if interval <= 0:
+            raise ValueError("采样间隔必须大于0")
+        if len(thresholds) != STAGE_MINIMAL or list(thresholds) != sorted(thresholds):
+            raise ValueError("需要3个递增的降级门限")
+        if recover_samples < 1:
+            raise ValueError("恢复采样次数必须至少为1")
+        if quiet_level.upper() not in _LEVEL_NOS:
+            raise ValueError(f"未知的日志级别: {quiet_level}")
+
+        self.budget = budget
+        self.interval = interval
+        self.thresholds = tuple(thresholds)
+        self.hysteresis = hysteresis
+        self.recover_samples = recover_samples
+        self.clock = clock or SYSTEM_CLOCK
+        self._rss = rss
+        self._cpu_time = cpu_time
+
+        self.stage = STAGE_NORMAL
+        self.changes = 0
+        self.rss_bytes = 0.0
+        self.cpu = 0.0
+        self.memory_ratio = 0.0
+        self.cpu_ratio = 0.0
+        self._calm = 0
+        self._last_cpu: Optional[Tuple[float, float]] = None
+
+        self._actions: List[DegradeAction] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.add_action(STAGE_SHRINK, "回收空闲内存", gc.collect)
+        self._quiet_level = quiet_level.upper()
+        self._saved_level: Optional[str] = None
+        self._quieted = False
+        self.add_action(
+            STAGE_MINIMAL,
+            f"日志级别降为 {self._quiet_level}",
+            self._quiet_logs,
+            self._restore_logs,
+        )
+
+    def add_action(
+        self,
+        stage: int,
+        name: str,
+        apply: Callable[[], None],
+        restore: Optional[Callable[[], None]] = None,
+    ) -> None:
+        """
+        注册降级操作
+
+        Args:
+            stage: 在第几级执行（1-3）
+            name: 操作说明，用于日志
+            apply: 降级时调用
+            restore: 恢复时调用，None表示无需恢复
+        """
+        if not STAGE_SHRINK <= stage <= STAGE_MINIMAL:
+            raise ValueError(f"降级级别必须在1到3之间: {stage}")
+        with self._lock:
+            action = DegradeAction(stage, name, apply, restore)
+            self._actions.append(action)
+            if stage <= self.stage:
+                # 已处于该级别，立即生效
+                self._run(action, action.apply, "降级", logger.warning)
+
+    def _quiet_logs(self) -> None:
+        self._quieted = True
+        if logger.level_no < _LEVEL_NOS[self._quiet_level]:
+            self._saved_level = logger.level
+            logger.set_level(self._quiet_level)
+
+    def _restore_logs(self) -> None:
+        # 降级期间日志级别被控制命令等改过时不再覆盖
+        if self._saved_level is not None and logger.level == self._quiet_level:
+            logger.set_level(self._saved_level)
+        self._saved_level = None
+        self._quieted = False
+
+    def hold_level(self, level: str) -> bool:
+        """
+        配置热加载要修改日志级别时调用（作为 ConfigReloader 的 level_guard）
+
+        第3级期间比降级级别更详细的新级别不立即生效，记下来在恢复时再设置。
+
+        Args:
+            level: 配置中的日志级别
+
+        Returns:
+            新级别被延后、调用方不应修改日志级别时返回True
+        """
+        with self._lock:
+            if not self._quieted:
+                return False
+            if _LEVEL_NOS[level.upper()] < _LEVEL_NOS[self._quiet_level]:
+                self._saved_level = level.upper()
+                return True
+            # 配置的级别不比降级级别更详细，直接生效，恢复时保持
+            self._saved_level = None
+            return False
+
+    def _read_usage(self) -> None:
+        self.rss_bytes = float(self._rss())
+        now = self.clock.monotonic()
+        cpu_time = float(self._cpu_time())
+        if self._last_cpu is not None:
+            elapsed = now - self._last_cpu[0]
+            if elapsed > 0:
+                current = max(0.0, cpu_time - self._last_cpu[1]) / elapsed
+                self.cpu += _CPU_SMOOTHING * (current - self.cpu)
+        self._last_cpu = (now, cpu_time)
+
+        budget = self.budget
+        self.memory_ratio = (
+            self.rss_bytes / budget.max_memory if budget.max_memory else 0.0
+        )
+        self.cpu_ratio = self.cpu / budget.max_cpu if budget.max_cpu else 0.0
+
+    def _usage(self) -> str:
+        parts = []
+        if self.budget.max_memory:
+            parts.append(
+                f"内存 {_format_bytes(self.rss_bytes)}/"
+                f"{_format_bytes(self.budget.max_memory)}"
+            )
+        if self.budget.max_cpu:
+            parts.append(f"CPU {self.cpu:.0%}/{self.budget.max_cpu:.0%}")
+        return "，".join(parts)
+
+    def sample(self) -> int:
+        """
+        采样一次并按需升降级
+
+        Returns:
+            采样后的降级级别
+        """
+        with self._lock:
+            self._read_usage()
+            ratio = max(self.memory_ratio, self.cpu_ratio)
+            wanted = sum(1 for threshold in self.thresholds if ratio >= threshold)
+
+            if wanted > self.stage:
+                self._calm = 0
+                logger.warning(
+                    "⚠️  资源接近预算（{}），进入第{}级降级: {}",
+                    self._usage(),
+                    wanted,
+                    STAGE_NAMES[wanted],
+                )
+                while self.stage < wanted:
+                    self.stage += 1
+                    self.changes += 1
+                    for action in self._actions:
+                        if action.stage == self.stage:
+                            self._run(action, action.apply, "降级", logger.warning)
+            elif self.stage > STAGE_NORMAL and (
+                ratio < self.thresholds[self.stage - 1] - self.hysteresis
+            ):
+                self._calm += 1
+                if self._calm >= self.recover_samples:
+                    self._calm = 0
+                    for action in reversed(self._actions):
+                        if action.stage == self.stage and action.restore is not None:
+                            self._run(action, action.restore, "恢复", logger.info)
+                    self.stage -= 1
+                    self.changes += 1
+                    logger.info(
+                        "✅ 资源回落（{}），恢复到第{}级: {}",
+                        self._usage(),
+                        self.stage,
+                        STAGE_NAMES[self.stage],
+                    )
+            else:
+                self._calm = 0
+            return self.stage
+
+    @staticmethod
+    def _run(
+        action: DegradeAction,
+        func: Callable[[], None],
+        verb: str,
+        log: Callable[..., None],
+    ) -> None:
+        try:
+            func()
+        except Exception as e:
+            logger.error("{}操作失败（{}）: {}", verb, action.name, e)
+            return
+        log("{}: {}", verb, action.name)
+
+    def _worker(self) -> None:
+        while not self.clock.wait(self._stop_event, self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error("资源采样失败: {}", e)
+
+    def start(self) -> None:
+        """在后台线程中定期采样"""
+        if self._thread is not None:
+            return
+        # 建立CPU时间基准
+        self.sample()
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._worker, name="edubuddy-governor", daemon=True
+        )
+        self._thread.start()
+        logger.info("资源调控已启动，预算: {}", self.budget.describe())
+
+    def stop(self) -> None:
+        """停止采样（保持当前级别）"""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """注册降级级别和预算占用指标"""
+        registry.register(
+            "governor.stage", lambda: self.stage, "当前降级级别（0为正常）"
+        )
+        registry.register(
+            "governor.changes_total",
+            lambda: self.changes,
+            "降级级别变化次数",
+            "counter",
+        )
+        registry.register(
+            "governor.memory_ratio", lambda: self.memory_ratio, "常驻内存占预算的比例"
+        )
+        registry.register(
+            "governor.cpu_ratio", lambda: self.cpu_ratio, "CPU占预算的比例"
+        )
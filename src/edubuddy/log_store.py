@@ -0,0 +1,538 @@
+"""
+日志存储模块
+
+提供进程内的滚动日志文件输出和按时间范围的快速查询:
+
+- 按大小和时长滚动日志分段
+- 已关闭的分段在后台线程中压缩为多成员gzip，每个索引块为一个独立成员
+- 每个分段维护稀疏的 时间戳 -> 偏移量 索引，查询时直接定位到目标块
+
+目录结构::
+
+    edubuddy-20240501-080000.log       当前写入的分段
+    edubuddy-20240501-080000.idx       当前分段的索引
+    edubuddy-20240430-080000.log.gz    已压缩的分段
+    edubuddy-20240430-080000.idx       已压缩分段的索引（含压缩后偏移）
+"""
+
+import gzip
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterator, List, Optional, Tuple
+
+# 文件日志行的时间格式，查询时按固定宽度解析
+FILE_TIME_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+_TIME_PREFIX_LEN = 26
+
+SEGMENT_PREFIX = "edubuddy-"
+_SEGMENT_PATTERN = re.compile(r"^edubuddy-(\d{8}-\d{6})(?:-(\d+))?\.log(\.gz)?$")
+
+# 索引结束标记行
+_END_MARKER = "#end"
+
+
+@dataclass
+class IndexEntry:
+    """稀疏索引项：块内第一行的时间戳及其在原始/压缩文件中的偏移"""
+
+    timestamp: float
+    offset: int
+    compressed_offset: Optional[int] = None
+
+
+@dataclass
+class Segment:
+    """日志分段"""
+
+    path: Path
+    index_path: Path
+    entries: List[IndexEntry] = field(default_factory=list)
+    end_timestamp: Optional[float] = None
+
+    @property
+    def compressed(self) -> bool:
+        """分段是否已压缩"""
+        return self.path.suffix == ".gz"
+
+    @property
+    def start_timestamp(self) -> Optional[float]:
+        """分段中第一行的时间戳"""
+        return self.entries[0].timestamp if self.entries else None
+
+
+def _read_index(index_path: Path) -> Tuple[List[IndexEntry], Optional[float]]:
+    """读取索引文件"""
+    entries: List[IndexEntry] = []
+    end_timestamp: Optional[float] = None
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if parts[0] == _END_MARKER:
+                    end_timestamp = float(parts[1])
+                    continue
+                if len(parts) < 2:
+                    continue
+                compressed = int(parts[2]) if len(parts) > 2 else None
+                entries.append(IndexEntry(float(parts[0]), int(parts[1]), compressed))
+    except (OSError, ValueError):
+        pass
+    return entries, end_timestamp
+
+
+def _write_index(
+    index_path: Path, entries: List[IndexEntry], end_timestamp: Optional[float]
+) -> None:
+    """原子地重写索引文件"""
+    tmp_path = index_path.with_name(index_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for entry in entries:
+            line = f"{entry.timestamp:.6f}\t{entry.offset}"
+            if entry.compressed_offset is not None:
+                line += f"\t{entry.compressed_offset}"
+            f.write(line + "\n")
+        if end_timestamp is not None:
+            f.write(f"{_END_MARKER}\t{end_timestamp:.6f}\n")
+    os.replace(tmp_path, index_path)
+
+
+def list_segments(directory: Path) -> List[Segment]:
+    """
+    列出目录中的日志分段，按开始时间排序
+
+    Args:
+        directory: 日志目录
+
+    Returns:
+        分段列表
+    """
+    segments: List[Tuple[str, int, Segment]] = []
+    if not directory.is_dir():
+        return []
+
+    for path in directory.iterdir():
+        match = _SEGMENT_PATTERN.match(path.name)
+        if not match:
+            continue
+        stem, sequence, _ = match.groups()
+        index_name = f"{SEGMENT_PREFIX}{stem}" + (f"-{sequence}" if sequence else "")
+        index_path = path.with_name(index_name + ".idx")
+        # 压缩完成前原始文件和压缩文件可能同时存在，以原始文件为准
+        if path.suffix == ".gz" and path.with_suffix("").exists():
+            continue
+        entries, end_timestamp = _read_index(index_path)
+        segment = Segment(path, index_path, entries, end_timestamp)
+        segments.append((stem, int(sequence or 0), segment))
+
+    segments.sort(key=lambda item: (item[0], item[1]))
+    return [segment for _, _, segment in segments]
+
+
+def compress_segment(log_path: Path, index_path: Path) -> Path:
+    """
+    将已关闭的分段压缩为多成员gzip，并把压缩偏移写入索引
+
+    每个索引块单独压缩为一个gzip成员，查询时可以直接定位到块起点解压。
+
+    Args:
+        log_path: 未压缩的分段文件
+        index_path: 分段的索引文件
+
+    Returns:
+        压缩后的文件路径
+    """
+    entries, end_timestamp = _read_index(index_path)
+    if not entries:
+        entries = [IndexEntry(os.path.getmtime(log_path), 0)]
+
+    gz_path = log_path.with_name(log_path.name + ".gz")
+    tmp_path = gz_path.with_name(gz_path.name + ".tmp")
+    size = os.path.getsize(log_path)
+    boundaries = [entry.offset for entry in entries] + [size]
+
+    with open(log_path, "rb") as src, open(tmp_path, "wb") as dst:
+        for entry, start, end in zip(entries, boundaries, boundaries[1:]):
+            entry.compressed_offset = dst.tell()
+            src.seek(start)
+            dst.write(gzip.compress(src.read(end - start), compresslevel=6))
+
+    os.replace(tmp_path, gz_path)
+    _write_index(index_path, entries, end_timestamp)
+    log_path.unlink()
+    return gz_path
+
+
+class RotatingFileSink:
+    """滚动日志文件输出 - 按大小和时长滚动，后台压缩，维护稀疏时间索引"""
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        max_age: float = 24 * 3600,
+        backup_count: int = 30,
+        index_interval_bytes: int = 64 * 1024,
+        index_interval_seconds: float = 60.0,
+        flush_interval: float = 1.0,
+    ):
+        """
+        初始化滚动日志文件输出
+
+        Args:
+            directory: 日志目录
+            max_bytes: 单个分段的最大字节数
+            max_age: 单个分段的最长时长（秒）
+            backup_count: 保留的历史分段数量
+            index_interval_bytes: 两个索引项之间的最大字节数
+            index_interval_seconds: 两个索引项之间的最长时长（秒）
+            flush_interval: 刷新到磁盘的最长间隔（秒），由后台线程定期刷新
+        """
+        if max_bytes <= 0:
+            raise ValueError("分段大小必须大于0")
+        if max_age <= 0:
+            raise ValueError("分段时长必须大于0")
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backup_count = backup_count
+        self.index_interval_bytes = index_interval_bytes
+        self.index_interval_seconds = index_interval_seconds
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._file: Optional[IO[bytes]] = None
+        self._index_file: Optional[IO[str]] = None
+        self._log_path: Optional[Path] = None
+        self._index_path: Optional[Path] = None
+        self._size = 0
+        self._opened_at = 0.0
+        self._last_index_offset = 0
+        self._last_index_time = 0.0
+        self._last_timestamp = 0.0
+        self._unflushed = False
+
+        self._pending: List[Tuple[Path, Path]] = []
+        self._compress_condition = threading.Condition()
+        self._closed = False
+        self._compressor = threading.Thread(
+            target=self._compress_worker, name="edubuddy-log-compress", daemon=True
+        )
+        self._compressor.start()
+
+        # 压缩上次运行遗留的未压缩分段
+        for segment in list_segments(self.directory):
+            if not segment.compressed:
+                self._schedule_compress(segment.path, segment.index_path)
+
+    def _open_segment(self, timestamp: float) -> None:
+        """打开新的分段"""
+        stem = datetime.fromtimestamp(timestamp).strftime("%Y%m%d-%H%M%S")
+        name = f"{SEGMENT_PREFIX}{stem}"
+        sequence = 0
+        while (self.directory / f"{name}.log").exists() or (
+            self.directory / f"{name}.log.gz"
+        ).exists():
+            sequence += 1
+            name = f"{SEGMENT_PREFIX}{stem}-{sequence}"
+
+        self._log_path = self.directory / f"{name}.log"
+        self._index_path = self.directory / f"{name}.idx"
+        self._file = open(self._log_path, "ab")
+        self._index_file = open(self._index_path, "a", encoding="utf-8")
+        self._size = 0
+        self._opened_at = timestamp
+        self._last_index_offset = -1
+
+    def _close_segment(self) -> None:
+        """关闭当前分段并安排压缩"""
+        if self._file is None or self._index_file is None:
+            return
+        self._index_file.write(f"{_END_MARKER}\t{self._last_timestamp:.6f}\n")
+        self._file.close()
+        self._index_file.close()
+        self._file = None
+        self._index_file = None
+        if self._log_path is not None and self._index_path is not None:
+            self._schedule_compress(self._log_path, self._index_path)
+
+    def _should_rotate(self, timestamp: float, length: int) -> bool:
+        """判断写入前是否需要滚动"""
+        if self._size == 0:
+            return False
+        return (
+            self._size + length > self.max_bytes
+            or timestamp - self._opened_at >= self.max_age
+        )
+
+    def write_line(self, line: str, timestamp: Optional[float] = None) -> None:
+        """
+        写入一行日志
+
+        Args:
+            line: 已格式化的日志文本（以换行结尾）
+            timestamp: 该行的时间戳，默认当前时间
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        data = line.encode("utf-8")
+
+        with self._lock:
+            if self._closed:
+                return
+            if self._file is None:
+                self._open_segment(timestamp)
+            elif self._should_rotate(timestamp, len(data)):
+                self._close_segment()
+                self._open_segment(timestamp)
+
+            assert self._file is not None and self._index_file is not None
+            if (
+                self._last_index_offset < 0
+                or self._size - self._last_index_offset >= self.index_interval_bytes
+                or timestamp - self._last_index_time >= self.index_interval_seconds
+            ):
+                self._index_file.write(f"{timestamp:.6f}\t{self._size}\n")
+                self._index_file.flush()
+                self._last_index_offset = self._size
+                self._last_index_time = timestamp
+
+            self._file.write(data)
+            self._size += len(data)
+            self._last_timestamp = timestamp
+            self._unflushed = True
+
+    def write_text(self, text: str) -> None:
+        """
+        写入一批已格式化的日志（QueuedSink 写出接口）
+
+        按行首的时间戳拆分为单条日志，续行归入上一条，
+        没有时间戳的开头部分使用当前时间。
+
+        Args:
+            text: 拼接在一起的日志文本
+        """
+        record: List[str] = []
+        record_time: Optional[float] = None
+        for line in text.splitlines(keepends=True):
+            line_time = _parse_line_timestamp(line)
+            if line_time is not None and record:
+                self.write_line("".join(record), record_time)
+                record = []
+            if line_time is not None or not record:
+                record_time = line_time
+            record.append(line)
+        if record:
+            self.write_line("".join(record), record_time)
+
+    def flush(self) -> None:
+        """刷新当前分段到磁盘"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+            self._unflushed = False
+
+    def _flush_if_pending(self) -> None:
+        """有未刷新的写入时刷新（由后台线程按 flush_interval 调用）"""
+        if self._unflushed:
+            self.flush()
+
+    def rotate(self) -> None:
+        """立即滚动到新的分段"""
+        with self._lock:
+            self._close_segment()
+
+    def _schedule_compress(self, log_path: Path, index_path: Path) -> None:
+        """安排后台压缩分段"""
+        with self._compress_condition:
+            self._pending.append((log_path, index_path))
+            self._compress_condition.notify()
+
+    def _compress_worker(self) -> None:
+        """后台压缩线程，同时按 flush_interval 定期刷新当前分段"""
+        while True:
+            with self._compress_condition:
+                if not self._pending and not self._closed:
+                    self._compress_condition.wait(timeout=self.flush_interval)
+                if not self._pending and self._closed:
+                    return
+                task = self._pending.pop(0) if self._pending else None
+
+            # 刷新需要写入锁，不能在持有压缩条件变量时进行
+            self._flush_if_pending()
+            if task is None:
+                continue
+            log_path, index_path = task
+
+            try:
+                compress_segment(log_path, index_path)
+            except OSError:
+                continue
+            self._enforce_retention()
+
+    def _enforce_retention(self) -> None:
+        """删除超出保留数量的最旧分段"""
+        # 在压缩线程中运行，当前分段可能同时被写入线程滚动
+        with self._lock:
+            current = self._log_path
+        closed = [
+            segment
+            for segment in list_segments(self.directory)
+            if segment.path != current
+        ]
+        for segment in closed[: max(0, len(closed) - self.backup_count)]:
+            for path in (segment.path, segment.index_path):
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def wait_compressed(self, timeout: float = 10.0) -> bool:
+        """
+        等待所有待压缩分段处理完成
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            如果全部完成则返回True
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            # 写入线程持有写入锁时会获取压缩条件变量，先读当前分段再等待条件变量
+            with self._lock:
+                current = self._log_path
+            with self._compress_condition:
+                if not self._pending and not any(
+                    not segment.compressed and segment.path != current
+                    for segment in list_segments(self.directory)
+                ):
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def close(self) -> None:
+        """关闭当前分段并等待后台压缩结束"""
+        with self._lock:
+            if self._closed:
+                return
+            self._close_segment()
+            self._log_path = None
+            self._closed = True
+        with self._compress_condition:
+            self._compress_condition.notify_all()
+        self._compressor.join(timeout=30.0)
+
+
+def _parse_line_timestamp(line: str) -> Optional[float]:
+    """解析日志行开头的时间戳，续行返回None"""
+    if len(line) < _TIME_PREFIX_LEN or line[4] != "-" or line[10] != " ":
+        return None
+    try:
+        return datetime.strptime(line[:_TIME_PREFIX_LEN], FILE_TIME_FORMAT).timestamp()
+    except ValueError:
+        return None
+
+
+def _open_from(segment: Segment, entry: IndexEntry) -> IO[bytes]:
+    """从索引项位置打开分段的字节流"""
+    raw = open(segment.path, "rb")
+    if segment.compressed:
+        raw.seek(entry.compressed_offset or 0)
+        # 从块起点开始依次解压后续的gzip成员
+        return gzip.GzipFile(fileobj=raw, mode="rb")  # type: ignore[return-value]
+    raw.seek(entry.offset)
+    return raw
+
+
+def query_logs(
+    directory: str,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    pattern: Optional[str] = None,
+) -> Iterator[str]:
+    """
+    按时间范围和正则查询日志
+
+    通过分段索引跳过不相关的分段，并直接定位到since所在的块，
+    不需要从头扫描全部日志。
+
+    Args:
+        directory: 日志目录
+        since: 起始时间戳（包含）
+        until: 结束时间戳（包含）
+        pattern: 正则表达式，只返回匹配的日志
+
+    Yields:
+        匹配的日志（多行日志作为一条返回）
+    """
+    regex = re.compile(pattern) if pattern else None
+
+    for segment in list_segments(Path(directory)):
+        if not segment.entries:
+            continue
+        if until is not None and segment.entries[0].timestamp > until:
+            break
+        if (
+            since is not None
+            and segment.end_timestamp is not None
+            and segment.end_timestamp < since
+        ):
+            continue
+
+        start_entry = segment.entries[0]
+        if since is not None:
+            timestamps = [entry.timestamp for entry in segment.entries]
+            position = bisect_right(timestamps, since) - 1
+            start_entry = segment.entries[max(position, 0)]
+
+        try:
+            stream = _open_from(segment, start_entry)
+        except OSError:
+            continue
+
+        with stream:
+            record: List[str] = []
+            record_time = start_entry.timestamp
+            finished = False
+
+            def emit() -> Optional[str]:
+                if not record:
+                    return None
+                if since is not None and record_time < since:
+                    return None
+                text = "".join(record)
+                if regex is not None and not regex.search(text):
+                    return None
+                return text
+
+            for raw_line in stream:
+                line = raw_line.decode("utf-8", errors="replace")
+                line_time = _parse_line_timestamp(line)
+                if line_time is None:
+                    record.append(line)
+                    continue
+
+                text = emit()
+                if text is not None:
+                    yield text
+                if until is not None and line_time > until:
+                    finished = True
+                    record = []
+                    break
+                record = [line]
+                record_time = line_time
+
+            if not finished:
+                text = emit()
+                if text is not None:
+                    yield text
+            else:
+                return
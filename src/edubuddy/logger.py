@@ -3,15 +3,98 @@
 
 提供通用的日志记录功能，支持定时任务和自定义日志处理。
 封装loguru，为其他模块提供统一的日志接口。
+
+日志方法在任何格式化之前先检查缓存的级别，未启用的级别直接返回。
+消息可以是带 `{}` 占位符的字符串加参数，或无参函数，二者都只在级别启用时才求值:
+
+    logger.debug("收到 {} 个样本", n)
+    logger.debug(lambda: f"事件: {expensive_repr(event)}")
+
+高频诊断日志可按调用点限流或采样，避免刷屏:
+
+    logger.rate_limited("INFO", "能量: {:.4f}", energy, rate=0.2)
+    logger.sampled("DEBUG", "收到音频块: {}", n, every=50)
 """
 
+import atexit
+import sys
 import threading
 import time
 from datetime import datetime
-from typing import Any, Callable, Optional
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
 
 from loguru import logger as _loguru_logger
 
+from .log_store import FILE_TIME_FORMAT, RotatingFileSink
+from .ratelimit import Sampler, TokenBucket
+from .sinks import OVERFLOW_DROP_OLDEST, QueuedSink
+from .timestamp import get_timestamp_formatter
+
+# 控制台日志的时间格式（strftime格式）
+LOG_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 日志级别数值（与loguru一致）
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+CRITICAL = 50
+
+_LEVEL_NOS = {
+    "DEBUG": DEBUG,
+    "INFO": INFO,
+    "WARNING": WARNING,
+    "ERROR": ERROR,
+    "CRITICAL": CRITICAL,
+}
+
+# 日志消息：字符串，或仅在级别启用时才调用的无参函数
+LogMessage = Union[str, Callable[[], str]]
+
+
+class _Throttle:
+    """单个调用点的节流状态"""
+
+    def __init__(self, limiter: Union[TokenBucket, Sampler], level: str = "INFO"):
+        self.limiter = limiter
+        self.level = level
+        self.suppressed = 0
+
+
+def _write_stdout(text: str) -> None:
+    """写出到当前的标准输出（每次调用时解析，兼容重定向）"""
+    sys.stdout.write(text)
+
+
+def _flush_stdout() -> None:
+    """刷新当前的标准输出"""
+    sys.stdout.flush()
+
+
+def _level_no(level: str) -> Tuple[str, int]:
+    """
+    解析日志级别名称（不区分大小写）
+
+    Returns:
+        (大写的级别名称, 级别数值)
+
+    Raises:
+        ValueError: 未知的日志级别
+    """
+    name = level.upper()
+    level_no = _LEVEL_NOS.get(name)
+    if level_no is None:
+        raise ValueError(f"未知的日志级别: {level}，可选: {', '.join(_LEVEL_NOS)}")
+    return name, level_no
+
+
+def _describe(key: Hashable) -> str:
+    """将调用点标识转换为可读文本"""
+    if isinstance(key, tuple) and len(key) == 2:
+        filename, lineno = key
+        return f"{str(filename).rsplit('/', 1)[-1]}:{lineno}"
+    return str(key)
+
 
 # 封装loguru，提供统一的日志接口
 class Logger:
@@ -32,32 +115,339 @@ class Logger:
 
     def _setup_logger(self) -> None:
         """设置日志配置"""
+        self._time_formatter = get_timestamp_formatter(LOG_TIME_FORMAT)
+        self._level = "INFO"
+        self._level_no = INFO
+        # 按调用点保存的限流/采样状态
+        self._throttles: Dict[Hashable, _Throttle] = {}
+        # 控制台输出经由后台线程批量写出，调用线程只负责入队
+        self._console_sink = QueuedSink(_write_stdout, _flush_stdout)
         _loguru_logger.remove()  # 移除默认处理器
-        _loguru_logger.add(
-            sink=lambda msg: print(msg, end=""),  # 直接打印到控制台
-            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | {message}",
-            level="INFO",
+        self._console_handler_id = self._add_console_handler(self._console_sink)
+        self._file_time_formatter = get_timestamp_formatter(FILE_TIME_FORMAT)
+        self._file_sink: Optional[RotatingFileSink] = None
+        # 文件输出同样经由队列写出，调用线程（可能是音频回调）不做磁盘IO
+        self._file_queue: Optional[QueuedSink] = None
+        self._file_handler_id: Optional[int] = None
+        atexit.register(self.shutdown)
+
+    def _add_console_handler(self, sink: QueuedSink) -> int:
+        """注册控制台处理器"""
+        return _loguru_logger.add(
+            sink=sink,
+            format=self._format_record,
+            level=self._level,
         )
 
-    def info(self, message: str) -> None:
+    def _add_file_handler(self, sink: QueuedSink) -> int:
+        """注册文件处理器"""
+        return _loguru_logger.add(
+            sink=sink,
+            format=self._format_file_record,
+            level=self._level,
+            colorize=False,
+        )
+
+    def add_file_sink(
+        self,
+        directory: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        max_age: float = 24 * 3600,
+        backup_count: int = 30,
+    ) -> RotatingFileSink:
+        """
+        添加滚动日志文件输出，替换已有的文件输出
+
+        Args:
+            directory: 日志目录
+            max_bytes: 单个分段的最大字节数
+            max_age: 单个分段的最长时长（秒）
+            backup_count: 保留的历史分段数量
+
+        Returns:
+            RotatingFileSink实例
+        """
+        self.remove_file_sink()
+        sink = RotatingFileSink(
+            directory,
+            max_bytes=max_bytes,
+            max_age=max_age,
+            backup_count=backup_count,
+        )
+        self._file_sink = sink
+        self._file_queue = QueuedSink(sink.write_text, name="edubuddy-log-file")
+        self._file_handler_id = self._add_file_handler(self._file_queue)
+        return sink
+
+    def remove_file_sink(self) -> None:
+        """移除并关闭文件输出"""
+        if self._file_handler_id is not None:
+            _loguru_logger.remove(self._file_handler_id)
+            self._file_handler_id = None
+        if self._file_queue is not None:
+            self._file_queue.close()
+            self._file_queue = None
+        if self._file_sink is not None:
+            self._file_sink.close()
+            self._file_sink = None
+
+    def configure_console(
+        self,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+        maxsize: int = 10000,
+        batch_size: int = 256,
+    ) -> None:
+        """
+        重新配置控制台输出队列
+
+        Args:
+            overflow: 队列满时的策略（block、drop-oldest、drop-newest）
+            maxsize: 队列最大消息数
+            batch_size: 每批最多写出的消息数
+        """
+        new_sink = QueuedSink(
+            _write_stdout,
+            _flush_stdout,
+            maxsize=maxsize,
+            batch_size=batch_size,
+            overflow=overflow,
+        )
+        old_sink, old_handler_id = self._console_sink, self._console_handler_id
+        self._console_handler_id = self._add_console_handler(new_sink)
+        self._console_sink = new_sink
+        _loguru_logger.remove(old_handler_id)
+        old_sink.close()
+
+    @property
+    def dropped_messages(self) -> int:
+        """控制台输出队列累计丢弃的消息数"""
+        return self._console_sink.dropped
+
+    @property
+    def queue_depth(self) -> int:
+        """控制台输出队列中等待写出的消息数"""
+        return self._console_sink.qsize
+
+    @property
+    def suppressed_messages(self) -> int:
+        """各调用点当前被限流或采样抑制、尚未汇报的消息总数"""
+        return sum(throttle.suppressed for throttle in list(self._throttles.values()))
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """
+        等待已记录的日志全部写出
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            如果全部写出则返回True
+        """
+        self._report_suppressed()
+        flushed = True
+        if self._file_queue is not None:
+            flushed = self._file_queue.flush(timeout=timeout)
+        if self._file_sink is not None:
+            self._file_sink.flush()
+        return self._console_sink.flush(timeout=timeout) and flushed
+
+    def shutdown(self) -> None:
+        """写出剩余日志并停止后台输出线程"""
+        self._report_suppressed()
+        self._console_sink.close()
+        self.remove_file_sink()
+
+    def _format_record(self, record: Dict[str, Any]) -> str:
+        """生成日志格式模板，时间戳使用共享的缓存格式化器预先渲染"""
+        record["extra"]["timestamp"] = self._time_formatter.format_datetime(
+            record["time"]
+        )
+        return (
+            "<green>{extra[timestamp]}</green> | <level>{level: <8}</level> | "
+            "{message}\n{exception}"
+        )
+
+    def _format_file_record(self, record: Dict[str, Any]) -> str:
+        """生成文件日志格式模板，时间戳带微秒以便按时间查询"""
+        record["extra"]["file_timestamp"] = self._file_time_formatter.format_datetime(
+            record["time"]
+        )
+        return "{extra[file_timestamp]} | {level: <8} | {message}\n{exception}"
+
+    def set_level(self, level: str) -> None:
+        """
+        设置日志级别（控制台和文件输出）
+
+        Args:
+            level: 日志级别名称，例如 "DEBUG"、"INFO"
+
+        Raises:
+            ValueError: 未知的日志级别
+        """
+        level = level.upper()
+        level_no = _loguru_logger.level(level).no
+        self._level = level
+        self._level_no = level_no
+        old_handler_id = self._console_handler_id
+        self._console_handler_id = self._add_console_handler(self._console_sink)
+        _loguru_logger.remove(old_handler_id)
+        if self._file_queue is not None and self._file_handler_id is not None:
+            old_handler_id = self._file_handler_id
+            self._file_handler_id = self._add_file_handler(self._file_queue)
+            _loguru_logger.remove(old_handler_id)
+
+    @property
+    def level(self) -> str:
+        """当前日志级别名称"""
+        return self._level
+
+    @property
+    def level_no(self) -> int:
+        """当前日志级别数值"""
+        return self._level_no
+
+    def is_enabled_for(self, level_no: int) -> bool:
+        """检查指定级别的日志是否会被输出"""
+        return level_no >= self._level_no
+
+    def _log(self, level: str, message: LogMessage, args: Any, kwargs: Any) -> None:
+        """格式化并记录日志（调用前已通过级别检查）"""
+        if callable(message):
+            message = message()
+        if args or kwargs:
+            message = message.format(*args, **kwargs)
+        _loguru_logger.log(level, message)
+
+    def debug(self, message: LogMessage, *args: Any, **kwargs: Any) -> None:
+        """记录调试日志"""
+        if self._level_no > DEBUG:
+            return
+        self._log("DEBUG", message, args, kwargs)
+
+    def info(self, message: LogMessage, *args: Any, **kwargs: Any) -> None:
         """记录信息日志"""
-        _loguru_logger.info(message)
+        if self._level_no > INFO:
+            return
+        self._log("INFO", message, args, kwargs)
 
-    def warning(self, message: str) -> None:
+    def warning(self, message: LogMessage, *args: Any, **kwargs: Any) -> None:
         """记录警告日志"""
-        _loguru_logger.warning(message)
+        if self._level_no > WARNING:
+            return
+        self._log("WARNING", message, args, kwargs)
 
-    def error(self, message: str) -> None:
+    def error(self, message: LogMessage, *args: Any, **kwargs: Any) -> None:
         """记录错误日志"""
-        _loguru_logger.error(message)
+        if self._level_no > ERROR:
+            return
+        self._log("ERROR", message, args, kwargs)
 
-    def debug(self, message: str) -> None:
-        """记录调试日志"""
-        _loguru_logger.debug(message)
-
-    def critical(self, message: str) -> None:
+    def critical(self, message: LogMessage, *args: Any, **kwargs: Any) -> None:
         """记录严重错误日志"""
-        _loguru_logger.critical(message)
+        if self._level_no > CRITICAL:
+            return
+        self._log("CRITICAL", message, args, kwargs)
+
+    def _get_throttle(
+        self, key: Hashable, factory: Callable[[], Union[TokenBucket, Sampler]]
+    ) -> _Throttle:
+        """获取调用点的节流状态，不存在时创建"""
+        throttle = self._throttles.get(key)
+        if throttle is None:
+            throttle = self._throttles.setdefault(key, _Throttle(factory()))
+        return throttle
+
+    def _report_suppressed(self) -> None:
+        """输出各调用点尚未汇报的抑制计数（此后不再有放行的消息时也不丢失）"""
+        for key, throttle in list(self._throttles.items()):
+            suppressed, throttle.suppressed = throttle.suppressed, 0
+            if suppressed and self._level_no <= _LEVEL_NOS[throttle.level]:
+                self._log(
+                    throttle.level,
+                    "已抑制 {} 条消息 ({})",
+                    (suppressed, _describe(key)),
+                    {},
+                )
+
+    @staticmethod
+    def _callsite_key() -> Hashable:
+        """以调用者的文件和行号作为调用点标识"""
+        frame = sys._getframe(2)
+        return (frame.f_code.co_filename, frame.f_lineno)
+
+    def rate_limited(
+        self,
+        level: str,
+        message: LogMessage,
+        *args: Any,
+        rate: float = 1.0,
+        burst: int = 1,
+        key: Optional[Hashable] = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        按调用点令牌桶限流记录日志
+
+        被抑制的消息会被计数，下一条放行的消息之前（或 flush()/shutdown() 时）
+        输出一行"已抑制 N 条消息"。
+
+        Args:
+            level: 日志级别名称（不区分大小写）
+            message: 日志消息或延迟函数
+            rate: 每秒允许的消息数
+            burst: 允许的突发消息数
+            key: 调用点标识，默认使用调用者的文件和行号
+
+        Raises:
+            ValueError: 未知的日志级别
+        """
+        level, level_no = _level_no(level)
+        if self._level_no > level_no:
+            return
+        if key is None:
+            key = self._callsite_key()
+
+        throttle = self._get_throttle(key, lambda: TokenBucket(rate, burst))
+        throttle.level = level
+        if not throttle.limiter.try_acquire():
+            throttle.suppressed += 1
+            return
+
+        suppressed, throttle.suppressed = throttle.suppressed, 0
+        if suppressed:
+            self._log(level, "已抑制 {} 条消息 ({})", (suppressed, _describe(key)), {})
+        self._log(level, message, args, kwargs)
+
+    def sampled(
+        self,
+        level: str,
+        message: LogMessage,
+        *args: Any,
+        every: int = 100,
+        key: Optional[Hashable] = None,
+        **kwargs: Any,
+    ) -> None:
+        """
+        按调用点1/N采样记录日志
+
+        Args:
+            level: 日志级别名称（不区分大小写）
+            message: 日志消息或延迟函数
+            every: 采样间隔N，第1次及此后每N次记录一次
+            key: 调用点标识，默认使用调用者的文件和行号
+
+        Raises:
+            ValueError: 未知的日志级别
+        """
+        level, level_no = _level_no(level)
+        if self._level_no > level_no:
+            return
+        if key is None:
+            key = self._callsite_key()
+
+        throttle = self._get_throttle(key, lambda: Sampler(every))
+        if throttle.limiter.try_acquire():
+            self._log(level, message, args, kwargs)
 
 
 # 创建全局日志实例（单例）
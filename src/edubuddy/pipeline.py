@@ -0,0 +1,683 @@
+"""
+音频处理流水线模块
+
+把上行（麦克风 -> 模型）和下行（模型 -> 扬声器）的处理拆成按顺序执行的阶段，
+用声明式的阶段列表组装，例如 "denoise,energy,barge_in,downsample"。
+
+设计要点:
+    - 每个阶段持有自己的预分配缓冲区，稳态下处理一块音频不分配新的样本数组
+    - 整条流水线在专用工作线程中运行，不占用asyncio事件循环
+    - 输入队列有界，满时按溢出策略丢弃并计数；结果通过有界的asyncio队列交回，
+      消费者跟不上时工作线程等待，形成背压
+    - 每个阶段自带耗时统计（调用次数、累计和最大耗时），可注册到控制服务的指标
+"""
+
+import asyncio
+import concurrent.futures
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Set,
+)
+
+import numpy as np
+
+from .audio import AudioArray, EchoGate, PlaybackBuffer
+from .denoise import NoiseSuppressor
+from .logger import logger
+from .sinks import (
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+    OVERFLOW_POLICIES,
+)
+from .wakeword import WakeGate
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
+
+# 默认的阶段组合
+UPLINK_STAGES = "denoise,energy,barge_in,downsample"
+DOWNLINK_STAGES = "upsample"
+
+# 默认队列容量（块），40ms一块时约320ms
+DEFAULT_QUEUE_SIZE = 8
+
+_STOP = object()
+
+
+@dataclass
+class Frame:
+    """流水线中传递的一块音频及其附带信息"""
+
+    samples: AudioArray
+    captured_at: float = 0.0
+    meta: Dict[str, Any] = field(default_factory=dict)
+    generation: int = 0
+
+
+class Stage:
+    """流水线阶段基类"""
+
+    name = "stage"
+
+    def process(self, frame: Frame) -> Optional[Frame]:
+        """
+        处理一块音频
+
+        Args:
+            frame: 输入块，可以原地修改
+
+        Returns:
+            处理后的块，返回None表示丢弃该块，后续阶段不再执行
+        """
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        """清空流式状态"""
+
+
+class FunctionStage(Stage):
+    """把样本变换函数包装成阶段"""
+
+    def __init__(self, name: str, func: Callable[[AudioArray], AudioArray]):
+        self.name = name
+        self._func = func
+
+    def process(self, frame: Frame) -> Optional[Frame]:
+        frame.samples = self._func(frame.samples)
+        return frame
+
+
+class DenoiseStage(Stage):
+    """STFT维纳滤波降噪"""
+
+    name = "denoise"
+
+    def __init__(self, suppressor: NoiseSuppressor):
+        self.suppressor = suppressor
+
+    def process(self, frame: Frame) -> Optional[Frame]:
+        frame.samples = self.suppressor.process(frame.samples)
+        return frame
+
+    def reset(self) -> None:
+        self.suppressor.reset()
+
+
+class EnergyStage(Stage):
+    """计算归一化RMS能量，写入 meta["energy"]"""
+
+    name = "energy"
+
+    def __init__(self) -> None:
+        self._buffer = np.empty(0, dtype=np.float32)
+
+    def process(self, frame: Frame) -> Optional[Frame]:
+        samples = frame.samples
+        if samples.size == 0:
+            frame.meta["energy"] = 0.0
+            return frame
+        if samples.size > self._buffer.size:
+            self._buffer = np.empty(samples.size, dtype=np.float32)
+        x = self._buffer[: samples.size]
+        np.multiply(samples, 1.0 / 32768.0, out=x, casting="unsafe")
+        frame.meta["energy"] = float(np.sqrt(np.dot(x, x) / x.size))
+        return frame
+
+
+class BargeInStage(Stage):
+    """
+    助手播放期间的打断判断
+
+    助手音频正在播放（或其回声仍在到达麦克风）时，只有能量超过回声门限的块才继续
+    上行，并立即中断本地播放；其余块丢弃。需要前面有 energy 阶段。
+    结果写入 meta["barge_in"]。
+    """
+
+    name = "barge_in"
+
+    def __init__(self, playback: PlaybackBuffer, echo_gate: EchoGate):
+        self.playback = playback
+        self.echo_gate = echo_gate
+
+    def process(self, frame: Frame) -> Optional[Frame]:
+        frame.meta["barge_in"] = False
+        captured_at = frame.captured_at
+        if not (self.playback.is_playing or self.echo_gate.echo_expected(captured_at)):
+            return frame
+        if not self.echo_gate.is_barge_in(frame.meta["energy"], captured_at):
+            return None
+        frame.meta["barge_in"] = True
+        # 本地立即清空待播放的助手音频，打断更及时
+        self.playback.interrupt()
+        return frame
+
+
+class WakeStage(Stage):
+    """
+    唤醒词门控
+
+    只有唤醒窗口打开时的块继续上行，其余块丢弃。触发唤醒的块写入
+    meta["wake"]；energy 阶段在前时用其能量判断是否还在说话。
+    """
+
+    name = "wake"
+
+    def __init__(self, gate: WakeGate):
+        self.gate = gate
+
+    def process(self, frame: Frame) -> Optional[Frame]:
+        state = self.gate.update(
+            frame.samples, frame.captured_at, frame.meta.get("energy", 0.0)
+        )
+        frame.meta["wake"] = state == "wake"
+        return None if state == "closed" else frame
+
+    def reset(self) -> None:
+        self.gate.reset()
+
+
+class ResampleStage(Stage):
+    """
+    流式整数倍重采样（加窗sinc低通的多相FIR）
+
+    与逐块调用 resample_poly 不同，滤波器状态跨块保留，块边界没有不连续；
+    缓冲区按最大块长预分配并复用。输出为int16。
+    """
+
+    def __init__(
+        self,
+        up: int = 1,
+        down: int = 1,
+        taps_per_phase: int = 16,
+        name: str = "resample",
+    ):
+        """
+        初始化重采样阶段
+
+        Args:
+            up: 上采样倍数
+            down: 下采样倍数，up 和 down 至少有一个为1
+            taps_per_phase: 每个相位的滤波器抽头数
+            name: 阶段名称
+        """
+        if up < 1 or down < 1 or (up > 1 and down > 1):
+            raise ValueError("只支持整数倍上采样或下采样")
+        if taps_per_phase < 2:
+            raise ValueError("每个相位至少需要2个抽头")
+
+        self.name = name
+        self.up = up
+        self.down = down
+        factor = max(up, down)
+        length = taps_per_phase * factor
+
+        # 截止频率为较低采样率的奈奎斯特频率，Kaiser窗（与resample_poly默认一致）
+        n = np.arange(length) - (length - 1) / 2.0
+        h = np.sinc(n / factor) * np.kaiser(length, 5.0)
+        h *= up / h.sum()
+
+        if up > 1:
+            # y[k*up + p] = sum_i h[p + i*up] * x[k - i]
+            self._history = np.zeros(taps_per_phase - 1)
+            self._kernel = h.reshape(taps_per_phase, up)[::-1].copy()
+        else:
+            self._history = np.zeros(length - 1)
+            self._kernel = h[::-1].copy()
+        self._padded = np.empty(0)
+        self._output = np.empty(0)
+        self._result = np.empty(0, dtype=np.int16)
+
+    @property
+    def delay_samples(self) -> float:
+        """群延迟（以输出采样率计的样本数）"""
+        length = self._kernel.size
+        return (length - 1) / 2.0 / self.down
+
+    def reset(self) -> None:
+        self._history.fill(0.0)
+
+    def _reserve(self, count: int, produced: int) -> None:
+        if self._padded.size < self._history.size + count:
+            self._padded = np.empty(self._history.size + count)
+        if self._output.size < produced:
+            self._output = np.empty(produced)
+            self._result = np.empty(produced, dtype=np.int16)
+
+    def process(self, frame: Frame) -> Optional[Frame]:
+        samples = np.asarray(frame.samples).reshape(-1)
+        count = samples.size
+        if count % self.down:
+            raise ValueError(f"块长必须是下采样倍数 {self.down} 的整数倍")
+        produced = count * self.up // self.down
+        self._reserve(count, produced)
+
+        keep = self._history.size
+        padded = self._padded[: keep + count]
+        padded[:keep] = self._history
+        padded[keep:] = samples
+        self._history[:] = padded[count:]
+
+        output = self._output[:produced]
+        if self.up > 1:
+            taps = self._kernel.shape[0]
+            view = np.lib.stride_tricks.sliding_window_view(padded, taps)
+            np.dot(view, self._kernel, out=output.reshape(count, self.up))
+        else:
+            view = np.lib.stride_tricks.sliding_window_view(padded, self._kernel.size)
+            np.dot(view[:: self.down], self._kernel, out=output)
+
+        np.rint(output, out=output)
+        np.clip(output, -32768, 32767, out=output)
+        result = self._result[:produced]
+        result[:] = output
+        frame.samples = result
+        return frame
+
+
+class StageTiming:
+    """单个阶段的耗时统计"""
+
+    __slots__ = ("calls", "total_ns", "max_ns", "last_ns")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.last_ns = 0
+
+    def record(self, elapsed_ns: int) -> None:
+        self.calls += 1
+        self.total_ns += elapsed_ns
+        self.last_ns = elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+    @property
+    def mean_ns(self) -> float:
+        return self.total_ns / self.calls if self.calls else 0.0
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "mean_us": round(self.mean_ns / 1000.0, 3),
+            "max_us": round(self.max_ns / 1000.0, 3),
+            "last_us": round(self.last_ns / 1000.0, 3),
+        }
+
+
+class Pipeline:
+    """按顺序执行的阶段列表，带每阶段耗时统计"""
+
+    def __init__(self, name: str, stages: Iterable[Stage]):
+        self.name = name
+        self.stages: List[Stage] = list(stages)
+        names = [stage.name for stage in self.stages]
+        if len(set(names)) != len(names):
+            raise ValueError(f"阶段名称重复: {','.join(names)}")
+        self.timings: Dict[str, StageTiming] = {
+            stage.name: StageTiming() for stage in self.stages
+        }
+        self.filtered = 0
+        # 临时跳过的阶段名（资源调控等在其他线程中修改）
+        self.bypassed: Set[str] = set()
+
+    @classmethod
+    def from_spec(
+        cls, name: str, spec: str, factories: Mapping[str, Callable[[], Stage]]
+    ) -> "Pipeline":
+        """
+        按逗号分隔的阶段名称组装流水线
+
+        Args:
+            name: 流水线名称（用于日志和指标）
+            spec: 阶段名称列表，如 "energy,barge_in,downsample"
+            factories: 阶段名称到构造函数的映射
+
+        Returns:
+            流水线
+
+        Raises:
+            ValueError: 包含未知的阶段名称
+        """
+        names = [item.strip() for item in spec.split(",") if item.strip()]
+        unknown = [item for item in names if item not in factories]
+        if unknown:
+            raise ValueError(
+                f"未知的{name}阶段: {', '.join(unknown)}（可用: {', '.join(factories)}）"
+            )
+        return cls(name, [factories[item]() for item in names])
+
+    def describe(self) -> str:
+        return " -> ".join(stage.name for stage in self.stages) or "(空)"
+
+    def process(self, frame: Frame) -> Optional[Frame]:
+        """
+        依次执行所有阶段
+
+        Returns:
+            处理后的块，被某个阶段丢弃时返回None
+        """
+        current: Optional[Frame] = frame
+        for stage in self.stages:
+            if stage.name in self.bypassed:
+                continue
+            start = time.perf_counter_ns()
+            current = stage.process(current)
+            self.timings[stage.name].record(time.perf_counter_ns() - start)
+            if current is None:
+                self.filtered += 1
+                return None
+        return current
+
+    def reset(self) -> None:
+        for stage in self.stages:
+            stage.reset()
+
+    def set_bypass(self, name: str, bypass: bool) -> bool:
+        """
+        跳过或恢复某个阶段（恢复时清空其流式状态）
+
+        Args:
+            name: 阶段名
+            bypass: 是否跳过
+
+        Returns:
+            流水线中是否有该阶段
+        """
+        stage = next((s for s in self.stages if s.name == name), None)
+        if stage is None:
+            return False
+        if bypass:
+            self.bypassed.add(name)
+        elif name in self.bypassed:
+            # 跳过期间工作线程不会调用该阶段，先清空状态再恢复
+            stage.reset()
+            self.bypassed.discard(name)
+        return True
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """各阶段的耗时统计"""
+        return {name: timing.to_dict() for name, timing in self.timings.items()}
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """向控制服务的指标注册表注册各阶段耗时指标"""
+        prefix = f"pipeline.{self.name}"
+        registry.register(
+            f"{prefix}.filtered_total",
+            lambda: self.filtered,
+            "被阶段丢弃的块数",
+            "counter",
+        )
+        for stage_name, timing in self.timings.items():
+            registry.register(
+                f"{prefix}.{stage_name}.calls_total",
+                lambda t=timing: t.calls,
+                f"{stage_name} 阶段调用次数",
+                "counter",
+            )
+            registry.register(
+                f"{prefix}.{stage_name}.seconds_total",
+                lambda t=timing: t.total_ns / 1e9,
+                f"{stage_name} 阶段累计耗时（秒）",
+                "counter",
+            )
+            registry.register(
+                f"{prefix}.{stage_name}.max_seconds",
+                lambda t=timing: t.max_ns / 1e9,
+                f"{stage_name} 阶段最大单块耗时（秒）",
+            )
+
+
+class PipelineWorker:
+    """
+    在专用线程中运行流水线
+
+    结果交给 sink 回调（在工作线程中调用），或在未提供 sink 时放入有界的asyncio队列，
+    由协程通过 get() 取出。asyncio队列满时工作线程等待，输入队列随之积压，
+    积压满后按溢出策略处理新提交的块。交出的样本总是复制一份，
+    阶段内部的预分配缓冲区可以安全复用。
+    """
+
+    def __init__(
+        self,
+        pipeline: Pipeline,
+        maxsize: int = DEFAULT_QUEUE_SIZE,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+        sink: Optional[Callable[[Frame], None]] = None,
+    ):
+        """
+        初始化工作线程
+
+        Args:
+            pipeline: 要运行的流水线
+            maxsize: 输入队列和结果队列的容量（块）
+            overflow: 输入队列满时的策略；"block" 策略在事件循环中用 put() 提交
+            sink: 结果回调，为None时结果放入asyncio队列
+        """
+        if maxsize < 1:
+            raise ValueError("队列容量必须至少为1")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"未知的溢出策略: {overflow}")
+
+        self.pipeline = pipeline
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.sink = sink
+
+        self.submitted = 0
+        self.dropped = 0
+        self.errors = 0
+        # 取出处理但没有交出的块（被阶段丢弃、已被 clear 或处理出错）
+        self.lost = 0
+        self.stall_ns = 0
+
+        self._inbox: "queue.Queue[Any]" = queue.Queue(maxsize)
+        self._results: Optional["asyncio.Queue[Frame]"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self._generation = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """等待处理的块数"""
+        return self._inbox.qsize()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """
+        启动工作线程
+
+        Args:
+            loop: 接收结果的事件循环，未提供 sink 时默认为当前运行的循环
+        """
+        if self.running:
+            return
+        if self.sink is None:
+            self._loop = loop or asyncio.get_running_loop()
+            self._results = asyncio.Queue(self.maxsize)
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"pipeline-{self.pipeline.name}", daemon=True
+        )
+        self._thread.start()
+        logger.debug(
+            "{} 流水线已启动: {}", self.pipeline.name, self.pipeline.describe()
+        )
+
+    def stop(self, timeout: float = 1.0) -> None:
+        """停止工作线程，未处理的块被丢弃"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self.clear()
+        try:
+            self._inbox.put_nowait(_STOP)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def clear(self) -> int:
+        """
+        丢弃所有等待处理的块，正在处理的块也不再交出（用于打断）
+
+        Returns:
+            丢弃的块数
+        """
+        self._generation += 1
+        cleared = 0
+        while True:
+            try:
+                item = self._inbox.get_nowait()
+            except queue.Empty:
+                return cleared
+            if item is _STOP:
+                self._inbox.put_nowait(_STOP)
+                return cleared
+            cleared += 1
+
+    def submit(self, frame: Frame) -> bool:
+        """
+        提交一块音频
+
+        Returns:
+            是否进入了队列；按策略丢弃新块时返回False
+        """
+        frame.generation = self._generation
+        self.submitted += 1
+        if self.overflow == OVERFLOW_BLOCK:
+            self._inbox.put(frame)
+            return True
+        try:
+            self._inbox.put_nowait(frame)
+            return True
+        except queue.Full:
+            pass
+
+        self.dropped += 1
+        logger.rate_limited(
+            "WARNING", "{} 流水线处理不过来，丢弃音频块", self.pipeline.name, rate=0.2
+        )
+        if self.overflow == OVERFLOW_DROP_NEWEST:
+            return False
+        try:
+            self._inbox.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self._inbox.put_nowait(frame)
+        except queue.Full:
+            return False
+        return True
+
+    async def put(self, frame: Frame) -> bool:
+        """
+        在事件循环中提交一块音频，输入队列满时在线程池中等待空位，不阻塞事件循环
+
+        Returns:
+            是否进入了队列；等待期间工作线程停止时返回False
+        """
+        frame.generation = self._generation
+        self.submitted += 1
+        try:
+            self._inbox.put_nowait(frame)
+            return True
+        except queue.Full:
+            pass
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._put_until_stopped, frame)
+
+    def _put_until_stopped(self, frame: Frame) -> bool:
+        """等待输入队列的空位，工作线程停止时放弃"""
+        while not self._stopping.is_set():
+            try:
+                self._inbox.put(frame, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    async def get(self) -> Frame:
+        """取出下一块处理结果（仅在未提供 sink 时可用）"""
+        if self._results is None:
+            raise RuntimeError("流水线未启动，或结果交给了 sink 回调")
+        return await self._results.get()
+
+    def _deliver(self, frame: Frame) -> None:
+        """把结果交给 sink 或asyncio队列，队列满时等待"""
+        if self.sink is not None:
+            self.sink(frame)
+            return
+        assert self._loop is not None and self._results is not None
+        results = self._results
+        full = results.full()
+        start = time.perf_counter_ns()
+        future = asyncio.run_coroutine_threadsafe(results.put(frame), self._loop)
+        while True:
+            try:
+                future.result(timeout=0.1)
+                break
+            except concurrent.futures.TimeoutError:
+                if self._stopping.is_set() or self._loop.is_closed():
+                    future.cancel()
+                    return
+        if full:
+            self.stall_ns += time.perf_counter_ns() - start
+
+    def _run(self) -> None:
+        while True:
+            item = self._inbox.get()
+            if item is _STOP or self._stopping.is_set():
+                return
+            try:
+                result = self.pipeline.process(item)
+                if result is None or result.generation != self._generation:
+                    self.lost += 1
+                    continue
+                result.samples = result.samples.copy()
+                self._deliver(result)
+            except Exception as e:
+                self.errors += 1
+                self.lost += 1
+                logger.rate_limited(
+                    "ERROR", "{} 流水线处理出错: {}", self.pipeline.name, e, rate=0.2
+                )
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """注册队列、丢弃和各阶段耗时指标"""
+        prefix = f"pipeline.{self.pipeline.name}"
+        registry.register(
+            f"{prefix}.queue_depth", lambda: self.queue_depth, "等待处理的块数"
+        )
+        registry.register(
+            f"{prefix}.dropped_total",
+            lambda: self.dropped,
+            "输入队列满时丢弃的块数",
+            "counter",
+        )
+        registry.register(
+            f"{prefix}.errors_total", lambda: self.errors, "处理出错的块数", "counter"
+        )
+        registry.register(
+            f"{prefix}.stall_seconds_total",
+            lambda: self.stall_ns / 1e9,
+            "等待消费者取走结果的累计时间（秒）",
+            "counter",
+        )
+        self.pipeline.register_metrics(registry)
@@ -0,0 +1,460 @@
+"""
+线程调度优先级模块
+
+课堂主机上，执行播放回调的 PortAudio 线程要和事件循环、时间服务线程以及其他程序
+争抢CPU，回调起始被推迟就会欠载，听起来是断断续续的语音。可选地（默认关闭）
+把回调线程和事件循环线程提升为 Linux 实时调度策略（SCHED_FIFO/SCHED_RR）
+或更高的 nice 优先级，并绑定到指定的CPU。
+
+没有权限（既没有 CAP_SYS_NICE，RLIMIT_RTPRIO 也不够）或平台不支持时只记录警告，
+线程保持普通调度继续运行。
+
+为了看出效果，先按普通调度测量一段回调起始抖动（相邻两次回调的间隔与块时长之差），
+再提升优先级继续测量，两段结果写入日志和指标。
+"""
+
+import collections
+import os
+import threading
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Deque, FrozenSet, List, Mapping, Optional
+
+from .logger import logger
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
+
+POLICY_FIFO = "fifo"
+POLICY_RR = "rr"
+POLICY_NICE = "nice"
+POLICIES = (POLICY_FIFO, POLICY_RR, POLICY_NICE)
+
+# 回调线程的默认实时优先级；事件循环线程低一些，回调总能抢占它
+DEFAULT_RT_PRIORITY = 70
+LOOP_PRIORITY_OFFSET = 10
+
+# 提升前测量的回调次数（40ms一块约10秒）
+DEFAULT_BASELINE_CALLBACKS = 250
+
+# 计算抖动分位数保留的最近回调数
+DEFAULT_JITTER_WINDOW = 4096
+
+
+@dataclass(frozen=True)
+class ThreadPolicy:
+    """一个线程的调度策略和优先级"""
+
+    policy: str
+    # 实时策略为 1-99 的实时优先级，nice 策略为 -20~19 的 nice 值
+    priority: int
+
+    def __post_init__(self) -> None:
+        if self.policy not in POLICIES:
+            raise ValueError(f"调度策略必须是 {'/'.join(POLICIES)} 之一: {self.policy}")
+        if self.realtime and not 1 <= self.priority <= 99:
+            raise ValueError(f"实时优先级必须在 1-99 之间: {self.priority}")
+        if not self.realtime and not -20 <= self.priority <= 19:
+            raise ValueError(f"nice 值必须在 -20~19 之间: {self.priority}")
+
+    @property
+    def realtime(self) -> bool:
+        return self.policy != POLICY_NICE
+
+    @classmethod
+    def parse(cls, spec: str) -> "ThreadPolicy":
+        """
+        解析调度设置
+
+        Args:
+            spec: "fifo:70"、"rr:60"、"nice:-10"，或只写策略使用默认优先级
+                  （"1"/"on" 等同于 "fifo"）
+
+        Returns:
+            调度策略
+
+        Raises:
+            ValueError: 设置无效
+        """
+        name, _, value = spec.strip().lower().partition(":")
+        if name in ("1", "true", "yes", "on"):
+            name = POLICY_FIFO
+        try:
+            if value:
+                priority = int(value)
+            else:
+                priority = -10 if name == POLICY_NICE else DEFAULT_RT_PRIORITY
+        except ValueError:
+            raise ValueError(f"优先级应为整数: {spec}") from None
+        return cls(name, priority)
+
+    def lowered(self, offset: int = LOOP_PRIORITY_OFFSET) -> "ThreadPolicy":
+        """比本策略低一些的策略（nice 策略不变）"""
+        if not self.realtime:
+            return self
+        return ThreadPolicy(self.policy, max(1, self.priority - offset))
+
+    def describe(self) -> str:
+        return f"{self.policy}:{self.priority}"
+
+
+def parse_cpu_list(spec: str) -> FrozenSet[int]:
+    """
+    解析CPU列表
+
+    Args:
+        spec: 如 "3"、"2-3"、"0,2-3"
+
+    Returns:
+        CPU编号集合
+
+    Raises:
+        ValueError: 格式无效或为空
+    """
+    cpus = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        low, sep, high = part.partition("-")
+        try:
+            first, last = int(low), int(high) if sep else int(low)
+        except ValueError:
+            raise ValueError(f"CPU列表格式应为 0,2-3: {spec}") from None
+        if first < 0 or last < first:
+            raise ValueError(f"CPU范围无效: {part}")
+        cpus.update(range(first, last + 1))
+    if not cpus:
+        raise ValueError("CPU列表为空")
+    return frozenset(cpus)
+
+
+@dataclass
+class ApplyResult:
+    """对一个线程应用调度设置的结果"""
+
+    policy_applied: bool = False
+    affinity_applied: bool = False
+    error: Optional[str] = None
+
+
+def apply_thread_policy(
+    tid: int,
+    policy: Optional[ThreadPolicy] = None,
+    cpus: Optional[FrozenSet[int]] = None,
+) -> ApplyResult:
+    """
+    设置一个线程的调度策略和CPU亲和性（Linux 上按线程生效）
+
+    失败不抛出异常：没有权限或平台不支持时在结果中记录原因，线程保持原样。
+
+    Args:
+        tid: 线程的内核线程号（threading.get_native_id()）
+        policy: 调度策略，None 表示不修改
+        cpus: 绑定的CPU，None 表示不修改
+
+    Returns:
+        应用结果
+    """
+    result = ApplyResult()
+    errors: List[str] = []
+    if policy is not None:
+        try:
+            if policy.realtime:
+                kind = os.SCHED_FIFO if policy.policy == POLICY_FIFO else os.SCHED_RR
+                os.sched_setscheduler(tid, kind, os.sched_param(policy.priority))
+            else:
+                os.setpriority(os.PRIO_PROCESS, tid, policy.priority)
+            result.policy_applied = True
+        except AttributeError:
+            errors.append("平台不支持设置调度策略")
+        except PermissionError:
+            errors.append(
+                f"没有权限设置 {policy.describe()}"
+                "（需要 CAP_SYS_NICE 或足够的 RLIMIT_RTPRIO/RLIMIT_NICE）"
+            )
+        except OSError as e:
+            errors.append(f"设置 {policy.describe()} 失败: {e}")
+    if cpus is not None:
+        try:
+            os.sched_setaffinity(tid, cpus)
+            result.affinity_applied = True
+        except AttributeError:
+            errors.append("平台不支持设置CPU亲和性")
+        except OSError as e:
+            errors.append(f"绑定CPU {sorted(cpus)} 失败: {e}")
+    if errors:
+        result.error = "；".join(errors)
+    return result
+
+
+class CallbackJitter:
+    """回调起始抖动：相邻两次回调的间隔与这次回调块时长之差的绝对值"""
+
+    def __init__(self, sample_rate: int, window: int = DEFAULT_JITTER_WINDOW):
+        self.sample_rate = sample_rate
+        self._deviations: Deque[float] = collections.deque(maxlen=window)
+        self._last: Optional[float] = None
+        self._last_frames = 0
+        self.count = 0
+        self.max_s = 0.0
+        self.total_s = 0.0
+
+    def record(self, now: float, frames: int) -> None:
+        """
+        记录一次回调开始（在回调中调用）
+
+        Args:
+            now: 回调开始的单调时钟时间
+            frames: 本次回调的帧数
+        """
+        if self._last is not None:
+            expected = self._last_frames / self.sample_rate
+            deviation = abs(now - self._last - expected)
+            self._deviations.append(deviation)
+            self.count += 1
+            self.total_s += deviation
+            if deviation > self.max_s:
+                self.max_s = deviation
+        self._last = now
+        self._last_frames = frames
+
+    def restart(self) -> None:
+        """回调线程换了（音频流重新打开），下一次回调不与之前的比较"""
+        self._last = None
+
+    @property
+    def mean_s(self) -> float:
+        return self.total_s / self.count if self.count else 0.0
+
+    def percentile_s(self, q: float) -> float:
+        """最近窗口内抖动的分位数（秒）"""
+        deviations = sorted(self._deviations)
+        if not deviations:
+            return 0.0
+        return deviations[min(len(deviations) - 1, int(q * len(deviations)))]
+
+    def summary(self) -> str:
+        return (
+            f"平均 {self.mean_s * 1000:.2f}ms，"
+            f"p99 {self.percentile_s(0.99) * 1000:.2f}ms，"
+            f"最大 {self.max_s * 1000:.2f}ms（{self.count} 次）"
+        )
+
+
+@dataclass(frozen=True)
+class SchedulingConfig:
+    """回调线程和事件循环线程的调度设置"""
+
+    policy: Optional[ThreadPolicy] = None
+    audio_cpus: Optional[FrozenSet[int]] = None
+    loop_cpus: Optional[FrozenSet[int]] = None
+    baseline_callbacks: int = DEFAULT_BASELINE_CALLBACKS
+
+    def __post_init__(self) -> None:
+        if self.baseline_callbacks < 0:
+            raise ValueError("提升前测量的回调次数不能为负数")
+
+    @property
+    def enabled(self) -> bool:
+        return (
+            self.policy is not None
+            or self.audio_cpus is not None
+            or self.loop_cpus is not None
+        )
+
+    @classmethod
+    def from_env(
+        cls, environ: Optional[Mapping[str, str]] = None
+    ) -> "SchedulingConfig":
+        """
+        从环境变量读取调度设置
+
+        支持 EDUBUDDY_RT_SCHED（如 "fifo:70"、"nice:-10"）、EDUBUDDY_AUDIO_CPUS、
+        EDUBUDDY_LOOP_CPUS（如 "3"、"2-3"）和 EDUBUDDY_RT_BASELINE（提升前测量的
+        回调次数），都未设置时不启用。
+
+        Raises:
+            ValueError: 设置无效
+        """
+        env = os.environ if environ is None else environ
+        spec = env.get("EDUBUDDY_RT_SCHED", "").strip()
+        policy = None
+        if spec and spec.lower() not in ("0", "false", "no", "off"):
+            policy = ThreadPolicy.parse(spec)
+        audio_cpus = env.get("EDUBUDDY_AUDIO_CPUS", "").strip()
+        loop_cpus = env.get("EDUBUDDY_LOOP_CPUS", "").strip()
+        try:
+            baseline = int(
+                env.get("EDUBUDDY_RT_BASELINE", str(DEFAULT_BASELINE_CALLBACKS))
+            )
+        except ValueError:
+            raise ValueError("EDUBUDDY_RT_BASELINE 应为整数") from None
+        return cls(
+            policy=policy,
+            audio_cpus=parse_cpu_list(audio_cpus) if audio_cpus else None,
+            loop_cpus=parse_cpu_list(loop_cpus) if loop_cpus else None,
+            baseline_callbacks=baseline,
+        )
+
+    def describe(self) -> str:
+        parts = []
+        if self.policy is not None:
+            parts.append(
+                f"回调线程 {self.policy.describe()}，"
+                f"事件循环 {self.policy.lowered().describe()}"
+            )
+        if self.audio_cpus is not None:
+            parts.append(f"回调线程绑定CPU {sorted(self.audio_cpus)}")
+        if self.loop_cpus is not None:
+            parts.append(f"事件循环绑定CPU {sorted(self.loop_cpus)}")
+        return "，".join(parts)
+
+
+class ThreadScheduler:
+    """
+    测量播放回调的起始抖动，测够基线后提升回调线程和事件循环线程的调度优先级
+
+    on_callback() 在每次播放回调开始时调用；音频流重新打开（stream_restarted()）
+    或回调线程更换后，对新线程重新应用设置。
+    """
+
+    def __init__(self, config: SchedulingConfig, sample_rate: int):
+        """
+        初始化调度器
+
+        Args:
+            config: 调度设置
+            sample_rate: 播放流的采样率
+        """
+        self.config = config
+        self.jitter = CallbackJitter(sample_rate)
+        # 提升前的抖动统计，提升后才有
+        self.baseline: Optional[CallbackJitter] = None
+        # 基线已测完、开始应用设置；applied 表示至少有一个线程设置成功
+        self.elevated = False
+        self.applied = False
+        self.reported = False
+        self.failures = 0
+        self._callback_tid: Optional[int] = None
+        self._loop_tid: Optional[int] = None
+
+    def attach_loop(self) -> None:
+        """记录事件循环线程（在事件循环线程中调用）"""
+        self._loop_tid = threading.get_native_id()
+        if self.elevated:
+            self._apply_loop()
+
+    def stream_restarted(self) -> None:
+        """播放流重新打开（回调线程会更换，内核线程号可能被复用）"""
+        self._callback_tid = None
+
+    def on_callback(self, now: float, frames: int) -> None:
+        """
+        一次播放回调开始（在回调线程中调用）
+
+        Args:
+            now: 回调开始的单调时钟时间
+            frames: 本次回调的帧数
+        """
+        tid = threading.get_native_id()
+        if tid != self._callback_tid:
+            self._callback_tid = tid
+            self.jitter.restart()
+            if self.elevated:
+                self._apply_callback()
+        self.jitter.record(now, frames)
+
+        if not self.elevated:
+            if self.jitter.count >= self.config.baseline_callbacks:
+                self._elevate()
+        elif not self.reported and self.jitter.count >= max(
+            self.config.baseline_callbacks, 1
+        ):
+            self.reported = True
+            if self.baseline is not None and self.baseline.count:
+                logger.info(
+                    "⏱️  回调起始抖动: 提升前 {}，{} {}",
+                    self.baseline.summary(),
+                    "提升后" if self.applied else "提升失败，仍为普通调度",
+                    self.jitter.summary(),
+                )
+
+    def _elevate(self) -> None:
+        """保存基线抖动，提升回调线程和事件循环线程"""
+        self.elevated = True
+        if self.jitter.count:
+            self.baseline = self.jitter
+            self.jitter = CallbackJitter(self.baseline.sample_rate)
+        self._apply_callback()
+        self._apply_loop()
+
+    def _apply(
+        self,
+        name: str,
+        tid: int,
+        policy: Optional[ThreadPolicy],
+        cpus: Optional[FrozenSet[int]],
+    ) -> None:
+        result = apply_thread_policy(tid, policy, cpus)
+        if result.error:
+            self.failures += 1
+            logger.warning("⚠️  {}保持普通调度: {}", name, result.error)
+        else:
+            self.applied = True
+            logger.info("🚀 已提升{}（线程 {}）", name, tid)
+
+    def _apply_callback(self) -> None:
+        if self._callback_tid is not None:
+            self._apply(
+                "播放回调线程",
+                self._callback_tid,
+                self.config.policy,
+                self.config.audio_cpus,
+            )
+
+    def _apply_loop(self) -> None:
+        if self._loop_tid is not None:
+            policy = self.config.policy
+            self._apply(
+                "事件循环线程",
+                self._loop_tid,
+                policy.lowered() if policy is not None else None,
+                self.config.loop_cpus,
+            )
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """注册回调抖动指标"""
+        registry.register(
+            "sched.elevated", lambda: int(self.applied), "是否已提升调度优先级"
+        )
+        registry.register(
+            "sched.failures_total",
+            lambda: self.failures,
+            "提升调度优先级失败的次数",
+            "counter",
+        )
+        registry.register(
+            "sched.jitter_ms_mean",
+            lambda: self.jitter.mean_s * 1000,
+            "回调起始抖动的平均值（毫秒，当前阶段）",
+        )
+        registry.register(
+            "sched.jitter_ms_p99",
+            lambda: self.jitter.percentile_s(0.99) * 1000,
+            "回调起始抖动的p99（毫秒，当前阶段）",
+        )
+        registry.register(
+            "sched.jitter_ms_max",
+            lambda: self.jitter.max_s * 1000,
+            "回调起始抖动的最大值（毫秒，当前阶段）",
+        )
+        registry.register(
+            "sched.baseline_jitter_ms_p99",
+            lambda: self.baseline.percentile_s(0.99) * 1000 if self.baseline else 0.0,
+            "提升前回调起始抖动的p99（毫秒）",
+        )
+        registry.register(
+            "sched.baseline_jitter_ms_max",
+            lambda: self.baseline.max_s * 1000 if self.baseline else 0.0,
+            "提升前回调起始抖动的最大值（毫秒）",
+        )
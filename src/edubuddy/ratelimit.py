@@ -0,0 +1,86 @@
+"""
+限流模块
+
+提供令牌桶限流和1/N采样，供日志等高频路径按调用点节流使用。
+"""
+
+import threading
+import time
+from typing import Callable
+
+
+class TokenBucket:
+    """令牌桶 - 按固定速率补充令牌，允许一定突发"""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        初始化令牌桶
+
+        Args:
+            rate: 每秒补充的令牌数
+            burst: 桶容量，即允许的最大突发次数
+            clock: 单调时钟函数
+        """
+        if rate <= 0:
+            raise ValueError("速率必须大于0")
+        if burst < 1:
+            raise ValueError("突发容量必须至少为1")
+
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """
+        尝试取得一个令牌
+
+        Returns:
+            如果取得令牌则返回True
+        """
+        with self._lock:
+            now = self._clock()
+            elapsed = now - self._last
+            self._last = now
+            self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+
+class Sampler:
+    """1/N采样器 - 第1次及此后每N次调用放行一次"""
+
+    def __init__(self, every: int):
+        """
+        初始化采样器
+
+        Args:
+            every: 采样间隔N
+        """
+        if every < 1:
+            raise ValueError("采样间隔必须至少为1")
+
+        self.every = every
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """
+        记录一次调用并判断是否放行
+
+        Returns:
+            如果本次调用被采样则返回True
+        """
+        with self._lock:
+            selected = self._count % self.every == 0
+            self._count += 1
+            return selected
@@ -1,9 +1,7 @@
 import asyncio
 import os
-import queue
 import sys
-import threading
-from typing import Any
+from time import monotonic, thread_time_ns
 
 import numpy as np
 import sounddevice as sd
@@ -12,47 +10,100 @@ from agents import function_tool
 from agents.realtime import (
     RealtimeAgent,
     RealtimePlaybackTracker,
-    RealtimeRunner,
     RealtimeSession,
     RealtimeSessionEvent,
 )
 from agents.realtime.model import RealtimeModelConfig
+from agents.realtime.model_inputs import RealtimeModelSendInterrupt
+
+from edubuddy.aggregation import UplinkAggregator, parse_frame_range
+from edubuddy.audio import (
+    CHANNELS,
+    CHUNK_LENGTH_S,
+    ENERGY_THRESHOLD,
+    FORMAT,
+    MODEL_SAMPLE_RATE,
+    SAMPLE_RATE,
+    EchoGate,
+    PlaybackBuffer,
+    rms_energy,
+)
+from edubuddy.audiobus import AudioBus
+from edubuddy.batch import runner_session_factory
+from edubuddy.calibration import DEFAULT_CALIBRATION_FILE, device_key, load_calibration
+from edubuddy.config import ConfigReloader
+from edubuddy.control import METRIC_COUNTER, ControlServer
+from edubuddy.denoise import NoiseSuppressor
+from edubuddy.governor import (
+    STAGE_REDUCE,
+    STAGE_SHRINK,
+    ResourceBudget,
+    ResourceGovernor,
+)
+from edubuddy.logger import logger
+from edubuddy.pipeline import (
+    DOWNLINK_STAGES,
+    UPLINK_STAGES,
+    BargeInStage,
+    DenoiseStage,
+    EnergyStage,
+    Frame,
+    Pipeline,
+    PipelineWorker,
+    ResampleStage,
+    WakeStage,
+)
+from edubuddy.priority import SchedulingConfig, ThreadScheduler
+from edubuddy.response_cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_CAPACITY_MB,
+    ResponseCache,
+    ResponseRecorder,
+)
+from edubuddy.replay import ReplayEntry, ReplayRing, is_repeat_request
+from edubuddy.session_pool import DEFAULT_MAX_IDLE_S, DEFAULT_POOL_SIZE, SessionPool
+from edubuddy.sinks import OVERFLOW_BLOCK
+from edubuddy.trace import EVENT_CHUNK_SENT, EVENT_DELTA_RECEIVED, recorder
+from edubuddy.tuning import (
+    AutoTuner,
+    StreamStats,
+    TuningBounds,
+    TuningLevel,
+    UplinkActivity,
+    baseline_level,
+    tuning_enabled,
+)
+from edubuddy.wakeword import DEFAULT_WAKE_FILE, KeywordSpotter, WakeGate, WakeTemplates
 
-from scipy.signal import resample_poly
+# Playback item ids for answers served from the response cache; the server never
+# sees these, so their progress is not reported to the playback tracker
+CACHED_ITEM_PREFIX = "cached:"
+# Same for answers replayed locally from the replay ring
+REPLAY_ITEM_PREFIX = "replay:"
+LOCAL_ITEM_PREFIXES = (CACHED_ITEM_PREFIX, REPLAY_ITEM_PREFIX)
 
 
 # 尝试导入 dotenv，如果失败则忽略
 try:
     from dotenv import load_dotenv
+
     # 加载当前目录下的 .env 文件
-    env_path = os.path.join(os.path.dirname(__file__), '.env')
+    env_path = os.path.join(os.path.dirname(__file__), ".env")
     load_dotenv(env_path)
-    print(f"尝试加载 .env 文件: {env_path}")
+    logger.info("尝试加载 .env 文件: {}", env_path)
 except ImportError:
     # 如果没有安装 python-dotenv，则跳过
-    print("python-dotenv 未安装，跳过 .env 文件加载")
+    logger.info("python-dotenv 未安装，跳过 .env 文件加载")
     pass
 
 # 调试：打印 API 密钥信息
-api_key = os.getenv('OPENAI_API_KEY')
-print(f"API 密钥状态: {'已设置' if api_key else '未设置'}")
+api_key = os.getenv("OPENAI_API_KEY")
+logger.info("API 密钥状态: {}", "已设置" if api_key else "未设置")
 if api_key:
-    print(f"API 密钥长度: {len(api_key)}")
-    print(f"API 密钥前缀: {api_key[:10]}..." if len(api_key) > 10 else f"API 密钥: {api_key}")
+    logger.debug("API 密钥长度: {}", len(api_key))
+    logger.debug("API 密钥前缀: {}...", api_key[:10])
 else:
-    print("警告: OPENAI_API_KEY 环境变量未设置")
-
-# Audio configuration
-CHUNK_LENGTH_S = 0.04  # 40ms aligns with realtime defaults
-# SAMPLE_RATE = 24000
-SAMPLE_RATE = 48000
-FORMAT = np.int16
-CHANNELS = 1
-# ENERGY_THRESHOLD = 0.015  # RMS threshold for barge‑in while assistant is speaking
-ENERGY_THRESHOLD = 0.12  # RMS threshold for barge‑in while assistant is speaking
-
-PREBUFFER_CHUNKS = 3  # initial jitter buffer (~120ms with 40ms chunks)
-FADE_OUT_MS = 12  # short fade to avoid clicks when interrupting
+    logger.warning("OPENAI_API_KEY 环境变量未设置")
 
 # Set up logging for OpenAI agents SDK
 # logging.basicConfig(
@@ -95,182 +146,654 @@ class NoUIDemo:
         self.playback_tracker = RealtimePlaybackTracker()
 
         # Audio output state for callback system
-        # Store tuples: (samples_np, item_id, content_index)
-        # Use an unbounded queue to avoid drops that sound like skipped words.
-        self.output_queue: queue.Queue[Any] = queue.Queue(maxsize=0)
-        self.interrupt_event = threading.Event()
-        self.current_audio_chunk: tuple[np.ndarray[Any, np.dtype[Any]], str, int] | None = None
-        self.chunk_position = 0
+        self.playback = PlaybackBuffer(on_played=self._on_played)
         self.bytes_per_sample = np.dtype(FORMAT).itemsize
 
-        # Jitter buffer and fade-out state
-        self.prebuffering = True
-        self.prebuffer_target_chunks = PREBUFFER_CHUNKS
-        self.fading = False
-        self.fade_total_samples = 0
-        self.fade_done_samples = 0
-        self.fade_samples = int(SAMPLE_RATE * (FADE_OUT_MS / 1000.0))
+        # Microphone device; the echo gate is aligned using its calibrated round trip
+        self.mic_device = 0
+        self.echo_gate = EchoGate()
+
+        # Optional control socket for live metrics (EDUBUDDY_CONTROL_SOCKET)
+        self.control: ControlServer | None = None
+        # Optional hot-reloaded config file (EDUBUDDY_CONFIG); only LOG_LEVEL applies
+        self.reloader: ConfigReloader | None = None
+
+        # Glitch counters and opt-in blocksize/latency/prebuffer auto-tuning
+        # (AUDIO_AUTOTUNE=1); otherwise the streams keep the baseline parameters.
+        # Only device glitches drive the tuner: playback starvations come from the
+        # network or the downlink, which a larger device buffer does not fix.
+        self.stream_stats = StreamStats()
+        self.tuner: AutoTuner | None = None
+        self.stream_level = baseline_level()
+        if tuning_enabled():
+            try:
+                self.tuner = AutoTuner(
+                    TuningBounds.from_env(), glitches=lambda: self.stream_stats.glitches
+                )
+                self.stream_level = self.tuner.level
+            except ValueError as e:
+                logger.warning("⚠️  音频调优设置无效，使用基线参数: {}", e)
+        self.playback.prebuffer_target_chunks = self.stream_level.prebuffer_chunks
+        self.pending_level: TuningLevel | None = None
+        # Streams are only reopened while the student is not speaking either
+        self.uplink_activity = UplinkActivity(ENERGY_THRESHOLD)
+
+        # Optional classroom noise suppression before barge-in and upload
+        # (EDUBUDDY_NOISE_SUPPRESSION=1)
+        self.denoiser: NoiseSuppressor | None = None
+        noise_suppression = os.getenv("EDUBUDDY_NOISE_SUPPRESSION", "")
+        if noise_suppression.lower() in ("1", "true", "yes", "on"):
+            self.denoiser = NoiseSuppressor(sample_rate=SAMPLE_RATE)
+            logger.info(
+                "已启用降噪，额外延迟 {}ms",
+                self.denoiser.latency_samples * 1000 // SAMPLE_RATE,
+            )
 
-    def _output_callback(self, outdata, frames: int, time, status) -> None:
-        """Callback for audio output - handles continuous audio stream from server."""
-        if status:
-            print(f"Output callback status: {status}")
-
-        # Handle interruption with a short fade-out to prevent clicks.
-        if self.interrupt_event.is_set():
-            outdata.fill(0)
-            if self.current_audio_chunk is None:
-                # Nothing to fade, just flush everything and reset.
-                while not self.output_queue.empty():
-                    try:
-                        self.output_queue.get_nowait()
-                    except queue.Empty:
-                        break
-                self.prebuffering = True
-                self.interrupt_event.clear()
-                return
+        # Uplink/downlink DSP stage pipelines on worker threads, built once the
+        # echo gate calibration is loaded
+        self.uplink: PipelineWorker | None = None
+        self.downlink: PipelineWorker | None = None
+
+        # Optional shared-memory audio bus for recorder/caption/meter taps
+        # (EDUBUDDY_AUDIO_BUS=<bus name>)
+        self.audio_bus: AudioBus | None = None
+
+        # Optional cache of answers to repeated questions, replayed locally
+        # (EDUBUDDY_RESPONSE_CACHE=<dir> or 1, EDUBUDDY_RESPONSE_CACHE_MB)
+        self.response_cache: ResponseCache | None = None
+        self.recorder: ResponseRecorder | None = None
+        # Set while the server's answer to the current turn is being dropped
+        self.serving_cached = False
+        self.cached_answers = 0
+
+        # Optional in-process degradation before the MAX_MEMORY/MAX_CPU hard limits
+        self.governor: ResourceGovernor | None = None
+
+        # Optional last N assistant answers, mu-law compressed, for instant local
+        # "repeat that" (EDUBUDDY_REPLAY_RESPONSES=<N>, 0 by default). Replay is
+        # requested with the control command; EDUBUDDY_REPLAY_ON_REQUEST=1 also
+        # transcribes questions and replays when the student asks to repeat.
+        self.replay_ring: ReplayRing | None = None
+        self.replay_on_request = False
+        self.replays = 0
+        # Answer currently streaming from the server (until agent_end or interruption)
+        self._streaming_item: str | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        try:
+            responses = int(os.getenv("EDUBUDDY_REPLAY_RESPONSES", "0"))
+            if responses:
+                self.replay_ring = ReplayRing(max_responses=responses)
+                self.replay_on_request = os.getenv(
+                    "EDUBUDDY_REPLAY_ON_REQUEST", ""
+                ).lower() in ("1", "true", "yes", "on")
+        except ValueError as e:
+            logger.warning("⚠️  重播设置无效，不保留回复: {}", e)
+
+        # Sessions connected ahead of time (EDUBUDDY_SESSION_POOL, 0 connects on demand)
+        self.session_pool: SessionPool | None = None
+
+        # Optionally batch idle uplink audio into larger frames, minimum size during
+        # speech (EDUBUDDY_UPLINK_FRAME_MS="20-200", a single value fixes the size).
+        # Off by default: every 40ms chunk is sent as it is read.
+        self.aggregator: UplinkAggregator | None = None
+        frame_ms = os.getenv("EDUBUDDY_UPLINK_FRAME_MS", "")
+        if frame_ms.lower() not in ("", "0", "off", "no", "false"):
+            try:
+                self.aggregator = UplinkAggregator(*parse_frame_range(frame_ms))
+            except ValueError as e:
+                logger.warning("⚠️  上行帧长设置无效，不聚合: {}", e)
+
+        # Optional on-device wake phrase: the mic is only streamed for a window after it
+        # (EDUBUDDY_WAKE_WORD=<templates file> or 1, EDUBUDDY_WAKE_WINDOW_S)
+        self.wake_gate: WakeGate | None = None
+
+        # Opt-in real-time priority / CPU pinning for the output callback and event loop
+        # threads (EDUBUDDY_RT_SCHED, EDUBUDDY_AUDIO_CPUS, EDUBUDDY_LOOP_CPUS)
+        self.scheduler: ThreadScheduler | None = None
+
+    def _start_control(self) -> None:
+        """Serve live metrics on the control socket if one is configured."""
+        path = os.getenv("EDUBUDDY_CONTROL_SOCKET")
+        if not path:
+            return
+        self.control = ControlServer(path)
+        registry = self.control.registry
+        registry.register(
+            "playback.queue_depth",
+            lambda: self.playback.queue_depth,
+            "待播放的音频块数",
+        )
+        registry.register(
+            "playback.partial_blocks_total",
+            lambda: self.playback.partial_blocks,
+            "只填充了部分输出块的次数",
+            METRIC_COUNTER,
+        )
+        registry.register(
+            "playback.starvations_total",
+            lambda: self.playback.starvations,
+            "回复播放中途数据耗尽的次数",
+            METRIC_COUNTER,
+        )
+        self.stream_stats.register_metrics(registry)
+        if self.tuner:
+            self.tuner.register_metrics(registry)
+        for worker in (self.uplink, self.downlink):
+            if worker:
+                worker.register_metrics(registry)
+        if self.audio_bus:
+            self.audio_bus.register_metrics(registry)
+        if self.response_cache is not None:
+            self.response_cache.register_metrics(registry)
+        if self.governor:
+            self.governor.register_metrics(registry)
+        if self.wake_gate:
+            self.wake_gate.register_metrics(registry)
+        if self.session_pool:
+            self.session_pool.register_metrics(registry)
+        if self.replay_ring is not None:
+            self.replay_ring.register_metrics(registry)
+            self._loop = asyncio.get_running_loop()
+            self.control.add_command("replay", self._replay_command)
+        if self.aggregator:
+            self.aggregator.register_metrics(registry)
+        if self.scheduler:
+            self.scheduler.register_metrics(registry)
+        if self.reloader:
+            self.reloader.register_metrics(registry)
+            self.control.add_command("reload", lambda args: self.reloader.reload())
+        self.control.start()
+
+    def _start_config_reloader(self) -> None:
+        """Watch the config file and reload it on change or SIGHUP."""
+        path = os.getenv("EDUBUDDY_CONFIG")
+        if not path:
+            return
+        self.reloader = ConfigReloader(
+            path, level_guard=self.governor.hold_level if self.governor else None
+        )
+        self.reloader.install_signal_handler()
+        self.reloader.start()
 
-            # Prepare fade parameters
-            if not self.fading:
-                self.fading = True
-                self.fade_done_samples = 0
-                # Remaining samples in the current chunk
-                remaining_in_chunk = len(self.current_audio_chunk[0]) - self.chunk_position
-                self.fade_total_samples = min(self.fade_samples, max(0, remaining_in_chunk))
-
-            samples, item_id, content_index = self.current_audio_chunk
-            samples_filled = 0
-            while (
-                samples_filled < len(outdata) and self.fade_done_samples < self.fade_total_samples
-            ):
-                remaining_output = len(outdata) - samples_filled
-                remaining_fade = self.fade_total_samples - self.fade_done_samples
-                n = min(remaining_output, remaining_fade)
-
-                src = samples[self.chunk_position : self.chunk_position + n].astype(np.float32)
-                # Linear ramp from current level down to 0 across remaining fade samples
-                idx = np.arange(
-                    self.fade_done_samples, self.fade_done_samples + n, dtype=np.float32
-                )
-                gain = 1.0 - (idx / float(self.fade_total_samples))
-                ramped = np.clip(src * gain, -32768.0, 32767.0).astype(np.int16)
-                outdata[samples_filled : samples_filled + n, 0] = ramped
+    def _start_audio_bus(self) -> None:
+        """Publish captured and played audio to shared memory if a bus is configured."""
+        name = os.getenv("EDUBUDDY_AUDIO_BUS")
+        if not name:
+            return
+        try:
+            self.audio_bus = AudioBus(name, sample_rate=SAMPLE_RATE)
+            logger.info("🔌 音频总线已启用: {}（edubuddy tap --bus {}）", name, name)
+        except Exception as e:
+            logger.warning("⚠️  无法创建音频总线 {}: {}", name, e)
 
-                # Optionally report played bytes (ramped) to playback tracker
-                try:
-                    self.playback_tracker.on_play_bytes(
-                        item_id=item_id, item_content_index=content_index, bytes=ramped.tobytes()
-                    )
-                except Exception:
-                    pass
-
-                samples_filled += n
-                self.chunk_position += n
-                self.fade_done_samples += n
-
-            # If fade completed, flush the remaining audio and reset state
-            if self.fade_done_samples >= self.fade_total_samples:
-                self.current_audio_chunk = None
-                self.chunk_position = 0
-                while not self.output_queue.empty():
-                    try:
-                        self.output_queue.get_nowait()
-                    except queue.Empty:
-                        break
-                self.fading = False
-                self.prebuffering = True
-                self.interrupt_event.clear()
+    def _start_response_cache(self) -> None:
+        """Open the response cache if one is configured."""
+        setting = os.getenv("EDUBUDDY_RESPONSE_CACHE", "")
+        if not setting or setting.lower() in ("0", "false", "no", "off"):
             return
+        directory = (
+            DEFAULT_CACHE_DIR
+            if setting.lower() in ("1", "true", "yes", "on")
+            else setting
+        )
+        try:
+            capacity_mb = float(
+                os.getenv("EDUBUDDY_RESPONSE_CACHE_MB", DEFAULT_CAPACITY_MB)
+            )
+            self.response_cache = ResponseCache(directory, capacity_mb)
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️  无法打开回复缓存 {}: {}", directory, e)
+            return
+        self.recorder = ResponseRecorder(self.response_cache)
+        logger.info(
+            "💾 回复缓存已启用: {}（{} 条）", directory, len(self.response_cache)
+        )
 
-        # Fill output buffer from queue and current chunk
-        outdata.fill(0)  # Start with silence
-        samples_filled = 0
+    def _load_wake_word(self) -> None:
+        """Gate the uplink on an enrolled wake phrase if one is configured."""
+        setting = os.getenv("EDUBUDDY_WAKE_WORD", "")
+        if not setting or setting.lower() in ("0", "false", "no", "off"):
+            return
+        path = (
+            DEFAULT_WAKE_FILE
+            if setting.lower() in ("1", "true", "yes", "on")
+            else setting
+        )
+        try:
+            templates = WakeTemplates.load(path)
+            window_s = float(os.getenv("EDUBUDDY_WAKE_WINDOW_S", "8"))
+            spotter = KeywordSpotter(templates, sample_rate=MODEL_SAMPLE_RATE)
+            self.wake_gate = WakeGate(
+                spotter, window_s=window_s, keep_open=lambda: self.playback.is_playing
+            )
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️  无法加载唤醒词（{}），麦克风将持续上行: {}", path, e)
+            return
+        logger.info(
+            "👂 已启用唤醒词: {} 个模板，阈值 {:.3f}，唤醒后上行 {}s",
+            len(templates.templates),
+            templates.threshold,
+            window_s,
+        )
 
-        while samples_filled < len(outdata):
-            # If we don't have a current chunk, try to get one from queue
-            if self.current_audio_chunk is None:
-                try:
-                    # Respect a small jitter buffer before starting playback
-                    if (
-                        self.prebuffering
-                        and self.output_queue.qsize() < self.prebuffer_target_chunks
-                    ):
-                        break
-                    self.prebuffering = False
-                    self.current_audio_chunk = self.output_queue.get_nowait()
-                    self.chunk_position = 0
-                except queue.Empty:
-                    # No more audio data available - this causes choppiness
-                    # Uncomment next line to debug underruns:
-                    # print(f"Audio underrun: {samples_filled}/{len(outdata)} samples filled")
-                    break
+    def _start_scheduler(self) -> None:
+        """Elevate the callback and loop threads once baseline jitter is measured."""
+        try:
+            config = SchedulingConfig.from_env()
+        except ValueError as e:
+            logger.warning("⚠️  调度设置无效，保持普通调度: {}", e)
+            return
+        if not config.enabled:
+            return
+        self.scheduler = ThreadScheduler(config, SAMPLE_RATE)
+        # run() executes on the event loop thread
+        self.scheduler.attach_loop()
+        logger.info(
+            "🚀 将在测量 {} 次回调的抖动后提升调度: {}",
+            config.baseline_callbacks,
+            config.describe(),
+        )
 
-            # Copy data from current chunk to output buffer
-            remaining_output = len(outdata) - samples_filled
-            samples, item_id, content_index = self.current_audio_chunk
-            remaining_chunk = len(samples) - self.chunk_position
-            samples_to_copy = min(remaining_output, remaining_chunk)
+    def _start_session_pool(self) -> None:
+        """Keep configured sessions connected ahead of time so one is ready at once."""
+        # Attach playback tracker and enable server‑side interruptions + auto response.
+        model_config: RealtimeModelConfig = {
+            "playback_tracker": self.playback_tracker,
+            "initial_model_settings": {
+                "turn_detection": {
+                    "type": "semantic_vad",
+                    "interrupt_response": True,
+                    "create_response": True,
+                },
+            },
+        }
+        if self.response_cache is not None or self.replay_on_request:
+            # Question transcripts are the cache keys and carry "repeat that" requests
+            model_config["initial_model_settings"]["input_audio_transcription"] = {
+                "model": "gpt-4o-mini-transcribe"
+            }
+        factory = runner_session_factory(agent, model_config)
+        try:
+            self.session_pool = SessionPool(
+                factory,
+                size=int(os.getenv("EDUBUDDY_SESSION_POOL", str(DEFAULT_POOL_SIZE))),
+                max_idle_s=float(
+                    os.getenv("EDUBUDDY_SESSION_MAX_IDLE_S", str(DEFAULT_MAX_IDLE_S))
+                ),
+            )
+        except ValueError as e:
+            logger.warning("⚠️  会话池设置无效，改为按需建立会话: {}", e)
+            self.session_pool = SessionPool(factory, size=0)
+        self.session_pool.start()
+
+    def _reset_session_state(self) -> None:
+        """Forget the previous session's turn: its answer will never finish."""
+        self.serving_cached = False
+        if self.recorder:
+            self.recorder.reset()
+        if self.replay_ring is not None and self._streaming_item:
+            self.replay_ring.mark_interrupted(self._streaming_item)
+        self._streaming_item = None
+
+    def _start_governor(self) -> None:
+        """Degrade gracefully as RSS/CPU approach the MAX_MEMORY/MAX_CPU budget."""
+        try:
+            budget = ResourceBudget.load(os.getenv("EDUBUDDY_CONFIG"))
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️  资源预算无效，不启用资源调控: {}", e)
+            return
+        if not budget.enabled:
+            return
+        self.governor = ResourceGovernor(budget)
+        if self.response_cache is not None:
+            cache = self.response_cache
+            self.governor.add_action(
+                STAGE_SHRINK,
+                "回复缓存收缩到25%",
+                lambda: cache.shrink(0.25),
+                lambda: cache.shrink(1.0),
+            )
+        uplink = self.uplink.pipeline
+        if any(stage.name == "denoise" for stage in uplink.stages):
+            self.governor.add_action(
+                STAGE_REDUCE,
+                "跳过降噪",
+                lambda: uplink.set_bypass("denoise", True),
+                lambda: uplink.set_bypass("denoise", False),
+            )
+        self.governor.start()
+
+    async def _on_question(self, transcript: str, item_id: str | None = None) -> None:
+        """A student question was transcribed: answer it locally when possible."""
+        logger.info("📝 提问: {}", transcript)
+        if self.replay_on_request and is_repeat_request(transcript):
+            # The server usually starts answering before the transcript arrives;
+            # that partial answer to "repeat that" is not the one to repeat
+            if self._streaming_item:
+                self.replay_ring.discard(self._streaming_item)
+            if await self._replay(cancel_server=True):
+                if self.recorder:
+                    self.recorder.interrupted()
+                return
+        if not self.recorder:
+            return
+        hit = self.recorder.question(transcript, item_id)
+        if hit is None:
+            return
+        entry, audio = hit
+        logger.info(
+            "💾 命中缓存回复（{:.1f}s）: {}", entry.duration_s, entry.transcript
+        )
+        self.cached_answers += 1
+        item_id = f"{CACHED_ITEM_PREFIX}{self.cached_answers}"
+        if self.replay_ring is not None:
+            self.replay_ring.put(item_id, audio, entry.transcript)
+        await self._play_local(audio, entry.sample_rate, item_id, cancel_server=True)
+
+    async def _replay(
+        self, item_id: str | None = None, cancel_server: bool = False
+    ) -> ReplayEntry | None:
+        """Play a kept answer (the latest by default) again without the model."""
+        found = self.replay_ring.get(item_id) if self.replay_ring is not None else None
+        if found is None:
+            return None
+        entry, audio = found
+        logger.info(
+            "🔁 本地重播回复 {}（{:.1f}s）: {}",
+            entry.item_id,
+            entry.duration_s,
+            _truncate_str(entry.transcript, 50),
+        )
+        self.replays += 1
+        await self._play_local(
+            audio,
+            entry.sample_rate,
+            f"{REPLAY_ITEM_PREFIX}{self.replays}",
+            cancel_server,
+        )
+        return entry
+
+    def _replay_command(self, args: list[str]) -> object:
+        """Control command `replay [item_id]` replays an answer; `replay list` lists."""
+        if args and args[0] == "list":
+            return [
+                {
+                    "item_id": e.item_id,
+                    "duration_s": round(e.duration_s, 2),
+                    "transcript": e.transcript,
+                    "interrupted": e.interrupted,
+                    "replays": e.replays,
+                }
+                for e in self.replay_ring.entries()
+            ]
+        item_id = args[0] if args else None
+        # Control commands run on the server thread; playback belongs to the event loop
+        future = asyncio.run_coroutine_threadsafe(self._replay(item_id), self._loop)
+        entry = future.result(timeout=2.0)
+        if entry is None:
+            raise ValueError(
+                f"没有可重播的回复: {item_id}" if item_id else "还没有可重播的回复"
+            )
+        return {"item_id": entry.item_id, "duration_s": round(entry.duration_s, 2)}
+
+    async def _play_local(
+        self, audio: np.ndarray, sample_rate: int, item_id: str, cancel_server: bool
+    ) -> None:
+        """Play an answer held locally through the downlink, replacing current audio."""
+        if cancel_server:
+            self.serving_cached = True
+            # Cancel the server's answer; its audio is dropped until the turn ends
+            try:
+                await self.session.model.send_event(
+                    RealtimeModelSendInterrupt(force_response_cancel=True)
+                )
+            except Exception as e:
+                logger.debug("取消服务端回复失败: {}", e)
+
+        # Flush whatever of the server's answer already reached playback, and wait
+        # for the callback to finish the fade so it does not flush the local audio
+        self.downlink.clear()
+        if self.playback.is_playing:
+            self.playback.interrupt()
+            deadline = monotonic() + 0.2
+            while self.playback.interrupt_event.is_set() and monotonic() < deadline:
+                await asyncio.sleep(0.005)
+
+        # Same 40ms chunks as the server sends, upsampled on the downlink worker
+        chunk = int(sample_rate * CHUNK_LENGTH_S)
+        for start in range(0, audio.size, chunk):
+            await self.downlink.put(
+                Frame(
+                    audio[start : start + chunk],
+                    meta={"item_id": item_id, "content_index": 0},
+                )
+            )
 
-            if samples_to_copy > 0:
-                chunk_data = samples[self.chunk_position : self.chunk_position + samples_to_copy]
-                # More efficient: direct assignment for mono audio instead of reshape
-                outdata[samples_filled : samples_filled + samples_to_copy, 0] = chunk_data
-                samples_filled += samples_to_copy
-                self.chunk_position += samples_to_copy
+    def _build_pipelines(self) -> None:
+        """Assemble the stage graphs (EDUBUDDY_UPLINK_STAGES/DOWNLINK_STAGES)."""
+        factor = SAMPLE_RATE // MODEL_SAMPLE_RATE
+        uplink_stages = {
+            "denoise": lambda: DenoiseStage(
+                self.denoiser or NoiseSuppressor(sample_rate=SAMPLE_RATE)
+            ),
+            "energy": EnergyStage,
+            "barge_in": lambda: BargeInStage(self.playback, self.echo_gate),
+            "downsample": lambda: ResampleStage(down=factor, name="downsample"),
+        }
+        downlink_stages = {
+            "upsample": lambda: ResampleStage(up=factor, name="upsample"),
+        }
+        default_uplink = UPLINK_STAGES
+        if not self.denoiser:
+            default_uplink = default_uplink.replace("denoise,", "")
+        if self.wake_gate:
+            # Spot on the downsampled audio; barge-in before it still sees every block
+            uplink_stages["wake"] = lambda: WakeStage(self.wake_gate)
+            default_uplink += ",wake"
+
+        uplink = Pipeline.from_spec(
+            "uplink", os.getenv("EDUBUDDY_UPLINK_STAGES", default_uplink), uplink_stages
+        )
+        downlink = Pipeline.from_spec(
+            "downlink",
+            os.getenv("EDUBUDDY_DOWNLINK_STAGES", DOWNLINK_STAGES),
+            downlink_stages,
+        )
+        logger.info(
+            "🧩 上行流水线: {}，下行流水线: {}", uplink.describe(), downlink.describe()
+        )
+        self.uplink = PipelineWorker(uplink)
+        # Assistant audio is never dropped: the playback queue is unbounded anyway.
+        # Frames go in with put(), so a full queue waits off the event loop
+        self.downlink = PipelineWorker(
+            downlink, maxsize=64, overflow=OVERFLOW_BLOCK, sink=self._enqueue_playback
+        )
 
-                # Inform playback tracker about played bytes
-                try:
-                    self.playback_tracker.on_play_bytes(
-                        item_id=item_id,
-                        item_content_index=content_index,
-                        bytes=chunk_data.tobytes(),
-                    )
-                except Exception:
-                    pass
+    def _enqueue_playback(self, frame: Frame) -> None:
+        """Downlink sink: hand upsampled assistant audio to the playback buffer."""
+        self.playback.enqueue(
+            frame.samples, frame.meta["item_id"], frame.meta["content_index"]
+        )
 
-                # If we've used up the entire chunk, reset for next iteration
-                if self.chunk_position >= len(samples):
-                    self.current_audio_chunk = None
-                    self.chunk_position = 0
+    def _on_played(self, item_id: str, content_index: int, data: bytes) -> None:
+        """Inform playback tracker about played bytes."""
+        if item_id.startswith(LOCAL_ITEM_PREFIXES):
+            return
+        self.playback_tracker.on_play_bytes(
+            item_id=item_id, item_content_index=content_index, bytes=data
+        )
 
-    async def run(self) -> None:
-        print("Connecting, may take a few seconds...")
+    def _output_callback(self, outdata, frames: int, time, status) -> None:
+        """Callback for audio output - handles continuous audio stream from server."""
+        now = monotonic()
+        if self.scheduler:
+            self.scheduler.on_callback(now, frames)
+        self.stream_stats.record_output_status(status)
+        if status:
+            logger.rate_limited(
+                "WARNING", "Output callback status: {}", status, rate=1.0
+            )
 
-        # Initialize audio player with callback
-        chunk_size = int(SAMPLE_RATE * CHUNK_LENGTH_S)
+        if self.playback.fill(outdata):
+            self.echo_gate.record_output(now, rms_energy(outdata[:, 0]))
+        if self.audio_bus:
+            self.audio_bus.publish_playback(outdata, now)
+
+    def _load_calibration(self) -> None:
+        """Align echo and barge-in decisions with the calibrated round-trip latency."""
+        path = os.getenv("EDUBUDDY_CALIBRATION_FILE", DEFAULT_CALIBRATION_FILE)
+        try:
+            key = device_key(self.mic_device, None)
+        except Exception as e:
+            logger.warning("无法识别音频设备，跳过延迟校准: {}", e)
+            return
+        calibration = load_calibration(key, path)
+        if calibration is None:
+            logger.info(
+                "设备未校准，回声判断不做延迟对齐（可运行 edubuddy calibrate）: {}", key
+            )
+            return
+        self.echo_gate = EchoGate(
+            latency_s=calibration.latency_s, echo_gain=calibration.echo_gain
+        )
+        logger.info(
+            "已加载延迟校准: {} - 回环延迟 {}ms，回声增益 {}",
+            key,
+            calibration.latency_ms,
+            calibration.echo_gain,
+        )
+
+    def _open_output_stream(self, level: TuningLevel) -> None:
+        """(Re)open the callback output stream with the given blocksize and latency."""
+        if self.audio_player:
+            self.audio_player.stop()
+            self.audio_player.close()
+        if self.scheduler:
+            # The new stream calls back on a new thread, which needs elevating again
+            self.scheduler.stream_restarted()
         self.audio_player = sd.OutputStream(
             channels=CHANNELS,
             samplerate=SAMPLE_RATE,
             dtype=FORMAT,
             callback=self._output_callback,
-            blocksize=chunk_size,  # Match our chunk timing for better alignment
+            blocksize=level.blocksize,
+            latency=level.latency_s,
         )
         self.audio_player.start()
 
+    def _open_input_stream(self, level: TuningLevel) -> None:
+        """(Re)open the microphone stream with the given blocksize and latency."""
+        if self.audio_stream:
+            self.audio_stream.stop()
+            self.audio_stream.close()
+        self.audio_stream = sd.InputStream(
+            device=self.mic_device,
+            channels=CHANNELS,
+            samplerate=SAMPLE_RATE,
+            dtype=FORMAT,
+            blocksize=level.blocksize,
+            latency=level.latency_s,
+        )
+
+    async def _retune(self) -> None:
+        """Apply auto-tuner decisions; streams reopen only while both sides idle."""
+        if not self.tuner:
+            return
+        level = self.tuner.update()
+        if level is not None:
+            # Prebuffer depth applies to the next jitter-buffer fill without a restart
+            self.playback.prebuffer_target_chunks = level.prebuffer_chunks
+            self.pending_level = level
+        if (
+            self.pending_level is None
+            or self.playback.is_playing
+            or not self.uplink_activity.idle
+        ):
+            return
+        level, self.pending_level = self.pending_level, None
+        # Closing and opening PortAudio streams blocks; the capture loop awaits this,
+        # so nothing reads the input stream while it is being replaced
+        loop = asyncio.get_running_loop()
         try:
-            runner = RealtimeRunner(agent)
-            # Attach playback tracker and enable server‑side interruptions + auto response.
-            model_config: RealtimeModelConfig = {
-                "playback_tracker": self.playback_tracker,
-                "initial_model_settings": {
-                    "turn_detection": {
-                        "type": "semantic_vad",
-                        "interrupt_response": True,
-                        "create_response": True,
-                    },
-                },
-            }
-            async with await runner.run(model_config=model_config) as session:
-                self.session = session
-                print("Connected. Starting audio recording...")
+            await loop.run_in_executor(None, self._reopen_streams, level)
+        except Exception as e:
+            logger.error("❌ 重新打开音频流失败: {}", e)
+
+    def _reopen_streams(self, level: TuningLevel) -> None:
+        """Reopen both audio streams with a new tuning level (runs in an executor)."""
+        self.stream_level = level
+        self._open_output_stream(level)
+        self._open_input_stream(level)
+        self.audio_stream.start()
+
+    def _start_flight_recorder(self) -> None:
+        """Dump the trace ring on SIGUSR1, uncaught exceptions and loop errors."""
+        trace_dir = os.getenv("EDUBUDDY_TRACE_DIR")
+        if trace_dir:
+            recorder.configure(directory=trace_dir)
+        recorder.install_signal_handler()
+        recorder.install_excepthooks()
+        loop = asyncio.get_running_loop()
+
+        def on_loop_error(loop: asyncio.AbstractEventLoop, context: dict) -> None:
+            recorder.dump_on_error(f"事件循环异常: {context.get('message')}")
+            loop.default_exception_handler(context)
+
+        loop.set_exception_handler(on_loop_error)
+
+    async def run(self) -> None:
+        logger.info("Connecting, may take a few seconds...")
+        self._start_flight_recorder()
+        self._load_calibration()
+        self._load_wake_word()
+        self._build_pipelines()
+        self._start_audio_bus()
+        self._start_response_cache()
+        # Start connecting now so the handshake overlaps the rest of the local setup
+        self._start_session_pool()
+        self.uplink.start()
+        self.downlink.start()
+        # The governor goes first so the reloader defers LOG_LEVEL to it while degraded
+        self._start_governor()
+        self._start_config_reloader()
+        self._start_scheduler()
+        self._start_control()
 
-                # Start audio recording
-                await self.start_audio_recording()
-                print("Audio recording started. You can start speaking - expect lots of logs!")
+        # Initialize audio player with callback
+        self._open_output_stream(self.stream_level)
 
-                # Process session events
-                async for event in session:
-                    await self._on_event(event)
+        try:
+            while True:
+                pooled = await self.session_pool.acquire()
+                async with pooled as session:
+                    self.session = session
+                    self._reset_session_state()
+                    logger.info(
+                        "Connected (waited {:.2f}s, pre-connected: {}). "
+                        "Starting audio recording...",
+                        pooled.waited_s,
+                        pooled.hit,
+                    )
+                    # New session: let the tuner converge quickly again
+                    if self.tuner:
+                        self.tuner.reset()
+
+                    # Start recording once; later sessions reuse the running streams
+                    if not self.recording:
+                        await self.start_audio_recording()
+                        logger.info(
+                            "Audio recording started. "
+                            "You can start speaking - expect lots of logs!"
+                        )
+
+                    # Process session events
+                    async for event in session:
+                        await self._on_event(event)
+
+                if not self.session_pool.size:
+                    break
+                # The server closed the session: switch to the next pre-connected one
+                logger.info("会话已结束，切换到预先建立的会话")
 
         finally:
             # Clean up audio player
@@ -278,202 +801,295 @@ class NoUIDemo:
                 self.audio_player.stop()
             if self.audio_player:
                 self.audio_player.close()
-
-        print("Session ended")
+            if self.control:
+                self.control.stop()
+            if self.reloader:
+                self.reloader.stop()
+            if self.governor:
+                self.governor.stop()
+            for worker in (self.uplink, self.downlink):
+                if worker:
+                    worker.stop()
+            if self.audio_bus:
+                # Stop the capture loop before the bus segments go away
+                self.recording = False
+                self.audio_bus.close()
+            if self.response_cache is not None:
+                self.response_cache.close()
+            if self.session_pool:
+                await self.session_pool.close()
+
+        logger.info("Session ended")
 
     async def start_audio_recording(self) -> None:
         """Start recording audio from the microphone."""
-        print("🎤 正在初始化音频输入流...")
-        
+        logger.info("🎤 正在初始化音频输入流...")
+
         # 检查可用的音频设备
         try:
             devices = sd.query_devices()
             default_input = sd.default.device[0]
-            print(f"📱 默认输入设备: {default_input}")
-            print(f"🎧 可用音频设备数量: {len(devices)}")
+            logger.info("📱 默认输入设备: {}", default_input)
+            logger.info("🎧 可用音频设备数量: {}", len(devices))
         except Exception as e:
-            print(f"⚠️  查询音频设备时出错: {e}")
-        
-        # Set up audio input stream
+            logger.warning("⚠️  查询音频设备时出错: {}", e)
+
+        # Set up audio input stream; reads stay 40ms regardless of the tuned blocksize
         try:
-            mic_device = 0
-            chunk_size = int(SAMPLE_RATE * CHUNK_LENGTH_S)
-            self.audio_stream = sd.InputStream(
-                device=mic_device,
-                channels=CHANNELS,
-                samplerate=SAMPLE_RATE,
-                dtype=FORMAT,
-                blocksize=chunk_size  # 明确要求一次 40ms
+            mic_device = self.mic_device
+            self._open_input_stream(self.stream_level)
+            logger.info(
+                "✅ 音频流创建成功 - 采样率: {}Hz, 通道数: {}, 格式: {}",
+                SAMPLE_RATE,
+                CHANNELS,
+                FORMAT,
+            )
+            logger.info(
+                "✅ 使用音频输入设备: {} - {}",
+                mic_device,
+                sd.query_devices(mic_device)["name"],
             )
-            print(f"✅ 音频流创建成功 - 采样率: {SAMPLE_RATE}Hz, 通道数: {CHANNELS}, 格式: {FORMAT}")
-            print(f"✅ 使用音频输入设备: {mic_device} - {sd.query_devices(mic_device)['name']}")
         except Exception as e:
-            print(f"❌ 创建音频输入流失败: {e}")
+            logger.error("❌ 创建音频输入流失败: {}", e)
             return
 
         try:
             self.audio_stream.start()
             self.recording = True
-            print("🎵 音频流已启动，开始录制...")
-            print(f"📊 音频流状态: active={self.audio_stream.active}")
+            logger.info("🎵 音频流已启动，开始录制...")
+            logger.info("📊 音频流状态: active={}", self.audio_stream.active)
         except Exception as e:
-            print(f"❌ 启动音频流失败: {e}")
+            logger.error("❌ 启动音频流失败: {}", e)
             return
 
-        # Start audio capture task
+        # Start audio capture and uplink sender tasks
         asyncio.create_task(self.capture_audio())
-        print("🔄 音频捕获任务已创建")
+        asyncio.create_task(self.send_uplink())
+        logger.info("🔄 音频捕获任务已创建")
 
     async def capture_audio(self) -> None:
         """Capture audio from the microphone and send to the session."""
         if not self.audio_stream or not self.session:
-            print("❌ 音频流或会话未初始化，无法开始音频捕获")
+            logger.error("❌ 音频流或会话未初始化，无法开始音频捕获")
             return
 
-        print("🎯 开始音频捕获循环...")
+        logger.info("🎯 开始音频捕获循环...")
         # Buffer size in samples
         read_size = int(SAMPLE_RATE * CHUNK_LENGTH_S)
-        print(f"📏 读取缓冲区大小: {read_size} 样本 ({CHUNK_LENGTH_S*1000}ms)")
-
-        audio_chunks_sent = 0
-        last_energy_log_time = 0
+        logger.info(
+            "📏 读取缓冲区大小: {} 样本 ({}ms)", read_size, CHUNK_LENGTH_S * 1000
+        )
 
         try:
-            # Simple energy-based barge-in: if user speaks while audio is playing, interrupt.
-            def rms_energy(samples: np.ndarray[Any, np.dtype[Any]]) -> float:
-                if samples.size == 0:
-                    return 0.0
-                # Normalize int16 to [-1, 1]
-                x = samples.astype(np.float32) / 32768.0
-                return float(np.sqrt(np.mean(x * x)))
-
-            def downsample_48k_to_24k(samples_48k: np.ndarray) -> np.ndarray:
-                """将 48000Hz 音频下采样到 24000Hz 并转换为 int16"""
-                import numpy as np
-                from scipy.signal import resample_poly
-
-                # 上下采样
-                samples_24k = resample_poly(samples_48k, up=1, down=2)
-
-                # 保证幅度不超范围并转换为 int16
-                samples_24k = np.clip(samples_24k, -32768, 32767).astype(np.int16)
-                return samples_24k
-
+            # Denoise, energy, barge-in and downsampling run on the uplink worker thread
             while self.recording:
                 # Check if there's enough data to read
                 available = self.audio_stream.read_available
 
-                # print(f"可读取样本: {available}, 目标: {read_size}")
+                # logger.debug("可读取样本: {}, 目标: {}", available, read_size)
                 if available < read_size:
                     await asyncio.sleep(0.01)
                     continue
 
                 # Read audio data
-                data, _ = self.audio_stream.read(read_size)
-                audio_chunks_sent += 1
-
-                # Convert numpy array to bytes
-                # audio_bytes = data.tobytes()
-
-                # 计算音频能量用于调试
-                samples = data.reshape(-1)
-                current_energy = rms_energy(samples)
-
-                # # 将 48000Hz 音频下采样到 24000Hz
-                audio_bytes = downsample_48k_to_24k(samples)
-                
-                # 每5秒记录一次音频状态
-                import time
-                current_time = time.time()
-                if current_time - last_energy_log_time > 5:
-                    print(f"🎙️  音频捕获状态 - 已发送块数: {audio_chunks_sent}, 当前能量: {current_energy:.4f}, 阈值: {ENERGY_THRESHOLD}")
-                    last_energy_log_time = current_time
-
-                # Smart barge‑in: if assistant audio is playing, send only if mic has speech.
-                assistant_playing = (
-                    self.current_audio_chunk is not None or not self.output_queue.empty()
-                )
-                if assistant_playing:
-                    # Compute RMS energy to detect speech while assistant is talking
-                    if current_energy >= ENERGY_THRESHOLD:
-                        print(f"🔊 检测到用户语音，能量: {current_energy:.4f}，中断助手音频")
-                        # Locally flush queued assistant audio for snappier interruption.
-                        self.interrupt_event.set()
-                        await self.session.send_audio(audio_bytes)
-                else:
-                    await self.session.send_audio(audio_bytes)
+                data, overflowed = self.audio_stream.read(read_size)
+                self.stream_stats.record_input(overflowed)
+                captured_at = monotonic()
+                if self.audio_bus:
+                    self.audio_bus.publish_capture(data, captured_at)
+                self.uplink.submit(Frame(data.reshape(-1), captured_at))
+
+                await self._retune()
 
                 # Yield control back to event loop
                 await asyncio.sleep(0)
 
         except Exception as e:
-            print(f"❌ 音频捕获错误: {e}")
+            logger.error("❌ 音频捕获错误: {}", e)
+            recorder.dump_on_error(f"音频捕获错误: {e}")
             import traceback
-            print(f"详细错误信息: {traceback.format_exc()}")
+
+            logger.error("详细错误信息: {}", traceback.format_exc())
         finally:
-            print("🧹 清理音频流资源...")
+            logger.info("🧹 清理音频流资源...")
             if self.audio_stream and self.audio_stream.active:
                 self.audio_stream.stop()
-                print("⏹️  音频流已停止")
+                logger.info("⏹️  音频流已停止")
             if self.audio_stream:
                 self.audio_stream.close()
-                print("🔒 音频流已关闭")
+                logger.info("🔒 音频流已关闭")
+
+    async def send_uplink(self) -> None:
+        """Send processed microphone chunks from the uplink pipeline to the session."""
+        audio_chunks_sent = 0
+        aggregator = self.aggregator
+        while self.recording:
+            deadline = aggregator.deadline if aggregator else None
+            if deadline is None:
+                frame = await self.uplink.get()
+            else:
+                # Idle audio is being batched: send it once it has waited max_ms
+                try:
+                    frame = await asyncio.wait_for(
+                        self.uplink.get(), max(0.0, deadline - monotonic())
+                    )
+                except asyncio.TimeoutError:
+                    batch = aggregator.flush()
+                    if batch and await self._send_audio(*batch):
+                        audio_chunks_sent += batch[1]
+                        recorder.record(EVENT_CHUNK_SENT, audio_chunks_sent, 0.0)
+                    continue
+
+            energy = frame.meta.get("energy", 0.0)
+            self.uplink_activity.record(energy)
+            if frame.meta.get("barge_in"):
+                logger.info("🔊 检测到用户语音，能量: {:.4f}，中断助手音频", energy)
+            if frame.meta.get("wake"):
+                logger.info(
+                    "👂 检测到唤醒词（匹配代价 {:.3f}），开始上行",
+                    self.wake_gate.spotter.score,
+                )
+            batch = aggregator.add(frame) if aggregator else (frame.samples, 1)
+            if batch is None or not await self._send_audio(*batch):
+                continue
+            audio_chunks_sent += batch[1]
+            recorder.record(EVENT_CHUNK_SENT, audio_chunks_sent, energy)
+
+            # 每5秒记录一次音频状态
+            logger.rate_limited(
+                "INFO",
+                "🎙️  音频捕获状态 - 已发送块数: {}, 当前能量: {:.4f}, 阈值: {}",
+                audio_chunks_sent,
+                energy,
+                ENERGY_THRESHOLD,
+                rate=0.2,
+            )
+
+    async def _send_audio(self, audio: np.ndarray, chunks: int) -> bool:
+        """Send one (possibly aggregated) uplink frame, timing its encoding cost."""
+        start = thread_time_ns()
+        try:
+            await self.session.send_audio(audio)
+        except Exception as e:
+            logger.error("❌ 发送音频失败: {}", e)
+            return False
+        if self.aggregator:
+            self.aggregator.record_send(len(audio), thread_time_ns() - start)
+        return True
 
     async def _on_event(self, event: RealtimeSessionEvent) -> None:
         """Handle session events."""
         try:
             if event.type == "agent_start":
-                print(f"Agent started: {event.agent.name}")
+                logger.info("Agent started: {}", event.agent.name)
             elif event.type == "agent_end":
-                print(f"Agent ended: {event.agent.name}")
+                logger.info("Agent ended: {}", event.agent.name)
+                if self.recorder:
+                    self.recorder.finish()
+                self.serving_cached = False
+                self._streaming_item = None
             elif event.type == "handoff":
-                print(f"Handoff from {event.from_agent.name} to {event.to_agent.name}")
+                logger.info(
+                    "Handoff from {} to {}", event.from_agent.name, event.to_agent.name
+                )
             elif event.type == "tool_start":
-                print(f"Tool started: {event.tool.name}")
+                logger.info("Tool started: {}", event.tool.name)
             elif event.type == "tool_end":
-                print(f"Tool ended: {event.tool.name}; output: {event.output}")
+                logger.info("Tool ended: {}; output: {}", event.tool.name, event.output)
             elif event.type == "audio_end":
-                print("Audio ended")
+                logger.info("Audio ended")
             elif event.type == "audio":
+                if self.serving_cached:
+                    return  # Answered from the response cache
                 # Enqueue audio for callback-based playback with metadata
                 np_audio = np.frombuffer(event.audio.data, dtype=np.int16)
                 # 假设 CHUNK_LENGTH_S = 0.04 s
                 n = len(np_audio)
+                recorder.record(EVENT_DELTA_RECEIVED, n, event.content_index)
                 expected = 24000 * 0.04  # = 960
-                print("实际样本数:", n, "与期望:", expected)
-                def upsample_24k_to_48k(samples_24k: np.ndarray) -> np.ndarray:
-                    # up=2, down=1 => 24k -> 48k
-                    return resample_poly(samples_24k, up=2, down=1)
-
-                # 先做 upsample -> 48kHz
-                np_audio_48k = upsample_24k_to_48k(np_audio)
-
-                # Non-blocking put; queue is unbounded, so drops won’t occur.
-                self.output_queue.put_nowait((np_audio_48k, event.item_id, event.content_index))
+                logger.sampled(
+                    "DEBUG", "实际样本数: {} 与期望: {}", n, expected, every=50
+                )
+                if self.recorder:
+                    self.recorder.add_audio(np_audio)
+                if self.replay_ring is not None:
+                    self.replay_ring.add_audio(event.item_id, np_audio)
+                    self._streaming_item = event.item_id
+
+                # upsample -> 48kHz on the downlink worker, which enqueues for playback
+                await self.downlink.put(
+                    Frame(
+                        np_audio,
+                        meta={
+                            "item_id": event.item_id,
+                            "content_index": event.content_index,
+                        },
+                    )
+                )
             elif event.type == "audio_interrupted":
-                print("Audio interrupted")
-                # Begin graceful fade + flush in the audio callback and rebuild jitter buffer.
-                self.prebuffering = True
-                self.interrupt_event.set()
+                if self.serving_cached:
+                    # Echo of our own cancel; local barge-in still stops cached audio
+                    return
+                logger.info("Audio interrupted")
+                if self.recorder:
+                    self.recorder.interrupted()
+                if self.replay_ring is not None:
+                    self.replay_ring.mark_interrupted(event.item_id)
+                    self._streaming_item = None
+                # Drop audio still being upsampled, then begin graceful fade + flush in
+                # the audio callback and rebuild jitter buffer.
+                self.downlink.clear()
+                self.playback.interrupt()
             elif event.type == "error":
-                print(f"Error: {event.error}")
+                logger.error("Error: {}", event.error)
+                recorder.dump_on_error(
+                    f"error 事件: {_truncate_str(str(event.error), 200)}"
+                )
             elif event.type == "history_updated":
                 pass  # Skip these frequent events
             elif event.type == "history_added":
                 pass  # Skip these frequent events
             elif event.type == "raw_model_event":
-                print(f"Raw model event: {_truncate_str(str(event.data), 200)}")
+                data_type = getattr(event.data, "type", None)
+                if data_type == "input_audio_transcription_completed":
+                    if self.recorder or self.replay_on_request:
+                        await self._on_question(
+                            event.data.transcript, event.data.item_id
+                        )
+                elif data_type == "raw_server_event":
+                    payload = event.data.data
+                    # Each answer belongs to the input item committed just before it
+                    if (
+                        self.recorder
+                        and payload.get("type") == "input_audio_buffer.committed"
+                    ):
+                        self.recorder.input_committed(payload["item_id"])
+                elif data_type == "transcript_delta":
+                    if self.recorder:
+                        self.recorder.add_text(event.data.delta)
+                    item_id = getattr(event.data, "item_id", None)
+                    if self.replay_ring is not None and item_id:
+                        self.replay_ring.add_text(item_id, event.data.delta)
+                logger.rate_limited(
+                    "DEBUG",
+                    lambda: f"Raw model event: {_truncate_str(str(event.data), 200)}",
+                    rate=5.0,
+                    burst=20,
+                )
             else:
-                print(f"Unknown event type: {event.type}")
+                logger.warning("Unknown event type: {}", event.type)
         except Exception as e:
-            print(f"Error processing event: {_truncate_str(str(e), 200)}")
+            logger.error("Error processing event: {}", _truncate_str(str(e), 200))
+            recorder.dump_on_error(
+                f"处理 {event.type} 事件出错: {_truncate_str(str(e), 200)}"
+            )
 
 
 if __name__ == "__main__":
-    print("Starting Realtime Agent...")
+    logger.info("Starting Realtime Agent...")
     demo = NoUIDemo()
     try:
         asyncio.run(demo.run())
     except KeyboardInterrupt:
-        print("\nExiting...")
+        logger.info("Exiting...")
         sys.exit(0)
@@ -0,0 +1,307 @@
+"""
+回复重播模块
+
+学生经常请助手"再说一遍"，每次都要模型重新生成一遍回答。在内存中按 item_id
+保留最近 N 条助手回复的音频，收到重播请求时直接经播放路径在本地重放，不联系模型。
+
+存储方式:
+    - 音频按 G.711 μ-law 压缩为每样本1字节（int16 PCM 的一半），
+      编码用 64K 项查表，解码用 256 项查表，40ms 一块只需几微秒
+    - 回复数和总字节数都有上限，超出时淘汰最早的回复；
+      单条回复超过字节上限时不再追加，记为截断
+"""
+
+import collections
+import threading
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio import MODEL_SAMPLE_RATE, AudioArray
+from .response_cache import normalize_transcript
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
+
+# 默认保留的回复数和压缩后总字节数（24kHz μ-law 每秒24KB，4MB约170秒）
+DEFAULT_MAX_RESPONSES = 5
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+# 视为"重复上一条回答"的说法（规范化后匹配）
+REPEAT_PHRASES = (
+    "再说一遍",
+    "再说一次",
+    "再讲一遍",
+    "再讲一次",
+    "重复一遍",
+    "重复一下",
+    "重复一次",
+    "没听清",
+    "repeat that",
+    "say that again",
+)
+
+# 重播请求的最大长度（去掉空格后的字符数），更长的提问按新问题处理
+MAX_REQUEST_CHARS = 12
+
+_MULAW_BIAS = 0x84
+_MULAW_CLIP = 32635
+
+
+def _build_tables() -> Tuple[np.ndarray, np.ndarray]:
+    """生成 μ-law 编码表（按 int16 的 uint16 视图索引）和解码表"""
+    values = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32)
+    sign = (values < 0).astype(np.int32) << 7
+    magnitude = np.minimum(np.abs(values), _MULAW_CLIP) + _MULAW_BIAS
+    exponent = np.clip(np.floor(np.log2(magnitude)).astype(np.int32) - 7, 0, 7)
+    mantissa = (magnitude >> (exponent + 3)) & 0x0F
+    encode = (~(sign | (exponent << 4) | mantissa) & 0xFF).astype(np.uint8)
+
+    codes = ~np.arange(256, dtype=np.int32) & 0xFF
+    exponent = (codes >> 4) & 0x07
+    magnitude = (((codes & 0x0F) << 3) + _MULAW_BIAS << exponent) - _MULAW_BIAS
+    decode = np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+    return encode, decode
+
+
+_ENCODE, _DECODE = _build_tables()
+
+
+def mulaw_encode(samples: AudioArray) -> bytes:
+    """
+    把 int16 PCM 编码为 μ-law
+
+    Args:
+        samples: int16 音频
+
+    Returns:
+        每样本1字节的 μ-law 数据
+    """
+    samples = np.asarray(samples, dtype=np.int16)
+    return _ENCODE[samples.view(np.uint16)].tobytes()
+
+
+def mulaw_decode(data: bytes) -> AudioArray:
+    """
+    把 μ-law 数据解码为 int16 PCM
+
+    Args:
+        data: μ-law 数据
+
+    Returns:
+        int16 音频
+    """
+    return _DECODE[np.frombuffer(data, dtype=np.uint8)]
+
+
+def is_repeat_request(transcript: str) -> bool:
+    """
+    判断一句提问是否是请助手重复上一条回答
+
+    Args:
+        transcript: 提问的转写文本
+
+    Returns:
+        是否是简短的重播请求
+    """
+    text = normalize_transcript(transcript)
+    if len(text.replace(" ", "")) > MAX_REQUEST_CHARS:
+        return False
+    return any(phrase in text for phrase in REPEAT_PHRASES)
+
+
+@dataclass
+class ReplayEntry:
+    """一条保留的助手回复"""
+
+    item_id: str
+    transcript: str = ""
+    samples: int = 0
+    sample_rate: int = MODEL_SAMPLE_RATE
+    created: float = 0.0
+    interrupted: bool = False
+    truncated: bool = False
+    replays: int = 0
+
+    @property
+    def duration_s(self) -> float:
+        return self.samples / self.sample_rate
+
+
+class ReplayRing:
+    """最近若干条助手回复的压缩内存环，按 item_id 索引"""
+
+    def __init__(
+        self,
+        max_responses: int = DEFAULT_MAX_RESPONSES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        sample_rate: int = MODEL_SAMPLE_RATE,
+    ):
+        """
+        初始化重播环
+
+        Args:
+            max_responses: 保留的回复数
+            max_bytes: 压缩后音频的总字节数上限
+            sample_rate: 回复音频的采样率
+
+        Raises:
+            ValueError: 参数无效
+        """
+        if max_responses < 1:
+            raise ValueError("保留的回复数必须至少为1")
+        if max_bytes <= 0:
+            raise ValueError("字节上限必须大于0")
+        self.max_responses = max_responses
+        self.max_bytes = max_bytes
+        self.sample_rate = sample_rate
+        self.stored_bytes = 0
+        self.replays = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._entries: "collections.OrderedDict[str, ReplayEntry]" = (
+            collections.OrderedDict()
+        )
+        self._audio: Dict[str, List[bytes]] = {}
+        self._text: Dict[str, List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._entries
+
+    def _entry(self, item_id: str) -> ReplayEntry:
+        """取出或新建回复条目，新建时按回复数上限淘汰最早的回复"""
+        entry = self._entries.get(item_id)
+        if entry is None:
+            entry = ReplayEntry(
+                item_id, sample_rate=self.sample_rate, created=time.time()
+            )
+            self._entries[item_id] = entry
+            self._audio[item_id] = []
+            self._text[item_id] = []
+            while len(self._entries) > self.max_responses:
+                self._evict_oldest()
+        return entry
+
+    def _remove(self, item_id: str) -> None:
+        del self._entries[item_id]
+        self.stored_bytes -= sum(len(chunk) for chunk in self._audio.pop(item_id))
+        del self._text[item_id]
+
+    def _evict_oldest(self) -> None:
+        self._remove(next(iter(self._entries)))
+        self.evictions += 1
+
+    def add_audio(self, item_id: str, samples: AudioArray) -> None:
+        """
+        追加一块回复音频
+
+        Args:
+            item_id: 回复的 item_id
+            samples: int16 音频（模型采样率）
+        """
+        with self._lock:
+            entry = self._entry(item_id)
+            if entry.truncated:
+                return
+            size = len(samples)
+            if entry.samples + size > self.max_bytes:
+                entry.truncated = True
+                return
+            while self.stored_bytes + size > self.max_bytes and len(self._entries) > 1:
+                if next(iter(self._entries)) == item_id:
+                    break
+                self._evict_oldest()
+            self._audio[item_id].append(mulaw_encode(samples))
+            entry.samples += size
+            self.stored_bytes += size
+
+    def add_text(self, item_id: str, delta: str) -> None:
+        """追加一段回复文本"""
+        with self._lock:
+            self._entry(item_id)
+            self._text[item_id].append(delta)
+
+    def put(self, item_id: str, samples: AudioArray, transcript: str = "") -> None:
+        """保存一条完整的回复（例如从回复缓存播放的回答）"""
+        self.add_audio(item_id, samples)
+        if transcript:
+            self.add_text(item_id, transcript)
+
+    def discard(self, item_id: str) -> bool:
+        """丢弃一条回复，返回是否存在"""
+        with self._lock:
+            if item_id not in self._entries:
+                return False
+            self._remove(item_id)
+            return True
+
+    def mark_interrupted(self, item_id: str) -> None:
+        """回复播放时被打断，保留已收到的部分"""
+        with self._lock:
+            entry = self._entries.get(item_id)
+            if entry is not None:
+                entry.interrupted = True
+
+    def get(
+        self, item_id: Optional[str] = None
+    ) -> Optional[Tuple[ReplayEntry, AudioArray]]:
+        """
+        取出一条回复用于重播
+
+        Args:
+            item_id: 回复的 item_id，默认最近的一条
+
+        Returns:
+            (条目, int16音频)，没有时返回None
+        """
+        with self._lock:
+            if item_id is None:
+                item_id = next(
+                    (key for key, e in reversed(self._entries.items()) if e.samples),
+                    None,
+                )
+            entry = self._entries.get(item_id) if item_id is not None else None
+            if entry is None or not entry.samples:
+                return None
+            chunks = self._audio[item_id]
+            if len(chunks) > 1:
+                # 合并成一块，之后的重播不再拼接
+                chunks[:] = [b"".join(chunks)]
+            entry.transcript = "".join(self._text[item_id])
+            entry.replays += 1
+            self.replays += 1
+            return entry, mulaw_decode(chunks[0])
+
+    def entries(self) -> List[ReplayEntry]:
+        """保留的回复，最近的在前"""
+        with self._lock:
+            for item_id, entry in self._entries.items():
+                entry.transcript = "".join(self._text[item_id])
+            return list(reversed(self._entries.values()))
+
+    def clear(self) -> None:
+        """清空所有回复"""
+        with self._lock:
+            self._entries.clear()
+            self._audio.clear()
+            self._text.clear()
+            self.stored_bytes = 0
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """注册重播环指标"""
+        registry.register("replay.responses", lambda: len(self), "保留的回复数")
+        registry.register(
+            "replay.stored_bytes", lambda: self.stored_bytes, "压缩后的音频字节数"
+        )
+        registry.register(
+            "replay.replays_total", lambda: self.replays, "本地重播次数", "counter"
+        )
+        registry.register(
+            "replay.evictions_total", lambda: self.evictions, "淘汰的回复数", "counter"
+        )
@@ -0,0 +1,496 @@
+"""
+回复缓存模块
+
+课堂上很多学生会问同样的问题。按规范化后的提问转写文本缓存助手的回复文本和音频，
+再次遇到相同的提问时直接在本地播放，省去一次实时往返和数秒的生成。
+
+存储方式:
+    - 音频以模型采样率（24kHz）的int16 PCM存放在一个固定大小的数据文件中，
+      通过 mmap 映射到内存，读写都不经过额外的文件IO
+    - 索引（键、偏移、长度、回复文本、最近使用时间）保存为同目录下的JSON，
+      每次写入后原子替换
+    - 空间不足时按最近最少使用（LRU）淘汰，直到能放下新回复
+"""
+
+import json
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import deque
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio import MODEL_SAMPLE_RATE, AudioArray
+from .logger import logger
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
+
+# 默认缓存目录和容量
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "edubuddy", "responses"
+)
+DEFAULT_CAPACITY_MB = 64
+
+DATA_FILE = "responses.pcm"
+INDEX_FILE = "responses.json"
+
+_BYTES_PER_SAMPLE = 2
+_SPACES = re.compile(r"\s+")
+
+# 规范化后短于该长度的提问不缓存：离开上下文就没有确定的答案
+MIN_KEY_LENGTH = 4
+# 依赖上文的追问，同样的文字在不同对话中需要不同的回答
+FOLLOW_UP_KEYS = frozenset(
+    {
+        "为什么呢",
+        "然后呢",
+        "还有呢",
+        "什么意思",
+        "是什么意思",
+        "再说一遍",
+        "再讲一遍",
+        "继续说",
+        "继续讲",
+        "怎么回事",
+        "go on",
+        "and then",
+        "continue",
+        "what do you mean",
+        "say that again",
+    }
+)
+
+# 记住已回答过的输入条目数，用于识别迟到的提问转写
+_ANSWERED_INPUTS = 32
+
+
+def normalize_transcript(text: str) -> str:
+    """
+    规范化提问转写文本作为缓存键
+
+    全角半角统一（NFKC）、转小写、去掉标点和符号、合并空白，
+    使 "为什么天是蓝的？" 和 "为什么天是蓝的" 命中同一条缓存。
+
+    Args:
+        text: 转写文本
+
+    Returns:
+        规范化后的文本，可能为空字符串
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    kept = [" " if unicodedata.category(ch)[0] in "PSZC" else ch for ch in text]
+    return _SPACES.sub(" ", "".join(kept)).strip()
+
+
+def is_cacheable_key(key: str) -> bool:
+    """
+    判断规范化后的提问能否作为缓存键
+
+    过短的提问（"为什么"、"继续"）和常见追问依赖上文，不缓存也不查找。
+    """
+    return len(key) >= MIN_KEY_LENGTH and key not in FOLLOW_UP_KEYS
+
+
+@dataclass
+class CacheEntry:
+    """一条缓存的回复"""
+
+    key: str
+    transcript: str
+    offset: int
+    length: int
+    sample_rate: int = MODEL_SAMPLE_RATE
+    created: float = 0.0
+    last_used: float = 0.0
+    hits: int = 0
+
+    @property
+    def duration_s(self) -> float:
+        return self.length / _BYTES_PER_SAMPLE / self.sample_rate
+
+
+class ResponseCache:
+    """内存映射的回复缓存，按LRU淘汰"""
+
+    def __init__(
+        self,
+        directory: str = DEFAULT_CACHE_DIR,
+        capacity_mb: float = DEFAULT_CAPACITY_MB,
+        max_entry_fraction: float = 0.25,
+    ):
+        """
+        打开或创建缓存
+
+        Args:
+            directory: 缓存目录
+            capacity_mb: 音频数据文件大小（MB）
+            max_entry_fraction: 单条回复最多占容量的比例，更长的回复不缓存
+
+        Raises:
+            OSError: 无法创建缓存文件
+        """
+        if capacity_mb <= 0:
+            raise ValueError("缓存容量必须大于0")
+        if not 0 < max_entry_fraction <= 1:
+            raise ValueError("单条回复比例必须在0和1之间")
+
+        self.directory = directory
+        self.capacity = (
+            int(capacity_mb * 1024 * 1024) // _BYTES_PER_SAMPLE * _BYTES_PER_SAMPLE
+        )
+        self.max_entry_fraction = max_entry_fraction
+        self.max_entry_bytes = int(self.capacity * max_entry_fraction)
+        # 可使用的容量，资源紧张时可临时收缩
+        self.limit = self.capacity
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._data_path = os.path.join(directory, DATA_FILE)
+        self._index_path = os.path.join(directory, INDEX_FILE)
+
+        fd = os.open(self._data_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            resized = os.fstat(fd).st_size != self.capacity
+            if resized:
+                os.ftruncate(fd, self.capacity)
+            self._map = mmap.mmap(fd, self.capacity)
+        finally:
+            os.close(fd)
+        # 容量变化后旧的偏移不再可信
+        self._entries: Dict[str, CacheEntry] = {} if resized else self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    @property
+    def used_bytes(self) -> int:
+        return sum(entry.length for entry in self._entries.values())
+
+    def _load_index(self) -> Dict[str, CacheEntry]:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            entries = {
+                item["key"]: CacheEntry(**item) for item in data.get("entries", [])
+            }
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError, KeyError) as e:
+            logger.warning("回复缓存索引损坏，已清空: {}", e)
+            return {}
+        # 丢弃越界的条目
+        return {
+            key: entry
+            for key, entry in entries.items()
+            if 0 <= entry.offset and entry.offset + entry.length <= self.capacity
+        }
+
+    def _save_index(self) -> None:
+        data = {"entries": [asdict(entry) for entry in self._entries.values()]}
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".responses-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self._index_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def get(self, key: str) -> Optional[Tuple[CacheEntry, AudioArray]]:
+        """
+        查找缓存的回复
+
+        Args:
+            key: 规范化后的提问文本
+
+        Returns:
+            (条目, int16音频副本)，未命中时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(key) if key else None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            entry.hits += 1
+            entry.last_used = time.time()
+            audio = np.frombuffer(
+                self._map,
+                dtype="<i2",
+                count=entry.length // _BYTES_PER_SAMPLE,
+                offset=entry.offset,
+            ).copy()
+            self._save_index()
+            return entry, audio
+
+    def _find_gap(self, size: int) -> Optional[int]:
+        """按偏移顺序找第一个能放下 size 字节的空隙"""
+        position = 0
+        for entry in sorted(self._entries.values(), key=lambda e: e.offset):
+            if entry.offset - position >= size:
+                return position
+            position = max(position, entry.offset + entry.length)
+        return position if self.limit - position >= size else None
+
+    def put(
+        self,
+        key: str,
+        transcript: str,
+        audio: AudioArray,
+        sample_rate: int = MODEL_SAMPLE_RATE,
+    ) -> bool:
+        """
+        缓存一条回复，空间不足时淘汰最近最少使用的条目
+
+        Args:
+            key: 规范化后的提问文本
+            transcript: 助手回复的文本
+            audio: int16回复音频
+            sample_rate: 音频采样率
+
+        Returns:
+            是否已缓存（键为空、音频为空或过长时不缓存）
+        """
+        pcm = np.asarray(audio, dtype="<i2").reshape(-1).tobytes()
+        if not key or not pcm or len(pcm) > min(self.max_entry_bytes, self.limit):
+            return False
+
+        with self._lock:
+            self._entries.pop(key, None)
+            offset = self._find_gap(len(pcm))
+            while offset is None:
+                oldest = min(self._entries.values(), key=lambda e: e.last_used)
+                del self._entries[oldest.key]
+                self.evictions += 1
+                logger.debug("淘汰缓存回复: {}", oldest.key)
+                offset = self._find_gap(len(pcm))
+
+            self._map[offset : offset + len(pcm)] = pcm
+            now = time.time()
+            self._entries[key] = CacheEntry(
+                key=key,
+                transcript=transcript,
+                offset=offset,
+                length=len(pcm),
+                sample_rate=sample_rate,
+                created=now,
+                last_used=now,
+            )
+            self._save_index()
+        return True
+
+    def shrink(self, fraction: float) -> int:
+        """
+        把可用容量限制为总容量的一部分，淘汰落在其外的条目并释放其内存页
+
+        Args:
+            fraction: 可用容量比例，1.0 恢复全部容量
+
+        Returns:
+            淘汰的条目数
+        """
+        if not 0 < fraction <= 1:
+            raise ValueError("容量比例必须在0和1之间")
+        with self._lock:
+            self.limit = int(self.capacity * fraction)
+            outside = [
+                key
+                for key, entry in self._entries.items()
+                if entry.offset + entry.length > self.limit
+            ]
+            for key in outside:
+                del self._entries[key]
+            evicted = len(outside)
+            self.evictions += evicted
+            if evicted:
+                self._save_index()
+            if self.limit < self.capacity and hasattr(self._map, "madvise"):
+                # 空闲区域的页不再计入常驻内存
+                start = self.limit // mmap.PAGESIZE * mmap.PAGESIZE
+                self._map.madvise(mmap.MADV_DONTNEED, start, self.capacity - start)
+        return evicted
+
+    def entries(self) -> List[CacheEntry]:
+        """按最近使用时间排序的条目（最近的在前）"""
+        return sorted(self._entries.values(), key=lambda e: e.last_used, reverse=True)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._save_index()
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._map.closed:
+                self._map.flush()
+                self._map.close()
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """注册命中率和占用指标"""
+        registry.register(
+            "cache.hits_total", lambda: self.hits, "缓存命中次数", "counter"
+        )
+        registry.register(
+            "cache.misses_total", lambda: self.misses, "缓存未命中次数", "counter"
+        )
+        registry.register(
+            "cache.evictions_total", lambda: self.evictions, "淘汰的回复数", "counter"
+        )
+        registry.register("cache.entries", lambda: len(self._entries), "缓存的回复数")
+        registry.register(
+            "cache.used_bytes", lambda: self.used_bytes, "已用的音频字节数"
+        )
+
+
+class ResponseRecorder:
+    """
+    跟踪一轮对话：记录助手回复的文本和音频，回复正常结束后写入缓存
+
+    实时会话中提问转写和回复音频是交错到达的（回复往往在转写完成前就开始，
+    转写也可能在回复结束后才到达），因此按输入条目把转写和回复对应起来：
+    每轮回复对应它开始前最近提交的输入条目（input_committed），
+    只有该条目的转写在本轮结束前到达时才写入缓存。
+    不知道条目编号时，只采用本轮回复进行中到达的转写。
+    被打断或已由缓存回答的回复不写入。
+    """
+
+    def __init__(self, cache: ResponseCache):
+        self.cache = cache
+        self.key = ""
+        self._text: List[str] = []
+        self._audio: List[AudioArray] = []
+        self._discard = False
+        # 本轮回复是否已经开始，及其对应的输入条目
+        self._responding = False
+        self._turn_input: Optional[str] = None
+        # 最近提交、尚未回答的输入条目，及回复开始前就到达的转写（键, 是否命中缓存）
+        self._latest_input: Optional[str] = None
+        self._early: Optional[Tuple[str, str, bool]] = None
+        self._answered: Deque[str] = deque(maxlen=_ANSWERED_INPUTS)
+
+    def input_committed(self, item_id: str) -> None:
+        """
+        记录一个已提交的输入条目，下一轮回复回答的就是它
+
+        Args:
+            item_id: 输入音频条目编号
+        """
+        self._latest_input = item_id
+
+    def question(
+        self, transcript: str, item_id: Optional[str] = None
+    ) -> Optional[Tuple[CacheEntry, AudioArray]]:
+        """
+        记录提问的转写并查找缓存
+
+        Args:
+            transcript: 学生提问的转写文本
+            item_id: 转写所属的输入条目编号
+
+        Returns:
+            命中时返回缓存的回复，该轮服务端的回复随后不再记录；
+            转写已过时（所属条目已回答）或无法对应到回复时返回None
+        """
+        key = normalize_transcript(transcript)
+        if item_id is not None and item_id in self._answered:
+            logger.debug("忽略迟到的提问转写: {}", key)
+            return None
+
+        if self._responding:
+            if item_id is not None and self._turn_input not in (None, item_id):
+                # 属于之后的输入，本轮回复不是它的答案
+                return None
+            self.key = key
+        elif item_id is not None and item_id == self._latest_input:
+            self._early = (item_id, key, False)
+        else:
+            return None
+
+        hit = self.cache.get(key) if is_cacheable_key(key) else None
+        if hit is not None:
+            if self._responding:
+                self._discard = True
+            else:
+                self._early = (item_id or "", key, True)
+        return hit
+
+    def _start_turn(self) -> None:
+        """收到本轮第一段回复：对应到最近提交的输入条目"""
+        self._responding = True
+        self._turn_input = self._latest_input
+        early, self._early = self._early, None
+        if early is not None and early[0] == self._turn_input:
+            _, self.key, self._discard = early
+
+    def add_audio(self, samples: AudioArray) -> None:
+        """记录一块回复音频（模型采样率）"""
+        if not self._responding:
+            self._start_turn()
+        if not self._discard:
+            self._audio.append(np.array(samples, dtype=np.int16))
+
+    def add_text(self, delta: str) -> None:
+        """记录一段回复文本"""
+        if not self._responding:
+            self._start_turn()
+        if not self._discard:
+            self._text.append(delta)
+
+    def interrupted(self) -> None:
+        """回复被打断，只有部分内容，不缓存"""
+        self._discard = True
+
+    def finish(self) -> bool:
+        """
+        回复结束：写入缓存并开始新的一轮
+
+        Returns:
+            是否写入了缓存
+        """
+        stored = False
+        if is_cacheable_key(self.key) and self._audio and not self._discard:
+            stored = self.cache.put(
+                self.key, "".join(self._text), np.concatenate(self._audio)
+            )
+            if stored:
+                logger.debug("已缓存回复: {}", self.key)
+        answered = self._turn_input if self._responding else None
+        if not self._responding and self._early is not None and self._early[2]:
+            # 本轮由缓存回答，服务端的回复没有记录任何内容
+            answered = self._early[0]
+            self._early = None
+        if answered:
+            self._answered.append(answered)
+            if answered == self._latest_input:
+                self._latest_input = None
+        self._end_turn()
+        return stored
+
+    def reset(self) -> None:
+        """切换会话：丢弃未结束的一轮，忘记上一个会话的输入条目"""
+        self._end_turn()
+        self._latest_input = None
+        self._early = None
+        self._answered.clear()
+
+    def _end_turn(self) -> None:
+        """清空本轮状态"""
+        self.key = ""
+        self._text.clear()
+        self._audio.clear()
+        self._discard = False
+        self._responding = False
+        self._turn_input = None
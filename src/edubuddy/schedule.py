@@ -0,0 +1,265 @@
+"""
+计划表达式模块
+
+解析cron风格的计划表达式，并预编译为有序字段索引，直接计算下一次触发时间，
+避免通过短间隔轮询来模拟课时相关的定时任务。
+
+支持的格式:
+    分 时 日 月 周            （5段，秒固定为0）
+    秒 分 时 日 月 周         （6段）
+
+每段支持 `*`、`*/n`、`a-b`、`a-b/n`、`a,b,c`，月份和星期支持英文缩写
+（jan-dec、sun-sat），星期中0和7都表示周日。
+"""
+
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Optional, Tuple
+
+_MONTH_NAMES = {
+    name: index
+    for index, name in enumerate(
+        [
+            "jan",
+            "feb",
+            "mar",
+            "apr",
+            "may",
+            "jun",
+            "jul",
+            "aug",
+            "sep",
+            "oct",
+            "nov",
+            "dec",
+        ],
+        start=1,
+    )
+}
+
+_WEEKDAY_NAMES = {
+    name: index
+    for index, name in enumerate(["sun", "mon", "tue", "wed", "thu", "fri", "sat"])
+}
+
+_MACROS = {
+    "@yearly": "0 0 1 1 *",
+    "@annually": "0 0 1 1 *",
+    "@monthly": "0 0 1 * *",
+    "@weekly": "0 0 * * 0",
+    "@daily": "0 0 * * *",
+    "@hourly": "0 * * * *",
+}
+
+# 查找下一次触发时间的最大跨度，超出则认为表达式永不触发（如2月30日）
+_MAX_SEARCH_YEARS = 8
+
+
+def _parse_value(token: str, names: Dict[str, int], field: str) -> int:
+    """解析单个取值，支持数字和英文缩写"""
+    lowered = token.lower()
+    if lowered in names:
+        return names[lowered]
+    try:
+        return int(token)
+    except ValueError:
+        raise ValueError(f"{field}字段包含无效的值: {token}") from None
+
+
+def _parse_field(
+    expr: str,
+    low: int,
+    high: int,
+    field: str,
+    names: Optional[Dict[str, int]] = None,
+) -> Tuple[int, ...]:
+    """
+    解析单个cron字段
+
+    Args:
+        expr: 字段表达式
+        low: 允许的最小值
+        high: 允许的最大值
+        field: 字段名称，用于错误信息
+        names: 可选的名称到数值映射
+
+    Returns:
+        排序后的取值元组
+    """
+    names = names or {}
+    values = set()
+
+    for part in expr.split(","):
+        if not part:
+            raise ValueError(f"{field}字段为空: {expr}")
+
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/", 1)
+            try:
+                step = int(step_str)
+            except ValueError:
+                raise ValueError(f"{field}字段的步长无效: {step_str}") from None
+            if step <= 0:
+                raise ValueError(f"{field}字段的步长必须大于0: {step}")
+
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start_str, end_str = part.split("-", 1)
+            start = _parse_value(start_str, names, field)
+            end = _parse_value(end_str, names, field)
+        else:
+            start = _parse_value(part, names, field)
+            # "a/n" 表示从a开始到最大值
+            end = high if step != 1 else start
+
+        if start < low or end > high or start > end:
+            raise ValueError(f"{field}字段超出范围 {low}-{high}: {part}")
+
+        values.update(range(start, end + 1, step))
+
+    return tuple(sorted(values))
+
+
+class CronSchedule:
+    """cron风格计划 - 预编译字段索引，直接计算下一次触发时间"""
+
+    def __init__(self, expression: str):
+        """
+        编译计划表达式
+
+        Args:
+            expression: cron风格计划表达式
+
+        Raises:
+            ValueError: 表达式格式无效
+        """
+        self.expression = expression
+        normalized = _MACROS.get(expression.strip().lower(), expression)
+        fields = normalized.split()
+
+        if len(fields) == 5:
+            fields = ["0"] + fields
+        elif len(fields) != 6:
+            raise ValueError(f"计划表达式应包含5或6个字段: {expression}")
+
+        second, minute, hour, day, month, weekday = fields
+        self.seconds = _parse_field(second, 0, 59, "秒")
+        self.minutes = _parse_field(minute, 0, 59, "分")
+        self.hours = _parse_field(hour, 0, 23, "时")
+        self.days = _parse_field(day, 1, 31, "日")
+        self.months = _parse_field(month, 1, 12, "月", _MONTH_NAMES)
+        weekdays = _parse_field(weekday, 0, 7, "周", _WEEKDAY_NAMES)
+
+        # cron中0和7都表示周日；转换为Python的weekday()（周一为0）
+        self._weekdays: FrozenSet[int] = frozenset((w - 1) % 7 for w in weekdays)
+        self._days: FrozenSet[int] = frozenset(self.days)
+        self._hour_set: FrozenSet[int] = frozenset(self.hours)
+        self._minute_set: FrozenSet[int] = frozenset(self.minutes)
+        self._second_set: FrozenSet[int] = frozenset(self.seconds)
+        self._month_set: FrozenSet[int] = frozenset(self.months)
+        # 日和周都受限时按cron语义取并集，否则取交集
+        self._day_restricted = day != "*"
+        self._weekday_restricted = weekday != "*"
+
+    def __repr__(self) -> str:
+        return f"CronSchedule({self.expression!r})"
+
+    @staticmethod
+    def _next_value(values: Tuple[int, ...], current: int) -> Optional[int]:
+        """在有序取值中查找不小于current的下一个值"""
+        index = bisect_left(values, current)
+        return values[index] if index < len(values) else None
+
+    def _day_matches(self, moment: datetime) -> bool:
+        """判断日期是否满足日/周字段"""
+        day_ok = moment.day in self._days
+        weekday_ok = moment.weekday() in self._weekdays
+        if self._day_restricted and self._weekday_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_fire(self, after: Optional[datetime] = None) -> datetime:
+        """
+        计算严格晚于after的下一次触发时间
+
+        Args:
+            after: 起始时间，默认当前本地时间
+
+        Returns:
+            下一次触发时间（秒级精度）
+
+        Raises:
+            ValueError: 表达式在可搜索范围内永不触发
+        """
+        if after is None:
+            after = datetime.now()
+        moment = after.replace(microsecond=0) + timedelta(seconds=1)
+        limit_year = moment.year + _MAX_SEARCH_YEARS
+
+        while moment.year <= limit_year:
+            if moment.month not in self._month_set:
+                month = self._next_value(self.months, moment.month)
+                if month is None:
+                    moment = moment.replace(
+                        year=moment.year + 1,
+                        month=self.months[0],
+                        day=1,
+                        hour=0,
+                        minute=0,
+                        second=0,
+                    )
+                else:
+                    moment = moment.replace(
+                        month=month, day=1, hour=0, minute=0, second=0
+                    )
+                continue
+
+            if not self._day_matches(moment):
+                moment = moment.replace(hour=0, minute=0, second=0) + timedelta(days=1)
+                continue
+
+            if moment.hour not in self._hour_set:
+                hour = self._next_value(self.hours, moment.hour)
+                if hour is None:
+                    moment = moment.replace(hour=0, minute=0, second=0) + timedelta(
+                        days=1
+                    )
+                else:
+                    moment = moment.replace(hour=hour, minute=0, second=0)
+                continue
+
+            if moment.minute not in self._minute_set:
+                minute = self._next_value(self.minutes, moment.minute)
+                if minute is None:
+                    moment = moment.replace(minute=0, second=0) + timedelta(hours=1)
+                else:
+                    moment = moment.replace(minute=minute, second=0)
+                continue
+
+            if moment.second not in self._second_set:
+                second = self._next_value(self.seconds, moment.second)
+                if second is None:
+                    moment = moment.replace(second=0) + timedelta(minutes=1)
+                else:
+                    moment = moment.replace(second=second)
+                continue
+
+            return moment
+
+        raise ValueError(f"计划表达式永远不会触发: {self.expression}")
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> float:
+        """
+        计算距离下一次触发的秒数
+
+        Args:
+            now: 当前时间，默认当前本地时间
+
+        Returns:
+            距离下一次触发的秒数
+        """
+        if now is None:
+            now = datetime.now()
+        return (self.next_fire(now) - now).total_seconds()
@@ -0,0 +1,355 @@
+"""
+会话池模块
+
+建立实时会话（WebSocket握手、发送会话配置）需要几秒。会话池提前建立并配置好
+若干会话，请求时立即交出一个已就绪的会话，同时在后台补充新的会话；
+空闲太久的会话（服务端会话有时长上限）被关闭并替换。
+
+会话通过与批处理相同的工厂创建（返回异步上下文管理器，进入后得到会话对象），
+可以是真实的实时会话，也可以是本地替身 LocalSession。会话带有对话状态，
+用完即关闭，不放回池中。
+
+指标:
+    - 命中率: 请求时已有就绪会话的比例
+    - 就绪耗时: 后台建立一个会话的耗时
+    - 等待耗时: 请求方拿到会话实际等待的时间（命中时约为0）
+"""
+
+import asyncio
+import collections
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Deque, List, Optional, Set
+
+from .clock import SYSTEM_CLOCK, Clock
+from .logger import logger
+
+if TYPE_CHECKING:
+    from .batch import SessionFactory
+    from .control import MetricsRegistry
+
+# 默认预先建立的会话数（0为不预先建立，需要时才连接）
+DEFAULT_POOL_SIZE = 0
+
+# 会话空闲超过该时长（秒）后关闭并替换
+DEFAULT_MAX_IDLE_S = 600.0
+
+# 建立会话失败后重试的间隔（秒）
+DEFAULT_RETRY_S = 5.0
+
+
+@dataclass
+class _ReadySession:
+    """已建立、等待交出的会话"""
+
+    context: Any
+    session: Any
+    ready_at: float
+
+
+class PooledSession:
+    """从会话池取出的会话，退出时关闭"""
+
+    def __init__(self, ready: _ReadySession, waited_s: float, hit: bool):
+        self._ready = ready
+        self.session = ready.session
+        self.waited_s = waited_s
+        self.hit = hit
+
+    async def __aenter__(self) -> Any:
+        return self.session
+
+    async def __aexit__(self, *exc_info: Any) -> Any:
+        return await self._ready.context.__aexit__(*exc_info)
+
+
+class SessionPool:
+    """预连接会话池"""
+
+    def __init__(
+        self,
+        factory: "SessionFactory",
+        size: int = DEFAULT_POOL_SIZE,
+        max_idle_s: float = DEFAULT_MAX_IDLE_S,
+        retry_s: float = DEFAULT_RETRY_S,
+        clock: Optional[Clock] = None,
+    ):
+        """
+        初始化会话池
+
+        Args:
+            factory: 会话工厂
+            size: 保持就绪的会话数，0表示不预先建立（每次请求时现建）
+            max_idle_s: 会话空闲超过该时长后关闭并替换
+            retry_s: 后台建立会话失败后重试的间隔
+            clock: 计时和等待所用的时钟，默认系统时钟
+
+        Raises:
+            ValueError: 参数无效
+        """
+        if size < 0:
+            raise ValueError("会话池大小不能为负数")
+        if max_idle_s <= 0:
+            raise ValueError("空闲时长上限必须大于0")
+        self.factory = factory
+        self.size = size
+        self.max_idle_s = max_idle_s
+        self.retry_s = retry_s
+        self.clock = clock or SYSTEM_CLOCK
+
+        self._idle: Deque[_ReadySession] = collections.deque()
+        self._waiters: Deque["asyncio.Future[_ReadySession]"] = collections.deque()
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._warming = 0
+        self._reaper: Optional["asyncio.Task[None]"] = None
+        self._closed = False
+
+        # 统计
+        self.requests = 0
+        self.hits = 0
+        self.created = 0
+        self.failures = 0
+        self.retired = 0
+        self.ready_total_s = 0.0
+        self.ready_max_s = 0.0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    @property
+    def idle(self) -> int:
+        """就绪待交出的会话数"""
+        return len(self._idle)
+
+    @property
+    def warming(self) -> int:
+        """正在建立的会话数"""
+        return self._warming
+
+    @property
+    def hit_rate(self) -> float:
+        """请求时已有就绪会话的比例"""
+        return self.hits / self.requests if self.requests else 0.0
+
+    @property
+    def ready_mean_s(self) -> float:
+        """建立一个会话的平均耗时（秒）"""
+        return self.ready_total_s / self.created if self.created else 0.0
+
+    @property
+    def wait_mean_s(self) -> float:
+        """请求方平均等待时间（秒）"""
+        return self.wait_total_s / self.requests if self.requests else 0.0
+
+    def start(self) -> None:
+        """开始预先建立会话和回收空闲会话（需在事件循环中调用）"""
+        self._closed = False
+        self._refill()
+        if self._reaper is None and self.size:
+            self._reaper = asyncio.create_task(self._retire_idle())
+        logger.debug("会话池已启动，保持 {} 个就绪会话", self.size)
+
+    async def acquire(self) -> PooledSession:
+        """
+        取出一个会话，没有就绪会话时等待下一个建立完成
+
+        Returns:
+            会话上下文，进入后得到会话对象，退出时关闭会话
+
+        Raises:
+            RuntimeError: 会话池已关闭
+            Exception: 建立会话失败时工厂抛出的异常
+        """
+        if self._closed:
+            raise RuntimeError("会话池已关闭")
+        start = self.clock.monotonic()
+        self.requests += 1
+        hit = bool(self._idle)
+        if hit:
+            self.hits += 1
+            ready = self._idle.popleft()
+            self._refill()
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._refill()
+            try:
+                ready = await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif (
+                    waiter.done() and not waiter.cancelled() and not waiter.exception()
+                ):
+                    # 会话已交出但请求方被取消，放回池中
+                    self._idle.appendleft(waiter.result())
+                raise
+
+        waited = self.clock.monotonic() - start
+        self.wait_total_s += waited
+        self.wait_max_s = max(self.wait_max_s, waited)
+        return PooledSession(ready, waited, hit)
+
+    def session_factory(self) -> "SessionFactory":
+        """返回从本池取会话的工厂，可替代批处理等处的会话工厂"""
+        pool = self
+
+        class _Session:
+            async def __aenter__(self) -> Any:
+                self._pooled = await pool.acquire()
+                return await self._pooled.__aenter__()
+
+            async def __aexit__(self, *exc_info: Any) -> Any:
+                return await self._pooled.__aexit__(*exc_info)
+
+        return _Session
+
+    async def close(self) -> None:
+        """停止补充，关闭所有就绪会话，等待中的请求收到 RuntimeError"""
+        self._closed = True
+        tasks: List["asyncio.Task[None]"] = list(self._tasks)
+        if self._reaper is not None:
+            tasks.append(self._reaper)
+            self._reaper = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_exception(RuntimeError("会话池已关闭"))
+        while self._idle:
+            await self._close_session(self._idle.popleft())
+
+    def _refill(self) -> None:
+        """补足就绪和正在建立的会话，使其覆盖池大小和等待中的请求"""
+        if self._closed:
+            return
+        while self._warming + len(self._idle) < self.size + len(self._waiters):
+            self._warming += 1
+            task = asyncio.create_task(self._warm())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _warm(self) -> None:
+        """建立一个会话，交给等待的请求或放入池中"""
+        try:
+            while True:
+                start = self.clock.monotonic()
+                context = self.factory()
+                try:
+                    session = await context.__aenter__()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.failures += 1
+                    waiter = self._next_waiter()
+                    if waiter is not None:
+                        # 有请求在等：把错误交给它，由请求方决定如何处理
+                        waiter.set_exception(e)
+                        return
+                    logger.rate_limited(
+                        "WARNING",
+                        "⚠️  预先建立会话失败，{}秒后重试: {}",
+                        self.retry_s,
+                        e,
+                        rate=0.1,
+                    )
+                    await self.clock.asleep(self.retry_s)
+                    continue
+                break
+
+            now = self.clock.monotonic()
+            elapsed = now - start
+            self.created += 1
+            self.ready_total_s += elapsed
+            self.ready_max_s = max(self.ready_max_s, elapsed)
+            ready = _ReadySession(context, session, now)
+            waiter = self._next_waiter()
+            if waiter is not None:
+                waiter.set_result(ready)
+                return
+            self._idle.append(ready)
+            logger.debug("预先建立会话完成，耗时 {:.2f}秒", elapsed)
+        finally:
+            self._warming -= 1
+            self._refill()
+
+    def _next_waiter(self) -> Optional["asyncio.Future[_ReadySession]"]:
+        """取出最早的、仍在等待的请求"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                return waiter
+        return None
+
+    async def _retire_idle(self) -> None:
+        """定期关闭空闲太久的会话并补充新的"""
+        interval = self.max_idle_s / 4
+        while True:
+            await self.clock.asleep(interval)
+            now = self.clock.monotonic()
+            while self._idle and now - self._idle[0].ready_at >= self.max_idle_s:
+                ready = self._idle.popleft()
+                self.retired += 1
+                logger.debug("关闭空闲 {:.0f}秒的会话", now - ready.ready_at)
+                await self._close_session(ready)
+            self._refill()
+
+    async def _close_session(self, ready: _ReadySession) -> None:
+        try:
+            await ready.context.__aexit__(None, None, None)
+        except Exception as e:
+            logger.debug("关闭会话出错: {}", e)
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """向控制服务的指标注册表注册会话池指标"""
+        registry.register("session_pool.idle", lambda: self.idle, "就绪待交出的会话数")
+        registry.register(
+            "session_pool.warming", lambda: self.warming, "正在建立的会话数"
+        )
+        registry.register(
+            "session_pool.requests_total",
+            lambda: self.requests,
+            "取会话次数",
+            "counter",
+        )
+        registry.register(
+            "session_pool.hits_total",
+            lambda: self.hits,
+            "取会话时已有就绪会话的次数",
+            "counter",
+        )
+        registry.register(
+            "session_pool.hit_rate", lambda: self.hit_rate, "取会话的命中率"
+        )
+        registry.register(
+            "session_pool.failures_total",
+            lambda: self.failures,
+            "建立会话失败次数",
+            "counter",
+        )
+        registry.register(
+            "session_pool.retired_total",
+            lambda: self.retired,
+            "因空闲太久关闭的会话数",
+            "counter",
+        )
+        registry.register(
+            "session_pool.ready_ms_mean",
+            lambda: self.ready_mean_s * 1000,
+            "建立一个会话的平均耗时（毫秒）",
+        )
+        registry.register(
+            "session_pool.ready_ms_max",
+            lambda: self.ready_max_s * 1000,
+            "建立一个会话的最大耗时（毫秒）",
+        )
+        registry.register(
+            "session_pool.wait_ms_mean",
+            lambda: self.wait_mean_s * 1000,
+            "取会话的平均等待时间（毫秒）",
+        )
+        registry.register(
+            "session_pool.wait_ms_max",
+            lambda: self.wait_max_s * 1000,
+            "取会话的最大等待时间（毫秒）",
+        )
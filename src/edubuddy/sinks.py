@@ -0,0 +1,175 @@
+"""
+日志输出模块
+
+提供非阻塞的队列日志输出，调用线程只负责入队，由独立的后台线程批量写出，
+避免stdout/journald反压阻塞时间服务线程或音频事件循环。
+"""
+
+import threading
+from collections import deque
+from typing import Callable, Deque, List, Optional
+
+# 队列溢出策略
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "drop-oldest"
+OVERFLOW_DROP_NEWEST = "drop-newest"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_DROP_NEWEST)
+
+
+class QueuedSink:
+    """队列日志输出 - 有界队列、后台线程批量写出、可配置溢出策略"""
+
+    def __init__(
+        self,
+        write: Callable[[str], None],
+        flush: Optional[Callable[[], None]] = None,
+        maxsize: int = 10000,
+        batch_size: int = 256,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+        name: str = "edubuddy-log-sink",
+    ):
+        """
+        初始化队列日志输出
+
+        Args:
+            write: 实际写出函数，接收一批拼接好的日志文本
+            flush: 每批写出后调用的刷新函数
+            maxsize: 队列最大消息数
+            batch_size: 每批最多写出的消息数
+            overflow: 队列满时的策略（block、drop-oldest、drop-newest）
+            name: 后台线程名称
+        """
+        if maxsize <= 0:
+            raise ValueError("队列大小必须大于0")
+        if batch_size <= 0:
+            raise ValueError("批量大小必须大于0")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"无效的溢出策略: {overflow}，可选: {', '.join(OVERFLOW_POLICIES)}"
+            )
+
+        self._write = write
+        self._flush = flush
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.overflow = overflow
+
+        self._queue: Deque[str] = deque()
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._closed = False
+        self._dropped = 0
+        self._unreported_dropped = 0
+
+        self._thread = threading.Thread(target=self._worker, name=name, daemon=True)
+        self._thread.start()
+
+    @property
+    def dropped(self) -> int:
+        """累计丢弃的消息数"""
+        return self._dropped
+
+    @property
+    def qsize(self) -> int:
+        """当前队列中的消息数"""
+        return len(self._queue)
+
+    def __call__(self, message: str) -> None:
+        """入队一条日志消息（loguru sink接口）"""
+        with self._condition:
+            if self._closed:
+                # 关闭后直接同步写出，避免退出阶段的日志丢失
+                self._write_batch([message])
+                return
+
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == OVERFLOW_DROP_NEWEST:
+                    self._record_drop()
+                    return
+                if self.overflow == OVERFLOW_DROP_OLDEST:
+                    self._queue.popleft()
+                    self._record_drop()
+                else:
+                    while len(self._queue) >= self.maxsize and not self._closed:
+                        self._condition.wait()
+                    if self._closed:
+                        # 等待期间被关闭：后台线程可能已退出，同步写出
+                        self._write_batch([message])
+                        return
+
+            self._queue.append(message)
+            self._condition.notify_all()
+
+    def _record_drop(self) -> None:
+        """记录一次丢弃（需持有锁）"""
+        self._dropped += 1
+        self._unreported_dropped += 1
+
+    def _write_batch(self, batch: List[str]) -> None:
+        """写出一批日志，写出失败不影响后台线程"""
+        try:
+            self._write("".join(batch))
+            if self._flush is not None:
+                self._flush()
+        except Exception:
+            pass
+
+    def _worker(self) -> None:
+        """后台写出线程"""
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if not self._queue and self._closed:
+                    return
+
+                count = min(len(self._queue), self.batch_size)
+                batch = [self._queue.popleft() for _ in range(count)]
+                if self._unreported_dropped:
+                    batch.append(
+                        f"[日志队列已满，丢弃了 {self._unreported_dropped} 条消息]\n"
+                    )
+                    self._unreported_dropped = 0
+                self._in_flight = count
+                self._condition.notify_all()
+
+            self._write_batch(batch)
+
+            with self._condition:
+                self._in_flight = 0
+                self._condition.notify_all()
+
+    def flush(self, timeout: Optional[float] = 5.0) -> bool:
+        """
+        等待队列中的消息全部写出
+
+        Args:
+            timeout: 最长等待时间（秒），None表示一直等待
+
+        Returns:
+            如果队列已清空则返回True
+        """
+        with self._condition:
+            return (
+                self._condition.wait_for(
+                    lambda: (not self._queue and not self._in_flight)
+                    or not self._thread.is_alive(),
+                    timeout=timeout,
+                )
+                and not self._queue
+            )
+
+    def close(self, timeout: Optional[float] = 5.0) -> None:
+        """
+        写出剩余消息并停止后台线程
+
+        Args:
+            timeout: 等待后台线程结束的最长时间（秒）
+        """
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify_all()
+
+        self._thread.join(timeout=timeout)
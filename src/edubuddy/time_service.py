@@ -5,47 +5,117 @@
 """
 
 import threading
-import time
-from datetime import datetime
-from typing import Callable, Optional
+from typing import TYPE_CHECKING, Callable, Optional
 
+from .clock import SYSTEM_CLOCK, Clock
 from .logger import logger
+from .schedule import CronSchedule
+from .timestamp import get_timestamp_formatter
+from .trace import EVENT_TICK, recorder
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
 
 
 class TimeService:
     """时间服务类 - 整合周期性日志记录功能"""
 
-    def __init__(self, interval: float = 4.0, format_str: Optional[str] = None):
+    def __init__(
+        self,
+        interval: float = 4.0,
+        format_str: Optional[str] = None,
+        schedule: Optional[str] = None,
+        clock: Optional[Clock] = None,
+    ):
         """
         初始化时间服务
 
         Args:
             interval: 时间日志间隔（秒），默认4秒
             format_str: 时间格式字符串，默认使用ISO格式
+            schedule: cron风格计划表达式，指定后按计划触发并忽略interval
+            clock: 时钟，默认系统时钟；测试可传入 VirtualClock
         """
+        self.clock = clock or SYSTEM_CLOCK
         self.interval = interval
         self.format_str = format_str or "%Y-%m-%d %H:%M:%S"
+        self._formatter = get_timestamp_formatter(self.format_str)
+        self.schedule: Optional[CronSchedule] = (
+            CronSchedule(schedule) if schedule else None
+        )
         self._running = False
         self._thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
+        # 停止或修改计划/间隔时唤醒工作线程，使其重新计算下一次触发时刻
+        self._wake_event = threading.Event()
+
+        # 运行指标：触发次数和触发延迟（实际唤醒时刻晚于预定时刻的时间）
+        self.ticks = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
 
     def _get_current_time_message(self) -> str:
         """获取当前时间消息"""
-        current_time = datetime.now().strftime(self.format_str)
+        current_time = self._formatter.format(self.clock.time())
         return f"当前时间: {current_time}"
 
+    def _record_lateness(self, lateness: float) -> None:
+        """记录一次触发延迟"""
+        lateness = max(0.0, lateness)
+        self.last_lateness = lateness
+        if lateness > self.max_lateness:
+            self.max_lateness = lateness
+
+    def _log_time(self) -> None:
+        """记录一次当前时间"""
+        self.ticks += 1
+        recorder.record(EVENT_TICK, self.ticks, self.last_lateness)
+        try:
+            log_message = self._get_current_time_message()
+            logger.info(log_message)
+        except Exception as e:
+            logger.error(f"时间日志记录错误: {e}")
+
+    def _wait_until(self, deadline: float, now: Callable[[], float]) -> bool:
+        """
+        休眠到指定时刻
+
+        Args:
+            deadline: 触发时刻，与 now 使用同一时间基准
+            now: 读取当前时间的函数
+
+        Returns:
+            如果被唤醒（停止，或计划/间隔被修改）则返回True
+        """
+        while True:
+            remaining = deadline - now()
+            if remaining <= 0:
+                self._record_lateness(-remaining)
+                return False
+            if self.clock.wait(self._wake_event, remaining):
+                self._wake_event.clear()
+                return True
+
     def _log_worker(self) -> None:
         """日志工作线程"""
+        last_tick: Optional[float] = None
         while not self._stop_event.is_set():
-            try:
-                log_message = self._get_current_time_message()
-                logger.info(log_message)
-            except Exception as e:
-                logger.error(f"时间日志记录错误: {e}")
-
-            # 等待指定间隔或直到停止事件被设置
-            if self._stop_event.wait(self.interval):
-                break
+            schedule = self.schedule
+            if schedule is not None:
+                # 按计划直接休眠到下一次触发时间
+                fire_at = schedule.next_fire(self.clock.now()).timestamp()
+                woken = self._wait_until(fire_at, self.clock.time)
+            elif last_tick is None:
+                # 按间隔触发时启动后立即记录一次
+                woken = False
+            else:
+                due = last_tick + self.interval
+                woken = self._wait_until(due, self.clock.monotonic)
+            if woken:
+                # 停止，或按新的计划/间隔重新计算下一次触发时刻
+                continue
+            last_tick = self.clock.monotonic()
+            self._log_time()
 
     def start_time_logging(self) -> None:
         """开始时间日志记录"""
@@ -55,9 +125,13 @@ class TimeService:
 
         self._running = True
         self._stop_event.clear()
+        self._wake_event.clear()
         self._thread = threading.Thread(target=self._log_worker, daemon=True)
         self._thread.start()
-        logger.info(f"时间服务已启动，间隔: {self.interval}秒")
+        if self.schedule is not None:
+            logger.info(f"时间服务已启动，计划: {self.schedule.expression}")
+        else:
+            logger.info(f"时间服务已启动，间隔: {self.interval}秒")
 
     def stop_time_logging(self) -> None:
         """停止时间日志记录"""
@@ -66,6 +140,7 @@ class TimeService:
             return
 
         self._stop_event.set()
+        self._wake_event.set()
         if self._thread and self._thread.is_alive():
             self._thread.join(timeout=2.0)
 
@@ -76,6 +151,31 @@ class TimeService:
         """检查时间日志记录是否正在运行"""
         return self._running
 
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """
+        向控制服务的指标注册表注册时间服务指标
+
+        Args:
+            registry: 指标注册表
+        """
+        registry.register(
+            "time_service.ticks_total", lambda: self.ticks, "累计触发次数", "counter"
+        )
+        registry.register(
+            "time_service.lateness_seconds",
+            lambda: self.last_lateness,
+            "最近一次触发延迟（秒）",
+        )
+        registry.register(
+            "time_service.lateness_max_seconds",
+            lambda: self.max_lateness,
+            "最大触发延迟（秒）",
+        )
+        registry.register(
+            "time_service.interval_seconds", lambda: self.interval, "触发间隔（秒）"
+        )
+        registry.register("time_service.running", lambda: self._running, "是否正在运行")
+
     def set_interval(self, interval: float) -> None:
         """
         设置时间日志间隔
@@ -87,8 +187,26 @@ class TimeService:
             raise ValueError("间隔时间必须大于0")
 
         self.interval = interval
+        self._wake_event.set()
         logger.info(f"时间日志间隔已更新为: {interval}秒")
 
+    def set_schedule(self, schedule: Optional[str]) -> None:
+        """
+        设置cron风格计划表达式
+
+        Args:
+            schedule: 新的计划表达式，传入None恢复按间隔触发
+
+        Raises:
+            ValueError: 表达式格式无效
+        """
+        self.schedule = CronSchedule(schedule) if schedule else None
+        self._wake_event.set()
+        if self.schedule is not None:
+            logger.info(f"时间日志计划已更新为: {schedule}")
+        else:
+            logger.info(f"时间日志已恢复按间隔触发: {self.interval}秒")
+
     def set_format(self, format_str: str) -> None:
         """
         设置时间格式
@@ -97,11 +215,15 @@ class TimeService:
             format_str: 新的时间格式字符串
         """
         self.format_str = format_str
+        self._formatter = get_timestamp_formatter(format_str)
         logger.info(f"时间格式已更新为: {format_str}")
 
 
 def create_time_service(
-    interval: float = 4.0, format_str: Optional[str] = None
+    interval: float = 4.0,
+    format_str: Optional[str] = None,
+    schedule: Optional[str] = None,
+    clock: Optional[Clock] = None,
 ) -> TimeService:
     """
     创建时间服务的工厂函数
@@ -109,8 +231,12 @@ def create_time_service(
     Args:
         interval: 时间日志间隔（秒）
         format_str: 时间格式字符串
+        schedule: cron风格计划表达式，例如 "*/5 8-14 * * mon-fri"
+        clock: 时钟，默认系统时钟
 
     Returns:
         TimeService实例
     """
-    return TimeService(interval=interval, format_str=format_str)
+    return TimeService(
+        interval=interval, format_str=format_str, schedule=schedule, clock=clock
+    )
@@ -0,0 +1,142 @@
+"""
+时间戳格式化模块
+
+提供预编译的时间戳格式化器，供TimeService和Logger共享使用。
+格式字符串只解析一次，按秒缓存渲染结果，同一秒内只需追加亚秒字段。
+"""
+
+import math
+import time
+from datetime import datetime, timedelta, tzinfo
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple
+
+# 亚秒字段标记（strftime中的%f，微秒）
+_SUBSECOND = None
+
+_Segment = Optional[str]
+
+# 缓存键: (秒, 时区, UTC偏移)；本地时间的时区和偏移为None
+_CacheKey = Tuple[int, Optional[tzinfo], Optional[timedelta]]
+
+
+def _compile(format_str: str) -> Tuple[_Segment, ...]:
+    """
+    将格式字符串拆分为按秒渲染的片段和亚秒字段
+
+    Args:
+        format_str: strftime格式字符串
+
+    Returns:
+        片段元组，字符串为按秒渲染的子格式，None表示%f字段
+    """
+    segments: List[_Segment] = []
+    current: List[str] = []
+    i = 0
+    while i < len(format_str):
+        char = format_str[i]
+        if char == "%" and i + 1 < len(format_str):
+            directive = format_str[i + 1]
+            if directive == "f":
+                if current:
+                    segments.append("".join(current))
+                    current = []
+                segments.append(_SUBSECOND)
+            else:
+                current.append(char + directive)
+            i += 2
+            continue
+        current.append(char)
+        i += 1
+
+    if current:
+        segments.append("".join(current))
+    return tuple(segments)
+
+
+class TimestampFormatter:
+    """预编译的时间戳格式化器 - 按秒缓存渲染结果"""
+
+    def __init__(self, format_str: str):
+        """
+        初始化时间戳格式化器
+
+        Args:
+            format_str: strftime格式字符串，支持%f微秒字段
+        """
+        self.format_str = format_str
+        self._segments = _compile(format_str)
+        self._has_subsecond = _SUBSECOND in self._segments
+        # 缓存 (键, 渲染后的片段)，整体替换保证线程安全；键包含时区，
+        # format()（本地时间）和 format_datetime()（带时区）不会互相命中
+        self._cache: Tuple[Any, Tuple[str, ...]] = (None, ())
+
+    def _render_second(self, key: _CacheKey, moment: datetime) -> Tuple[str, ...]:
+        """渲染并缓存某一秒的所有按秒片段"""
+        rendered = tuple(
+            moment.strftime(segment) if segment is not None else ""
+            for segment in self._segments
+        )
+        self._cache = (key, rendered)
+        return rendered
+
+    def _join(self, rendered: Tuple[str, ...], microsecond: int) -> str:
+        """拼接按秒片段和亚秒字段"""
+        if not self._has_subsecond:
+            return rendered[0] if len(rendered) == 1 else "".join(rendered)
+        subsecond = f"{microsecond:06d}"
+        return "".join(
+            subsecond if segment is None else text
+            for segment, text in zip(self._segments, rendered)
+        )
+
+    def format(self, timestamp: Optional[float] = None) -> str:
+        """
+        格式化Unix时间戳（本地时区）
+
+        Args:
+            timestamp: Unix时间戳，默认使用当前时间
+
+        Returns:
+            格式化后的时间字符串
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        second = math.floor(timestamp)
+        microsecond = min(int((timestamp - second) * 1_000_000), 999_999)
+
+        key = (second, None, None)
+        cached_key, rendered = self._cache
+        if cached_key != key:
+            rendered = self._render_second(key, datetime.fromtimestamp(second))
+        return self._join(rendered, microsecond)
+
+    def format_datetime(self, moment: datetime) -> str:
+        """
+        格式化datetime对象，保留其自身时区
+
+        Args:
+            moment: 要格式化的时间
+
+        Returns:
+            格式化后的时间字符串
+        """
+        key = (math.floor(moment.timestamp()), moment.tzinfo, moment.utcoffset())
+        cached_key, rendered = self._cache
+        if cached_key != key:
+            rendered = self._render_second(key, moment.replace(microsecond=0))
+        return self._join(rendered, moment.microsecond)
+
+
+@lru_cache(maxsize=32)
+def get_timestamp_formatter(format_str: str) -> TimestampFormatter:
+    """
+    获取共享的时间戳格式化器，相同格式字符串复用同一实例
+
+    Args:
+        format_str: strftime格式字符串
+
+    Returns:
+        TimestampFormatter实例
+    """
+    return TimestampFormatter(format_str)
@@ -0,0 +1,395 @@
+"""
+飞行记录器模块
+
+始终开启的二进制追踪环：发送一块麦克风音频、收到一段助手音频、打断、播放断供、
+淡出开始/结束、定时触发等关键事件按固定格式写入预分配的环形缓冲区，只保留
+最近的 capacity 条。出错事件、未捕获的异常或收到 SIGUSR1 时把环写入文件，
+再用 `edubuddy trace <文件>` 还原出事前后的时间线。
+
+记录格式: 每条32字节（单调时间、事件类型、线程号、两个参数），一次 struct.pack_into，
+不加锁；槽位由 itertools.count 分配（在GIL下是原子的），因此音频回调、事件循环和
+工作线程可以同时记录。转储时复制整个缓冲区并按时间排序，正在写入的一两条可能不完整。
+
+转储文件格式: 魔数 "EBTR"、版本、头部长度（均为小端uint32），UTF-8 JSON 头部
+（原因、时间、线程名等），随后是按时间先后排列的记录。
+"""
+
+import itertools
+import json
+import os
+import signal
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from .logger import logger
+
+# 事件类型
+EVENT_CHUNK_SENT = 1
+EVENT_DELTA_RECEIVED = 2
+EVENT_INTERRUPT = 3
+EVENT_UNDERRUN = 4
+EVENT_FADE_START = 5
+EVENT_FADE_END = 6
+EVENT_TICK = 7
+EVENT_ERROR = 8
+
+# 事件名称和两个参数的含义（空字符串表示不使用）
+EVENT_SPECS: Dict[int, tuple] = {
+    EVENT_CHUNK_SENT: ("chunk_sent", "已发送块数", "能量"),
+    EVENT_DELTA_RECEIVED: ("delta_received", "样本数", "内容序号"),
+    EVENT_INTERRUPT: ("interrupt", "待播放块数", "正在播放"),
+    EVENT_UNDERRUN: ("underrun", "累计断供次数", "断供秒数"),
+    EVENT_FADE_START: ("fade_start", "淡出样本数", ""),
+    EVENT_FADE_END: ("fade_end", "已淡出样本数", ""),
+    EVENT_TICK: ("tick", "触发次数", "延迟秒数"),
+    EVENT_ERROR: ("error", "", ""),
+}
+EVENT_NAMES = {spec[0]: kind for kind, spec in EVENT_SPECS.items()}
+
+DEFAULT_CAPACITY = 16384
+DEFAULT_TRACE_DIR = os.path.join(
+    os.path.expanduser("~"), ".cache", "edubuddy", "traces"
+)
+# 自动转储（出错、异常）的最小间隔（秒），避免连续出错时反复写文件
+DEFAULT_MIN_DUMP_INTERVAL = 10.0
+
+_MAGIC = b"EBTR"
+_VERSION = 1
+_PREFIX = struct.Struct("<4sII")
+# 单调时间、事件类型、线程标识（低32位）、参数a（按uint32写入）、（填充）、参数b
+RECORD = struct.Struct("<dIII4xd")
+_MASK = 0xFFFFFFFF
+_pack_into = RECORD.pack_into
+_get_ident = threading.get_ident
+
+
+@dataclass
+class TraceEvent:
+    """一条追踪事件"""
+
+    time: float
+    kind: int
+    thread: int
+    a: int
+    b: float
+
+    @classmethod
+    def unpack(cls, fields: tuple) -> "TraceEvent":
+        """从一条记录的字段构造（参数a还原为有符号数）"""
+        moment, kind, thread, a, b = fields
+        return cls(moment, kind, thread, a - (1 << 32) if a >= 1 << 31 else a, b)
+
+    @property
+    def name(self) -> str:
+        spec = EVENT_SPECS.get(self.kind)
+        return spec[0] if spec else f"kind{self.kind}"
+
+
+@dataclass
+class TraceDump:
+    """转储文件的内容"""
+
+    header: Dict[str, Any]
+    events: List[TraceEvent]
+
+    @property
+    def reason(self) -> str:
+        return str(self.header.get("reason", ""))
+
+    def wall_time(self, monotonic_time: float) -> float:
+        """把记录中的单调时间换算成Unix时间"""
+        return monotonic_time + float(self.header.get("wall_offset", 0.0))
+
+
+class FlightRecorder:
+    """预分配的二进制追踪环"""
+
+    def __init__(
+        self,
+        capacity: int = DEFAULT_CAPACITY,
+        directory: str = DEFAULT_TRACE_DIR,
+        min_dump_interval: float = DEFAULT_MIN_DUMP_INTERVAL,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        初始化飞行记录器
+
+        Args:
+            capacity: 保留的事件条数
+            directory: 转储目录
+            min_dump_interval: 自动转储的最小间隔（秒）
+            clock: 单调时钟
+        """
+        if capacity < 1:
+            raise ValueError("容量必须为正")
+        self.capacity = capacity
+        self.directory = directory
+        self.min_dump_interval = min_dump_interval
+        self.clock = clock
+        self.enabled = True
+        self._buffer = bytearray(capacity * RECORD.size)
+        self._counter = itertools.count()
+        self._dump_lock = threading.Lock()
+        self._last_auto_dump: Optional[float] = None
+        self.dumps = 0
+        self.last_dump: Optional[str] = None
+
+    def configure(
+        self,
+        capacity: Optional[int] = None,
+        directory: Optional[str] = None,
+        enabled: Optional[bool] = None,
+    ) -> None:
+        """修改容量、转储目录或开关（在开始记录前调用，修改容量会清空已有记录）"""
+        if capacity is not None and capacity != self.capacity:
+            if capacity < 1:
+                raise ValueError("容量必须为正")
+            self.capacity = capacity
+            self._buffer = bytearray(capacity * RECORD.size)
+            self._counter = itertools.count()
+        if directory is not None:
+            self.directory = directory
+        if enabled is not None:
+            self.enabled = enabled
+
+    def record(self, kind: int, a: int = 0, b: float = 0.0) -> None:
+        """
+        记录一条事件（任意线程，包括音频回调）
+
+        Args:
+            kind: 事件类型 EVENT_*
+            a: 整数参数（按int32保存）
+            b: 浮点参数
+        """
+        if self.enabled:
+            _pack_into(
+                self._buffer,
+                next(self._counter) % self.capacity * RECORD.size,
+                self.clock(),
+                kind,
+                _get_ident() & _MASK,
+                a & _MASK,
+                b,
+            )
+
+    def snapshot(self) -> List[TraceEvent]:
+        """按时间先后返回环中的事件"""
+        buffer = bytes(self._buffer)
+        events = [
+            TraceEvent.unpack(fields)
+            for fields in RECORD.iter_unpack(buffer)
+            if fields[1]  # 未写入过的槽类型为0
+        ]
+        events.sort(key=lambda event: event.time)
+        return events
+
+    def dump(self, reason: str, path: Optional[str] = None) -> Optional[str]:
+        """
+        把环写入文件
+
+        Args:
+            reason: 转储原因，写入文件头
+            path: 文件路径，默认在转储目录下按时间命名
+
+        Returns:
+            写入的文件路径，失败时返回None
+        """
+        with self._dump_lock:
+            events = self.snapshot()
+            wall = time.time()
+            header = {
+                "reason": reason,
+                "created": wall,
+                "wall_offset": wall - self.clock(),
+                "pid": os.getpid(),
+                "capacity": self.capacity,
+                "threads": {
+                    str(t.ident & _MASK): t.name
+                    for t in threading.enumerate()
+                    if t.ident is not None
+                },
+            }
+            if path is None:
+                stamp = datetime.fromtimestamp(wall).strftime("%Y%m%d-%H%M%S-%f")
+                path = os.path.join(self.directory, f"trace-{stamp}.bin")
+            try:
+                directory = os.path.dirname(path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                encoded = json.dumps(header, ensure_ascii=False).encode("utf-8")
+                with open(path, "wb") as f:
+                    f.write(_PREFIX.pack(_MAGIC, _VERSION, len(encoded)))
+                    f.write(encoded)
+                    for event in events:
+                        f.write(
+                            RECORD.pack(
+                                event.time,
+                                event.kind,
+                                event.thread,
+                                event.a & _MASK,
+                                event.b,
+                            )
+                        )
+            except OSError as e:
+                logger.error("写入追踪转储失败: {}", e)
+                return None
+            self.dumps += 1
+            self.last_dump = path
+        logger.warning("已转储最近 {} 条追踪事件（{}）: {}", len(events), reason, path)
+        return path
+
+    def dump_on_error(self, reason: str) -> Optional[str]:
+        """
+        记录一条错误事件并自动转储（距上次自动转储不足最小间隔时只记录）
+
+        Returns:
+            写入的文件路径，未转储时返回None
+        """
+        self.record(EVENT_ERROR)
+        if not self.enabled:
+            return None
+        now = self.clock()
+        if (
+            self._last_auto_dump is not None
+            and now - self._last_auto_dump < self.min_dump_interval
+        ):
+            return None
+        self._last_auto_dump = now
+        return self.dump(reason)
+
+    def dump_in_background(self, reason: str) -> threading.Thread:
+        """
+        在新线程中转储
+
+        信号处理函数在主线程中断处运行，主线程可能正持有转储锁（例如正在
+        dump_on_error），直接转储会死锁；交给后台线程等锁即可。
+
+        Returns:
+            执行转储的线程
+        """
+        thread = threading.Thread(
+            target=self.dump, args=(reason,), name="edubuddy-trace-dump", daemon=True
+        )
+        thread.start()
+        return thread
+
+    def install_signal_handler(self) -> None:
+        """收到SIGUSR1时转储（只能在主线程调用）"""
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(
+                signal.SIGUSR1,
+                lambda signum, frame: self.dump_in_background("SIGUSR1"),
+            )
+
+    def install_excepthooks(self) -> None:
+        """未捕获的异常（主线程和其他线程）先转储，再交给原来的处理函数"""
+        previous = sys.excepthook
+        previous_thread = threading.excepthook
+
+        def excepthook(exc_type: Any, exc: Any, tb: Any) -> None:
+            self.dump_on_error(f"未捕获的异常: {exc_type.__name__}: {exc}")
+            previous(exc_type, exc, tb)
+
+        def thread_excepthook(args: Any) -> None:
+            name = args.thread.name if args.thread else "?"
+            self.dump_on_error(
+                f"线程 {name} 未捕获的异常: {args.exc_type.__name__}: {args.exc_value}"
+            )
+            previous_thread(args)
+
+        sys.excepthook = excepthook
+        threading.excepthook = thread_excepthook
+
+
+def read_trace(path: str) -> TraceDump:
+    """
+    读取转储文件
+
+    Raises:
+        OSError: 文件无法读取
+        ValueError: 不是追踪转储文件
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < _PREFIX.size:
+        raise ValueError(f"不是追踪转储文件: {path}")
+    magic, version, header_len = _PREFIX.unpack_from(data)
+    if magic != _MAGIC:
+        raise ValueError(f"不是追踪转储文件: {path}")
+    if version != _VERSION:
+        raise ValueError(f"不支持的追踪转储版本: {version}")
+    start = _PREFIX.size + header_len
+    try:
+        header = json.loads(data[_PREFIX.size : start].decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise ValueError(f"追踪转储头部损坏: {path}") from e
+    body = data[start:]
+    usable = len(body) - len(body) % RECORD.size
+    events = [TraceEvent.unpack(fields) for fields in RECORD.iter_unpack(body[:usable])]
+    return TraceDump(header, events)
+
+
+def render_timeline(
+    dump: TraceDump,
+    kinds: Optional[List[str]] = None,
+    last: Optional[int] = None,
+) -> List[str]:
+    """
+    把转储渲染成时间线文本
+
+    每行: 本地时间、相对转储时刻的毫秒数、线程、事件名称、参数和
+    与同类上一事件的间隔（便于发现发送或定时触发的停顿）
+
+    Args:
+        dump: 转储内容
+        kinds: 只显示这些事件名称
+        last: 只显示最后几条
+
+    Returns:
+        文本行列表
+
+    Raises:
+        ValueError: 未知的事件名称
+    """
+    if kinds:
+        unknown = [name for name in kinds if name not in EVENT_NAMES]
+        if unknown:
+            raise ValueError(
+                f"未知的事件: {', '.join(unknown)}（可用: {', '.join(EVENT_NAMES)}）"
+            )
+    threads = dump.header.get("threads", {})
+    created = float(dump.header.get("created", 0.0))
+    previous: Dict[int, float] = {}
+    lines = []
+    for event in dump.events:
+        gap = event.time - previous.get(event.kind, event.time)
+        previous[event.kind] = event.time
+        if kinds and event.name not in kinds:
+            continue
+        wall = dump.wall_time(event.time)
+        stamp = datetime.fromtimestamp(wall).strftime("%H:%M:%S.%f")[:-3]
+        thread = threads.get(str(event.thread), str(event.thread))
+        spec = EVENT_SPECS.get(event.kind, ("", "a", "b"))
+        details = []
+        if spec[1]:
+            details.append(f"{spec[1]}={event.a}")
+        if spec[2]:
+            details.append(f"{spec[2]}={event.b:.4g}")
+        if gap:
+            details.append(f"间隔={gap * 1000:.1f}ms")
+        lines.append(
+            f"{stamp} {(wall - created) * 1000:+10.1f}ms {thread:<20.20} "
+            f"{event.name:<15} {' '.join(details)}"
+        )
+    if last is not None:
+        lines = lines[-last:] if last > 0 else []
+    return lines
+
+
+# 全局飞行记录器
+recorder = FlightRecorder()
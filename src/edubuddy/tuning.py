@@ -0,0 +1,387 @@
+"""
+音频流调优模块
+
+统计音频设备的输入溢出和输出欠载，并在配置的范围内自动调节
+回调块大小、流延迟和预缓冲深度：出现卡顿时逐级加大缓冲，
+持续稳定时逐级降低延迟。会话开始时使用较短的评估窗口快速收敛。
+
+自动调优需设置 AUDIO_AUTOTUNE=1 开启；未开启时音频流固定使用基线参数
+（40ms 块、设备默认延迟、PREBUFFER_CHUNKS 块预缓冲）。
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, List, Mapping, Optional, Tuple
+
+from .audio import CHUNK_LENGTH_S, PREBUFFER_CHUNKS, SAMPLE_RATE
+from .logger import logger
+
+if TYPE_CHECKING:
+    from .control import MetricsRegistry
+
+
+@dataclass(frozen=True)
+class TuningLevel:
+    """一档音频流参数"""
+
+    blocksize: int
+    # None 表示使用设备默认延迟
+    latency_s: Optional[float]
+    prebuffer_chunks: int
+
+    def describe(self, sample_rate: int = SAMPLE_RATE) -> str:
+        block_ms = self.blocksize * 1000.0 / sample_rate
+        latency = "默认" if self.latency_s is None else f"{self.latency_s * 1000:.0f}ms"
+        return (
+            f"块 {block_ms:.0f}ms，流延迟 {latency}，"
+            f"预缓冲 {self.prebuffer_chunks} 块"
+        )
+
+
+def baseline_level(sample_rate: int = SAMPLE_RATE) -> TuningLevel:
+    """
+    未开启自动调优时的音频流参数
+
+    Args:
+        sample_rate: 采样率
+
+    Returns:
+        CHUNK_LENGTH_S 块大小、设备默认延迟、PREBUFFER_CHUNKS 块预缓冲
+    """
+    return TuningLevel(
+        blocksize=int(round(sample_rate * CHUNK_LENGTH_S)),
+        latency_s=None,
+        prebuffer_chunks=PREBUFFER_CHUNKS,
+    )
+
+
+def tuning_enabled(environ: Optional[Mapping[str, str]] = None) -> bool:
+    """是否设置了 AUDIO_AUTOTUNE 开启自动调优"""
+    environ = os.environ if environ is None else environ
+    return environ.get("AUDIO_AUTOTUNE", "").lower() in ("1", "true", "yes", "on")
+
+
+def _parse_range(value: str, name: str) -> Tuple[float, float]:
+    """解析 "min-max" 形式的范围"""
+    low, sep, high = value.partition("-")
+    try:
+        if not sep:
+            return float(value), float(value)
+        return float(low), float(high)
+    except ValueError:
+        raise ValueError(f"{name} 应为 最小值-最大值，例如 10-80: {value}") from None
+
+
+@dataclass(frozen=True)
+class TuningBounds:
+    """自动调优的范围"""
+
+    min_block_ms: float = 10.0
+    max_block_ms: float = 80.0
+    min_latency_ms: float = 20.0
+    max_latency_ms: float = 200.0
+    min_prebuffer: int = 2
+    max_prebuffer: int = 6
+    # 每分钟允许的卡顿次数，超过则加大缓冲
+    max_glitch_rate: float = 1.0
+    steps: int = 5
+
+    def __post_init__(self) -> None:
+        if not 0 < self.min_block_ms <= self.max_block_ms:
+            raise ValueError("块大小范围无效")
+        if not 0 <= self.min_latency_ms <= self.max_latency_ms:
+            raise ValueError("流延迟范围无效")
+        if not 1 <= self.min_prebuffer <= self.max_prebuffer:
+            raise ValueError("预缓冲范围无效")
+        if self.max_glitch_rate < 0:
+            raise ValueError("允许的卡顿率不能为负数")
+        if self.steps < 1:
+            raise ValueError("调节档位数必须至少为1")
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None) -> "TuningBounds":
+        """
+        从环境变量读取范围
+
+        支持 AUDIO_BLOCK_MS、AUDIO_LATENCY_MS、AUDIO_PREBUFFER（"最小值-最大值"）
+        和 AUDIO_MAX_GLITCH_RATE（每分钟次数），未设置的使用默认值。
+
+        Raises:
+            ValueError: 环境变量格式无效
+        """
+        environ = os.environ if environ is None else environ
+        kwargs: dict = {}
+        if "AUDIO_BLOCK_MS" in environ:
+            low, high = _parse_range(environ["AUDIO_BLOCK_MS"], "AUDIO_BLOCK_MS")
+            kwargs.update(min_block_ms=low, max_block_ms=high)
+        if "AUDIO_LATENCY_MS" in environ:
+            low, high = _parse_range(environ["AUDIO_LATENCY_MS"], "AUDIO_LATENCY_MS")
+            kwargs.update(min_latency_ms=low, max_latency_ms=high)
+        if "AUDIO_PREBUFFER" in environ:
+            low, high = _parse_range(environ["AUDIO_PREBUFFER"], "AUDIO_PREBUFFER")
+            kwargs.update(min_prebuffer=int(low), max_prebuffer=int(high))
+        if "AUDIO_MAX_GLITCH_RATE" in environ:
+            kwargs["max_glitch_rate"] = float(environ["AUDIO_MAX_GLITCH_RATE"])
+        return cls(**kwargs)
+
+    def ladder(self, sample_rate: int = SAMPLE_RATE) -> List[TuningLevel]:
+        """
+        生成从低延迟到高稳定性的调节档位
+
+        块大小按几何级数、流延迟和预缓冲按线性插值。
+
+        Args:
+            sample_rate: 采样率
+
+        Returns:
+            档位列表，第0档延迟最低
+        """
+        levels = []
+        for i in range(self.steps):
+            t = i / (self.steps - 1) if self.steps > 1 else 0.0
+            block_ms = self.min_block_ms * (self.max_block_ms / self.min_block_ms) ** t
+            latency_ms = self.min_latency_ms + t * (
+                self.max_latency_ms - self.min_latency_ms
+            )
+            prebuffer = self.min_prebuffer + t * (
+                self.max_prebuffer - self.min_prebuffer
+            )
+            levels.append(
+                TuningLevel(
+                    blocksize=max(1, int(round(sample_rate * block_ms / 1000.0))),
+                    latency_s=round(latency_ms / 1000.0, 4),
+                    prebuffer_chunks=int(round(prebuffer)),
+                )
+            )
+        return levels
+
+
+class StreamStats:
+    """音频设备流的卡顿计数（在音频回调和采集循环中更新）"""
+
+    def __init__(self) -> None:
+        self.input_overflows = 0
+        self.output_underflows = 0
+        self.output_callbacks = 0
+
+    def record_output_status(self, status: Any) -> None:
+        """记录一次输出回调及其状态标志（sounddevice.CallbackFlags）"""
+        self.output_callbacks += 1
+        if status and getattr(status, "output_underflow", False):
+            self.output_underflows += 1
+
+    def record_input(self, overflowed: bool) -> None:
+        """记录一次输入读取是否发生溢出"""
+        if overflowed:
+            self.input_overflows += 1
+
+    @property
+    def glitches(self) -> int:
+        """设备层面的卡顿总数（不含网络或下行处理不及时造成的播放断供）"""
+        return self.input_overflows + self.output_underflows
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """向控制服务的指标注册表注册流统计指标"""
+        registry.register(
+            "audio.input_overflows_total",
+            lambda: self.input_overflows,
+            "输入溢出次数",
+            "counter",
+        )
+        registry.register(
+            "audio.output_underflows_total",
+            lambda: self.output_underflows,
+            "输出欠载次数",
+            "counter",
+        )
+        registry.register(
+            "audio.output_callbacks_total",
+            lambda: self.output_callbacks,
+            "输出回调次数",
+            "counter",
+        )
+
+
+class UplinkActivity:
+    """上行语音活动 - 记录最近一次能量超过阈值的时间，判断用户是否正在说话"""
+
+    def __init__(
+        self,
+        threshold: float,
+        hold_s: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        初始化上行语音活动检测
+
+        Args:
+            threshold: 判定为语音的能量阈值
+            hold_s: 最近一次语音之后保持活动状态的时长（秒）
+            clock: 单调时钟函数
+        """
+        if hold_s < 0:
+            raise ValueError("保持时长不能为负")
+        self.threshold = threshold
+        self.hold_s = hold_s
+        self._clock = clock
+        self._last_voice: Optional[float] = None
+
+    def record(self, energy: float) -> None:
+        """记录一帧上行音频的能量"""
+        if energy >= self.threshold:
+            self._last_voice = self._clock()
+
+    @property
+    def idle(self) -> bool:
+        """最近 hold_s 秒内没有语音"""
+        return (
+            self._last_voice is None or self._clock() - self._last_voice >= self.hold_s
+        )
+
+
+class AutoTuner:
+    """音频流自动调优器 - 按评估窗口内的卡顿率在档位之间升降"""
+
+    def __init__(
+        self,
+        bounds: TuningBounds,
+        glitches: Callable[[], int],
+        sample_rate: int = SAMPLE_RATE,
+        start_level: Optional[int] = None,
+        window_s: float = 10.0,
+        warmup_s: float = 10.0,
+        warmup_window_s: float = 2.0,
+        calm_windows: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        初始化自动调优器
+
+        Args:
+            bounds: 调节范围
+            glitches: 返回累计设备卡顿次数的函数
+            sample_rate: 采样率
+            start_level: 起始档位，默认取中间档
+            window_s: 评估窗口（秒）
+            warmup_s: 会话开始后的快速收敛期（秒）
+            warmup_window_s: 快速收敛期内的评估窗口（秒）
+            calm_windows: 连续多少个无卡顿窗口后降低一档延迟
+            clock: 单调时钟函数
+        """
+        if window_s <= 0 or warmup_window_s <= 0:
+            raise ValueError("评估窗口必须大于0")
+        if calm_windows < 1:
+            raise ValueError("稳定窗口数必须至少为1")
+
+        self.bounds = bounds
+        self.sample_rate = sample_rate
+        self.levels = bounds.ladder(sample_rate)
+        self.window_s = window_s
+        self.warmup_s = warmup_s
+        self.warmup_window_s = warmup_window_s
+        self.calm_windows = calm_windows
+        self.changes = 0
+
+        self._glitches = glitches
+        self._clock = clock
+        self._index = len(self.levels) // 2 if start_level is None else start_level
+        if not 0 <= self._index < len(self.levels):
+            raise ValueError("起始档位超出范围")
+        # 曾在该档位以下出现卡顿，不再降到floor以下
+        self._floor = 0
+        self._calm = 0
+        self._stepped_down = False
+        self.reset()
+
+    @property
+    def level(self) -> TuningLevel:
+        """当前档位参数"""
+        return self.levels[self._index]
+
+    @property
+    def index(self) -> int:
+        """当前档位序号（0为延迟最低）"""
+        return self._index
+
+    def reset(self) -> None:
+        """开始新的会话：重新进入快速收敛期"""
+        now = self._clock()
+        self._session_start = now
+        self._window_start = now
+        self._window_glitches = self._glitches()
+        self._calm = 0
+
+    def _set_index(self, index: int, reason: str) -> TuningLevel:
+        self._index = index
+        self.changes += 1
+        self._calm = 0
+        logger.info(
+            f"音频流参数调整为第{index}档（{reason}）: {self.level.describe(self.sample_rate)}"
+        )
+        return self.level
+
+    def update(self) -> Optional[TuningLevel]:
+        """
+        评估当前窗口，必要时调整档位
+
+        Returns:
+            档位发生变化时返回新的参数，否则返回None
+        """
+        now = self._clock()
+        elapsed = now - self._window_start
+        warmup = now - self._session_start < self.warmup_s
+        if elapsed < (self.warmup_window_s if warmup else self.window_s):
+            return None
+
+        total = self._glitches()
+        glitches = total - self._window_glitches
+        self._window_start = now
+        self._window_glitches = total
+        rate = glitches * 60.0 / elapsed
+        stepped_down, self._stepped_down = self._stepped_down, False
+
+        if rate > self.bounds.max_glitch_rate:
+            if stepped_down:
+                # 刚降档就卡顿，说明更低的档位不稳定
+                self._floor = self._index + 1
+            if self._index + 1 < len(self.levels):
+                return self._set_index(self._index + 1, f"卡顿 {rate:.1f} 次/分钟")
+            logger.rate_limited(
+                "WARNING",
+                "音频卡顿 {:.1f} 次/分钟，已是最稳定的档位",
+                rate,
+                rate=1 / 60,
+            )
+            return None
+
+        if glitches == 0:
+            self._calm += 1
+            if self._calm >= self.calm_windows and self._index > self._floor:
+                self._stepped_down = True
+                return self._set_index(self._index - 1, "持续稳定")
+        return None
+
+    def register_metrics(self, registry: "MetricsRegistry") -> None:
+        """向控制服务的指标注册表注册调优指标"""
+        registry.register(
+            "tuning.level", lambda: self._index, "当前调优档位（0为延迟最低）"
+        )
+        registry.register(
+            "tuning.blocksize_frames",
+            lambda: self.level.blocksize,
+            "音频回调块大小（帧）",
+        )
+        registry.register(
+            "tuning.latency_seconds",
+            lambda: self.level.latency_s,
+            "请求的音频流延迟（秒）",
+        )
+        registry.register(
+            "tuning.prebuffer_chunks",
+            lambda: self.level.prebuffer_chunks,
+            "播放预缓冲块数",
+        )
+        registry.register(
+            "tuning.changes_total", lambda: self.changes, "档位调整次数", "counter"
+        )
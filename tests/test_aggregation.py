@@ -0,0 +1,113 @@
+"""
+上行帧聚合测试模块
+"""
+
+import numpy as np
+import pytest
+
+from edubuddy.aggregation import UplinkAggregator, parse_frame_range
+from edubuddy.clock import VirtualClock
+from edubuddy.control import MetricsRegistry
+from edubuddy.pipeline import Frame
+
+CHUNK = 960  # 24kHz 下40ms
+
+
+def _frame(energy=0.0, **meta):
+    return Frame(np.zeros(CHUNK, np.int16), 0.0, {"energy": energy, **meta})
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(monotonic_start=10.0)
+
+
+@pytest.fixture
+def aggregator(clock):
+    return UplinkAggregator(20, 200, hangover_s=1.0, clock=clock.monotonic)
+
+
+def _feed(aggregator, clock, count, **kwargs):
+    """每40ms加入一块，返回每次发送的块数"""
+    sent = []
+    for _ in range(count):
+        result = aggregator.add(_frame(**kwargs))
+        if result is not None:
+            audio, chunks = result
+            assert audio.size == chunks * CHUNK
+            sent.append(chunks)
+        clock.advance(0.04)
+    return sent
+
+
+class TestUplinkAggregator:
+    """上行帧聚合器测试类"""
+
+    def test_idle_frames_grow_to_max(self, aggregator, clock):
+        """测试空闲时帧长逐步增长到200ms"""
+        assert _feed(aggregator, clock, 23) == [1, 1, 2, 4, 5, 5, 5]
+        assert aggregator.target_ms == 200
+        assert aggregator.pending == 0
+        assert aggregator.chunks == 23 and aggregator.sends == 7
+
+    def test_speech_sends_immediately(self, aggregator, clock):
+        """测试说话时立即连同积攒的静音一起发送，之后每块都发送，hangover后再聚合"""
+        _feed(aggregator, clock, 11)
+        assert aggregator.pending == 3
+        assert _feed(aggregator, clock, 1, energy=0.1) == [4]
+        assert aggregator.active and aggregator.target_ms == 20
+        assert _feed(aggregator, clock, 5) == [1] * 5
+        # hangover 1秒内保持逐块发送
+        assert _feed(aggregator, clock, 20) == [1] * 20
+        assert not aggregator.active
+        assert _feed(aggregator, clock, 6) == [1, 1, 2]
+
+    def test_barge_in_and_wake_count_as_activity(self, aggregator, clock):
+        """测试打断和唤醒标记视为活动"""
+        _feed(aggregator, clock, 11)
+        assert _feed(aggregator, clock, 1, barge_in=True) == [4]
+        clock.advance(2.0)
+        _feed(aggregator, clock, 3)
+        assert aggregator.pending > 0
+        assert _feed(aggregator, clock, 1, wake=True) == [2]
+
+    def test_deadline_and_latency(self, aggregator, clock):
+        """测试积攒的音频有发送截止时间，统计每块增加的延迟"""
+        aggregator.target_ms = 200
+        assert aggregator.deadline is None
+        _feed(aggregator, clock, 2)
+        assert aggregator.deadline == pytest.approx(10.2)
+        clock.advance(0.12)  # 上行暂停，由调用方在截止时间 flush
+        audio, chunks = aggregator.flush()
+        assert chunks == 2 and aggregator.flush() is None
+        assert aggregator.latency_max_s == pytest.approx(0.2)
+        assert aggregator.latency_mean_s == pytest.approx(0.18)
+
+    def test_cpu_saved_from_send_cost(self, aggregator, clock):
+        """测试按发送耗时回归出固定开销，估计省下的CPU时间"""
+        assert aggregator.fixed_cost_ns == 0.0
+        for samples in (960, 1920, 4800, 4800):
+            aggregator.record_send(samples, 50000 + samples * 10)
+        assert aggregator.fixed_cost_ns == pytest.approx(50000)
+        _feed(aggregator, clock, 23)
+        assert aggregator.cpu_saved_s == pytest.approx(16 * 50000 / 1e9)
+
+        registry = MetricsRegistry()
+        aggregator.register_metrics(registry)
+        snapshot = registry.snapshot()
+        assert snapshot["uplink.aggregate.sends_total"] == 7
+        assert snapshot["uplink.aggregate.send_fixed_cpu_us"] == pytest.approx(50)
+
+
+class TestParseFrameRange:
+    """帧长设置解析测试类"""
+
+    def test_parse(self):
+        """测试范围、固定帧长和无效设置"""
+        assert parse_frame_range("20-200") == (20, 200)
+        assert parse_frame_range(" 80 ") == (80, 80)
+        for value in ("10-200", "20-300", "200-20", "abc", "20-40-80"):
+            with pytest.raises(ValueError):
+                parse_frame_range(value)
+        with pytest.raises(ValueError):
+            UplinkAggregator(20, 200, ramp=0.5)
@@ -0,0 +1,113 @@
+"""
+音频处理测试模块
+"""
+
+import numpy as np
+
+from edubuddy.audio import EchoGate, PlaybackBuffer, rms_energy
+
+
+def _chunk(value, size=100):
+    return np.full(size, value, dtype=np.int16)
+
+
+class TestRmsEnergy:
+    """RMS能量测试类"""
+
+    def test_silence(self):
+        """测试静音和空输入"""
+        assert rms_energy(_chunk(0)) == 0.0
+        assert rms_energy(np.zeros(0, dtype=np.int16)) == 0.0
+
+    def test_full_scale(self):
+        """测试满幅输入"""
+        assert abs(rms_energy(_chunk(-32768)) - 1.0) < 1e-6
+
+
+class TestPlaybackBuffer:
+    """播放缓冲测试类"""
+
+    def test_prebuffer(self):
+        """测试缓冲不足时输出静音"""
+        buffer = PlaybackBuffer(prebuffer_chunks=2)
+        buffer.enqueue(_chunk(1000), "item", 0)
+        out = np.ones((50, 1), dtype=np.int16)
+        assert buffer.fill(out) == 0
+        assert not out.any()
+
+    def test_fill_across_chunks(self):
+        """测试跨块填充并上报播放进度"""
+        played = []
+        buffer = PlaybackBuffer(
+            prebuffer_chunks=2, on_played=lambda i, c, data: played.append(len(data))
+        )
+        buffer.enqueue(_chunk(1), "item", 0)
+        buffer.enqueue(_chunk(2), "item", 0)
+        out = np.zeros((150, 1), dtype=np.int16)
+        assert buffer.fill(out) == 150
+        assert out[99, 0] == 1 and out[100, 0] == 2
+        assert sum(played) == 300  # int16每样本2字节
+        assert buffer.is_playing
+
+    def test_interrupt_fades_and_flushes(self):
+        """测试中断时淡出并清空队列"""
+        buffer = PlaybackBuffer(sample_rate=1000, prebuffer_chunks=1, fade_out_ms=10)
+        for _ in range(3):
+            buffer.enqueue(_chunk(10000), "item", 0)
+        out = np.zeros((20, 1), dtype=np.int16)
+        buffer.fill(out)
+
+        buffer.interrupt()
+        assert buffer.fill(out) == 10
+        assert out[0, 0] == 10000 and out[9, 0] < out[0, 0]
+        assert not out[10:].any()
+        assert not buffer.is_playing
+
+
+class TestEchoGate:
+    """回声门限测试类"""
+
+    def test_uncalibrated_matches_fixed_threshold(self):
+        """测试未校准时只使用固定阈值"""
+        gate = EchoGate(threshold=0.1)
+        gate.record_output(10.0, 0.9)
+        assert gate.is_barge_in(0.1, 10.0)
+        assert not gate.is_barge_in(0.05, 10.0)
+
+    def test_aligned_echo(self):
+        """测试按回环延迟对齐输出能量"""
+        gate = EchoGate(latency_s=0.2, echo_gain=0.5, threshold=0.1, block_s=0.04)
+        gate.record_output(10.0, 0.8)
+        # 回声在0.2秒后到达麦克风
+        assert not gate.echo_expected(10.0 + 0.5)
+        assert gate.echo_expected(10.2)
+        assert gate.expected_echo(10.2) == 0.8
+        assert not gate.is_barge_in(0.3, 10.2)
+        assert gate.is_barge_in(0.45, 10.2)
+        # 对齐窗口之外回到固定阈值
+        assert gate.is_barge_in(0.15, 11.0)
+
+    def test_ring_capacity(self):
+        """测试环形记录覆盖最旧的输出块"""
+        gate = EchoGate(capacity=2, block_s=0.01)
+        for t in (1.0, 2.0, 3.0):
+            gate.record_output(t, 0.5)
+        assert not gate.echo_expected(1.0)
+        assert gate.echo_expected(3.0)
+
+
+class TestPlaybackCounters:
+    """播放计数测试类"""
+
+    def test_starvation_counts_only_same_item(self):
+        """测试同一回复中途耗尽才计为供给不足"""
+        buffer = PlaybackBuffer(prebuffer_chunks=1)
+        out = np.zeros((150, 1), dtype=np.int16)
+        buffer.enqueue(_chunk(1), "a", 0)
+        buffer.fill(out)
+        assert buffer.partial_blocks == 1
+        buffer.enqueue(_chunk(1), "a", 0)
+        assert buffer.starvations == 1
+        buffer.fill(out)
+        buffer.enqueue(_chunk(1), "b", 0)
+        assert buffer.starvations == 1
@@ -0,0 +1,150 @@
+"""
+共享内存音频总线测试模块
+"""
+
+import subprocess
+import sys
+import threading
+import time
+import uuid
+import wave
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from edubuddy.audiobus import (
+    CHANNEL_CAPTURE,
+    CHANNEL_PLAYBACK,
+    AudioBus,
+    RingReader,
+    RingWriter,
+    segment_name,
+)
+from edubuddy.cli import main
+
+
+@pytest.fixture
+def bus():
+    """使用唯一名称的音频总线，测试后删除"""
+    audio_bus = AudioBus(f"ebtest-{uuid.uuid4().hex[:8]}", slots=8, slot_samples=1920)
+    yield audio_bus
+    audio_bus.close()
+
+
+def _reader(bus, channel=CHANNEL_CAPTURE, **kwargs):
+    return RingReader(segment_name(bus.name, channel), **kwargs)
+
+
+class TestRing:
+    """环形缓冲区读写测试类"""
+
+    def test_roundtrip(self, bus):
+        """测试读取方按序号拿到零拷贝视图和时间戳"""
+        reader = _reader(bus)
+        assert reader.read() is None
+        bus.publish_capture(np.full(1920, 7, np.int16), timestamp=12.5)
+        block = reader.read()
+        assert block.seq == 1 and block.timestamp == 12.5 and block.lost == 0
+        assert block.samples.base is not None and np.all(block.samples == 7)
+        assert reader.valid(block) and reader.sample_rate == 48000
+        assert reader.read() is None
+        reader.close()
+
+    def test_directions_are_separate(self, bus):
+        """测试采集和播放方向互不影响"""
+        reader = _reader(bus, CHANNEL_PLAYBACK)
+        bus.publish_capture(np.zeros(10, np.int16))
+        assert reader.read() is None
+        bus.publish_playback(np.ones(10, np.int16))
+        assert reader.read().samples.size == 10
+        reader.close()
+
+    def test_long_blocks_are_split(self, bus):
+        """测试超过槽长的块拆成多个连续序号的块"""
+        reader = _reader(bus)
+        bus.publish_capture(np.arange(5000, dtype=np.int16), timestamp=1.0)
+        blocks = [reader.read() for _ in range(3)]
+        assert [b.seq for b in blocks] == [1, 2, 3]
+        joined = np.concatenate([b.samples for b in blocks])
+        assert np.array_equal(joined, np.arange(5000, dtype=np.int16))
+        assert blocks[1].timestamp == pytest.approx(1.0 + 1920 / 48000)
+
+    def test_lagging_reader_detects_loss(self, bus):
+        """测试落后超过一圈的读取方跳到最旧的可用块并报告丢失"""
+        reader = _reader(bus)
+        for i in range(20):
+            bus.publish_capture(np.full(16, i, np.int16))
+        assert reader.lag == 20
+        block = reader.read()
+        assert block.lost == 13 and block.samples[0] == 13
+        old = block
+        for i in range(20, 30):
+            bus.publish_capture(np.full(16, i, np.int16))
+        # 旧视图已被覆盖
+        assert not reader.valid(old)
+        assert reader.lost >= 13
+
+    def test_reader_in_other_process(self, bus):
+        """测试其他进程读取，且读取进程退出后总线仍然存在"""
+        bus.publish_playback(np.full(100, 3, np.int16))
+        name = segment_name(bus.name, CHANNEL_PLAYBACK)
+        code = (
+            "from edubuddy.audiobus import RingReader\n"
+            f"r = RingReader({name!r}, from_start=True)\n"
+            "b = r.read()\n"
+            "print(b.seq, int(b.samples.sum()))\n"
+            "r.close()\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        ).stdout
+        assert output.split() == ["1", "300"]
+        _reader(bus, CHANNEL_PLAYBACK).close()
+
+    def test_stale_segment_replaced_live_rejected(self, bus):
+        """测试正在写入的总线不能重复创建，残留的段会被替换"""
+        name = segment_name(bus.name, CHANNEL_CAPTURE)
+        bus.publish_capture(np.zeros(10, np.int16))
+        with pytest.raises(FileExistsError):
+            RingWriter(name)
+
+        bus.publish_capture(np.zeros(10, np.int16), timestamp=time.monotonic() - 60)
+        writer = RingWriter(name, slots=4, slot_samples=64)
+        assert writer.slots == 4 and writer.last_seq == 0
+        # 替换后原写入方关闭时段已不存在
+        writer.close()
+        bus.writers[CHANNEL_CAPTURE] = RingWriter(name, slots=8, slot_samples=1920)
+
+
+class TestTapCommand:
+    """tap 命令测试类"""
+
+    def test_records_wav(self, bus, tmp_path):
+        """测试旁路录音到WAV文件"""
+        stop = threading.Event()
+
+        def publish():
+            while not stop.is_set():
+                bus.publish_capture(np.full(480, 1000, np.int16))
+                time.sleep(0.01)
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+        try:
+            path = tmp_path / "tap.wav"
+            result = CliRunner().invoke(
+                main, ["tap", "--bus", bus.name, "--wav", str(path), "-d", "0.3"]
+            )
+        finally:
+            stop.set()
+            thread.join()
+        assert result.exit_code == 0, result.output
+        with wave.open(str(path), "rb") as f:
+            assert f.getframerate() == 48000
+            assert f.getnframes() >= 480 * 5
+
+    def test_missing_bus(self):
+        """测试总线不存在时退出码为2"""
+        result = CliRunner().invoke(main, ["tap", "--bus", "ebtest-missing"])
+        assert result.exit_code == 2
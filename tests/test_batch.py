@@ -0,0 +1,232 @@
+"""
+离线批处理测试模块
+"""
+
+import asyncio
+import json
+import time
+
+import numpy as np
+import pytest
+from click.testing import CliRunner
+
+from edubuddy import batch
+from edubuddy.batch import (
+    LocalSession,
+    local_session_factory,
+    read_wav,
+    run_batch,
+    write_wav,
+)
+from edubuddy.cli import main
+from edubuddy.clock import VirtualClock
+from edubuddy.pipeline import EnergyStage, ResampleStage, Stage
+
+
+def _question(path, rate=48000, seconds=0.6):
+    """写出一段带静音的合成提问"""
+    t = np.arange(int(rate * seconds)) / rate
+    tone = (6000 * np.sin(2 * np.pi * 300 * t)).astype(np.int16)
+    write_wav(str(path), np.concatenate([np.zeros(rate // 10, np.int16), tone]), rate)
+
+
+class _CountingFactory:
+    """记录同时打开的会话数"""
+
+    def __init__(self, session_cls=LocalSession, **kwargs):
+        self.session_cls = session_cls
+        self.kwargs = kwargs
+        self.active = 0
+        self.peak = 0
+
+    def __call__(self):
+        factory = self
+
+        class _Session(self.session_cls):
+            async def __aenter__(self):
+                factory.active += 1
+                factory.peak = max(factory.peak, factory.active)
+                return await super().__aenter__()
+
+            async def __aexit__(self, *exc_info):
+                factory.active -= 1
+                return await super().__aexit__(*exc_info)
+
+        return _Session(**self.kwargs)
+
+
+class _SilentSession(LocalSession):
+    """从不回复的会话"""
+
+    def _respond(self):
+        pass
+
+
+class _EveryThird(Stage):
+    """丢弃每第三块，出错模式下在第五块抛出异常"""
+
+    name = "every_third"
+
+    def __init__(self, fail=False):
+        self.count = 0
+        self.fail = fail
+
+    def process(self, frame):
+        self.count += 1
+        if self.fail and self.count == 5:
+            raise ValueError("boom")
+        return None if self.count % 3 == 0 else frame
+
+
+def _read_records(output):
+    text = (output / "results.jsonl").read_text(encoding="utf-8")
+    return [json.loads(line) for line in text.splitlines()]
+
+
+class TestRunBatch:
+    """批处理运行测试类"""
+
+    def test_outputs_and_concurrency_limit(self, tmp_path):
+        """测试输出回复和耗时，且同时打开的会话数不超过上限"""
+        inputs = tmp_path / "in"
+        (inputs / "sub").mkdir(parents=True)
+        for i in range(5):
+            _question(inputs / f"q{i}.wav")
+        _question(inputs / "sub" / "q0.wav", rate=24000)
+        output = tmp_path / "out"
+        factory = _CountingFactory(response_delay_s=0.05)
+
+        paths = sorted(str(p) for p in inputs.rglob("*.wav"))
+        summary = asyncio.run(
+            run_batch(paths, factory, str(output), concurrency=2, base_dir=str(inputs))
+        )
+
+        assert summary.succeeded == 6 and summary.failed == 0
+        assert factory.peak == 2
+        assert summary.realtime_factor > 1.0
+        assert (output / "q0.wav").exists() and (output / "sub__q0.wav").exists()
+
+        records = [
+            json.loads(line)
+            for line in (output / "results.jsonl")
+            .read_text(encoding="utf-8")
+            .splitlines()
+        ]
+        assert len(records) == 6
+        record = records[0]
+        assert record["ok"] and record["first_audio_s"] is not None
+        assert set(record["stages"]) >= {"energy", "downsample"}
+        # 本地替身把句尾之前收到的上行音频（24kHz）原样返回
+        response, rate = read_wav(record["output"])
+        assert rate == 24000
+        assert 0.7 < response.size / rate < record["audio_s"]
+        summary_data = json.loads((output / "summary.json").read_text(encoding="utf-8"))
+        assert summary_data["files"] == 6
+
+    def test_realtime_pacing_with_virtual_clock(self, tmp_path):
+        """测试按实时节奏发送时，会话计时在虚拟时钟下确定且不实际等待"""
+        _question(tmp_path / "q.wav")
+        clock = VirtualClock(autojump=True)
+        started = time.monotonic()
+        summary = asyncio.run(
+            run_batch(
+                [str(tmp_path / "q.wav")],
+                local_session_factory(response_delay_s=2.0, clock=clock),
+                str(tmp_path / "out"),
+                speed=1.0,
+                clock=clock,
+            )
+        )
+        assert time.monotonic() - started < 2.0
+        assert summary.succeeded == 1
+        record = json.loads((tmp_path / "out" / "results.jsonl").read_text("utf-8"))
+        # 0.1秒静音 + 0.6秒提问 + 1秒尾部静音共43块，每40ms一块按时发出
+        assert record["send_s"] == pytest.approx(1.68, abs=0.001)
+        # 提问后静音0.5秒判定句尾，再等待2秒模拟生成
+        assert record["first_audio_s"] == pytest.approx(0.7 + 0.5 + 2.0, abs=0.05)
+
+    def test_timeout_is_recorded(self, tmp_path):
+        """测试没有回复的会话记录为超时失败"""
+        _question(tmp_path / "q.wav")
+        summary = asyncio.run(
+            run_batch(
+                [str(tmp_path / "q.wav")],
+                _CountingFactory(_SilentSession),
+                str(tmp_path / "out"),
+                timeout=0.2,
+            )
+        )
+        assert summary.failed == 1
+        line = (tmp_path / "out" / "results.jsonl").read_text(encoding="utf-8")
+        assert "超时" in json.loads(line)["error"]
+
+    @pytest.mark.parametrize(
+        "rate, samples", [(48000, 48000 * 7 // 10 + 1), (44100, 44100 * 7 // 10)]
+    )
+    def test_odd_length_and_non_integer_rate(self, tmp_path, rate, samples):
+        """测试奇数长度和44.1kHz的文件经降噪上行，最后一块补齐不会出错"""
+        t = np.arange(samples) / rate
+        tone = (6000 * np.sin(2 * np.pi * 300 * t)).astype(np.int16)
+        write_wav(str(tmp_path / "q.wav"), tone, rate)
+        summary = asyncio.run(
+            run_batch(
+                [str(tmp_path / "q.wav")],
+                local_session_factory(),
+                str(tmp_path / "out"),
+                denoise=True,
+                timeout=5.0,
+            )
+        )
+        (record,) = _read_records(tmp_path / "out")
+        assert summary.succeeded == 1, record["error"]
+        assert record["lost_chunks"] == 0
+        assert record["chunks"] * 0.04 == pytest.approx(record["audio_s"])
+
+    @pytest.mark.parametrize("fail", [False, True])
+    def test_lost_chunks_end_the_drain(self, tmp_path, monkeypatch, fail):
+        """测试流水线丢弃或处理出错的块被计数，发送不会一直等待"""
+        monkeypatch.setattr(
+            batch,
+            "uplink_stages",
+            lambda rate, denoise: [
+                _EveryThird(fail),
+                EnergyStage(),
+                ResampleStage(down=2),
+            ],
+        )
+        _question(tmp_path / "q.wav")
+        summary = asyncio.run(
+            asyncio.wait_for(
+                run_batch(
+                    [str(tmp_path / "q.wav")],
+                    local_session_factory(),
+                    str(tmp_path / "out"),
+                    timeout=5.0,
+                ),
+                10.0,
+            )
+        )
+        (record,) = _read_records(tmp_path / "out")
+        if fail:
+            assert summary.failed == 1 and "处理出错 1 块" in record["error"]
+        else:
+            assert summary.succeeded == 1
+            assert record["lost_chunks"] == record["chunks"] // 3
+
+
+class TestBatchCommand:
+    """batch 命令测试类"""
+
+    def test_local_backend(self, tmp_path):
+        """测试使用本地替身运行命令"""
+        inputs = tmp_path / "in"
+        inputs.mkdir()
+        _question(inputs / "a.wav")
+        _question(inputs / "b.wav")
+        result = CliRunner().invoke(
+            main,
+            ["batch", str(inputs), "-o", str(tmp_path / "out"), "--backend", "local"],
+        )
+        assert result.exit_code == 0, result.output
+        assert "成功 2" in result.output
+        assert (tmp_path / "out" / "summary.json").exists()
@@ -0,0 +1,86 @@
+"""
+性能基准测试模块
+"""
+
+import pytest
+
+from edubuddy.bench import (
+    BENCHMARKS,
+    compare_to_baseline,
+    parse_thresholds,
+    run_benchmarks,
+)
+
+
+def _report(name, value, higher_is_better=False, metric="ns_per_op"):
+    return {
+        "results": {
+            name: {
+                "primary": metric,
+                "higher_is_better": higher_is_better,
+                "metrics": {metric: value},
+            }
+        }
+    }
+
+
+class TestCompareToBaseline:
+    """基线比较测试类"""
+
+    def test_lower_is_better_regression(self):
+        """测试越低越好的指标变大超过阈值时判定为回退"""
+        result = compare_to_baseline(_report("a", 120.0), _report("a", 100.0))
+        assert result[0].regressed
+        assert result[0].change == pytest.approx(0.2)
+
+    def test_higher_is_better_regression(self):
+        """测试越高越好的指标下降超过阈值时判定为回退"""
+        current = _report("b", 80.0, higher_is_better=True)
+        baseline = _report("b", 100.0, higher_is_better=True)
+        assert compare_to_baseline(current, baseline)[0].regressed
+        assert not compare_to_baseline(baseline, current)[0].regressed
+
+    def test_threshold_pattern(self):
+        """测试按通配符配置的阈值"""
+        result = compare_to_baseline(
+            _report("resample.down", 120.0),
+            _report("resample.down", 100.0),
+            thresholds={"resample.*": 0.25},
+        )
+        assert not result[0].regressed
+        assert result[0].threshold == 0.25
+
+    def test_missing_in_baseline(self):
+        """测试基线中不存在的基准被忽略"""
+        assert compare_to_baseline(_report("new", 1.0), _report("old", 1.0)) == []
+
+
+class TestParseThresholds:
+    """阈值参数解析测试类"""
+
+    def test_parse(self):
+        """测试解析 name=ratio"""
+        assert parse_thresholds(("a.*=0.2", "b=1")) == {"a.*": 0.2, "b": 1.0}
+
+    @pytest.mark.parametrize("value", ["a", "a=x"])
+    def test_invalid(self, value):
+        """测试无效格式"""
+        with pytest.raises(ValueError):
+            parse_thresholds((value,))
+
+
+class TestRunBenchmarks:
+    """基准运行测试类"""
+
+    def test_registry(self):
+        """测试基准注册表包含微基准和宏基准"""
+        kinds = {item.kind for item in BENCHMARKS.values()}
+        assert kinds == {"micro", "macro"}
+
+    def test_quick_run(self):
+        """测试快速运行过滤后的基准"""
+        report = run_benchmarks(["logger.disabled_call", "barge_in.*"], quick=True)
+        data = report.to_dict()
+        assert set(data["results"]) == {"logger.disabled_call", "barge_in.rms"}
+        for result in data["results"].values():
+            assert result["metrics"][result["primary"]] > 0
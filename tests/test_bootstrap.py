@@ -0,0 +1,116 @@
+"""
+单文件包启动测试模块
+"""
+
+import os
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from edubuddy import bootstrap, cli
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def extras(tmp_path, monkeypatch):
+    """只含一个假依赖模块的附加目录，测试后还原导入状态"""
+    (tmp_path / "edubuddy_fake_extra.py").write_text("VALUE = 42\n")
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    monkeypatch.setattr(sys, "meta_path", list(sys.meta_path))
+    yield tmp_path
+    sys.modules.pop("edubuddy_fake_extra", None)
+
+
+class TestExtrasFinder:
+    """附加依赖查找器测试类"""
+
+    def test_loads_missing_module_from_extras(self, extras):
+        """测试包内找不到的模块从附加目录加载，之后查找器退出"""
+        finder = bootstrap.install([str(extras), str(extras / "missing")])
+        assert str(extras) not in sys.path
+
+        import edubuddy_fake_extra
+
+        assert edubuddy_fake_extra.VALUE == 42
+        assert finder.activated and finder not in sys.meta_path
+        assert str(extras) in sys.path
+
+    def test_ignores_submodules_and_found_modules(self, extras):
+        """测试子模块和能直接找到的模块不触发加载附加目录"""
+        finder = bootstrap.install([str(extras)])
+        assert finder.find_spec("edubuddy_fake_extra.sub", path=[]) is None
+        import json  # noqa: F401
+
+        assert not finder.activated and finder in sys.meta_path
+
+    def test_extras_dirs_from_env(self, monkeypatch):
+        """测试用环境变量指定附加目录"""
+        monkeypatch.setenv(bootstrap.EXTRAS_ENV, f"/a{os.pathsep}{os.pathsep}/b")
+        assert bootstrap.extras_dirs() == ["/a", "/b"]
+        monkeypatch.delenv(bootstrap.EXTRAS_ENV)
+        assert bootstrap.extras_dirs()
+
+
+class TestLightweightCli:
+    """命令行启动时不加载音频依赖的测试类"""
+
+    def test_cli_import_skips_audio_dependencies(self):
+        """测试导入命令行模块不会导入 numpy 和 scipy"""
+        code = (
+            "import sys, edubuddy.cli; "
+            "print(','.join(m for m in ('numpy', 'scipy') if m in sys.modules))"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True
+        )
+        assert result.stdout.strip() == ""
+
+    def test_option_defaults_match_module_constants(self):
+        """测试命令行中写明的默认值与音频模块中的常量一致"""
+        from edubuddy import audiobus, batch, calibration, wakeword
+
+        def option(command, name):
+            params = cli.main.commands[command].params
+            return next(p for p in params if p.name == name)
+
+        assert option("tap", "bus").default == audiobus.DEFAULT_BUS_NAME
+        assert option("tap", "channel").default == audiobus.CHANNEL_CAPTURE
+        assert tuple(option("tap", "channel").type.choices) == audiobus.BUS_CHANNELS
+        assert option("batch", "concurrency").default == batch.DEFAULT_CONCURRENCY
+        assert option("batch", "timeout").default == batch.DEFAULT_TIMEOUT_S
+        assert option("calibrate", "signal").default == calibration.SIGNAL_CHIRP
+        assert tuple(option("calibrate", "signal").type.choices) == calibration.SIGNALS
+        assert (
+            option("calibrate", "calibration_file").default
+            == calibration.DEFAULT_CALIBRATION_FILE
+        )
+        assert option("enroll", "output").default == wakeword.DEFAULT_WAKE_FILE
+
+
+class TestBundle:
+    """单文件包构建测试类"""
+
+    def test_build_and_run(self, tmp_path):
+        """测试构建的包带预编译字节码，在隔离模式下可以运行"""
+        subprocess.run(
+            [sys.executable, "scripts/bundle.py", "-o", str(tmp_path)],
+            cwd=ROOT,
+            check=True,
+            capture_output=True,
+        )
+        (target,) = tmp_path.glob("edubuddy-*.pyz")
+        names = set(zipfile.ZipFile(target).namelist())
+        assert "__main__.py" in names and "edubuddy/cli.pyc" in names
+        assert "click/core.pyc" in names and "loguru/__init__.pyc" in names
+
+        result = subprocess.run(
+            [sys.executable, "-IS", str(target), "--version"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        assert "EduBuddy" in result.stdout
@@ -0,0 +1,117 @@
+"""
+回环延迟校准测试模块
+"""
+
+import numpy as np
+import pytest
+
+from edubuddy.calibration import (
+    CalibrationStore,
+    LatencyCalibration,
+    chirp,
+    estimate_delay,
+    measure_latency,
+    mls,
+)
+
+RATE = 48000
+
+
+def _loopback(delay_samples, gain=0.3, noise=0.01, seed=1):
+    """模拟扬声器到麦克风的回环：延迟、衰减并叠加噪声"""
+    rng = np.random.default_rng(seed)
+
+    def play_record(signal):
+        captured = np.zeros_like(signal)
+        captured[delay_samples:] = gain * signal[: len(signal) - delay_samples]
+        return captured + rng.normal(0, noise, len(signal)).astype(np.float32)
+
+    return play_record
+
+
+class TestSignals:
+    """测试信号生成测试类"""
+
+    def test_chirp(self):
+        """测试扫频信号长度和幅度"""
+        signal = chirp(RATE, duration=0.25)
+        assert len(signal) == RATE // 4
+        assert np.max(np.abs(signal)) <= 0.5 + 1e-6
+        assert signal[0] == 0.0
+
+    def test_mls_autocorrelation(self):
+        """测试MLS的循环自相关只有单个尖峰"""
+        seq = np.sign(mls(10)).astype(np.float64)
+        spectrum = np.fft.fft(seq)
+        autocorr = np.real(np.fft.ifft(spectrum * np.conj(spectrum)))
+        assert round(autocorr[0]) == 1023
+        assert np.allclose(autocorr[1:], -1.0)
+
+    def test_invalid(self):
+        """测试无效参数"""
+        with pytest.raises(ValueError):
+            chirp(RATE, f_start=1000, f_end=500)
+        with pytest.raises(ValueError):
+            mls(4)
+
+
+class TestEstimateDelay:
+    """延迟估计测试类"""
+
+    @pytest.mark.parametrize("delay", [0, 37, 4800])
+    def test_known_delay(self, delay):
+        """测试找出已知延迟"""
+        reference = chirp(RATE, duration=0.2)
+        captured = np.zeros(len(reference) + 6000, dtype=np.float32)
+        captured[delay : delay + len(reference)] = 0.2 * reference
+        lag, confidence = estimate_delay(reference, captured)
+        assert lag == delay
+        assert confidence > 0.99
+
+    def test_no_signal(self):
+        """测试只有噪声时相关峰值很低"""
+        reference = chirp(RATE, duration=0.2)
+        noise = np.random.default_rng(0).normal(0, 0.1, len(reference) * 3)
+        assert estimate_delay(reference, noise)[1] < 0.2
+
+
+class TestMeasureLatency:
+    """延迟测量测试类"""
+
+    @pytest.mark.parametrize("signal", ["chirp", "mls"])
+    def test_measure(self, signal):
+        """测试通过模拟回环测量延迟和回声增益"""
+        result = measure_latency(
+            _loopback(6000), "fake", RATE, signal=signal, repeats=2, tail_s=0.3
+        )
+        assert result.latency_ms == pytest.approx(125.0)
+        assert result.jitter_ms == 0.0
+        assert result.echo_gain == pytest.approx(0.3, abs=0.02)
+
+    def test_silence_fails(self):
+        """测试没有录到信号时报错"""
+        with pytest.raises(ValueError):
+            measure_latency(
+                lambda s: np.zeros_like(s), "fake", RATE, repeats=1, tail_s=0.1
+            )
+
+
+class TestCalibrationStore:
+    """校准结果存储测试类"""
+
+    def test_save_and_load(self, tmp_path):
+        """测试按设备保存和读取"""
+        store = CalibrationStore(str(tmp_path / "sub" / "latency.json"))
+        a = LatencyCalibration("mic -> spk", RATE, 120.5, 1.0, 0.25, 0.9, "chirp")
+        b = LatencyCalibration("usb -> usb", RATE, 40.0, 0.0, 0.1, 0.95, "mls")
+        store.save(a)
+        store.save(b)
+        assert store.get("mic -> spk") == a
+        assert store.get("usb -> usb").latency_s == pytest.approx(0.04)
+        assert store.get("missing") is None
+
+    def test_corrupt_file(self, tmp_path):
+        """测试文件损坏时视为未校准"""
+        path = tmp_path / "latency.json"
+        path.write_text("{not json")
+        assert CalibrationStore(str(path)).load() == {}
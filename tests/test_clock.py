@@ -0,0 +1,137 @@
+"""
+时钟测试模块
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from edubuddy.clock import SYSTEM_CLOCK, VirtualClock
+from edubuddy.ratelimit import TokenBucket
+
+
+class TestVirtualClock:
+    """虚拟时钟测试类"""
+
+    def test_reads_are_consistent(self):
+        """测试Unix时间、单调时间和本地时间同步前进"""
+        clock = VirtualClock(start=1_700_000_000.0, monotonic_start=50.0)
+        clock.advance(90.5)
+        assert clock.time() == 1_700_000_090.5
+        assert clock.monotonic() == 140.5
+        assert clock.now().timestamp() == pytest.approx(1_700_000_090.5)
+        with pytest.raises(ValueError):
+            clock.advance(-1)
+
+    def test_thread_wait(self):
+        """测试线程等待到advance推进到期，事件设置时立即返回"""
+        clock = VirtualClock()
+        event = threading.Event()
+        results = []
+        thread = threading.Thread(
+            target=lambda: results.append(clock.wait(event, 10.0))
+        )
+        thread.start()
+        assert clock.wait_for_waiters()
+        clock.advance(9.0)
+        thread.join(0.05)
+        assert thread.is_alive()
+        clock.advance(1.0)
+        thread.join(1.0)
+        assert results == [False]
+
+        thread = threading.Thread(target=lambda: results.append(clock.wait(event, 60)))
+        thread.start()
+        assert clock.wait_for_waiters()
+        event.set()
+        thread.join(1.0)
+        assert results == [False, True]
+
+    def test_periodic_thread_is_stepped(self):
+        """测试advance逐个到期唤醒周期任务，触发次数确定"""
+        clock = VirtualClock()
+        stop = threading.Event()
+        stamps = []
+
+        def worker():
+            while not clock.wait(stop, 0.25):
+                stamps.append(clock.monotonic())
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert clock.wait_for_waiters()
+        clock.advance(600)
+        stop.set()
+        thread.join(1.0)
+        assert len(stamps) == 2400
+        assert stamps[:2] == [1000.25, 1000.5]
+
+    def test_async_sleep_waits_for_advance(self):
+        """测试协程等待到advance推进到期"""
+
+        async def run():
+            clock = VirtualClock()
+            task = asyncio.create_task(clock.asleep(5.0))
+            await asyncio.sleep(0)
+            clock.advance(4.0)
+            await asyncio.sleep(0.01)
+            assert not task.done()
+            clock.advance(1.0)
+            await asyncio.wait_for(task, 1.0)
+
+        asyncio.run(run())
+
+    def test_autojump_wakes_in_deadline_order(self):
+        """测试autojump模式按到期先后跳转"""
+
+        async def run():
+            clock = VirtualClock(monotonic_start=0.0, autojump=True)
+            order = []
+
+            async def sleeper(name, seconds):
+                await clock.asleep(seconds)
+                order.append((name, clock.monotonic()))
+
+            await asyncio.gather(
+                sleeper("a", 3600), sleeper("b", 0.04), sleeper("c", 60)
+            )
+            return order
+
+        assert asyncio.run(run()) == [("b", 0.04), ("c", 60.0), ("a", 3600.0)]
+
+    def test_hold_blocks_autojump(self):
+        """测试有协程在等待时钟之外的事件时autojump不跳转"""
+
+        async def run():
+            clock = VirtualClock(monotonic_start=0.0, autojump=True)
+            task = asyncio.ensure_future(clock.asleep(60))
+            with clock.hold():
+                await asyncio.sleep(0.05)
+                assert clock.monotonic() == 0.0
+            await asyncio.wait_for(task, 1.0)
+            return clock.monotonic()
+
+        assert asyncio.run(run()) == 60.0
+
+    def test_drives_clock_callbacks(self):
+        """测试monotonic可作为已有组件的时钟回调"""
+        clock = VirtualClock()
+        bucket = TokenBucket(rate=1.0, burst=1, clock=clock.monotonic)
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        clock.advance(1.0)
+        assert bucket.try_acquire()
+
+
+class TestSystemClock:
+    """系统时钟测试类"""
+
+    def test_matches_time_module(self):
+        """测试读数与time模块一致"""
+        assert abs(SYSTEM_CLOCK.time() - time.time()) < 1.0
+        assert abs(SYSTEM_CLOCK.monotonic() - time.monotonic()) < 1.0
+        event = threading.Event()
+        event.set()
+        assert SYSTEM_CLOCK.wait(event, 1.0)
@@ -0,0 +1,140 @@
+"""
+运行时配置测试模块
+"""
+
+import time
+
+import pytest
+
+from edubuddy.config import ConfigReloader, RuntimeConfig, parse_config
+from edubuddy.logger import logger
+from edubuddy.time_service import TimeService
+
+DEFAULTS = RuntimeConfig(interval=4.0, format_str="%H:%M:%S", level="INFO")
+
+
+@pytest.fixture
+def restore_level():
+    """测试后恢复日志级别"""
+    original = logger.level
+    yield
+    logger.set_level(original)
+
+
+def _write(path, text):
+    path.write_text(text, encoding="utf-8")
+
+
+class TestParseConfig:
+    """配置解析测试类"""
+
+    def test_parse(self):
+        """测试注释、引号和未加引号的值"""
+        values = parse_config(
+            '# 注释\n\nLOG_INTERVAL=2.5\nLOG_FORMAT="%Y-%m-%d %H:%M:%S"\n'
+            "LOG_LEVEL='debug'\nMAX_CPU=50%\n"
+        )
+        assert values == {
+            "LOG_INTERVAL": "2.5",
+            "LOG_FORMAT": "%Y-%m-%d %H:%M:%S",
+            "LOG_LEVEL": "debug",
+            "MAX_CPU": "50%",
+        }
+
+    @pytest.mark.parametrize("text", ["LOG_LEVEL", "1KEY=x", 'LOG_FORMAT="%H'])
+    def test_invalid_line(self, text):
+        """测试无法解析的行"""
+        with pytest.raises(ValueError):
+            parse_config(text)
+
+
+class TestRuntimeConfig:
+    """运行时配置校验测试类"""
+
+    def test_defaults_for_missing_keys(self):
+        """测试缺失的配置项使用默认值"""
+        config = RuntimeConfig.from_values({"LOG_LEVEL": "debug"}, DEFAULTS)
+        assert config == RuntimeConfig(4.0, "%H:%M:%S", "DEBUG")
+
+    def test_collects_all_errors(self):
+        """测试错误信息包含所有无效项"""
+        with pytest.raises(ValueError) as exc_info:
+            RuntimeConfig.from_values(
+                {"LOG_INTERVAL": "0", "LOG_FORMAT": "%Q", "LOG_LEVEL": "LOUD"}, DEFAULTS
+            )
+        message = str(exc_info.value)
+        assert "LOG_INTERVAL" in message
+        assert "LOG_FORMAT" in message
+        assert "LOG_LEVEL" in message
+
+
+class TestConfigReloader:
+    """配置热加载测试类"""
+
+    def test_reload_applies(self, tmp_path, restore_level):
+        """测试重新加载后应用到时间服务和日志"""
+        path = tmp_path / "edubuddy.conf"
+        _write(path, 'LOG_INTERVAL=1.5\nLOG_FORMAT="%H:%M"\nLOG_LEVEL=WARNING\n')
+        service = TimeService(interval=4.0)
+        reloader = ConfigReloader(str(path), service)
+
+        assert reloader.reload()
+        assert service.interval == 1.5
+        assert service.format_str == "%H:%M"
+        assert logger.level == "WARNING"
+        assert reloader.reloads == 1
+
+    def test_pinned_keys_are_skipped(self, tmp_path, restore_level):
+        """测试命令行中指定的配置项不被配置文件覆盖"""
+        path = tmp_path / "edubuddy.conf"
+        _write(path, 'LOG_INTERVAL=1.5\nLOG_FORMAT="%H:%M"\n')
+        service = TimeService(interval=4.0)
+        reloader = ConfigReloader(str(path), service, pinned=["log_interval"])
+
+        assert reloader.reload()
+        assert service.interval == 4.0
+        assert service.format_str == "%H:%M"
+
+    def test_invalid_config_keeps_current(self, tmp_path, restore_level):
+        """测试部分无效的配置整体不生效"""
+        path = tmp_path / "edubuddy.conf"
+        _write(path, "LOG_INTERVAL=2\nLOG_LEVEL=LOUD\n")
+        service = TimeService(interval=4.0)
+        reloader = ConfigReloader(str(path), service)
+
+        assert not reloader.reload()
+        assert service.interval == 4.0
+        assert reloader.failures == 1
+
+    def test_rollback_on_apply_error(self, tmp_path, restore_level, monkeypatch):
+        """测试应用中途出错时回滚已生效的项"""
+        path = tmp_path / "edubuddy.conf"
+        _write(path, 'LOG_INTERVAL=2\nLOG_FORMAT="%H"\nLOG_LEVEL=ERROR\n')
+        service = TimeService(interval=4.0, format_str="%M")
+        reloader = ConfigReloader(str(path), service)
+        original_level = logger.level
+
+        def fail(interval):
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(service, "set_interval", fail)
+        assert not reloader.reload()
+        assert service.format_str == "%M"
+        assert logger.level == original_level
+
+    def test_watch_and_request(self, tmp_path, restore_level):
+        """测试监视文件变化和显式重新加载请求"""
+        path = tmp_path / "edubuddy.conf"
+        _write(path, "LOG_INTERVAL=3\n")
+        service = TimeService(interval=4.0)
+        reloader = ConfigReloader(str(path), service, poll_interval=0.05)
+        reloader.start()
+        try:
+            assert service.interval == 3.0
+            _write(path, "LOG_INTERVAL=2.25\n")
+            deadline = time.monotonic() + 2.0
+            while service.interval != 2.25 and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert service.interval == 2.25
+        finally:
+            reloader.stop()
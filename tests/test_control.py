@@ -0,0 +1,104 @@
+"""
+控制套接字测试模块
+"""
+
+import socket
+
+import pytest
+
+from edubuddy.control import (
+    METRIC_COUNTER,
+    ControlServer,
+    MetricsRegistry,
+    send_command,
+)
+from edubuddy.logger import logger
+
+
+@pytest.fixture
+def server(tmp_path):
+    """在临时目录中启动控制服务"""
+    control = ControlServer(str(tmp_path / "control.sock"))
+    control.start()
+    yield control
+    control.stop()
+
+
+class TestMetricsRegistry:
+    """指标注册表测试类"""
+
+    def test_snapshot_skips_failing_metric(self):
+        """测试读取失败的指标被跳过"""
+        registry = MetricsRegistry()
+        registry.register("a.value", lambda: 3)
+        registry.register("b.broken", lambda: 1 / 0)
+        assert registry.snapshot() == {"a.value": 3.0}
+
+    def test_prometheus_format(self):
+        """测试Prometheus文本格式"""
+        registry = MetricsRegistry()
+        registry.register("queue.items_total", lambda: 7, "累计条目", METRIC_COUNTER)
+        text = registry.to_prometheus()
+        assert "# TYPE edubuddy_queue_items_total counter" in text
+        assert "edubuddy_queue_items_total 7.0" in text.splitlines()
+
+    @pytest.mark.parametrize("name", ["Bad", "a..b", "a-b"])
+    def test_invalid_name(self, name):
+        """测试无效指标名"""
+        with pytest.raises(ValueError):
+            MetricsRegistry().register(name, lambda: 0)
+
+
+class TestControlServer:
+    """控制服务测试类"""
+
+    def test_metrics(self, server):
+        """测试查询默认指标"""
+        snapshot = send_command(server.path, "metrics")
+        assert snapshot["process.threads"] >= 1
+        assert "logger.queue_depth" in snapshot
+
+    def test_set_level(self, server):
+        """测试通过控制命令修改日志级别"""
+        original = logger.level
+        try:
+            send_command(server.path, "set", "level", "warning")
+            assert logger.level == "WARNING"
+        finally:
+            logger.set_level(original)
+
+    def test_custom_setting_and_errors(self, server):
+        """测试自定义设置项和错误响应"""
+        values = []
+
+        def apply(value):
+            if float(value) <= 0:
+                raise ValueError("间隔时间必须大于0")
+            values.append(float(value))
+
+        server.add_setting("interval", apply)
+        send_command(server.path, "set", "interval", "2.5")
+        assert values == [2.5]
+        with pytest.raises(RuntimeError, match="大于0"):
+            send_command(server.path, "set", "interval", "-1")
+        with pytest.raises(RuntimeError, match="未知的命令"):
+            send_command(server.path, "missing")
+
+    def test_replaces_stale_socket(self, tmp_path):
+        """测试启动时清理遗留的套接字文件"""
+        path = str(tmp_path / "stale.sock")
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+
+        control = ControlServer(path)
+        control.start()
+        try:
+            assert send_command(path, "ping") == "pong"
+        finally:
+            control.stop()
+
+    def test_refuses_live_socket(self, server):
+        """测试套接字被占用时拒绝启动"""
+        with pytest.raises(RuntimeError):
+            ControlServer(server.path).start()
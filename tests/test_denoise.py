@@ -0,0 +1,72 @@
+"""
+降噪测试模块
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from edubuddy.denoise import CPU_BUDGET_S, NoiseSuppressor
+
+RATE = 48000
+CHUNK = 1920  # 40ms
+
+
+def _rms(x):
+    x = np.asarray(x, dtype=np.float64)
+    return float(np.sqrt(np.mean(x * x)))
+
+
+def _run(suppressor, signal):
+    return np.concatenate(
+        [
+            suppressor.process(signal[i : i + CHUNK])
+            for i in range(0, len(signal), CHUNK)
+        ]
+    )
+
+
+class TestNoiseSuppressor:
+    """降噪器测试类"""
+
+    def test_unity_gain_reconstructs_input(self):
+        """测试增益为1时输出等于延迟后的输入"""
+        rng = np.random.default_rng(0)
+        signal = rng.normal(0, 3000, RATE).astype(np.int16)
+        suppressor = NoiseSuppressor(RATE, gain_floor_db=0.0)
+        out = _run(suppressor, signal)
+        delay = suppressor.latency_samples
+        assert delay == 480
+        error = np.abs(out[delay:].astype(int) - signal[:-delay].astype(int))
+        assert error.max() <= 1
+
+    def test_suppresses_stationary_noise_keeps_tone(self):
+        """测试抑制稳态噪声并保留语音频段的信号"""
+        rng = np.random.default_rng(1)
+        t = np.arange(RATE * 4) / RATE
+        noise = rng.normal(0, 1500, t.size)
+        tone = np.where((t > 2) & (t < 3), 8000 * np.sin(2 * np.pi * 440 * t), 0.0)
+        signal = np.clip(noise + tone, -32768, 32767).astype(np.int16)
+        out = _run(NoiseSuppressor(RATE), signal)
+
+        noise_only = slice(RATE, 2 * RATE)
+        assert _rms(out[noise_only]) < 0.3 * _rms(signal[noise_only])
+        with_tone = slice(int(2.2 * RATE), int(2.8 * RATE))
+        assert _rms(out[with_tone]) > 0.8 * 8000 / np.sqrt(2)
+
+    def test_block_length_must_match_hop(self):
+        """测试块长不是帧移整数倍时报错"""
+        with pytest.raises(ValueError):
+            NoiseSuppressor(RATE).process(np.zeros(1000, dtype=np.int16))
+
+    def test_within_cpu_budget(self):
+        """测试每个40ms块的处理耗时远低于实时预算"""
+        suppressor = NoiseSuppressor(RATE)
+        chunk = np.random.default_rng(2).normal(0, 2000, CHUNK).astype(np.int16)
+        suppressor.process(chunk)
+        start = time.perf_counter()
+        for _ in range(20):
+            suppressor.process(chunk)
+        per_chunk = (time.perf_counter() - start) / 20
+        assert per_chunk < CPU_BUDGET_S / 4
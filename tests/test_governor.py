@@ -0,0 +1,234 @@
+"""
+资源调控测试模块
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from edubuddy.clock import VirtualClock
+from edubuddy.config import ConfigReloader
+from edubuddy.governor import (
+    STAGE_MINIMAL,
+    STAGE_REDUCE,
+    STAGE_SHRINK,
+    ResourceBudget,
+    ResourceGovernor,
+    parse_cpu,
+    parse_memory,
+)
+from edubuddy.logger import logger
+
+MB = 1 << 20
+
+
+class TestBudget:
+    """资源预算解析测试类"""
+
+    def test_parse_memory(self):
+        """测试systemd风格的内存限制"""
+        assert parse_memory("256M") == 256 * MB
+        assert parse_memory("1.5G") == 1536 * MB
+        assert parse_memory("4096") == 4096
+        assert parse_memory("infinity") is None
+        assert parse_memory("") is None
+        assert 0 < parse_memory("50%")
+        for value in ("abc", "0M", "-1M", "12X"):
+            with pytest.raises(ValueError):
+                parse_memory(value)
+
+    def test_parse_cpu(self):
+        """测试systemd风格的CPU配额"""
+        assert parse_cpu("50%") == 0.5
+        assert parse_cpu("150%") == 1.5
+        assert parse_cpu("infinity") is None
+        for value in ("50", "0%", "x%"):
+            with pytest.raises(ValueError):
+                parse_cpu(value)
+
+    def test_load_from_file_and_env(self, tmp_path, monkeypatch):
+        """测试从部署配置读取，环境变量优先"""
+        path = tmp_path / "edubuddy.conf"
+        path.write_text('MAX_MEMORY="256M"\nMAX_CPU="50%"\n', encoding="utf-8")
+        monkeypatch.delenv("MAX_MEMORY", raising=False)
+        monkeypatch.setenv("MAX_CPU", "25%")
+        budget = ResourceBudget.load(str(path))
+        assert budget == ResourceBudget(max_memory=256 * MB, max_cpu=0.25)
+        assert budget.enabled
+
+        monkeypatch.delenv("MAX_CPU")
+        assert not ResourceBudget.load().enabled
+        with pytest.raises(ValueError, match="MAX_MEMORY.*MAX_CPU"):
+            ResourceBudget.from_values({"MAX_MEMORY": "lots", "MAX_CPU": "1"})
+
+
+class _Usage:
+    """可控的内存和CPU读数"""
+
+    def __init__(self):
+        self.rss = 0.0
+        self.cpu_time = 0.0
+
+
+def _governor(usage, clock, **kwargs):
+    return ResourceGovernor(
+        ResourceBudget(max_memory=100 * MB, max_cpu=0.5),
+        rss=lambda: usage.rss,
+        cpu_time=lambda: usage.cpu_time,
+        clock=clock,
+        **kwargs,
+    )
+
+
+class TestResourceGovernor:
+    """资源调控器测试类"""
+
+    @patch("edubuddy.governor.logger")
+    def test_staged_degradation_and_recovery(self, mock_logger):
+        """测试按占用逐级降级、带回差逐级恢复，每次变化都有日志"""
+        usage = _Usage()
+        governor = _governor(usage, VirtualClock(), recover_samples=2)
+        calls = []
+        governor.add_action(
+            STAGE_SHRINK,
+            "收缩",
+            lambda: calls.append("shrink"),
+            lambda: calls.append("grow"),
+        )
+        governor.add_action(
+            STAGE_REDUCE,
+            "精简",
+            lambda: calls.append("reduce"),
+            lambda: calls.append("full"),
+        )
+
+        usage.rss = 50 * MB
+        assert governor.sample() == 0
+        # 直接跳到第2级时依次执行第1、2级操作
+        usage.rss = 85 * MB
+        assert governor.sample() == STAGE_REDUCE
+        assert calls == ["shrink", "reduce"]
+        assert governor.memory_ratio == pytest.approx(0.85)
+        warnings = [c.args for c in mock_logger.warning.call_args_list]
+        assert any("进入第{}级" in args[0] and args[2] == 2 for args in warnings)
+        assert ("{}: {}", "降级", "精简") in warnings
+
+        # 回差内不恢复
+        usage.rss = 75 * MB
+        assert governor.sample() == STAGE_REDUCE
+        usage.rss = 65 * MB
+        assert governor.sample() == STAGE_REDUCE
+        assert governor.sample() == STAGE_SHRINK
+        assert calls[-1] == "full"
+        infos = [c.args for c in mock_logger.info.call_args_list]
+        assert ("{}: {}", "恢复", "精简") in infos
+
+        usage.rss = 10 * MB
+        governor.sample()
+        assert governor.sample() == 0
+        assert calls == ["shrink", "reduce", "full", "grow"]
+        assert governor.changes == 4
+
+    @patch("edubuddy.governor.logger")
+    def test_cpu_usage_is_measured_over_clock(self, mock_logger):
+        """测试CPU占用按时钟间隔计算并与配额比较"""
+        usage = _Usage()
+        clock = VirtualClock()
+        governor = _governor(usage, clock)
+        governor.sample()
+        for _ in range(6):
+            clock.advance(2.0)
+            usage.cpu_time += 0.96  # 48% 的CPU，配额50%
+            governor.sample()
+        assert governor.cpu == pytest.approx(0.48, abs=0.01)
+        assert governor.stage == STAGE_MINIMAL
+
+    def test_failing_action_is_reported(self):
+        """测试操作出错时记录错误并继续执行其他操作"""
+        usage = _Usage()
+        governor = _governor(usage, VirtualClock())
+        done = []
+
+        def broken():
+            raise RuntimeError("boom")
+
+        governor.add_action(STAGE_SHRINK, "出错", broken)
+        governor.add_action(STAGE_SHRINK, "正常", lambda: done.append(1))
+        usage.rss = 75 * MB
+        with patch("edubuddy.governor.logger") as mock_logger:
+            assert governor.sample() == STAGE_SHRINK
+        assert done == [1]
+        assert "boom" in str(mock_logger.error.call_args)
+
+    def test_quiet_logs_at_minimal_stage(self):
+        """测试第3级降低日志级别，恢复时还原"""
+        usage = _Usage()
+        governor = _governor(usage, VirtualClock(), recover_samples=1)
+        previous = logger.level
+        logger.set_level("INFO")
+        try:
+            usage.rss = 95 * MB
+            governor.sample()
+            assert logger.level == "WARNING"
+            usage.rss = 10 * MB
+            governor.sample()
+            assert logger.level == "INFO"
+        finally:
+            logger.set_level(previous)
+
+    def test_reload_defers_to_quiet_logs(self, tmp_path):
+        """测试第3级期间热加载的日志级别延后到恢复时生效"""
+        usage = _Usage()
+        governor = _governor(usage, VirtualClock(), recover_samples=1)
+        path = tmp_path / "edubuddy.conf"
+        reloader = ConfigReloader(str(path), level_guard=governor.hold_level)
+        previous = logger.level
+        logger.set_level("INFO")
+        try:
+            usage.rss = 95 * MB
+            governor.sample()
+            path.write_text("LOG_LEVEL=DEBUG\n", encoding="utf-8")
+            assert reloader.reload()
+            assert logger.level == "WARNING"
+            usage.rss = 10 * MB
+            governor.sample()
+            assert logger.level == "DEBUG"
+
+            # 比降级级别更安静的级别立即生效，恢复时保持
+            usage.rss = 95 * MB
+            governor.sample()
+            path.write_text("LOG_LEVEL=ERROR\n", encoding="utf-8")
+            assert reloader.reload()
+            assert logger.level == "ERROR"
+            usage.rss = 10 * MB
+            governor.sample()
+            assert logger.level == "ERROR"
+        finally:
+            logger.set_level(previous)
+
+    @patch("edubuddy.governor.logger")
+    def test_background_sampling(self, mock_logger):
+        """测试后台线程按间隔采样"""
+        usage = _Usage()
+        clock = VirtualClock()
+        governor = _governor(usage, clock, interval=1.0)
+        governor.start()
+        try:
+            assert clock.wait_for_waiters()
+            usage.rss = 82 * MB
+            clock.advance(1.0)
+            assert governor.stage == STAGE_REDUCE
+        finally:
+            governor.stop()
+
+    def test_invalid_arguments(self):
+        """测试无效参数"""
+        budget = ResourceBudget(max_memory=MB)
+        with pytest.raises(ValueError):
+            ResourceGovernor(budget, interval=0)
+        with pytest.raises(ValueError):
+            ResourceGovernor(budget, thresholds=(0.9, 0.8, 0.7))
+        with pytest.raises(ValueError):
+            ResourceGovernor(budget, quiet_level="LOUD")
+        with pytest.raises(ValueError):
+            ResourceGovernor(budget).add_action(4, "x", lambda: None)
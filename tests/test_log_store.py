@@ -0,0 +1,151 @@
+"""
+日志存储测试模块
+"""
+
+import gzip
+import time
+
+import pytest
+
+from edubuddy.log_store import (
+    FILE_TIME_FORMAT,
+    RotatingFileSink,
+    list_segments,
+    query_logs,
+)
+from edubuddy.timestamp import TimestampFormatter
+
+BASE_TIME = 1_714_550_400.0  # 2024-05-01 附近
+_formatter = TimestampFormatter(FILE_TIME_FORMAT)
+
+
+def _line(timestamp, message):
+    return f"{_formatter.format(timestamp)} | INFO     | {message}\n"
+
+
+@pytest.fixture
+def populated(tmp_path):
+    """写入一小时的每秒日志，按小分段滚动并压缩"""
+    sink = RotatingFileSink(
+        str(tmp_path),
+        max_bytes=32 * 1024,
+        index_interval_bytes=2 * 1024,
+        index_interval_seconds=3600,
+    )
+    for i in range(3600):
+        sink.write_line(_line(BASE_TIME + i, f"tick {i}"), BASE_TIME + i)
+    sink.close()
+    return tmp_path
+
+
+class TestRotatingFileSink:
+    """滚动日志文件输出测试类"""
+
+    def test_rotates_by_size_and_compresses(self, populated):
+        """测试按大小滚动且关闭的分段被压缩"""
+        segments = list_segments(populated)
+        assert len(segments) > 3
+        assert all(segment.compressed for segment in segments)
+        assert all(len(segment.entries) > 1 for segment in segments)
+
+    def test_rotates_by_age(self, tmp_path):
+        """测试按时长滚动"""
+        sink = RotatingFileSink(str(tmp_path), max_age=60)
+        for i in range(0, 300, 10):
+            sink.write_line(_line(BASE_TIME + i, "x"), BASE_TIME + i)
+        sink.close()
+        assert len(list_segments(tmp_path)) == 5
+
+    def test_retention(self, tmp_path):
+        """测试只保留指定数量的历史分段"""
+        sink = RotatingFileSink(str(tmp_path), max_age=10, backup_count=2)
+        for i in range(0, 100, 10):
+            sink.write_line(_line(BASE_TIME + i, "x"), BASE_TIME + i)
+            sink.wait_compressed()
+        sink.close()
+        assert len(list_segments(tmp_path)) <= 3
+
+    def test_periodic_flush(self, tmp_path):
+        """测试没有后续写入时后台线程也会按间隔刷新到磁盘"""
+        sink = RotatingFileSink(str(tmp_path), flush_interval=0.05)
+        sink.write_line(_line(BASE_TIME, "only"), BASE_TIME)
+        (segment,) = list_segments(tmp_path)
+        deadline = time.monotonic() + 5
+        while segment.path.stat().st_size == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        size = segment.path.stat().st_size
+        sink.close()
+        assert size == len(_line(BASE_TIME, "only").encode("utf-8"))
+
+    def test_write_text_splits_records(self, tmp_path):
+        """测试批量写出的文本按行首时间戳拆分，多行日志不被拆开"""
+        sink = RotatingFileSink(str(tmp_path), index_interval_bytes=1)
+        sink.write_text(
+            _line(BASE_TIME, "a")
+            + _line(BASE_TIME + 1, "error\nTraceback line")
+            + _line(BASE_TIME + 2, "c")
+        )
+        sink.close()
+        (segment,) = list_segments(tmp_path)
+        assert [entry.timestamp for entry in segment.entries] == [
+            BASE_TIME,
+            BASE_TIME + 1,
+            BASE_TIME + 2,
+        ]
+        results = list(query_logs(str(tmp_path), since=BASE_TIME + 1))
+        assert len(results) == 2 and "Traceback line" in results[0]
+
+    def test_index_points_to_gzip_members(self, populated):
+        """测试索引中的压缩偏移指向独立的gzip成员"""
+        segment = list_segments(populated)[1]
+        entry = segment.entries[2]
+        with open(segment.path, "rb") as raw:
+            raw.seek(entry.compressed_offset)
+            first_line = gzip.GzipFile(fileobj=raw).readline().decode("utf-8")
+        assert first_line.startswith(_formatter.format(entry.timestamp))
+
+
+class TestQueryLogs:
+    """日志查询测试类"""
+
+    def test_time_range(self, populated):
+        """测试按时间范围查询"""
+        results = list(
+            query_logs(str(populated), since=BASE_TIME + 1000, until=BASE_TIME + 1009)
+        )
+        assert [r.split(" | ")[-1].strip() for r in results] == [
+            f"tick {i}" for i in range(1000, 1010)
+        ]
+
+    def test_grep(self, populated):
+        """测试正则过滤"""
+        results = list(query_logs(str(populated), pattern=r"tick 12\d\d$"))
+        assert len(results) == 100
+
+    def test_open_range(self, populated):
+        """测试不限定范围时返回全部日志"""
+        assert len(list(query_logs(str(populated)))) == 3600
+
+    def test_active_segment(self, tmp_path):
+        """测试查询未压缩的当前分段"""
+        sink = RotatingFileSink(str(tmp_path), index_interval_bytes=64)
+        for i in range(50):
+            sink.write_line(_line(BASE_TIME + i, f"live {i}"), BASE_TIME + i)
+        sink.flush()
+        results = list(query_logs(str(tmp_path), since=BASE_TIME + 45))
+        sink.close()
+        assert len(results) == 5
+
+    def test_multiline_record(self, tmp_path):
+        """测试多行日志作为一条返回"""
+        sink = RotatingFileSink(str(tmp_path))
+        sink.write_line(_line(BASE_TIME, "error\nTraceback line"), BASE_TIME)
+        sink.write_line(_line(BASE_TIME + 1, "next"), BASE_TIME + 1)
+        sink.close()
+        results = list(query_logs(str(tmp_path), pattern="Traceback"))
+        assert len(results) == 1
+        assert results[0].startswith(_formatter.format(BASE_TIME))
+
+    def test_missing_directory(self, tmp_path):
+        """测试目录不存在时返回空"""
+        assert list(query_logs(str(tmp_path / "missing"))) == []
@@ -9,7 +9,9 @@ from unittest.mock import MagicMock, patch
 
 import pytest
 
+from edubuddy.clock import VirtualClock
 from edubuddy.logger import Logger
+from edubuddy.ratelimit import Sampler, TokenBucket
 from edubuddy.time_service import TimeService, create_time_service
 
 
@@ -40,6 +42,159 @@ class TestLogger:
         assert callable(logger.debug)
         assert callable(logger.critical)
 
+    @patch("edubuddy.logger._loguru_logger")
+    def test_disabled_level_skips_formatting(self, mock_loguru):
+        """测试未启用的级别不会求值或格式化消息"""
+        logger = Logger()
+        build = MagicMock(return_value="expensive")
+        logger.debug(build)
+        logger.debug("value: {}", build)
+
+        build.assert_not_called()
+        mock_loguru.log.assert_not_called()
+
+    @patch("edubuddy.logger._loguru_logger")
+    def test_lazy_message(self, mock_loguru):
+        """测试延迟消息在启用时求值"""
+        logger = Logger()
+        logger.info(lambda: "built lazily")
+        logger.info("{} + {} = {total}", 1, 2, total=3)
+
+        mock_loguru.log.assert_any_call("INFO", "built lazily")
+        mock_loguru.log.assert_any_call("INFO", "1 + 2 = 3")
+
+    def test_set_level(self):
+        """测试设置日志级别"""
+        logger = Logger()
+        try:
+            logger.set_level("debug")
+            assert logger.level == "DEBUG"
+            assert logger.is_enabled_for(10)
+        finally:
+            logger.set_level("INFO")
+        assert not logger.is_enabled_for(10)
+
+    def test_set_level_invalid(self):
+        """测试设置无效的日志级别"""
+        logger = Logger()
+        with pytest.raises(ValueError):
+            logger.set_level("VERBOSE")
+        assert logger.level == "INFO"
+
+
+class TestThrottledLogging:
+    """限流和采样日志测试类"""
+
+    def test_token_bucket(self):
+        """测试令牌桶按速率补充"""
+        now = [0.0]
+        bucket = TokenBucket(rate=2.0, burst=2, clock=lambda: now[0])
+        assert bucket.try_acquire()
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+        now[0] = 0.5
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+    def test_sampler(self):
+        """测试1/N采样"""
+        sampler = Sampler(every=3)
+        assert [sampler.try_acquire() for _ in range(7)] == [
+            True,
+            False,
+            False,
+            True,
+            False,
+            False,
+            True,
+        ]
+
+    @patch("edubuddy.logger._loguru_logger")
+    def test_rate_limited_burst(self, mock_loguru):
+        """测试突发消息超出容量后被限流"""
+        logger = Logger()
+        key = object()
+        for i in range(5):
+            logger.rate_limited("INFO", "tick {}", i, rate=0.001, key=key)
+        messages = [c.args[1] for c in mock_loguru.log.call_args_list]
+        assert messages == ["tick 0"]
+
+    @patch("edubuddy.logger._loguru_logger")
+    def test_rate_limited_per_callsite(self, mock_loguru):
+        """测试不同调用点独立限流"""
+        logger = Logger()
+        for _ in range(3):
+            logger.rate_limited("INFO", "a", rate=0.001)
+            logger.rate_limited("INFO", "b", rate=0.001)
+
+        messages = [c.args[1] for c in mock_loguru.log.call_args_list]
+        assert messages == ["a", "b"]
+
+    @patch("edubuddy.logger._loguru_logger")
+    def test_suppressed_line(self, mock_loguru):
+        """测试恢复放行时先输出抑制计数"""
+        logger = Logger()
+        now = [0.0]
+        key = "suppressed-line"
+        logger._throttles.pop(key, None)
+        with patch(
+            "edubuddy.logger.TokenBucket",
+            lambda rate, burst: TokenBucket(rate, burst, clock=lambda: now[0]),
+        ):
+            for _ in range(4):
+                logger.rate_limited("WARNING", "burst", rate=1.0, key=key)
+            now[0] = 1.0
+            logger.rate_limited("WARNING", "after", rate=1.0, key=key)
+
+        messages = [c.args[1] for c in mock_loguru.log.call_args_list]
+        assert messages == ["burst", "已抑制 3 条消息 (suppressed-line)", "after"]
+
+    @patch("edubuddy.logger._loguru_logger")
+    def test_suppressed_reported_on_flush(self, mock_loguru):
+        """测试之后没有放行的消息时，flush() 也会输出抑制计数"""
+        logger = Logger()
+        key = "suppressed-flush"
+        logger.flush()
+        mock_loguru.reset_mock()
+        for _ in range(3):
+            logger.rate_limited("warning", "burst", rate=0.001, key=key)
+        assert logger.flush()
+        assert logger.flush()
+
+        calls = [c.args for c in mock_loguru.log.call_args_list]
+        assert calls == [
+            ("WARNING", "burst"),
+            ("WARNING", "已抑制 2 条消息 (suppressed-flush)"),
+        ]
+
+    def test_unknown_level(self):
+        """测试未知的日志级别"""
+        logger = Logger()
+        with pytest.raises(ValueError):
+            logger.rate_limited("verbose", "message")
+        with pytest.raises(ValueError):
+            logger.sampled("verbose", "message")
+
+    @patch("edubuddy.logger._loguru_logger")
+    def test_sampled(self, mock_loguru):
+        """测试按调用点采样"""
+        logger = Logger()
+        for i in range(10):
+            logger.sampled("INFO", "sample {}", i, every=4)
+
+        messages = [c.args[1] for c in mock_loguru.log.call_args_list]
+        assert messages == ["sample 0", "sample 4", "sample 8"]
+
+    @patch("edubuddy.logger._loguru_logger")
+    def test_disabled_level_not_counted(self, mock_loguru):
+        """测试未启用的级别不参与限流计数"""
+        logger = Logger()
+        key = "disabled-level"
+        for _ in range(5):
+            logger.rate_limited("DEBUG", "hidden", key=key)
+        assert key not in logger._throttles
+        mock_loguru.log.assert_not_called()
+
 
 class TestTimeService:
     """时间服务测试类"""
@@ -127,3 +282,61 @@ class TestTimeService:
         assert isinstance(service, TimeService)
         assert service.interval == 3.0
         assert service.format_str == "%H:%M:%S"
+
+    @patch("edubuddy.time_service.logger")
+    def test_hours_of_ticks_with_virtual_clock(self, mock_logger):
+        """测试虚拟时钟下几小时的触发在毫秒级完成且没有延迟"""
+        clock = VirtualClock()
+        service = TimeService(interval=0.5, format_str="%H:%M:%S", clock=clock)
+        service.start_time_logging()
+        assert clock.wait_for_waiters()
+        started = time.monotonic()
+        clock.advance(3 * 3600)
+        elapsed = time.monotonic() - started
+        service.stop_time_logging()
+
+        assert service.ticks == 3 * 3600 * 2 + 1
+        assert service.max_lateness == 0.0
+        assert elapsed < 5.0
+        expected = time.strftime("%H:%M:%S", time.localtime(clock.time()))
+        assert mock_logger.info.call_args_list[-2].args[0] == f"当前时间: {expected}"
+
+    @patch("edubuddy.time_service.logger")
+    def test_schedule_with_virtual_clock(self, mock_logger):
+        """测试按计划触发使用注入的时钟"""
+        clock = VirtualClock(start=1_700_000_000.0)
+        service = TimeService(schedule="0 0 * * * *", clock=clock)
+        service.start_time_logging()
+        assert clock.wait_for_waiters()
+        clock.advance(5 * 3600)
+        service.stop_time_logging()
+        assert service.ticks == 5
+        assert service.last_lateness == 0.0
+
+    @patch("edubuddy.time_service.logger")
+    def test_schedule_change_wakes_worker(self, mock_logger):
+        """测试运行中修改计划或间隔立即生效，不必等到原来的触发时刻"""
+        clock = VirtualClock(start=1_700_000_000.0)
+        service = TimeService(interval=10.0, schedule="0 0 0 1 1 *", clock=clock)
+        service.start_time_logging()
+        assert clock.wait_for_waiters()
+
+        def settled():
+            # 等工作线程取走唤醒事件并重新进入等待
+            while service._wake_event.is_set():
+                time.sleep(0.001)
+            return clock.wait_for_waiters()
+
+        service.set_schedule("0 * * * * *")
+        assert settled()
+        clock.advance(3 * 60)
+        assert service.ticks == 3
+
+        # 清除计划后按间隔触发，修改间隔也立即生效
+        service.set_schedule(None)
+        assert clock.wait_for_waiters()
+        service.set_interval(1.0)
+        assert settled()
+        clock.advance(5)
+        service.stop_time_logging()
+        assert service.ticks == 9
@@ -0,0 +1,242 @@
+"""
+音频处理流水线测试模块
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from edubuddy.audio import EchoGate, PlaybackBuffer
+from edubuddy.control import MetricsRegistry
+from edubuddy.pipeline import (
+    BargeInStage,
+    EnergyStage,
+    Frame,
+    FunctionStage,
+    Pipeline,
+    PipelineWorker,
+    ResampleStage,
+    Stage,
+)
+from edubuddy.sinks import OVERFLOW_BLOCK, OVERFLOW_DROP_NEWEST
+
+RATE = 48000
+CHUNK = 1920
+
+
+def _tone(freq, seconds=1.0, rate=RATE, amplitude=8000):
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * freq * t)).astype(np.int16)
+
+
+def _stream(stage, signal, chunk):
+    return np.concatenate(
+        [
+            stage.process(Frame(signal[i : i + chunk])).samples.copy()
+            for i in range(0, len(signal), chunk)
+        ]
+    )
+
+
+class TestResampleStage:
+    """流式重采样测试类"""
+
+    def test_down_and_up_follow_ideal_signal(self):
+        """测试跨块的下采样和上采样与理想信号一致（扣除群延迟）"""
+        down = ResampleStage(down=2)
+        low = _stream(down, _tone(440), CHUNK)
+        assert low.dtype == np.int16 and low.size == RATE // 2
+        n = np.arange(low.size)
+        ideal = 8000 * np.sin(2 * np.pi * 440 * (n - down.delay_samples) / (RATE // 2))
+        assert np.abs(low - ideal)[200:].max() < 10
+
+        up = ResampleStage(up=2)
+        high = _stream(up, low, CHUNK // 2)
+        assert high.size == RATE
+        n = np.arange(high.size)
+        delay = up.delay_samples + 2 * down.delay_samples
+        ideal = 8000 * np.sin(2 * np.pi * 440 * (n - delay) / RATE)
+        assert np.abs(high - ideal)[400:].max() < 10
+
+    def test_rejects_aliasing(self):
+        """测试下采样时滤除高于新奈奎斯特频率的成分"""
+        out = _stream(ResampleStage(down=2), _tone(20000), CHUNK)
+        assert np.sqrt(np.mean(out[100:].astype(float) ** 2)) < 80
+
+    def test_invalid_arguments(self):
+        """测试非法倍数和块长"""
+        with pytest.raises(ValueError):
+            ResampleStage(up=2, down=3)
+        with pytest.raises(ValueError):
+            ResampleStage(down=2).process(Frame(np.zeros(3, dtype=np.int16)))
+
+
+class TestPipeline:
+    """流水线组装与计时测试类"""
+
+    def test_from_spec_and_timing(self):
+        """测试按名称组装、依次执行并记录每阶段耗时"""
+        factories = {
+            "energy": EnergyStage,
+            "double": lambda: FunctionStage("double", lambda x: x * 2),
+        }
+        pipeline = Pipeline.from_spec("uplink", "double, energy", factories)
+        assert pipeline.describe() == "double -> energy"
+
+        frame = pipeline.process(Frame(np.full(100, 8192, dtype=np.int16)))
+        assert frame.meta["energy"] == pytest.approx(0.5)
+        stats = pipeline.stats()
+        assert stats["double"]["calls"] == 1 and stats["energy"]["calls"] == 1
+
+        registry = MetricsRegistry()
+        pipeline.register_metrics(registry)
+        assert registry.snapshot()["pipeline.uplink.energy.calls_total"] == 1
+
+    def test_bypass_stage(self):
+        """测试跳过阶段不执行也不计时，恢复时清空其流式状态"""
+        resets = []
+
+        class _Counting(FunctionStage):
+            def reset(self):
+                resets.append(self.name)
+
+        pipeline = Pipeline(
+            "uplink", [_Counting("double", lambda x: x * 2), EnergyStage()]
+        )
+        assert pipeline.set_bypass("double", True)
+        frame = pipeline.process(Frame(np.full(10, 100, dtype=np.int16)))
+        assert np.all(frame.samples == 100)
+        assert pipeline.stats()["double"]["calls"] == 0
+        assert pipeline.set_bypass("double", False) and resets == ["double"]
+        assert np.all(pipeline.process(Frame(np.ones(10, np.int16))).samples == 2)
+        assert not pipeline.set_bypass("missing", True)
+
+    def test_unknown_stage(self):
+        """测试未知阶段名称报错"""
+        with pytest.raises(ValueError, match="nope"):
+            Pipeline.from_spec("uplink", "energy,nope", {"energy": EnergyStage})
+
+    def test_barge_in_filters_echo(self):
+        """测试助手播放时只放行超过回声门限的块并中断播放"""
+        playback = PlaybackBuffer()
+        playback.enqueue(np.zeros(CHUNK, dtype=np.int16), "item", 0)
+        gate = BargeInStage(playback, EchoGate())
+        pipeline = Pipeline("uplink", [EnergyStage(), gate])
+
+        assert pipeline.process(Frame(np.full(CHUNK, 100, dtype=np.int16))) is None
+        assert pipeline.filtered == 1
+        frame = pipeline.process(Frame(np.full(CHUNK, 10000, dtype=np.int16)))
+        assert frame.meta["barge_in"]
+        assert playback.interrupt_event.is_set()
+
+
+class _SlowStage(Stage):
+    name = "slow"
+
+    def __init__(self):
+        self.release = threading.Event()
+
+    def process(self, frame):
+        self.release.wait(2.0)
+        return frame
+
+
+class TestPipelineWorker:
+    """工作线程测试类"""
+
+    def test_results_reach_event_loop_as_copies(self):
+        """测试结果在工作线程处理后交回事件循环，且不共享阶段缓冲区"""
+
+        async def scenario():
+            worker = PipelineWorker(Pipeline("uplink", [ResampleStage(down=2)]))
+            worker.start()
+            try:
+                for i in range(3):
+                    worker.submit(Frame(np.full(CHUNK, 1000 * i, dtype=np.int16)))
+                return [await asyncio.wait_for(worker.get(), 2.0) for _ in range(3)]
+            finally:
+                worker.stop()
+
+        frames = asyncio.run(scenario())
+        assert [f.samples.size for f in frames] == [CHUNK // 2] * 3
+        assert frames[0].samples[-1] == 0 and frames[2].samples[-1] == 2000
+
+    def test_slow_consumer_backpressures(self):
+        """测试事件循环不取结果时工作线程等待，积压满后新块被丢弃"""
+
+        async def scenario():
+            worker = PipelineWorker(Pipeline("uplink", [EnergyStage()]), maxsize=1)
+            worker.start()
+            try:
+                for _ in range(10):
+                    worker.submit(Frame(np.zeros(4, dtype=np.int16)))
+                    await asyncio.sleep(0.02)
+                return worker.dropped, worker.stall_ns
+            finally:
+                worker.stop()
+
+        dropped, stall_ns = asyncio.run(scenario())
+        assert dropped >= 5
+        assert stall_ns == 0  # 等待仍未结束
+
+    def test_overflow_drops_and_clear(self):
+        """测试输入队列满时按策略丢弃，clear 丢弃积压的块"""
+        stage = _SlowStage()
+        delivered = []
+        worker = PipelineWorker(
+            Pipeline("downlink", [stage]),
+            maxsize=2,
+            overflow=OVERFLOW_DROP_NEWEST,
+            sink=delivered.append,
+        )
+        worker.start()
+        try:
+            frames = [Frame(np.zeros(4, dtype=np.int16)) for _ in range(6)]
+            results = [worker.submit(frame) for frame in frames]
+            assert not all(results)
+            assert worker.dropped >= 1
+            assert worker.clear() >= 1
+            stage.release.set()
+        finally:
+            worker.stop()
+        # 被 clear 之前已经在处理的块也不再交出
+        assert delivered == []
+
+    def test_put_waits_without_blocking_loop(self):
+        """测试阻塞策略下 put() 等待队列空位时事件循环仍然运行，且不丢块"""
+        stage = _SlowStage()
+        delivered = []
+        worker = PipelineWorker(
+            Pipeline("downlink", [stage]),
+            maxsize=2,
+            overflow=OVERFLOW_BLOCK,
+            sink=delivered.append,
+        )
+
+        async def scenario():
+            worker.start()
+            frames = [Frame(np.full(4, i, dtype=np.int16)) for i in range(8)]
+
+            async def producer():
+                for frame in frames:
+                    await worker.put(frame)
+
+            task = asyncio.ensure_future(producer())
+            # 生产者在等待空位，事件循环上的其他协程照常运行
+            await asyncio.sleep(0.05)
+            assert not task.done()
+            stage.release.set()
+            await asyncio.wait_for(task, 2.0)
+            for _ in range(200):
+                if len(delivered) == len(frames):
+                    break
+                await asyncio.sleep(0.01)
+
+        try:
+            asyncio.run(scenario())
+        finally:
+            worker.stop(timeout=2.0)
+        assert worker.dropped == 0
+        assert [int(f.samples[0]) for f in delivered] == list(range(8))
@@ -0,0 +1,151 @@
+"""
+线程调度优先级测试模块
+"""
+
+import os
+import threading
+
+import pytest
+
+from edubuddy import priority
+from edubuddy.control import MetricsRegistry
+from edubuddy.priority import (
+    CallbackJitter,
+    SchedulingConfig,
+    ThreadPolicy,
+    ThreadScheduler,
+    apply_thread_policy,
+    parse_cpu_list,
+)
+
+
+class TestParsing:
+    """调度设置解析测试类"""
+
+    def test_policy(self):
+        """测试调度策略和默认优先级"""
+        assert ThreadPolicy.parse("fifo:80") == ThreadPolicy("fifo", 80)
+        assert ThreadPolicy.parse("on") == ThreadPolicy("fifo", 70)
+        assert ThreadPolicy.parse("RR") == ThreadPolicy("rr", 70)
+        assert ThreadPolicy.parse("nice") == ThreadPolicy("nice", -10)
+        assert ThreadPolicy.parse("fifo:5").lowered() == ThreadPolicy("fifo", 1)
+        assert ThreadPolicy.parse("nice:-5").lowered() == ThreadPolicy("nice", -5)
+
+    @pytest.mark.parametrize("spec", ["idle:1", "fifo:0", "fifo:x", "nice:-30"])
+    def test_invalid_policy(self, spec):
+        """测试无效的调度设置"""
+        with pytest.raises(ValueError):
+            ThreadPolicy.parse(spec)
+
+    def test_cpu_list(self):
+        """测试CPU列表"""
+        assert parse_cpu_list("3") == {3}
+        assert parse_cpu_list("0, 2-3") == {0, 2, 3}
+        for spec in ("", "3-1", "a", "-1"):
+            with pytest.raises(ValueError):
+                parse_cpu_list(spec)
+
+    def test_config_from_env(self):
+        """测试从环境变量读取，未设置时不启用"""
+        assert not SchedulingConfig.from_env({}).enabled
+        assert not SchedulingConfig.from_env({"EDUBUDDY_RT_SCHED": "off"}).enabled
+        config = SchedulingConfig.from_env(
+            {
+                "EDUBUDDY_RT_SCHED": "rr:50",
+                "EDUBUDDY_AUDIO_CPUS": "3",
+                "EDUBUDDY_RT_BASELINE": "10",
+            }
+        )
+        assert config.enabled and config.policy == ThreadPolicy("rr", 50)
+        assert config.audio_cpus == {3} and config.loop_cpus is None
+        assert config.baseline_callbacks == 10
+        with pytest.raises(ValueError):
+            SchedulingConfig.from_env({"EDUBUDDY_RT_BASELINE": "x"})
+
+
+class TestApply:
+    """应用调度设置测试类"""
+
+    def test_affinity_on_current_thread(self):
+        """测试把当前线程绑定到它已允许的CPU"""
+        if not hasattr(os, "sched_getaffinity"):
+            pytest.skip("平台不支持CPU亲和性")
+        tid = threading.get_native_id()
+        cpus = frozenset(os.sched_getaffinity(tid))
+        result = apply_thread_policy(tid, cpus=cpus)
+        assert result.affinity_applied and result.error is None
+
+    def test_permission_denied_falls_back(self, monkeypatch):
+        """测试没有权限时不抛出异常，只记录原因"""
+
+        def deny(*args):
+            raise PermissionError(1, "Operation not permitted")
+
+        monkeypatch.setattr(os, "sched_setscheduler", deny, raising=False)
+        result = apply_thread_policy(
+            threading.get_native_id(), ThreadPolicy("fifo", 70)
+        )
+        assert not result.policy_applied
+        assert "CAP_SYS_NICE" in result.error
+
+
+class TestScheduler:
+    """回调抖动测量和提升流程测试类"""
+
+    def test_jitter(self):
+        """测试抖动为回调间隔与上一块时长之差"""
+        jitter = CallbackJitter(sample_rate=1000)
+        for now in (0.0, 0.040, 0.083, 0.120):
+            jitter.record(now, 40)
+        assert jitter.count == 3
+        assert jitter.max_s == pytest.approx(0.003)
+        assert jitter.mean_s == pytest.approx(0.002)
+        jitter.restart()
+        jitter.record(5.0, 40)
+        assert jitter.count == 3
+
+    def test_baseline_then_elevate(self, monkeypatch):
+        """测试测够基线后提升回调线程和事件循环线程，新回调线程重新应用"""
+        calls = []
+
+        def fake_apply(tid, policy=None, cpus=None):
+            calls.append((tid, policy))
+            return priority.ApplyResult(policy_applied=True)
+
+        monkeypatch.setattr(priority, "apply_thread_policy", fake_apply)
+        config = SchedulingConfig(ThreadPolicy("fifo", 70), baseline_callbacks=3)
+        scheduler = ThreadScheduler(config, sample_rate=1000)
+        scheduler.attach_loop()
+        loop_tid = threading.get_native_id()
+
+        times = iter(i * 0.04 for i in range(100))
+        callback_tid = []
+
+        def callbacks(count):
+            callback_tid.append(threading.get_native_id())
+            for _ in range(count):
+                scheduler.on_callback(next(times), 40)
+
+        thread = threading.Thread(target=callbacks, args=(4,))
+        thread.start()
+        thread.join()
+        assert scheduler.elevated and scheduler.applied
+        assert scheduler.baseline.count == 3
+        assert calls == [
+            (callback_tid[0], ThreadPolicy("fifo", 70)),
+            (loop_tid, ThreadPolicy("fifo", 60)),
+        ]
+
+        # 音频流重新打开：新的回调线程
+        scheduler.stream_restarted()
+        thread = threading.Thread(target=callbacks, args=(4,))
+        thread.start()
+        thread.join()
+        assert calls[-1] == (callback_tid[1], ThreadPolicy("fifo", 70))
+        assert scheduler.reported and scheduler.jitter.count == 3
+
+        registry = MetricsRegistry()
+        scheduler.register_metrics(registry)
+        snapshot = registry.snapshot()
+        assert snapshot["sched.elevated"] == 1
+        assert snapshot["sched.jitter_ms_max"] == pytest.approx(0.0, abs=1e-6)
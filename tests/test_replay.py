@@ -0,0 +1,121 @@
+"""
+回复重播测试模块
+"""
+
+import numpy as np
+import pytest
+
+from edubuddy.control import MetricsRegistry
+from edubuddy.replay import (
+    ReplayRing,
+    is_repeat_request,
+    mulaw_decode,
+    mulaw_encode,
+)
+
+
+def _tone(seconds=0.2, amplitude=8000, rate=24000):
+    t = np.arange(int(seconds * rate)) / rate
+    return (amplitude * np.sin(2 * np.pi * 440 * t)).astype(np.int16)
+
+
+class TestMulaw:
+    """μ-law 编解码测试类"""
+
+    def test_roundtrip_quality(self):
+        """测试压缩为每样本1字节，解码后信噪比足够语音重播"""
+        audio = _tone()
+        data = mulaw_encode(audio)
+        assert len(data) == audio.size
+        decoded = mulaw_decode(data)
+        assert decoded.dtype == np.int16 and decoded.size == audio.size
+        noise = audio.astype(np.float64) - decoded
+        snr_db = 10 * np.log10(
+            np.mean(audio.astype(np.float64) ** 2) / np.mean(noise**2)
+        )
+        assert snr_db > 30
+
+    def test_extremes(self):
+        """测试静音和满幅"""
+        extremes = np.array([0, 32767, -32768], dtype=np.int16)
+        decoded = mulaw_decode(mulaw_encode(extremes))
+        assert decoded[0] == 0
+        assert decoded[1] > 30000 and decoded[2] < -30000
+
+
+class TestReplayRing:
+    """重播环测试类"""
+
+    def test_latest_and_by_item_id(self):
+        """测试按 item_id 或取最近一条回复，分块追加的音频和文本完整还原"""
+        ring = ReplayRing(max_responses=3)
+        audio = _tone()
+        for start in range(0, audio.size, 960):
+            ring.add_audio("a", audio[start : start + 960])
+        ring.add_text("a", "光合作用")
+        ring.add_text("a", "是……")
+        ring.add_audio("b", _tone(0.1))
+
+        entry, decoded = ring.get("a")
+        assert entry.transcript == "光合作用是……"
+        assert entry.duration_s == pytest.approx(0.2)
+        np.testing.assert_array_equal(decoded, mulaw_decode(mulaw_encode(audio)))
+        assert ring.get()[0].item_id == "b"
+        assert ring.get("missing") is None
+        assert ring.replays == 2 and entry.replays == 1
+
+    def test_bounded_by_count_and_bytes(self):
+        """测试超过回复数或字节上限时淘汰最早的回复，单条过长时截断"""
+        ring = ReplayRing(max_responses=2, max_bytes=10000)
+        for item_id in ("a", "b", "c"):
+            ring.add_audio(item_id, np.zeros(3000, np.int16))
+        assert [e.item_id for e in ring.entries()] == ["c", "b"]
+        assert ring.stored_bytes == 6000 and ring.evictions == 1
+
+        ring.add_audio("c", np.zeros(5000, np.int16))
+        assert "b" not in ring and ring.stored_bytes == 8000
+        ring.add_audio("c", np.zeros(5000, np.int16))
+        entry = ring.entries()[0]
+        assert entry.truncated and entry.samples == 8000
+
+    def test_discard_and_interrupted(self):
+        """测试丢弃回复后取到上一条，被打断的回复保留已收到的部分"""
+        ring = ReplayRing()
+        ring.add_audio("a", _tone())
+        ring.mark_interrupted("a")
+        ring.add_text("b", "只有文本")
+        ring.add_audio("c", _tone(0.1))
+        assert ring.discard("c") and not ring.discard("c")
+        entry, _ = ring.get()
+        assert entry.item_id == "a" and entry.interrupted
+
+        registry = MetricsRegistry()
+        ring.register_metrics(registry)
+        snapshot = registry.snapshot()
+        assert snapshot["replay.responses"] == 2
+        assert snapshot["replay.stored_bytes"] == _tone().size
+
+    def test_rejects_invalid_settings(self):
+        """测试无效参数"""
+        with pytest.raises(ValueError):
+            ReplayRing(max_responses=0)
+        with pytest.raises(ValueError):
+            ReplayRing(max_bytes=0)
+
+
+class TestRepeatRequest:
+    """重播请求识别测试类"""
+
+    @pytest.mark.parametrize(
+        "text", ["再说一遍", "老师，再说一遍！", "重复一下。", "Say that again?"]
+    )
+    def test_repeat_requests(self, text):
+        """测试简短的重复请求"""
+        assert is_repeat_request(text)
+
+    @pytest.mark.parametrize(
+        "text", ["为什么天是蓝的", "请再说一遍光合作用和呼吸作用有什么区别", ""]
+    )
+    def test_other_questions(self, text):
+        """测试普通提问和较长的提问不视为重播请求"""
+        assert not is_repeat_request(text)
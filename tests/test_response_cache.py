@@ -0,0 +1,201 @@
+"""
+回复缓存测试模块
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+from edubuddy.response_cache import (
+    INDEX_FILE,
+    ResponseCache,
+    ResponseRecorder,
+    is_cacheable_key,
+    normalize_transcript,
+)
+
+
+def _audio(value, samples=1000):
+    return np.full(samples, value, np.int16)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """约10KB的小缓存，每条回复最多占一半"""
+    response_cache = ResponseCache(
+        str(tmp_path), capacity_mb=0.01, max_entry_fraction=0.5
+    )
+    yield response_cache
+    response_cache.close()
+
+
+class TestNormalize:
+    """提问文本规范化测试类"""
+
+    def test_punctuation_case_and_width(self):
+        """测试标点、大小写、全角和多余空白不影响缓存键"""
+        assert normalize_transcript(" 为什么天是蓝的？") == "为什么天是蓝的"
+        assert normalize_transcript("Why is  the sky BLUE?!") == "why is the sky blue"
+        assert normalize_transcript("ＡＢＣ，１２３") == normalize_transcript("abc 123")
+        assert normalize_transcript("？！…") == ""
+
+
+class TestResponseCache:
+    """回复缓存测试类"""
+
+    def test_roundtrip_and_persistence(self, cache, tmp_path):
+        """测试存取一致，重新打开后仍然命中"""
+        assert cache.put("q", "回答", _audio(7))
+        entry, audio = cache.get("q")
+        assert entry.transcript == "回答" and entry.duration_s == pytest.approx(1 / 24)
+        assert np.array_equal(audio, _audio(7))
+        assert cache.get("other") is None
+        assert (cache.hits, cache.misses) == (1, 1)
+        cache.close()
+
+        reopened = ResponseCache(str(tmp_path), capacity_mb=0.01)
+        assert np.array_equal(reopened.get("q")[1], _audio(7))
+        reopened.close()
+
+    def test_lru_eviction(self, cache):
+        """测试空间不足时淘汰最近最少使用的回复"""
+        for key in "abcde":
+            assert cache.put(key, key, _audio(ord(key)))
+        # 5条各2000字节，容量约10KB
+        assert len(cache) == 5
+        cache.get("a")
+        assert cache.put("f", "f", _audio(1, 2000))
+        assert "a" in cache and "b" not in cache and "c" not in cache
+        assert cache.evictions == 2
+        # 淘汰后复用的空间里数据没有串
+        assert np.all(cache.get("a")[1] == ord("a"))
+        assert np.all(cache.get("f")[1] == 1)
+
+    def test_shrink_and_restore(self, cache):
+        """测试收缩可用容量时淘汰落在其外的条目，恢复后可再次使用"""
+        for key in "abcd":
+            assert cache.put(key, key, _audio(ord(key)))
+        evicted = cache.shrink(0.5)
+        assert evicted == 2 and sorted(e.key for e in cache.entries()) == ["a", "b"]
+        assert np.all(cache.get("b")[1] == ord("b"))
+        # 收缩期间新回复只能放进可用容量
+        assert cache.put("e", "e", _audio(1, 1500))
+        assert max(e.offset + e.length for e in cache.entries()) <= cache.limit
+
+        assert cache.shrink(1.0) == 0
+        assert cache.put("f", "f", _audio(2))
+        with pytest.raises(ValueError):
+            cache.shrink(0)
+
+    def test_rejects_unusable_entries(self, cache):
+        """测试空键、空音频和过长的回复不缓存"""
+        assert not cache.put("", "x", _audio(1))
+        assert not cache.put("q", "x", _audio(1, 0))
+        assert not cache.put("q", "x", _audio(1, 4000))
+        assert len(cache) == 0
+
+    def test_corrupt_index_is_ignored(self, tmp_path):
+        """测试索引损坏或越界时清空而不是报错"""
+        (tmp_path / INDEX_FILE).write_text("{", encoding="utf-8")
+        cache = ResponseCache(str(tmp_path), capacity_mb=0.01)
+        assert len(cache) == 0
+        assert cache.put("q", "x", _audio(1))
+        cache.close()
+
+        index = json.loads((tmp_path / INDEX_FILE).read_text(encoding="utf-8"))
+        index["entries"][0]["offset"] = 1 << 30
+        (tmp_path / INDEX_FILE).write_text(json.dumps(index), encoding="utf-8")
+        cache = ResponseCache(str(tmp_path), capacity_mb=0.01)
+        assert len(cache) == 0
+        cache.close()
+
+
+class TestResponseRecorder:
+    """回复记录测试类"""
+
+    def test_completed_response_is_cached(self, cache):
+        """测试回复在提问转写之前开始，也按本轮提问缓存"""
+        recorder = ResponseRecorder(cache)
+        recorder.input_committed("u1")
+        recorder.add_audio(_audio(1, 100))
+        assert recorder.question("天为什么是蓝的？", "u1") is None
+        recorder.add_text("因为")
+        recorder.add_audio(_audio(2, 100))
+        assert recorder.finish()
+
+        # 回复开始前到达的转写命中缓存，该轮服务端的回复不再记录
+        recorder.input_committed("u2")
+        entry, audio = recorder.question("天为什么是蓝的", "u2")
+        assert entry.transcript == "因为" and audio.size == 200
+        recorder.add_text("服务端的回复")
+        recorder.add_audio(_audio(3, 100))
+        assert not recorder.finish()
+        assert cache.get("天为什么是蓝的")[1].size == 200
+
+    def test_interrupted_response_is_not_cached(self, cache):
+        """测试被打断的回复不缓存，且不影响下一轮"""
+        recorder = ResponseRecorder(cache)
+        recorder.add_audio(_audio(1, 100))
+        recorder.question("这道题怎么做")
+        recorder.interrupted()
+        assert not recorder.finish()
+        # 没有提问转写的回复也不缓存
+        recorder.add_audio(_audio(1, 100))
+        assert not recorder.finish()
+        assert len(cache) == 0
+
+    def test_late_transcript_is_not_used_for_next_answer(self, cache):
+        """测试在本轮结束后才到达的转写既不查找缓存，也不作为下一轮回复的键"""
+        recorder = ResponseRecorder(cache)
+        recorder.input_committed("u1")
+        recorder.add_audio(_audio(1, 100))
+        assert not recorder.finish()
+        assert recorder.question("我听到的不是中文", "u1") is None
+
+        recorder.input_committed("u2")
+        recorder.add_audio(_audio(2, 100))
+        assert not recorder.finish()
+        assert len(cache) == 0
+
+        # 不知道条目编号时，只采用回复进行中到达的转写
+        assert recorder.question("我听到的不是中文") is None
+        recorder.add_audio(_audio(3, 100))
+        assert not recorder.finish()
+        assert len(cache) == 0
+
+    def test_transcript_for_a_later_input(self, cache):
+        """测试回复进行中到达的新输入的转写不作为本轮的键"""
+        recorder = ResponseRecorder(cache)
+        recorder.input_committed("u1")
+        recorder.add_audio(_audio(1, 100))
+        recorder.input_committed("u2")
+        assert recorder.question("月亮为什么会变", "u2") is None
+        assert not recorder.finish()
+        assert len(cache) == 0
+
+    def test_reset_forgets_previous_session(self, cache):
+        """测试切换会话后，上一个会话未结束的回复和输入条目都被丢弃"""
+        recorder = ResponseRecorder(cache)
+        recorder.input_committed("u1")
+        recorder.add_audio(_audio(1, 100))
+        recorder.question("天为什么是蓝的", "u1")
+        recorder.reset()
+        assert recorder.question("天为什么是蓝的", "u1") is None
+        recorder.add_audio(_audio(2, 100))
+        assert not recorder.finish()
+        assert len(cache) == 0
+
+    def test_follow_ups_are_not_cached(self, cache):
+        """测试过短的提问和常见追问不缓存也不查找"""
+        assert not is_cacheable_key(normalize_transcript("为什么？"))
+        assert not is_cacheable_key(normalize_transcript("继续"))
+        assert not is_cacheable_key(normalize_transcript("然后呢？"))
+        assert is_cacheable_key(normalize_transcript("天为什么是蓝的"))
+
+        recorder = ResponseRecorder(cache)
+        recorder.input_committed("u1")
+        recorder.add_audio(_audio(1, 100))
+        recorder.question("为什么？", "u1")
+        assert not recorder.finish()
+        assert len(cache) == 0
@@ -0,0 +1,107 @@
+"""
+计划表达式测试模块
+"""
+
+from datetime import datetime
+
+import pytest
+
+from edubuddy.schedule import CronSchedule
+from edubuddy.time_service import TimeService, create_time_service
+
+
+class TestCronSchedule:
+    """cron计划测试类"""
+
+    def test_every_five_minutes_in_lesson_hours(self):
+        """测试工作日上课时间每5分钟触发"""
+        schedule = CronSchedule("*/5 8-14 * * mon-fri")
+
+        # 周三 08:02 -> 08:05
+        assert schedule.next_fire(datetime(2024, 5, 1, 8, 2, 30)) == datetime(
+            2024, 5, 1, 8, 5
+        )
+        # 周三 14:59 -> 周四 08:00
+        assert schedule.next_fire(datetime(2024, 5, 1, 14, 59)) == datetime(
+            2024, 5, 2, 8, 0
+        )
+        # 周五 15:00 -> 下周一 08:00
+        assert schedule.next_fire(datetime(2024, 5, 3, 15, 0)) == datetime(
+            2024, 5, 6, 8, 0
+        )
+
+    def test_strictly_after(self):
+        """测试下一次触发严格晚于给定时间"""
+        schedule = CronSchedule("0 * * * *")
+        assert schedule.next_fire(datetime(2024, 1, 1, 10, 0)) == datetime(
+            2024, 1, 1, 11, 0
+        )
+
+    def test_six_fields_with_seconds(self):
+        """测试带秒字段的6段表达式"""
+        schedule = CronSchedule("*/15 * * * * *")
+        assert schedule.next_fire(datetime(2024, 1, 1, 0, 0, 16)) == datetime(
+            2024, 1, 1, 0, 0, 30
+        )
+
+    def test_month_and_year_rollover(self):
+        """测试跨月和跨年"""
+        schedule = CronSchedule("0 9 1 jan,jun *")
+        assert schedule.next_fire(datetime(2024, 6, 1, 9, 0)) == datetime(
+            2025, 1, 1, 9, 0
+        )
+
+    def test_day_or_weekday(self):
+        """测试日和周同时受限时取并集"""
+        schedule = CronSchedule("0 0 13 * 5")
+        # 2024-05-10 是周五，早于13日
+        assert schedule.next_fire(datetime(2024, 5, 4)) == datetime(2024, 5, 10)
+
+    def test_sunday_aliases(self):
+        """测试0和7都表示周日"""
+        for expr in ("0 0 * * 0", "0 0 * * 7", "@weekly"):
+            assert CronSchedule(expr).next_fire(datetime(2024, 5, 1)) == datetime(
+                2024, 5, 5
+            )
+
+    @pytest.mark.parametrize(
+        "expr",
+        ["* * * *", "61 * * * *", "*/0 * * * *", "0 0 * * funday", "5-1 * * * *"],
+    )
+    def test_invalid_expression(self, expr):
+        """测试无效表达式"""
+        with pytest.raises(ValueError):
+            CronSchedule(expr)
+
+    def test_never_fires(self):
+        """测试永不触发的表达式"""
+        with pytest.raises(ValueError):
+            CronSchedule("0 0 30 feb *").next_fire(datetime(2024, 1, 1))
+
+
+class TestTimeServiceSchedule:
+    """时间服务计划测试类"""
+
+    def test_create_with_schedule(self):
+        """测试通过工厂函数创建带计划的时间服务"""
+        service = create_time_service(schedule="*/5 8-14 * * mon-fri")
+        assert isinstance(service.schedule, CronSchedule)
+
+    def test_set_schedule(self):
+        """测试设置和清除计划"""
+        service = TimeService()
+        service.set_schedule("* * * * * *")
+        assert service.schedule is not None
+        service.set_schedule(None)
+        assert service.schedule is None
+
+    def test_scheduled_ticks(self):
+        """测试按计划触发日志"""
+        service = TimeService(schedule="* * * * * *")
+        ticks = []
+        service._log_time = lambda: ticks.append(1)
+        service.start_time_logging()
+        # 每秒触发一次，等待足够覆盖至少一次触发
+        service._thread.join(timeout=1.2)
+        service.stop_time_logging()
+        assert ticks
@@ -0,0 +1,180 @@
+"""
+会话池测试模块
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from edubuddy.batch import LocalSession, local_session_factory, run_batch, write_wav
+from edubuddy.clock import VirtualClock
+from edubuddy.control import MetricsRegistry
+from edubuddy.session_pool import SessionPool
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(autojump=True)
+
+
+class _TrackingFactory:
+    """记录建立和关闭的本地会话，可设置前几次建立失败"""
+
+    def __init__(self, clock, connect_delay_s=2.0, failures=0):
+        self.clock = clock
+        self.connect_delay_s = connect_delay_s
+        self.failures = failures
+        self.opened = 0
+        self.closed = 0
+
+    def __call__(self):
+        factory = self
+
+        class _Session(LocalSession):
+            async def __aenter__(self):
+                await super().__aenter__()
+                if factory.failures:
+                    factory.failures -= 1
+                    raise ConnectionError("握手失败")
+                factory.opened += 1
+                return self
+
+            async def close(self):
+                factory.closed += 1
+                await super().close()
+
+        return _Session(clock=self.clock, connect_delay_s=self.connect_delay_s)
+
+
+class TestSessionPool:
+    """会话池测试类"""
+
+    def test_hands_out_warm_sessions(self, clock):
+        """测试预先建立的会话立即交出，并在后台补充"""
+
+        async def scenario():
+            factory = _TrackingFactory(clock)
+            pool = SessionPool(factory, size=2, clock=clock)
+            pool.start()
+            assert pool.warming == 2
+            await clock.asleep(3.0)
+            assert pool.idle == 2 and pool.ready_mean_s == pytest.approx(2.0)
+
+            pooled = await pool.acquire()
+            assert pooled.hit and pooled.waited_s == 0.0
+            async with pooled as session:
+                assert isinstance(session, LocalSession)
+                assert pool.idle == 1 and pool.warming == 1
+            assert factory.closed == 1
+
+            await clock.asleep(3.0)
+            assert pool.idle == 2
+            await pool.close()
+            assert factory.opened == 3 and factory.closed == 3
+            return pool
+
+        pool = asyncio.run(scenario())
+        assert pool.hit_rate == 1.0 and pool.wait_max_s == 0.0
+
+    def test_miss_waits_for_next_session(self, clock):
+        """测试没有就绪会话时等待下一个建立完成，不预先建立时每次现建"""
+
+        async def scenario():
+            pool = SessionPool(_TrackingFactory(clock), size=0, clock=clock)
+            pool.start()
+            assert pool.warming == 0
+            first, second = await asyncio.gather(pool.acquire(), pool.acquire())
+            assert not first.hit and first.waited_s == pytest.approx(2.0)
+            assert pool.idle == 0 and pool.warming == 0
+            await pool.close()
+            with pytest.raises(RuntimeError):
+                await pool.acquire()
+            return pool
+
+        pool = asyncio.run(scenario())
+        assert pool.hit_rate == 0.0 and pool.wait_mean_s == pytest.approx(2.0)
+
+    def test_retires_idle_sessions(self, clock):
+        """测试空闲太久的会话被关闭并替换"""
+
+        async def scenario():
+            factory = _TrackingFactory(clock)
+            pool = SessionPool(factory, size=1, max_idle_s=60.0, clock=clock)
+            pool.start()
+            # 每15秒检查一次：第75秒和第150秒各关闭一个空闲超过60秒的会话
+            await clock.asleep(200.0)
+            assert pool.retired == 2 and factory.closed == 2
+            assert pool.idle == 1
+            await pool.close()
+            return factory
+
+        factory = asyncio.run(scenario())
+        assert factory.opened == factory.closed == 3
+
+    def test_failures_reach_waiters_and_retry(self, clock):
+        """测试建立失败时错误交给等待的请求，后台按间隔重试"""
+
+        async def scenario():
+            factory = _TrackingFactory(clock, failures=2)
+            pool = SessionPool(factory, size=1, retry_s=5.0, clock=clock)
+            pool.start()
+            with pytest.raises(ConnectionError):
+                await pool.acquire()
+            # 第二次失败后等待5秒重试
+            await clock.asleep(10.0)
+            assert pool.failures == 2 and pool.idle == 1
+            registry = MetricsRegistry()
+            pool.register_metrics(registry)
+            snapshot = registry.snapshot()
+            await pool.close()
+            return snapshot
+
+        snapshot = asyncio.run(scenario())
+        assert snapshot["session_pool.failures_total"] == 2
+        assert snapshot["session_pool.ready_ms_mean"] == pytest.approx(2000)
+        assert snapshot["session_pool.hit_rate"] == 0.0
+
+    def test_rejects_invalid_settings(self):
+        """测试无效参数"""
+        with pytest.raises(ValueError):
+            SessionPool(local_session_factory(), size=-1)
+        with pytest.raises(ValueError):
+            SessionPool(local_session_factory(), max_idle_s=0)
+
+
+class TestPooledBatch:
+    """批处理使用会话池测试类"""
+
+    def test_pool_hides_connect_time(self, tmp_path, clock):
+        """测试批处理经会话池取会话时不再等待建立连接"""
+        rate = 16000
+        t = np.arange(int(rate * 0.5)) / rate
+        tone = (6000 * np.sin(2 * np.pi * 300 * t)).astype(np.int16)
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"q{i}.wav"
+            write_wav(str(path), tone, rate)
+            paths.append(str(path))
+
+        async def scenario():
+            factory = local_session_factory(clock=clock, connect_delay_s=1.5)
+            pool = SessionPool(factory, size=3, clock=clock)
+            pool.start()
+            await clock.asleep(2.0)
+            try:
+                return await run_batch(
+                    paths,
+                    pool.session_factory(),
+                    str(tmp_path / "out"),
+                    concurrency=3,
+                    clock=clock,
+                )
+            finally:
+                await pool.close()
+
+        summary = asyncio.run(scenario())
+        assert summary.succeeded == 3
+        lines = (tmp_path / "out" / "results.jsonl").read_text("utf-8").splitlines()
+        assert all(json.loads(line)["connect_s"] == 0.0 for line in lines)
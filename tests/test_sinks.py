@@ -0,0 +1,185 @@
+"""
+队列日志输出测试模块
+"""
+
+import gzip
+import threading
+
+import pytest
+
+from edubuddy.logger import Logger
+from edubuddy.sinks import (
+    OVERFLOW_BLOCK,
+    OVERFLOW_DROP_NEWEST,
+    OVERFLOW_DROP_OLDEST,
+    QueuedSink,
+)
+
+
+class _GatedWriter:
+    """在放行前阻塞写出的测试写出器，模拟stdout反压"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+        self.batches = []
+
+    def __call__(self, text):
+        self.started.set()
+        self.gate.wait(timeout=5)
+        self.batches.append(text)
+
+    @property
+    def text(self):
+        return "".join(self.batches)
+
+
+class TestQueuedSink:
+    """队列日志输出测试类"""
+
+    def test_writes_in_order(self):
+        """测试消息按顺序写出"""
+        writer = _GatedWriter()
+        writer.gate.set()
+        sink = QueuedSink(writer)
+        for i in range(100):
+            sink(f"{i}\n")
+        assert sink.flush()
+        sink.close()
+        assert writer.text == "".join(f"{i}\n" for i in range(100))
+
+    def test_batches_writes(self):
+        """测试积压的消息批量写出"""
+        writer = _GatedWriter()
+        sink = QueuedSink(writer, batch_size=50)
+        sink("first\n")
+        assert writer.started.wait(timeout=5)
+        for i in range(100):
+            sink(f"{i}\n")
+        writer.gate.set()
+        sink.close()
+        # 首条消息单独写出，其余100条按50条一批写出
+        assert len(writer.batches) == 3
+
+    def test_drop_newest(self):
+        """测试丢弃最新消息策略"""
+        writer = _GatedWriter()
+        sink = QueuedSink(writer, maxsize=2, overflow=OVERFLOW_DROP_NEWEST)
+        sink("busy\n")
+        assert writer.started.wait(timeout=5)
+        for name in ("a", "b", "c", "d"):
+            sink(f"{name}\n")
+        assert sink.dropped == 2
+        writer.gate.set()
+        sink.close()
+        assert "a\nb\n" in writer.text
+        assert "c\n" not in writer.text
+        assert "丢弃了 2 条消息" in writer.text
+
+    def test_drop_oldest(self):
+        """测试丢弃最旧消息策略"""
+        writer = _GatedWriter()
+        sink = QueuedSink(writer, maxsize=2, overflow=OVERFLOW_DROP_OLDEST)
+        sink("busy\n")
+        assert writer.started.wait(timeout=5)
+        for name in ("a", "b", "c", "d"):
+            sink(f"{name}\n")
+        assert sink.dropped == 2
+        writer.gate.set()
+        sink.close()
+        assert "c\nd\n" in writer.text
+        assert "a\n" not in writer.text
+
+    def test_block(self):
+        """测试阻塞策略等待队列空位而不丢弃"""
+        writer = _GatedWriter()
+        sink = QueuedSink(writer, maxsize=1, overflow=OVERFLOW_BLOCK)
+        sink("busy\n")
+        assert writer.started.wait(timeout=5)
+        sink("a\n")
+
+        producer = threading.Thread(target=sink, args=("b\n",))
+        producer.start()
+        producer.join(timeout=0.1)
+        assert producer.is_alive()
+
+        writer.gate.set()
+        producer.join(timeout=5)
+        sink.close()
+        assert sink.dropped == 0
+        assert writer.text == "busy\na\nb\n"
+
+    def test_block_woken_by_close(self):
+        """测试阻塞等待中被关闭时消息同步写出而不丢失"""
+        writer = _GatedWriter()
+        sink = QueuedSink(writer, maxsize=1, overflow=OVERFLOW_BLOCK)
+        sink("busy\n")
+        assert writer.started.wait(timeout=5)
+        sink("a\n")
+
+        producer = threading.Thread(target=sink, args=("b\n",))
+        producer.start()
+        producer.join(timeout=0.1)
+        assert producer.is_alive()
+
+        sink.close(timeout=0.1)
+        writer.gate.set()
+        producer.join(timeout=5)
+        # 生产者返回时消息已经写出，而不是留在已关闭的队列中
+        assert "b\n" in writer.batches
+        assert sink.dropped == 0
+
+    def test_write_after_close(self):
+        """测试关闭后同步写出"""
+        writer = _GatedWriter()
+        writer.gate.set()
+        sink = QueuedSink(writer)
+        sink.close()
+        sink("late\n")
+        assert writer.text == "late\n"
+
+    def test_invalid_policy(self):
+        """测试无效的溢出策略"""
+        with pytest.raises(ValueError):
+            QueuedSink(print, overflow="drop-all")
+
+
+class TestLoggerConsole:
+    """Logger控制台输出测试类"""
+
+    def test_logger_uses_queued_sink(self, capsys):
+        """测试日志经由队列写出到标准输出"""
+        logger = Logger()
+        logger.info("queued hello")
+        assert logger.flush()
+        assert "queued hello" in capsys.readouterr().out
+
+    def test_configure_console(self, capsys):
+        """测试重新配置控制台输出队列"""
+        logger = Logger()
+        logger.configure_console(overflow=OVERFLOW_DROP_NEWEST, maxsize=100)
+        logger.info("reconfigured")
+        assert logger.flush()
+        assert "reconfigured" in capsys.readouterr().out
+        logger.configure_console()
+
+    def test_file_sink_is_queued(self, tmp_path):
+        """测试文件输出经由队列写出，调用线程不直接写文件"""
+        logger = Logger()
+        file_sink = logger.add_file_sink(str(tmp_path))
+        calls = []
+        original = file_sink.write_line
+
+        def record_thread(*args):
+            calls.append(threading.current_thread().name)
+            original(*args)
+
+        file_sink.write_line = record_thread
+        try:
+            logger.info("to file")
+            assert logger.flush()
+        finally:
+            logger.remove_file_sink()
+        assert set(calls) == {"edubuddy-log-file"}
+        (log,) = tmp_path.glob("*.log*")
+        assert "to file" in gzip.open(log, "rt").read()
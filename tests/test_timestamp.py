@@ -0,0 +1,68 @@
+"""
+时间戳格式化测试模块
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from edubuddy.timestamp import TimestampFormatter, get_timestamp_formatter
+
+
+class TestTimestampFormatter:
+    """时间戳格式化器测试类"""
+
+    def test_matches_strftime(self):
+        """测试与strftime输出一致"""
+        fmt = "%Y-%m-%d %H:%M:%S"
+        formatter = TimestampFormatter(fmt)
+        ts = 1_700_000_000.25
+        assert formatter.format(ts) == datetime.fromtimestamp(ts).strftime(fmt)
+
+    def test_subsecond_field(self):
+        """测试亚秒字段在同一秒内追加"""
+        fmt = "%H:%M:%S.%f"
+        formatter = TimestampFormatter(fmt)
+        base = 1_700_000_000
+        for offset in (0.0, 0.5, 0.123456):
+            ts = base + offset
+            assert formatter.format(ts) == datetime.fromtimestamp(ts).strftime(fmt)
+
+    def test_second_cache(self):
+        """测试同一秒复用缓存的渲染结果"""
+        formatter = TimestampFormatter("%H:%M:%S")
+        formatter.format(1_700_000_000.1)
+        cached = formatter._cache
+        formatter.format(1_700_000_000.9)
+        assert formatter._cache is cached
+        formatter.format(1_700_000_001.0)
+        assert formatter._cache is not cached
+
+    def test_literal_percent(self):
+        """测试转义的百分号不被当作亚秒字段"""
+        formatter = TimestampFormatter("%%f %S")
+        dt = datetime(2024, 1, 1, 8, 0, 5, 42)
+        assert formatter.format_datetime(dt) == dt.strftime("%%f %S")
+
+    def test_format_datetime_keeps_timezone(self):
+        """测试格式化datetime保留其时区"""
+        formatter = TimestampFormatter("%Y-%m-%d %H:%M:%S.%f %z")
+        dt = datetime(2024, 5, 1, 12, 30, 45, 123456, tzinfo=timezone.utc)
+        assert formatter.format_datetime(dt) == dt.strftime("%Y-%m-%d %H:%M:%S.%f %z")
+
+    def test_format_and_format_datetime_do_not_share_cache(self):
+        """测试本地时间和带时区的datetime在同一秒不会命中对方的缓存"""
+        fmt = "%H:%M:%S %z"
+        formatter = TimestampFormatter(fmt)
+        east8 = datetime.fromtimestamp(1_700_000_000, timezone(timedelta(hours=8)))
+        utc = east8.astimezone(timezone.utc)
+        assert formatter.format(1_700_000_000) == datetime.fromtimestamp(
+            1_700_000_000
+        ).strftime(fmt)
+        assert formatter.format_datetime(east8) == east8.strftime(fmt)
+        assert formatter.format_datetime(utc) == utc.strftime(fmt)
+        assert formatter.format(1_700_000_000) == datetime.fromtimestamp(
+            1_700_000_000
+        ).strftime(fmt)
+
+    def test_shared_instance(self):
+        """测试相同格式共享同一格式化器"""
+        assert get_timestamp_formatter("%H:%M") is get_timestamp_formatter("%H:%M")
@@ -0,0 +1,146 @@
+"""
+飞行记录器测试模块
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from edubuddy import audio
+from edubuddy.clock import VirtualClock
+from edubuddy.trace import (
+    EVENT_CHUNK_SENT,
+    EVENT_ERROR,
+    EVENT_FADE_END,
+    EVENT_FADE_START,
+    EVENT_INTERRUPT,
+    EVENT_TICK,
+    EVENT_UNDERRUN,
+    FlightRecorder,
+    read_trace,
+    render_timeline,
+)
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(monotonic_start=100.0)
+
+
+@pytest.fixture
+def flight(tmp_path, clock):
+    return FlightRecorder(capacity=4, directory=str(tmp_path), clock=clock.monotonic)
+
+
+class TestFlightRecorder:
+    """飞行记录器测试类"""
+
+    def test_ring_keeps_latest_events(self, flight, clock):
+        """测试环满后只保留最近的事件，按时间先后返回"""
+        for i in range(6):
+            flight.record(EVENT_CHUNK_SENT, i, i / 10)
+            clock.advance(0.04)
+        flight.record(EVENT_INTERRUPT, -3)
+        events = flight.snapshot()
+        assert [e.a for e in events] == [3, 4, 5, -3]
+        assert events[0].time == pytest.approx(100.12)
+        assert events[-1].name == "interrupt"
+        assert events[0].thread == threading.get_ident() & 0xFFFFFFFF
+
+        flight.configure(enabled=False)
+        flight.record(EVENT_TICK)
+        assert flight.snapshot()[-1].kind == EVENT_INTERRUPT
+
+    def test_dump_and_render(self, flight, clock, tmp_path):
+        """测试转储文件可读回并渲染成时间线"""
+        flight.record(EVENT_TICK, 1, 0.001)
+        clock.advance(1.0)
+        flight.record(EVENT_CHUNK_SENT, 1, 0.05)
+        clock.advance(0.5)
+        flight.record(EVENT_TICK, 2, 0.002)
+        path = flight.dump("测试")
+        assert path and path.startswith(str(tmp_path)) and flight.dumps == 1
+
+        dump = read_trace(path)
+        assert dump.reason == "测试" and len(dump.events) == 3
+        lines = render_timeline(dump)
+        assert "MainThread" in lines[0] and "tick" in lines[0]
+        assert "-1500.0ms" in lines[0]
+        assert "间隔=1500.0ms" in lines[2]
+        assert len(render_timeline(dump, ["chunk_sent"])) == 1
+        assert len(render_timeline(dump, last=2)) == 2
+        with pytest.raises(ValueError):
+            render_timeline(dump, ["unknown"])
+
+    def test_error_dumps_are_rate_limited(self, flight, clock):
+        """测试出错时自动转储，间隔内的再次出错只记录"""
+        assert flight.dump_on_error("first")
+        clock.advance(1.0)
+        assert flight.dump_on_error("second") is None
+        clock.advance(10.0)
+        assert flight.dump_on_error("third")
+        assert flight.dumps == 2
+        assert [e.kind for e in flight.snapshot()] == [EVENT_ERROR] * 3
+
+    def test_thread_exception_dumps(self, flight, monkeypatch):
+        """测试其他线程未捕获的异常触发转储"""
+        monkeypatch.setattr(threading, "excepthook", lambda args: None)
+        monkeypatch.setattr("sys.excepthook", lambda *args: None)
+        flight.install_excepthooks()
+
+        def boom():
+            raise RuntimeError("boom")
+
+        thread = threading.Thread(target=boom, name="worker")
+        thread.start()
+        thread.join()
+        assert "worker" in read_trace(flight.last_dump).reason
+
+    def test_dump_while_lock_held(self, flight):
+        """测试转储锁被占用时，后台转储等锁释放后再写入，不阻塞调用方"""
+        with flight._dump_lock:
+            thread = flight.dump_in_background("SIGUSR1")
+            thread.join(timeout=0.1)
+            assert thread.is_alive() and flight.dumps == 0
+        thread.join(timeout=5)
+        assert not thread.is_alive() and flight.dumps == 1
+
+    def test_rejects_other_files(self, tmp_path):
+        """测试读取非转储文件时报错"""
+        path = tmp_path / "other.bin"
+        path.write_bytes(b"not a trace file")
+        with pytest.raises(ValueError):
+            read_trace(str(path))
+
+
+class TestPlaybackTrace:
+    """播放缓冲追踪事件测试类"""
+
+    def test_interrupt_fade_and_underrun(self, flight, clock, monkeypatch):
+        """测试打断、淡出开始/结束和断供时长被记录"""
+        flight.configure(capacity=16)
+        monkeypatch.setattr(audio, "recorder", flight)
+        buffer = audio.PlaybackBuffer(
+            sample_rate=1000, prebuffer_chunks=1, fade_out_ms=10
+        )
+        out = np.zeros((20, 1), dtype=np.int16)
+
+        buffer.enqueue(np.full(20, 100, np.int16), "item", 0)
+        buffer.fill(out)
+        buffer.fill(out)  # 数据耗尽
+        clock.advance(0.3)
+        buffer.enqueue(np.full(40, 100, np.int16), "item", 0)
+        buffer.fill(out)
+        buffer.interrupt()
+        buffer.fill(out)
+
+        events = flight.snapshot()
+        assert [e.kind for e in events] == [
+            EVENT_UNDERRUN,
+            EVENT_INTERRUPT,
+            EVENT_FADE_START,
+            EVENT_FADE_END,
+        ]
+        assert events[0].b == pytest.approx(0.3)
+        assert events[2].a == events[3].a == 10
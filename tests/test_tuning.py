@@ -0,0 +1,180 @@
+"""
+音频流调优测试模块
+"""
+
+import pytest
+
+from edubuddy.audio import PREBUFFER_CHUNKS
+from edubuddy.tuning import (
+    AutoTuner,
+    StreamStats,
+    TuningBounds,
+    UplinkActivity,
+    baseline_level,
+    tuning_enabled,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Flags:
+    def __init__(self, output_underflow=False):
+        self.output_underflow = output_underflow
+
+    def __bool__(self):
+        return self.output_underflow
+
+
+def _tuner(bounds=None, **kwargs):
+    clock = FakeClock()
+    counter = {"glitches": 0}
+    tuner = AutoTuner(
+        bounds or TuningBounds(),
+        glitches=lambda: counter["glitches"],
+        window_s=10.0,
+        warmup_s=0.0,
+        calm_windows=2,
+        clock=clock,
+        **kwargs,
+    )
+    return tuner, clock, counter
+
+
+class TestTuningBounds:
+    """调优范围测试类"""
+
+    def test_ladder(self):
+        """测试档位从低延迟到高稳定性单调递增"""
+        levels = TuningBounds().ladder(48000)
+        assert levels[0].blocksize == 480
+        assert levels[-1].blocksize == 3840
+        assert levels[0].latency_s == 0.02 and levels[-1].latency_s == 0.2
+        assert [l.prebuffer_chunks for l in levels] == sorted(
+            l.prebuffer_chunks for l in levels
+        )
+
+    def test_from_env(self):
+        """测试从环境变量读取范围"""
+        bounds = TuningBounds.from_env(
+            {
+                "AUDIO_BLOCK_MS": "20-40",
+                "AUDIO_PREBUFFER": "3",
+                "AUDIO_MAX_GLITCH_RATE": "2",
+            }
+        )
+        assert (bounds.min_block_ms, bounds.max_block_ms) == (20.0, 40.0)
+        assert bounds.min_prebuffer == bounds.max_prebuffer == 3
+        assert bounds.max_glitch_rate == 2.0
+
+    def test_baseline_without_tuning(self):
+        """测试未开启自动调优时使用基线参数（40ms 块、设备默认延迟）"""
+        assert not tuning_enabled({})
+        assert tuning_enabled({"AUDIO_AUTOTUNE": "1"})
+        level = baseline_level(48000)
+        assert level.blocksize == 1920 and level.latency_s is None
+        assert level.prebuffer_chunks == PREBUFFER_CHUNKS
+        assert "默认" in level.describe(48000)
+
+    @pytest.mark.parametrize(
+        "environ", [{"AUDIO_BLOCK_MS": "80-10"}, {"AUDIO_LATENCY_MS": "a-b"}]
+    )
+    def test_invalid(self, environ):
+        """测试无效范围"""
+        with pytest.raises(ValueError):
+            TuningBounds.from_env(environ)
+
+
+class TestStreamStats:
+    """流统计测试类"""
+
+    def test_counters(self):
+        """测试输入溢出和输出欠载计数"""
+        stats = StreamStats()
+        stats.record_output_status(Flags())
+        stats.record_output_status(Flags(output_underflow=True))
+        stats.record_input(False)
+        stats.record_input(True)
+        assert stats.output_callbacks == 2
+        assert stats.glitches == 2
+
+
+class TestUplinkActivity:
+    """上行语音活动测试类"""
+
+    def test_idle_after_hold(self):
+        """测试语音结束后保持一段时间才判定为空闲"""
+        clock = FakeClock()
+        activity = UplinkActivity(threshold=0.01, hold_s=1.0, clock=clock)
+        assert activity.idle
+        activity.record(0.005)
+        assert activity.idle
+        activity.record(0.02)
+        clock.now = 0.5
+        activity.record(0.001)
+        assert not activity.idle
+        clock.now = 1.0
+        assert activity.idle
+
+
+class TestAutoTuner:
+    """自动调优测试类"""
+
+    def test_steps_up_on_glitches(self):
+        """测试卡顿率超限时升档"""
+        tuner, clock, counter = _tuner()
+        start = tuner.index
+        counter["glitches"] = 3
+        clock.now = 10.0
+        level = tuner.update()
+        assert level is not None and tuner.index == start + 1
+        assert level.blocksize > tuner.levels[start].blocksize
+
+    def test_steps_down_when_calm(self):
+        """测试连续稳定后降档"""
+        tuner, clock, counter = _tuner()
+        start = tuner.index
+        clock.now = 10.0
+        assert tuner.update() is None
+        clock.now = 20.0
+        assert tuner.update() is not None
+        assert tuner.index == start - 1
+
+    def test_floor_after_failed_step_down(self):
+        """测试降档后立即卡顿则不再降到该档"""
+        tuner, clock, counter = _tuner(start_level=1)
+        clock.now = 10.0
+        tuner.update()
+        clock.now = 20.0
+        tuner.update()
+        assert tuner.index == 0
+        counter["glitches"] = 5
+        clock.now = 30.0
+        tuner.update()
+        assert tuner.index == 1
+        for i in range(4, 10):
+            clock.now = i * 10.0
+            tuner.update()
+        assert tuner.index == 1
+
+    def test_warmup_uses_short_windows(self):
+        """测试会话开始时使用较短的评估窗口"""
+        clock = FakeClock()
+        counter = {"glitches": 0}
+        tuner = AutoTuner(
+            TuningBounds(),
+            glitches=lambda: counter["glitches"],
+            warmup_s=10.0,
+            warmup_window_s=2.0,
+            clock=clock,
+        )
+        start = tuner.index
+        counter["glitches"] = 1
+        clock.now = 2.0
+        assert tuner.update() is not None
+        assert tuner.index == start + 1
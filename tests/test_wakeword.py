@@ -0,0 +1,191 @@
+"""
+唤醒词测试模块
+"""
+
+import numpy as np
+import pytest
+
+from edubuddy.control import MetricsRegistry
+from edubuddy.pipeline import EnergyStage, Frame, Pipeline, WakeStage
+from edubuddy.wakeword import (
+    MIN_THRESHOLD,
+    KeywordSpotter,
+    MfccExtractor,
+    WakeGate,
+    WakeTemplates,
+    enroll,
+    match_score,
+)
+
+WAKE = [(300, 0.15), (900, 0.12), (500, 0.2)]
+OTHER = [(500, 0.15), (300, 0.12), (900, 0.2)]
+
+
+def _phrase(notes, rate=24000, stretch=1.0, gain=0.3, seed=0):
+    """合成"短语"：几段带颤音和谐波的音节，前后各0.3秒安静"""
+    rng = np.random.default_rng(seed)
+    parts = []
+    for pitch, seconds in notes:
+        t = np.arange(int(seconds * stretch * rate)) / rate
+        phase = 2 * np.pi * np.cumsum(pitch * (1 + 0.1 * np.sin(6 * np.pi * t))) / rate
+        envelope = np.minimum(1.0, np.minimum(t, t[::-1]) / 0.02)
+        parts.append(envelope * sum(np.sin(k * phase) / k for k in range(1, 6)))
+    silence = np.zeros(int(0.3 * rate))
+    signal = gain * np.concatenate([silence, *parts, silence])
+    signal += 0.002 * rng.standard_normal(signal.size)
+    return np.clip(signal * 32767, -32768, 32767).astype(np.int16)
+
+
+@pytest.fixture(scope="module")
+def templates():
+    """用3段16kHz、语速略有不同的录音登记"""
+    recordings = [
+        (_phrase(WAKE, 16000, s, seed=i), 16000)
+        for i, s in enumerate((0.95, 1.0, 1.05))
+    ]
+    result, scores = enroll(recordings)
+    assert len(scores) == 6
+    return result
+
+
+def _stream(spotter, audio, rate=24000):
+    chunk = int(rate * 0.04)
+    return [spotter.process(audio[i : i + chunk]) for i in range(0, audio.size, chunk)]
+
+
+class TestFeatures:
+    """特征和模板匹配测试类"""
+
+    def test_streaming_matches_whole_clip(self):
+        """测试按40ms块流式提取与整段提取结果一致"""
+        audio = _phrase(WAKE)
+        whole, level = MfccExtractor(24000).compute(audio)
+        extractor = MfccExtractor(24000)
+        parts = [
+            extractor.process(audio[i : i + 960]) for i in range(0, audio.size, 960)
+        ]
+        streamed = np.concatenate([p[0] for p in parts])
+        assert streamed.shape == whole.shape and whole.shape[1] == 12
+        np.testing.assert_allclose(streamed, whole, atol=1e-9)
+        # 开头的安静部分低于静音电平
+        assert level[0] < -50 < level.max()
+        with pytest.raises(ValueError):
+            MfccExtractor(8000)
+
+    def test_dtw_tolerates_tempo_not_content(self):
+        """测试语速不同仍然匹配，音节顺序不同则不匹配"""
+        features = lambda audio: MfccExtractor(24000).compute(audio)[0]
+        template = features(_phrase(WAKE))[30:-30]
+        assert match_score(template, features(_phrase(WAKE))) < 0.01
+        assert (
+            match_score(template, features(_phrase(WAKE, stretch=1.3))) < MIN_THRESHOLD
+        )
+        assert match_score(template, features(_phrase(OTHER))) > 2 * MIN_THRESHOLD
+
+
+class TestEnrollment:
+    """登记测试类"""
+
+    def test_threshold_and_roundtrip(self, templates, tmp_path):
+        """测试阈值范围、截去静音，保存后可以加载"""
+        assert MIN_THRESHOLD <= templates.threshold < 1.0
+        # 截去前后0.3秒静音后约0.47秒
+        assert all(40 <= len(t) <= 55 for t in templates.templates)
+
+        path = str(tmp_path / "wake" / "wake.npz")
+        templates.save(path)
+        loaded = WakeTemplates.load(path)
+        assert loaded.threshold == templates.threshold
+        assert all(
+            np.array_equal(a, b) for a, b in zip(loaded.templates, templates.templates)
+        )
+
+    def test_rejects_unusable_input(self, tmp_path):
+        """测试没有录音、录音太短和无效文件"""
+        with pytest.raises(ValueError):
+            enroll([])
+        with pytest.raises(ValueError, match="第1段"):
+            enroll([(np.zeros(16000, np.int16), 16000)])
+        path = tmp_path / "bad.npz"
+        np.savez(str(path), threshold=np.array(0.2))
+        with pytest.raises(ValueError):
+            WakeTemplates.load(str(path))
+
+
+class TestKeywordSpotter:
+    """唤醒词检测测试类"""
+
+    def test_detects_wake_phrase_only(self, templates):
+        """测试在24kHz流中检测到更慢、更轻的唤醒词，其他短语和噪声不触发"""
+        spotter = KeywordSpotter(templates, sample_rate=24000)
+        detected = _stream(spotter, _phrase(WAKE, stretch=1.15, gain=0.1, seed=7))
+        assert sum(detected) == 1
+        # 在短语结束（约0.8秒）附近触发
+        assert 0.6 <= detected.index(True) * 0.04 <= 1.0
+
+        rng = np.random.default_rng(3)
+        noise = (rng.standard_normal(24000 * 2) * 3000).astype(np.int16)
+        assert not any(_stream(spotter, _phrase(OTHER)))
+        assert not any(_stream(spotter, noise))
+
+    def test_reports_cpu_per_frame(self, templates):
+        """测试统计每个10ms特征帧的耗时"""
+        spotter = KeywordSpotter(templates, sample_rate=24000)
+        _stream(spotter, _phrase(OTHER))
+        assert spotter.frames == pytest.approx(_phrase(OTHER).size / 240, abs=3)
+        assert 0 < spotter.ns_per_frame < 10e6
+        assert spotter.realtime_fraction == pytest.approx(spotter.ns_per_frame / 1e7)
+        registry = MetricsRegistry()
+        spotter.register_metrics(registry)
+        assert registry.snapshot()["wake.frames_total"] == spotter.frames
+
+
+class TestWakeGate:
+    """唤醒窗口测试类"""
+
+    def _run(self, gate, audio, start=0.0, energy=0.0):
+        states = []
+        for i in range(0, audio.size - 959, 960):
+            states.append(gate.update(audio[i : i + 960], start + i / 24000, energy))
+        return states
+
+    def test_window_opens_and_closes(self, templates):
+        """测试唤醒后窗口打开，到期后关闭；说话和keep_open会延长窗口"""
+        playing = [False]
+        gate = WakeGate(
+            KeywordSpotter(templates, 24000),
+            window_s=2.0,
+            hold_s=1.0,
+            keep_open=lambda: playing[0],
+        )
+        states = self._run(gate, _phrase(WAKE))
+        assert "open" not in states[: states.index("wake")]
+        woke_at = states.index("wake") * 0.04
+        silence = np.zeros(960, np.int16)
+
+        assert gate.update(silence, woke_at + 1.9) == "open"
+        # 说话时延长到最后一次说话后 hold_s
+        assert gate.update(silence, woke_at + 1.95, energy=0.1) == "open"
+        assert gate.update(silence, woke_at + 2.9) == "open"
+        playing[0] = True
+        assert gate.update(silence, woke_at + 2.94) == "open"
+        playing[0] = False
+        assert gate.update(silence, woke_at + 4.0) == "closed"
+        assert not gate.is_open and gate.windows == 1
+        assert gate.blocks_dropped > 0
+
+    def test_pipeline_stage_drops_until_wake(self, templates):
+        """测试流水线中的唤醒阶段只放行唤醒窗口内的块"""
+        gate = WakeGate(KeywordSpotter(templates, 24000), window_s=1.0)
+        pipeline = Pipeline("uplink", [EnergyStage(), WakeStage(gate)])
+        audio = _phrase(WAKE)
+        passed = []
+        for i in range(0, audio.size - 959, 960):
+            frame = pipeline.process(Frame(audio[i : i + 960], i / 24000))
+            if frame is not None:
+                passed.append(frame.meta["wake"])
+        assert passed and passed[0] and not any(passed[1:])
+        assert pipeline.filtered == gate.blocks_dropped
+        registry = MetricsRegistry()
+        gate.register_metrics(registry)
+        assert registry.snapshot()["wake.windows_total"] == 1